@@ -0,0 +1,137 @@
+"""Аналітика швидкості обробки замовлень за журналом подій.
+
+Для кожного замовлення, створеного в періоді, рахуються інтервали:
+    * confirm — від оформлення до підтвердження;
+    * deliver — від підтвердження до виїзду кур'єра;
+    * receive — від виїзду до отримання (клієнтом або завершення адміном).
+Береться перша подія кожного статусу, тож повторні натискання й
+примусові переходи не спотворюють інтервали.
+
+Журнал читається одним потоком за (order_id, id), у пам'яті лише події
+поточного замовлення і гістограми з логарифмічними кошиками, тож
+обсяг пам'яті залежить від кількості днів та адмінів, а не подій.
+"""
+
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+from database import EventSource, OrderEvent, OrderStatus, iter_order_events
+
+# Інтервал → (статус початку, статус кінця)
+METRICS = {
+    "confirm": (OrderStatus.PENDING, OrderStatus.CONFIRMED),
+    "deliver": (OrderStatus.CONFIRMED, OrderStatus.DELIVERING),
+    "receive": (OrderStatus.DELIVERING, OrderStatus.COMPLETED),
+}
+
+
+class Histogram:
+    """Гістограма тривалостей з відносною похибкою перцентилів до ~2.5%.
+
+    Кошик i охоплює [GROWTH^i, GROWTH^(i+1)) секунд; від секунди до
+    року — близько 350 кошиків незалежно від кількості значень.
+    """
+
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._buckets: dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        bucket = math.floor(math.log(seconds, self.GROWTH)) if seconds >= 1 else -1
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.total += other.total
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q: float) -> float | None:
+        """Перцентиль q (0–100), середина кошика в геометричному сенсі."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return 0.0 if bucket < 0 else self.GROWTH ** (bucket + 0.5)
+        return None
+
+
+def _histograms() -> dict[str, Histogram]:
+    return {metric: Histogram() for metric in METRICS}
+
+
+@dataclass
+class LatencyReport:
+    """Гістограми інтервалів за днем створення замовлення і за адміном.
+
+    by_admin містить лише переходи, виконані адміном (source=admin).
+    """
+    since: date
+    until: date
+    by_day: dict[date, dict[str, Histogram]] = field(default_factory=dict)
+    by_admin: dict[int, dict[str, Histogram]] = field(default_factory=dict)
+    orders: int = 0
+    events: int = 0
+
+    def total(self) -> dict[str, Histogram]:
+        result = _histograms()
+        for histograms in self.by_day.values():
+            for metric, histogram in histograms.items():
+                result[metric].merge(histogram)
+        return result
+
+    def _add_order(self, events: list[OrderEvent]) -> None:
+        first: dict[OrderStatus, OrderEvent] = {}
+        for event in events:
+            first.setdefault(event.status, event)
+        created = first.get(OrderStatus.PENDING)
+        # Діапазон id може захопити замовлення з сусідніх днів
+        if created is None or not self.since <= created.created_at.date() <= self.until:
+            return
+        self.orders += 1
+        day = created.created_at.date()
+        for metric, (start, end) in METRICS.items():
+            if start not in first or end not in first:
+                continue
+            seconds = (first[end].created_at - first[start].created_at).total_seconds()
+            if seconds < 0:
+                continue  # перехід назад у часі (ручні правки БД)
+            if day not in self.by_day:
+                self.by_day[day] = _histograms()
+            self.by_day[day][metric].add(seconds)
+            actor_id = first[end].actor_id
+            if first[end].source == EventSource.ADMIN and actor_id is not None:
+                if actor_id not in self.by_admin:
+                    self.by_admin[actor_id] = _histograms()
+                self.by_admin[actor_id][metric].add(seconds)
+
+
+async def order_latencies(since: date, until: date) -> LatencyReport:
+    """Інтервали обробки замовлень, створених з since по until включно."""
+    report = LatencyReport(since, until)
+    start = datetime.combine(since, time.min)
+    end = datetime.combine(until + timedelta(days=1), time.min)
+
+    current: list[OrderEvent] = []
+    async for event in iter_order_events(start, end):
+        report.events += 1
+        if current and event.order_id != current[0].order_id:
+            report._add_order(current)
+            current = []
+        current.append(event)
+    if current:
+        report._add_order(current)
+    return report
@@ -0,0 +1,123 @@
+"""Перенесення давніх завершених і скасованих замовлень в архів.
+
+У orders лишаються активні й недавні замовлення, тож таблиця і її
+індекси не ростуть разом з історією. Замовлення, створені понад
+ARCHIVE_AFTER_DAYS днів тому, переносяться в orders_archive невеликими
+пачками — кожна окремою короткою транзакцією в потоці aiosqlite, між
+пачками цикл подій і запис інших обробників вільні. Після перенесення
+вільні сторінки поступово повертаються файловій системі (інкрементальний
+VACUUM) і оновлюється статистика планувальника (PRAGMA optimize).
+
+Історію клієнта, експорт і перерахунок статистики database читає з
+обох таблиць; бот запускає архівування раз на добу.
+
+Запуск з директорії бота:
+    python -m archive --days 90
+    python -m archive --vacuum   # один раз для БД, створеної до появи архіву (бот зупинено)
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database
+from config import ConfigStore
+
+logger = logging.getLogger(__name__)
+
+# Замовлень за транзакцію: запис блокується на мілісекунди
+ARCHIVE_BATCH = 500
+# Сторінок (по 4 КБ) за крок інкрементального VACUUM
+VACUUM_STEP = 1000
+# Пауза між пачками, с: дає місце записам обробників
+ARCHIVE_PAUSE = 0.05
+
+# Перший запуск після старту бота і інтервал між запусками, с
+ARCHIVE_START_DELAY = 15 * 60
+ARCHIVE_INTERVAL = 24 * 60 * 60
+
+
+@dataclass
+class ArchiveReport:
+    orders: int = 0
+    pages_freed: int = 0
+    seconds: float = 0.0
+
+
+async def archive_orders(days: int, batch: int = ARCHIVE_BATCH, pause: float = ARCHIVE_PAUSE) -> ArchiveReport:
+    """Архівування замовлень, старших за days днів, і ущільнення файлу БД."""
+    report = ArchiveReport()
+    started = time.perf_counter()
+    before = datetime.now() - timedelta(days=days)
+
+    while moved := await database.archive_orders_batch(before, batch):
+        report.orders += moved
+        await asyncio.sleep(pause)
+
+    if report.orders:
+        while result := await database.compact_database(VACUUM_STEP):
+            freed, remaining = result
+            report.pages_freed += freed
+            if not remaining or not freed:
+                break
+            await asyncio.sleep(pause)
+        await database.optimize_database()
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+async def archive_periodically(store: ConfigStore, database_path: Path | None = None) -> None:
+    """Щоденне архівування за налаштуванням archive_after_days (0 — вимкнено)."""
+    if database_path is not None:
+        # Задача має власну копію контексту
+        database.use_database(database_path)
+
+    await asyncio.sleep(ARCHIVE_START_DELAY)
+    while True:
+        days = store.current.archive_after_days
+        if days:
+            try:
+                report = await archive_orders(days)
+                if report.orders:
+                    logger.info(
+                        f"Архівовано замовлень: {report.orders}, звільнено сторінок: "
+                        f"{report.pages_freed} за {report.seconds:.1f} с"
+                    )
+            except Exception as e:
+                logger.error(f"Помилка архівування замовлень: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+async def run(args: argparse.Namespace) -> None:
+    await database.init_db()
+    if args.vacuum:
+        started = time.perf_counter()
+        await database.enable_incremental_vacuum()
+        print(f"Інкрементальний VACUUM увімкнено за {time.perf_counter() - started:.1f} с")
+
+    report = await archive_orders(args.days)
+    print(f"Архівовано замовлень: {report.orders}, звільнено сторінок: {report.pages_freed} "
+          f"за {report.seconds:.1f} с")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="архівувати замовлення, старші за N днів")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="спершу перевести БД в режим інкрементального VACUUM (повний VACUUM)")
+    parser.add_argument("--database", type=Path, default=database.DATABASE_PATH)
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""Резервні копії БД через онлайн-бекап SQLite без зупинки бота.
+
+Копія знімається backup API невеликими порціями сторінок в окремому
+потоці: цикл подій не чекає, а між порціями блокування БД вільне для
+записів обробників. Якщо БД змінюється посеред копіювання, SQLite
+починає копію спочатку; після кількох таких перезапусків знімок
+береться за один крок — у режимі WAL це одна транзакція читання, що
+не блокує запис.
+
+Знімок перевіряється PRAGMA quick_check, стискається gzip і лишається
+за правилами ротації: найновіша копія кожного з останніх KEEP_DAILY
+днів, KEEP_WEEKLY тижнів і KEEP_MONTHLY місяців.
+
+Запуск з директорії бота:
+    python -m backup
+    python -m backup --database data/water_delivery.db --dir /mnt/backups
+
+Відновлення: зупинити бота, розпакувати копію на місце БД
+(gunzip -c data/backups/water_delivery-20261019-030000.db.gz > data/water_delivery.db),
+видалити water_delivery.db-wal і -shm, якщо вони лишились, і запустити бота.
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database
+from config import ConfigStore
+
+logger = logging.getLogger(__name__)
+
+# Сторінок (по 4 КБ) за крок копіювання і пауза між кроками, с
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_PAUSE = 0.002
+# Скільки разів копія може початись спочатку через записи, перш ніж
+# знімок буде взято за один крок
+MAX_RESTARTS = 3
+
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 6
+
+# Перша копія після старту, якщо остання застаріла, і повтор після помилки, с
+BACKUP_START_DELAY = 5 * 60
+BACKUP_RETRY_DELAY = 60 * 60
+
+_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+@dataclass
+class BackupReport:
+    path: Path
+    seconds: float
+    database_bytes: int
+    backup_bytes: int
+    restarts: int
+    kept: int
+
+
+class _Restarted(Exception):
+    """Копія почалась спочатку забагато разів."""
+
+
+def backup_dir_for(path: Path) -> Path:
+    """Директорія копій за замовчуванням — backups поруч з БД."""
+    return path.parent / "backups"
+
+
+def _snapshot_name(path: Path, created: datetime) -> str:
+    return f"{path.stem}-{created.strftime(_TIME_FORMAT)}.db.gz"
+
+
+def list_snapshots(path: Path, backup_dir: Path) -> list[tuple[datetime, Path]]:
+    """Копії цієї БД у backup_dir, від найновішої."""
+    pattern = re.compile(re.escape(path.stem) + r"-(\d{8}-\d{6})\.db\.gz")
+    snapshots = []
+    for candidate in backup_dir.glob(f"{path.stem}-*.db.gz"):
+        match = pattern.fullmatch(candidate.name)
+        if match:
+            snapshots.append((datetime.strptime(match.group(1), _TIME_FORMAT), candidate))
+    return sorted(snapshots, reverse=True)
+
+
+def select_kept(snapshots: list[tuple[datetime, Path]]) -> set[Path]:
+    """Найновіша копія кожного з останніх KEEP_DAILY днів, KEEP_WEEKLY тижнів і KEEP_MONTHLY місяців."""
+    rules = (
+        (lambda created: created.date(), KEEP_DAILY),
+        (lambda created: created.isocalendar()[:2], KEEP_WEEKLY),
+        (lambda created: (created.year, created.month), KEEP_MONTHLY),
+    )
+    kept = set()
+    for period, count in rules:
+        periods = set()
+        for created, path in sorted(snapshots, reverse=True):
+            key = period(created)
+            if key in periods:
+                continue
+            if len(periods) == count:
+                break
+            periods.add(key)
+            kept.add(path)
+    return kept
+
+
+def _copy(source: Path, target: Path) -> int:
+    """Онлайн-копія source у target; повертає кількість перезапусків."""
+    restarts = 0
+    previous = None
+
+    def pace(status, remaining, total):
+        nonlocal restarts, previous
+        if previous is not None and remaining > previous:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _Restarted()
+        previous = remaining
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    src = sqlite3.connect(f"{source.resolve().as_uri()}?mode=ro", uri=True, timeout=database.BUSY_TIMEOUT)
+    try:
+        dst = sqlite3.connect(target)
+        try:
+            try:
+                src.backup(dst, pages=BACKUP_STEP_PAGES, progress=pace)
+            except _Restarted:
+                src.backup(dst)
+            dst.execute("PRAGMA journal_mode = DELETE")  # копія — один файл без -wal
+            (check,) = dst.execute("PRAGMA quick_check").fetchone()
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+    if check != "ok":
+        raise RuntimeError(f"перевірка копії не пройдена: {check}")
+    return restarts
+
+
+def _compress(source: Path, target: Path) -> None:
+    with open(source, "rb") as raw, gzip.open(target, "wb", compresslevel=6) as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+
+
+def _make_backup(source: Path, backup_dir: Path) -> BackupReport:
+    started = time.perf_counter()
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    target = backup_dir / _snapshot_name(source, datetime.now())
+    raw = target.with_name(target.name + ".tmp")
+    packed = target.with_name(target.name + ".part")
+    try:
+        restarts = _copy(source, raw)
+        _compress(raw, packed)
+        packed.replace(target)
+        database_bytes = raw.stat().st_size
+    finally:
+        raw.unlink(missing_ok=True)
+        packed.unlink(missing_ok=True)
+
+    snapshots = list_snapshots(source, backup_dir)
+    kept = select_kept(snapshots)
+    for _, path in snapshots:
+        if path not in kept:
+            path.unlink(missing_ok=True)
+
+    return BackupReport(
+        path=target,
+        seconds=time.perf_counter() - started,
+        database_bytes=database_bytes,
+        backup_bytes=target.stat().st_size,
+        restarts=restarts,
+        kept=len(kept),
+    )
+
+
+# Одна копія БД за раз (щоденна і /backup можуть збігтися)
+_locks: dict[str, asyncio.Lock] = {}
+
+
+async def backup_database(backup_dir: Path | None = None) -> BackupReport:
+    """Резервна копія поточної БД (орендаря) з перевіркою, стисненням і ротацією."""
+    source = database.current_database()
+    if not isinstance(source, Path):
+        raise ValueError("резервна копія можлива лише для БД у файлі")
+
+    lock = _locks.setdefault(str(source), asyncio.Lock())
+    async with lock:
+        return await asyncio.to_thread(_make_backup, source, backup_dir or backup_dir_for(source))
+
+
+def _next_backup_delay(source: Path, interval: timedelta) -> float:
+    """Секунд до наступної копії: через interval після останньої, але не одразу після старту."""
+    snapshots = list_snapshots(source, backup_dir_for(source))
+    if not snapshots:
+        return BACKUP_START_DELAY
+    due = snapshots[0][0] + interval - datetime.now()
+    return max(BACKUP_START_DELAY, due.total_seconds())
+
+
+async def backup_periodically(store: ConfigStore, database_path: Path | None = None) -> None:
+    """Копії з інтервалом backup_interval_hours (0 — вимкнено); відлік від останньої копії,
+    тож часті перезапуски бота не відкладають її."""
+    if database_path is not None:
+        # Задача має власну копію контексту
+        database.use_database(database_path)
+    source = database.current_database()
+    if not isinstance(source, Path):
+        return
+
+    while True:
+        hours = store.current.backup_interval_hours
+        if not hours:
+            await asyncio.sleep(BACKUP_START_DELAY)
+            continue
+        await asyncio.sleep(_next_backup_delay(source, timedelta(hours=hours)))
+        if not store.current.backup_interval_hours:
+            continue
+        try:
+            report = await backup_database()
+            logger.info(
+                f"Резервна копія {report.path.name}: {report.backup_bytes / 2**20:.1f} МБ "
+                f"за {report.seconds:.1f} с"
+            )
+        except Exception as e:
+            logger.error(f"Помилка резервного копіювання: {e}")
+            await asyncio.sleep(BACKUP_RETRY_DELAY)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", type=Path, default=database.DATABASE_PATH)
+    parser.add_argument("--dir", type=Path, help="директорія копій (за замовчуванням backups поруч з БД)")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    report = asyncio.run(backup_database(args.dir))
+    print(f"{report.path}: {report.database_bytes / 2**20:.1f} МБ → {report.backup_bytes / 2**20:.1f} МБ "
+          f"за {report.seconds:.1f} с, перезапусків: {report.restarts}, зберігається копій: {report.kept}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Архівування давніх замовлень: тривалість, вплив на бота і результат.
+
+БД заповнюється історією завершених замовлень (старших за --days) і
+активними. Під час архівування паралельно працюють «обробники» —
+зміни статусів активних замовлень — і вимірюються їх затримки та
+найдовша пауза циклу подій. Після архівування перевіряється, що історія
+клієнта й експорт не змінились, статистика збігається з перерахунком з
+обох таблиць, і порівнюється час get_user_orders та розмір поточної
+таблиці з індексами (архів лишається в тому ж файлі).
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_archive --history 200000 --active 2000
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import archive
+import database
+from database import OrderStatus
+
+from benchmarks.bench_order_index import populate
+
+CUSTOMERS = 2000
+READS = 50
+
+
+async def time_user_orders() -> tuple[float, list[int]]:
+    """Медіана get_user_orders (мс) і id замовлень одного клієнта."""
+    samples = []
+    for _ in range(READS):
+        started = time.perf_counter()
+        orders = await database.get_user_orders(100000 + 7)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, [order.id for order in orders]
+
+
+async def count_exported() -> int:
+    exported = 0
+    async for _ in database.iter_orders_with_users():
+        exported += 1
+    return exported
+
+
+async def stats_match_rebuild() -> bool:
+    """Накопичена статистика дорівнює перерахованій з orders і orders_archive."""
+    since, until = date(2026, 1, 1), date.today()
+    incremental = await database.get_order_stats(since, until)
+    await database.rebuild_order_stats()
+    return incremental == await database.get_order_stats(since, until)
+
+
+def sizes_mb(path: Path) -> tuple[float, float]:
+    """Розмір orders з індексами і всього файлу БД."""
+    with sqlite3.connect(path) as db:
+        (hot,) = db.execute(
+            "SELECT sum(pgsize) FROM dbstat d JOIN sqlite_schema s ON s.name = d.name WHERE s.tbl_name = 'orders'"
+        ).fetchone()
+    return hot / 2**20, path.stat().st_size / 2**20
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=200000)
+    parser.add_argument("--active", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "archive.db"
+        await database.init_db()
+        active_ids = populate(database.DATABASE_PATH, args.active, args.history, CUSTOMERS)
+        await database.rebuild_order_stats()  # populate пише в orders напряму
+        await database.checkpoint()
+
+        hot_before, file_before = sizes_mb(database.DATABASE_PATH)
+        read_before, orders_before = await time_user_orders()
+        exported_before = await count_exported()
+
+        # Архівування разом з «обробниками»: зміни статусів і пульс циклу подій
+        latencies, lags = [], []
+        done = asyncio.Event()
+
+        async def handlers():
+            for order_id in active_ids:
+                if done.is_set():
+                    break
+                started = time.perf_counter()
+                await database.update_order_status(order_id, OrderStatus.CONFIRMED)
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        async def heartbeat():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - started - 0.01)
+
+        tasks = [asyncio.create_task(handlers()), asyncio.create_task(heartbeat())]
+        report = await archive.archive_orders(args.days)
+        done.set()
+        await asyncio.gather(*tasks)
+        await database.checkpoint()
+
+        hot_after, file_after = sizes_mb(database.DATABASE_PATH)
+        read_after, orders_after = await time_user_orders()
+        exported_after = await count_exported()
+        stats_ok = await stats_match_rebuild()
+
+    print(f"архівовано: {report.orders} замовлень за {report.seconds:.1f} с, "
+          f"звільнено сторінок: {report.pages_freed}")
+    print(f"orders з індексами: {hot_before:.1f} → {hot_after:.1f} МБ, файл БД: {file_before:.1f} → {file_after:.1f} МБ")
+    print(f"get_user_orders: {read_before:.2f} → {read_after:.2f} мс")
+    print(f"зміни статусу під час архівування: {len(latencies)}, медіана "
+          f"{statistics.median(latencies) * 1000:.1f} мс, макс {max(latencies) * 1000:.1f} мс")
+    print(f"найдовша пауза циклу подій: {max(lags) * 1000:.1f} мс")
+
+    problems = []
+    if orders_before != orders_after:
+        problems.append("історія клієнта змінилась")
+    if exported_before != exported_after:
+        problems.append(f"експорт: {exported_before} → {exported_after} замовлень")
+    if not stats_ok:
+        problems.append("статистика не збігається з перерахунком")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,94 @@
+"""Онлайн-бекап БД під навантаженням: тривалість, вплив на бота, розмір.
+
+Поки знімається копія, «обробники» безперервно оформлюють замовлення,
+а пульс вимірює найдовшу паузу циклу подій. Після копіювання архів
+розпаковується, перевіряється PRAGMA integrity_check і кількістю
+замовлень (не менше, ніж до початку, і не більше, ніж після).
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_backup --history 200000
+"""
+
+import argparse
+import asyncio
+import gzip
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import backup
+import database
+from database import WaterType
+
+from benchmarks.bench_order_index import populate
+
+CUSTOMERS = 2000
+
+
+def count_orders(path: Path) -> int:
+    with sqlite3.connect(path) as db:
+        return sum(db.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("orders", "orders_archive"))
+
+
+def restore(snapshot: Path, target: Path) -> str:
+    with gzip.open(snapshot, "rb") as packed, open(target, "wb") as raw:
+        shutil.copyfileobj(packed, raw)
+    with sqlite3.connect(target) as db:
+        return db.execute("PRAGMA integrity_check").fetchone()[0]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "backup.db"
+        await database.init_db()
+        populate(database.DATABASE_PATH, 100, args.history, CUSTOMERS)
+        before = count_orders(database.DATABASE_PATH)
+
+        latencies, lags = [], []
+        done = asyncio.Event()
+
+        async def handlers():
+            user_id = 1
+            while not done.is_set():
+                started = time.perf_counter()
+                await database.create_order(user_id, WaterType.EFFECT, 2, 300, "💵 Готівка")
+                latencies.append(time.perf_counter() - started)
+                user_id = user_id % CUSTOMERS + 1
+                await asyncio.sleep(0.005)
+
+        async def heartbeat():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - started - 0.01)
+
+        tasks = [asyncio.create_task(handlers()), asyncio.create_task(heartbeat())]
+        await asyncio.sleep(0.2)
+        report = await backup.backup_database()
+        done.set()
+        await asyncio.gather(*tasks)
+        after = count_orders(database.DATABASE_PATH)
+
+        restored = Path(tmp) / "restored.db"
+        check = restore(report.path, restored)
+        copied = count_orders(restored)
+
+    print(f"копія: {report.database_bytes / 2**20:.1f} МБ → {report.backup_bytes / 2**20:.1f} МБ gzip "
+          f"за {report.seconds:.2f} с, перезапусків: {report.restarts}")
+    print(f"замовлень під час копіювання: {len(latencies)}, медіана {statistics.median(latencies) * 1000:.1f} мс, "
+          f"макс {max(latencies) * 1000:.1f} мс")
+    print(f"найдовша пауза циклу подій: {max(lags) * 1000:.1f} мс")
+    print(f"відновлена копія: integrity_check {check}, замовлень {copied} (до {before}, після {after})")
+    return 0 if check == "ok" and before <= copied <= after else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,193 @@
+"""Облік тари: баланс зі зведення проти підсумовування журналу, звірка.
+
+БД заповнюється --customers клієнтами і журналом тари на --entries записів
+(доставки й повернення, у частини клієнтів — виправлення). Вимірюється:
+    * баланс клієнта для профілю й картки кур'єра: рядок bottle_balances
+      проти SUM за журналом клієнта з індексом — для звичайного клієнта і
+      для офісу, на який припадає --office частка журналу (запити на
+      відкритому з'єднанні, окремо — повний get_bottle_balance);
+    * виконання замовлення з записом у журнал і зміною балансу проти
+      виконання без обліку тари;
+    * звірка зведення з журналом одним проходом (bottles.reconcile);
+після чого перевіряється, що звірка чиста, а зіпсовані рядки зведення
+знаходяться всі до одного.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_bottles --customers 20000 --entries 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bottles
+import database
+from database import OrderStatus, WaterType
+
+READS = 2000
+COMPLETIONS = 300
+# Скільки рядків зведення зіпсувати для перевірки звірки
+CORRUPTED = 25
+
+
+def populate(path: Path, customers: int, entries: int, office: float, rnd: random.Random) -> None:
+    """Клієнти, журнал тари і зведення, що йому відповідає; клієнт 1 — офіс."""
+    start = datetime.now() - timedelta(days=730)
+    totals = [[0, 0] for _ in range(customers + 1)]
+
+    def ledger():
+        for i in range(entries):
+            user_id = 1 if rnd.random() < office else 1 + rnd.randrange(customers)
+            if rnd.random() < 0.5:
+                kind, delivered, returned = "delivery", rnd.randint(1, 6), 0
+            elif rnd.random() < 0.98:
+                kind, delivered, returned = "pickup", 0, rnd.randint(0, 6)
+            else:
+                kind, delivered, returned = "adjustment", rnd.randint(0, 2), rnd.randint(0, 2)
+            totals[user_id][0] += delivered
+            totals[user_id][1] += returned
+            yield (user_id, None if kind == "adjustment" else i + 1, kind, delivered, returned, "system",
+                   f"{start + timedelta(minutes=i * 730 * 24 * 60 // entries):%Y-%m-%d %H:%M:%S}")
+
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        db.executemany(
+            """INSERT INTO bottle_ledger (user_id, order_id, kind, delivered, returned, source, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            ledger(),
+        )
+        db.executemany(
+            "INSERT INTO bottle_balances (user_id, delivered, returned) VALUES (?, ?, ?)",
+            ((user_id, *total) for user_id, total in enumerate(totals) if any(total)),
+        )
+
+
+BALANCE_QUERIES = {
+    "зведення": "SELECT delivered - returned FROM bottle_balances WHERE user_id = ?",
+    "SUM за журналом": "SELECT SUM(delivered) - SUM(returned) FROM bottle_ledger WHERE user_id = ?",
+}
+
+
+async def time_balance_queries(user_ids: list[int]) -> dict[str, float]:
+    """Медіана запиту балансу на відкритому з'єднанні, мс."""
+    timings = {}
+    async with database._connect() as db:
+        for name, query in BALANCE_QUERIES.items():
+            samples = []
+            for user_id in user_ids:
+                start = time.perf_counter()
+                cursor = await db.execute(query, (user_id,))
+                await cursor.fetchone()
+                samples.append(time.perf_counter() - start)
+            timings[name] = statistics.median(samples) * 1000
+    return timings
+
+
+async def time_get_balance(user_ids: list[int]) -> float:
+    """Медіана get_bottle_balance разом з відкриттям з'єднання, мс."""
+    samples = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        await database.get_bottle_balance(user_id)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def time_completions(customers: int) -> float:
+    """Медіана переходу DELIVERING → COMPLETED, мс."""
+    samples = []
+    for i in range(COMPLETIONS):
+        order = await database.create_order(1 + i % customers, WaterType.EFFECT, 2, 300, "💵 Готівка")
+        await database.update_order_status(order.id, OrderStatus.CONFIRMED)
+        await database.update_order_status(order.id, OrderStatus.DELIVERING)
+        start = time.perf_counter()
+        await database.update_order_status(order.id, OrderStatus.COMPLETED)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--entries", type=int, default=1000000, help="записів журналу тари")
+    parser.add_argument("--office", type=float, default=0.05, help="частка журналу одного клієнта-офісу")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    problems = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bottles.db"
+        database.DATABASE_PATH = path
+        asyncio.run(database.init_db())
+        started = time.perf_counter()
+        populate(path, args.customers, args.entries, args.office, rnd)
+        populate_seconds = time.perf_counter() - started
+
+        regular = [2 + rnd.randrange(args.customers - 1) for _ in range(READS)]
+        typical = asyncio.run(time_balance_queries(regular))
+        office = asyncio.run(time_balance_queries([1] * (READS // 10)))
+        get_balance_ms = asyncio.run(time_get_balance(regular))
+        with sqlite3.connect(path) as db:
+            office_entries = db.execute("SELECT COUNT(*) FROM bottle_ledger WHERE user_id = 1").fetchone()[0]
+        ledger_ms = asyncio.run(time_completions(args.customers))
+        # Еталон без обліку тари: запис у журнал і зведення пропускається
+        add_bottle_entry = database._add_bottle_entry
+
+        async def skip_bottle_entry(*_args) -> bool:
+            return False
+
+        database._add_bottle_entry = skip_bottle_entry
+        plain_ms = asyncio.run(time_completions(args.customers))
+        database._add_bottle_entry = add_bottle_entry
+
+        clean = asyncio.run(bottles.reconcile())
+        if not clean.ok:
+            problems.append(f"звірка чистої БД знайшла {len(clean.mismatches)} розбіжностей")
+
+        with sqlite3.connect(path) as db:
+            corrupted = {
+                row[0] for row in db.execute(
+                    "SELECT user_id FROM bottle_balances ORDER BY random() LIMIT ?", (CORRUPTED,)
+                )
+            }
+            db.executemany("UPDATE bottle_balances SET returned = returned + 1 WHERE user_id = ?",
+                           ((user_id,) for user_id in corrupted))
+        dirty = asyncio.run(bottles.reconcile())
+        found = {expected.user_id for expected, _ in dirty.mismatches}
+        if found != corrupted:
+            problems.append(f"звірка знайшла {len(found)} з {len(corrupted)} зіпсованих балансів")
+
+        asyncio.run(database.rebuild_bottle_balances())
+        if not asyncio.run(bottles.reconcile()).ok:
+            problems.append("після перерахунку зведення розходиться з журналом")
+
+    print(f"клієнтів: {args.customers}, записів журналу: {args.entries} "
+          f"(~{args.entries // args.customers} на клієнта), заповнення {populate_seconds:.1f} с")
+    for label, timings in ((f"~{args.entries // args.customers} записів", typical),
+                           (f"офіс, {office_entries} записів", office)):
+        summary_ms, sum_ms = timings.values()
+        print(f"баланс ({label}): зведення {summary_ms:.3f} мс, SUM за журналом {sum_ms:.3f} мс "
+              f"(×{sum_ms / summary_ms:.0f})")
+    print(f"get_bottle_balance з відкриттям з'єднання: {get_balance_ms:.3f} мс")
+    print(f"виконання замовлення: з журналом тари {ledger_ms:.3f} мс, без {plain_ms:.3f} мс "
+          f"(+{ledger_ms - plain_ms:.3f} мс)")
+    print(f"звірка: {clean.entries} записів, {clean.customers} клієнтів за {clean.seconds:.2f} с "
+          f"({clean.entries / clean.seconds / 1e6:.1f} млн записів/с); "
+          f"зіпсованих балансів знайдено {len(found)} з {len(corrupted)}")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
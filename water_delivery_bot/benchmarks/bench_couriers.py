@@ -0,0 +1,190 @@
+"""Розподіл замовлень між кур'єрами: купи проти повного перерахунку.
+
+--couriers кур'єрів з місткістю 40-80 пляшок закріплені за 8 районами
+(кожен п'ятий — без району). Потік --events переходів: підтвердження
+нових замовлень (1-6 пляшок, клієнти навколо районів), відправлення,
+виконання і скасування. Кожні PEAK_EVENTS переходів спокійні години
+(замовлень на 80% сумарної місткості) змінюються піком (115%), коли
+частина замовлень чекає в черзі. Вимірюється:
+    * CourierPool — час на перехід на всьому потоці;
+    * еталон, що на кожному кроці перераховує завантаження за всіма
+      активними замовленнями і перебирає всіх кур'єрів, — на перших
+      --reference переходах;
+після чого перевіряється, що обидва дали однакові призначення, місткість
+не перевищена, завантаження збігається з сумою замовлень, а жодне
+замовлення з черги не вміщається до жодного кур'єра.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_couriers --couriers 40 --events 200000
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+
+from config import Courier
+from couriers import CourierPool
+from database import OrderStatus
+from route_planner import distance_km
+
+DEPOT = (50.4501, 30.5234)
+# Тривалість спокійних годин і піку, переходів
+PEAK_EVENTS = 5000
+
+
+class Reference:
+    """Ті самі правила перебором: завантаження — сума активних замовлень кур'єра."""
+
+    def __init__(self, couriers: list[Courier]):
+        self.couriers = couriers
+        self.zones = list(dict.fromkeys(courier.zone for courier in couriers if courier.zone is not None))
+        self.assigned: dict[int, tuple[int, int]] = {}
+        self.waiting: dict[int, tuple[int, tuple[float, float]]] = {}
+
+    def loads(self) -> dict[int, int]:
+        loads = {courier.telegram_id: 0 for courier in self.couriers}
+        for courier_id, bottles in self.assigned.values():
+            loads[courier_id] += bottles
+        return loads
+
+    def choose(self, bottles: int, location: tuple[float, float]) -> int | None:
+        loads = self.loads()
+
+        def best(candidates: list[Courier]) -> int | None:
+            fitting = [
+                (loads[c.telegram_id] / c.capacity, loads[c.telegram_id], c.telegram_id) for c in candidates
+                if c.capacity - loads[c.telegram_id] >= min(bottles, c.capacity)
+            ]
+            return min(fitting)[2] if fitting else None
+
+        if self.zones:
+            zone = min(self.zones, key=lambda center: distance_km(center, location))
+            found = best([c for c in self.couriers if c.zone == zone])
+            if found is not None:
+                return found
+        return best(self.couriers)
+
+    def transition(self, order_id: int, bottles: int, location, status: OrderStatus) -> list[tuple[int, int]]:
+        if status == OrderStatus.CONFIRMED:
+            if order_id not in self.assigned:
+                self.waiting.setdefault(order_id, (bottles, location))
+        elif status == OrderStatus.DELIVERING:
+            self.waiting.pop(order_id, None)
+        else:
+            self.waiting.pop(order_id, None)
+            self.assigned.pop(order_id, None)
+        assignments = []
+        for waiting_id, (waiting_bottles, waiting_location) in list(self.waiting.items()):
+            courier_id = self.choose(waiting_bottles, waiting_location)
+            if courier_id is not None:
+                del self.waiting[waiting_id]
+                self.assigned[waiting_id] = (courier_id, waiting_bottles)
+                assignments.append((waiting_id, courier_id))
+        return assignments
+
+
+def make_couriers(count: int, rnd: random.Random) -> tuple[list[Courier], list[tuple[float, float]]]:
+    districts = [(DEPOT[0] + rnd.uniform(-0.08, 0.08), DEPOT[1] + rnd.uniform(-0.12, 0.12)) for _ in range(8)]
+    couriers = [
+        Courier(500000 + i, rnd.randrange(40, 81, 10), None if i % 5 == 4 else districts[i % len(districts)])
+        for i in range(count)
+    ]
+    return couriers, districts
+
+
+def make_events(count: int, couriers: list[Courier], districts, rnd: random.Random):
+    """(id замовлення, пляшок, геолокація, статус) — потік переходів."""
+    capacity = sum(courier.capacity for courier in couriers)
+    active: dict[int, tuple[int, tuple[float, float], OrderStatus]] = {}
+    bottles = 0
+    next_id = 1
+    for step in range(count):
+        target = capacity * (1.15 if step // PEAK_EVENTS % 2 else 0.8)
+        if bottles < target or not active:
+            lat, lon = rnd.choice(districts)
+            location = (lat + rnd.gauss(0, 0.015), lon + rnd.gauss(0, 0.02))
+            quantity = rnd.randint(1, 6)
+            active[next_id] = (quantity, location, OrderStatus.CONFIRMED)
+            bottles += quantity
+            yield next_id, quantity, location, OrderStatus.CONFIRMED
+            next_id += 1
+            continue
+        # Раніше підтверджені й доставляються раніше
+        order_id = rnd.choice(list(itertools.islice(active, 64)))
+        quantity, location, status = active[order_id]
+        roll = rnd.random()
+        if status == OrderStatus.CONFIRMED and roll < 0.6:
+            active[order_id] = (quantity, location, OrderStatus.DELIVERING)
+            yield order_id, quantity, location, OrderStatus.DELIVERING
+        else:
+            final = OrderStatus.CANCELLED if roll > 0.95 else OrderStatus.COMPLETED
+            del active[order_id]
+            bottles -= quantity
+            yield order_id, quantity, location, final
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--couriers", type=int, default=40)
+    parser.add_argument("--events", type=int, default=200000, help="переходів статусу")
+    parser.add_argument("--reference", type=int, default=12000, help="переходів для еталона (спокійні години й пік)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    problems = []
+
+    couriers, districts = make_couriers(args.couriers, rnd)
+    events = list(make_events(args.events, couriers, districts, rnd))
+    pool = CourierPool(couriers)
+    reference = Reference(couriers)
+
+    started = time.perf_counter()
+    assignments = [pool.transition(*event) for event in events]
+    pool_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = [reference.transition(*event) for event in events[:args.reference]]
+    reference_seconds = time.perf_counter() - started
+
+    if assignments[:len(expected)] != expected:
+        step = next(i for i, (a, b) in enumerate(zip(assignments, expected)) if a != b)
+        problems.append(f"призначення розійшлись з еталоном на переході {step}")
+
+    # Стан пулу наприкінці: завантаження і черга
+    locations = {order_id: location for order_id, _, location, _ in events}
+    loads = {courier.telegram_id: 0 for courier in couriers}
+    for order_id, (courier_id, bottles) in pool._assigned.items():
+        loads[courier_id] += bottles
+    for load in pool.loads():
+        if load.bottles != loads[load.courier.telegram_id]:
+            problems.append(f"завантаження кур'єра {load.courier.telegram_id} не збігається із замовленнями")
+        if load.bottles > load.courier.capacity:
+            problems.append(f"кур'єр {load.courier.telegram_id} перевантажений")
+    for bottles, _ in pool._waiting.values():
+        if any(load.fits(bottles) for load in pool.loads()):
+            problems.append("у черзі замовлення, що вміщається до кур'єра")
+            break
+
+    made = [pair for step in assignments for pair in step]
+    zoned = {courier.telegram_id: courier.zone for courier in couriers}
+    nearest = sum(
+        1 for order_id, courier_id in made
+        if zoned[courier_id] is not None
+        and zoned[courier_id] == min(reference.zones, key=lambda zone: distance_km(zone, locations[order_id]))
+    )
+    capacity = sum(courier.capacity for courier in couriers)
+    print(f"кур'єрів: {len(couriers)} (місткість {capacity} пл.), переходів: {len(events)}, "
+          f"призначень: {len(made)}, у черзі наприкінці: {pool.waiting}")
+    print(f"CourierPool: {pool_seconds / len(events) * 1e6:.1f} мкс на перехід ({pool_seconds:.2f} с)")
+    print(f"повний перерахунок: {reference_seconds / len(expected) * 1e6:.0f} мкс на перехід "
+          f"на перших {len(expected)} (×{reference_seconds / len(expected) / (pool_seconds / len(events)):.0f})")
+    print(f"у кур'єра свого району: {nearest / len(made) * 100:.0f}% призначень; сповіщень кур'єрам "
+          f"{len(made)} (по одному на замовлення) замість {len(made) * len(couriers)} при розсилці всім")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
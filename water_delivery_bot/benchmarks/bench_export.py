@@ -0,0 +1,74 @@
+"""Експорт замовлень у CSV/XLSX: час, розмір файлу і пік пам'яті.
+
+Пік пам'яті (tracemalloc) має лишатися сталим при зростанні кількості
+замовлень. XLSX додатково перевіряється розбором аркуша.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_export --orders 10000 100000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import date
+from pathlib import Path
+from xml.etree import ElementTree
+
+import database
+import export
+
+from benchmarks.bench_order_index import populate
+
+
+def count_xlsx_rows(path: Path) -> int:
+    """Кількість рядків аркуша (разом із заголовком), розбір потоком."""
+    with zipfile.ZipFile(path) as archive, archive.open("xl/worksheets/sheet1.xml") as sheet:
+        rows = 0
+        for _, element in ElementTree.iterparse(sheet):
+            if element.tag.endswith("}row"):
+                rows += 1
+                element.clear()
+        return rows
+
+
+async def run(orders: int, fmt: str, workdir: Path) -> dict:
+    database.DATABASE_PATH = workdir / f"export_{orders}.db"
+    if not database.DATABASE_PATH.exists():
+        await database.init_db()
+        populate(database.DATABASE_PATH, active=orders // 10, history=orders - orders // 10, customers=2000)
+
+    output = workdir / f"orders_{orders}.{fmt}"
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = await export.export_orders(output, fmt, date(2026, 1, 1), date(2026, 12, 31))
+    elapsed = time.perf_counter() - started
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    if fmt == "xlsx" and count_xlsx_rows(output) != count + 1:
+        raise RuntimeError("кількість рядків XLSX не збігається")
+    return {"orders": count, "format": fmt, "elapsed": elapsed, "peak_mb": peak_mb,
+            "size_mb": output.stat().st_size / 2**20}
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'замовлень':>10} {'формат':>7} {'час, с':>8} {'файл, МБ':>9} {'пік пам., МБ':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for orders in args.orders:
+            for fmt in export.FORMATS:
+                result = await run(orders, fmt, Path(tmp))
+                print(f"{result['orders']:>10} {fmt:>7} {result['elapsed']:>8.1f} "
+                      f"{result['size_mb']:>9.1f} {result['peak_mb']:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
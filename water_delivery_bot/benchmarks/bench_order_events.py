@@ -0,0 +1,123 @@
+"""Аналітика журналу подій на мільйонах записів: час і пік пам'яті.
+
+Журнал заповнюється синтетичними замовленнями (оформлення → підтвердження
+адміном → виїзд → отримання клієнтом, частина з повторними натисканнями
+й скасуваннями), після чого analytics.order_latencies рахує перцентилі
+за днями та адмінами. Пік пам'яті (tracemalloc) має лишатися сталим
+при зростанні --orders.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_order_events --orders 250000 --days 90
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import database
+from analytics import order_latencies
+
+ADMINS = [101, 102, 103]
+
+
+def populate(path: Path, orders: int, days: int) -> int:
+    """Події для orders замовлень, рівномірно за days днів; повертає кількість подій."""
+    rnd = random.Random(7)
+    start = datetime(2026, 1, 1, 8)
+    step = timedelta(days=days) / orders
+
+    def events():
+        for order_id in range(1, orders + 1):
+            at = start + step * order_id
+            yield order_id, "pending", 5000 + order_id % 997, "client", at
+            if rnd.random() < 0.05:
+                yield order_id, "cancelled", rnd.choice(ADMINS), "admin", at + timedelta(minutes=3)
+                continue
+            admin = ADMINS[order_id % len(ADMINS)]
+            at += timedelta(seconds=rnd.lognormvariate(5, 1) * (1 + ADMINS.index(admin)))
+            yield order_id, "confirmed", admin, "admin", at
+            if rnd.random() < 0.1:
+                yield order_id, "confirmed", admin, "admin", at + timedelta(seconds=2)  # повторне натискання
+            at += timedelta(seconds=rnd.lognormvariate(7, 0.5))
+            yield order_id, "delivering", admin, "admin", at
+            at += timedelta(seconds=rnd.lognormvariate(7.5, 0.7))
+            if rnd.random() < 0.1:
+                yield order_id, "completed", admin, "admin", at
+            else:
+                yield order_id, "completed", 5000 + order_id % 997, "client", at
+
+    count = 0
+
+    def rows():
+        nonlocal count
+        for order_id, status, actor_id, source, at in events():
+            count += 1
+            yield order_id, status, actor_id, source, at.isoformat(sep=" ")
+
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO order_events (order_id, status, actor_id, source, created_at) VALUES (?, ?, ?, ?, ?)",
+            rows(),
+        )
+    return count
+
+
+def _fmt(seconds: float | None) -> str:
+    return "—" if seconds is None else f"{seconds / 60:.1f}"
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=250000)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "events.db"
+        await database.init_db()
+        started = time.perf_counter()
+        count = populate(database.DATABASE_PATH, args.orders, args.days)
+        print(f"подій: {count} ({args.orders} замовлень за {args.days} днів), "
+              f"запис {time.perf_counter() - started:.1f} с")
+
+        with sqlite3.connect(database.DATABASE_PATH) as db:
+            plan = db.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM order_events WHERE order_id BETWEEN 1 AND 2 ORDER BY order_id, id"
+            ).fetchall()
+        print("план читання:", "; ".join(row[-1] for row in plan))
+
+        since = date(2026, 1, 1)
+        until = since + timedelta(days=args.days)
+        started = time.perf_counter()
+        report = await order_latencies(since, until)
+        elapsed = time.perf_counter() - started
+
+        # Пам'ять окремим прогоном: tracemalloc уповільнює в рази
+        tracemalloc.start()
+        await order_latencies(since, until)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    print(f"аналітика: {elapsed:.1f} с ({report.events / elapsed:,.0f} подій/с), "
+          f"пік пам'яті {peak_mb:.1f} МБ, замовлень {report.orders}, днів {len(report.by_day)}")
+
+    print(f"\n{'хв':<18} {'n':>8} {'p50':>7} {'p90':>7} {'p99':>7}")
+    for metric, histogram in report.total().items():
+        print(f"{'усього ' + metric:<18} {histogram.count:>8} {_fmt(histogram.percentile(50)):>7} "
+              f"{_fmt(histogram.percentile(90)):>7} {_fmt(histogram.percentile(99)):>7}")
+    for admin_id, histograms in sorted(report.by_admin.items()):
+        histogram = histograms["confirm"]
+        print(f"{f'адмін {admin_id} confirm':<18} {histogram.count:>8} {_fmt(histogram.percentile(50)):>7} "
+              f"{_fmt(histogram.percentile(90)):>7} {_fmt(histogram.percentile(99)):>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,129 @@
+"""Бенчмарк індексу активних замовлень проти JOIN-запиту до БД.
+
+БД заповнюється завершеними замовленнями (історія) і заданою кількістю
+активних. Вимірюється:
+    * завантаження індексу при старті і пам'ять, яку він займає;
+    * читання списку замовлень для адміна (get_all_pending_orders) з БД і з індексу;
+    * переходи статусів (update_order_status) без індексу і з ним;
+після переходів індекс звіряється з БД (check_active_orders).
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_order_index --active 10000 --history 100000
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import database
+from database import OrderStatus
+
+READS = 50
+
+
+def populate(path: Path, active: int, history: int, customers: int) -> list[int]:
+    """Клієнти й замовлення одним executemany; повертає id активних замовлень."""
+    statuses = [OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.DELIVERING]
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        rows = [
+            (1 + i % customers, "effect", 2, 300, "💵 Готівка", OrderStatus.COMPLETED.value,
+             "2026-01-01 08:00:00", "2026-01-01T09:00:00", "2026-01-01T10:00:00", "2026-01-01T11:00:00")
+            for i in range(history)
+        ]
+        rows += [
+            (1 + i % customers, "effect", 2, 300, "💵 Готівка", statuses[i % 3].value,
+             "2026-02-01 08:00:00", None, None, None)
+            for i in range(active)
+        ]
+        db.executemany(
+            """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, status,
+                                   created_at, confirmed_at, delivered_at, completed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+    return list(range(history + 1, history + active + 1))
+
+
+async def time_reads() -> tuple[float, int]:
+    """Медіана get_all_pending_orders (мс) і кількість замовлень."""
+    samples = []
+    for _ in range(READS):
+        start = time.perf_counter()
+        orders = await database.get_all_pending_orders()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(orders)
+
+
+async def time_transitions(order_ids: list[int]) -> float:
+    """Медіана update_order_status (мс) на переходах pending → ... → completed."""
+    samples = []
+    for order_id in order_ids:
+        for status in (OrderStatus.CONFIRMED, OrderStatus.DELIVERING, OrderStatus.COMPLETED):
+            start = time.perf_counter()
+            await database.update_order_status(order_id, status)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--active", type=int, default=10000, help="активних замовлень")
+    parser.add_argument("--history", type=int, default=100000, help="завершених замовлень")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--transitions", type=int, default=200, help="замовлень для перевірки переходів")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "index.db"
+        await database.init_db()
+        active_ids = populate(database.DATABASE_PATH, args.active, args.history, args.customers)
+        sample = random.Random(1).sample(active_ids, min(args.transitions, len(active_ids)))
+        half = len(sample) // 2
+
+        sql_read, count = await time_reads()
+        sql_transition = await time_transitions(sample[:half])
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = await database.load_active_orders()
+        load_ms = (time.perf_counter() - start) * 1000
+        memory_mb = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        index_read, _ = await time_reads()
+        index_transition = await time_transitions(sample[half:])
+
+        # Зміни даних клієнта і повернення в роботу теж мають дійти до індексу
+        order, user = index.orders()[0]
+        await database.update_user(user.telegram_id, "Перейменований", user.phone, user.address)
+        await database.set_user_price(user.telegram_id, 140)
+        await database.update_order_status(sample[-1], OrderStatus.PENDING)
+        problems = await database.check_active_orders()
+
+    print(f"активних замовлень: {count}, завершених: {args.history}")
+    print(f"завантаження індексу: {load_ms:.0f} мс, пам'ять: {memory_mb:.1f} МБ, у індексі: {len(index)}")
+    print(f"{'':<24} {'БД, мс':>10} {'індекс, мс':>12}")
+    print(f"{'get_all_pending_orders':<24} {sql_read:>10.2f} {index_read:>12.3f}")
+    print(f"{'update_order_status':<24} {sql_transition:>10.2f} {index_transition:>12.2f}")
+    if problems:
+        print(f"розбіжностей з БД: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        return 1
+    print("індекс збігається з БД")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,221 @@
+"""Звірка переказів: виписка на десятки тисяч рядків проти неоплачених замовлень.
+
+БД заповнюється --orders неоплаченими замовленнями з оплатою переказом за
+--days днів (суми з кількох типових, тож однакових багато) і --history
+давніми замовленнями готівкою. Виписка на --lines рядків у форматі
+Monobank: оплати замовлень (частина з «#номер» у призначенні, частина —
+запізнілі, поза вікном), інші надходження тих самих сум і видатки.
+Вимірюється:
+    * план оплат (payments.plan_payments): розбір CSV, вибірка замовлень
+      індексом, зіставлення злиттям;
+    * еталон, що для кожного надходження перебирає всі замовлення, — на
+      перших --reference надходженнях (зіставлення — на них же);
+після чого перевіряється, що зіставлення збігається з еталоном, суми й
+вікна дотримані, кожне замовлення й надходження використане не більше
+разу, а повторна звірка тієї ж виписки після запису нічого не оплачує.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_payments --orders 5000 --lines 50000
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import database
+import payments
+from config import Config
+
+AMOUNTS = (150, 300, 450, 600, 750, 900, 280, 420)
+TRANSFER = "🏦 Переказ на картку"
+
+
+def make_config() -> Config:
+    return Config(bot_token="0:bench", admin_ids=(), transfer_payment_method=TRANSFER, payment_window_hours=72)
+
+
+def populate(path: Path, orders: int, history: int, days: int, rnd: random.Random) -> list[tuple[int, int, datetime]]:
+    """Клієнти й замовлення; повертає (id, сума, місцевий час створення) неоплачених переказів."""
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    customers = max(orders // 5, 1)
+    transfers = []
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        db.executemany(
+            """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, status, created_at)
+               VALUES (?, 'effect', 2, 300, '💵 Готівкою кур''єру', 'completed', ?)""",
+            ((1 + i % customers, f"{start - timedelta(days=400) + timedelta(minutes=i)}") for i in range(history)),
+        )
+        for i in range(orders):
+            created = start + timedelta(seconds=rnd.randrange(days * 24 * 3600))
+            amount = rnd.choice(AMOUNTS)
+            cursor = db.execute(
+                """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, status, created_at)
+                   VALUES (?, 'effect', 2, ?, ?, 'completed', ?)""",
+                (1 + i % customers, amount, TRANSFER,
+                 created.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            transfers.append((cursor.lastrowid, amount, created))
+    return transfers
+
+
+def make_statement(transfers, lines: int, days: int, rnd: random.Random) -> bytes:
+    """Виписка CSV: оплати замовлень, сторонні надходження й видатки."""
+    now = datetime.now()
+    start = now - timedelta(days=days)
+    rows = []
+    for order_id, amount, created in transfers:
+        roll = rnd.random()
+        if roll < 0.08:
+            continue  # не оплатили
+        delay = timedelta(hours=rnd.expovariate(1 / 8)) if roll < 0.95 else timedelta(hours=rnd.uniform(80, 200))
+        description = f"Оплата замовлення #{order_id}" if rnd.random() < 0.2 else f"Від: Клієнт {order_id % 997}"
+        rows.append((created + delay, amount * 100, description))
+    while len(rows) < lines:
+        at = start + timedelta(seconds=rnd.randrange(days * 24 * 3600))
+        if rnd.random() < 0.5:
+            rows.append((at, -rnd.randrange(100, 500000), "Покупка"))
+        else:
+            # Сторонні надходження, частина — тих самих сум, що й замовлення
+            amount = rnd.choice(AMOUNTS) * 100 if rnd.random() < 0.3 else rnd.randrange(100, 500000)
+            rows.append((at, amount, "Переказ"))
+    rows.sort()
+    text = "Дата i час операції;Деталі операції;Сума в валюті картки (UAH)\n" + "".join(
+        f"{at:%d.%m.%Y %H:%M:%S};{description};{amount / 100:.2f}\n"
+        for at, amount, description in rows
+    )
+    return text.encode("utf-8")
+
+
+def reference_match(transactions, orders, window: timedelta, tolerance: timedelta) -> list[tuple[int, int]]:
+    """Ті самі правила перебором: для кожного надходження — усі замовлення."""
+    created = {order.id: database.utc_to_local(order.created_at) for order, _ in orders}
+    paid: set[int] = set()
+    matches = []
+    rest = []
+    for transaction in transactions:
+        found = payments.ORDER_REFERENCE.search(transaction.description)
+        order_id = int(found.group(1)) if found else None
+        hit = next((
+            order for order, _ in orders
+            if order.id == order_id and order.id not in paid and order.total_price * 100 == transaction.amount
+            and created[order.id] - tolerance <= transaction.at <= created[order.id] + window
+        ), None)
+        if hit is not None:
+            paid.add(hit.id)
+            matches.append((transaction.line, hit.id))
+        else:
+            rest.append(transaction)
+    for transaction in rest:
+        candidates = [
+            order for order, _ in orders
+            if order.id not in paid and order.total_price * 100 == transaction.amount
+            and created[order.id] - tolerance <= transaction.at <= created[order.id] + window
+        ]
+        if candidates:
+            hit = min(candidates, key=lambda order: (created[order.id], order.id))
+            paid.add(hit.id)
+            matches.append((transaction.line, hit.id))
+    return sorted(matches)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000, help="неоплачених замовлень з переказом")
+    parser.add_argument("--lines", type=int, default=50000, help="рядків виписки")
+    parser.add_argument("--days", type=int, default=30, help="період виписки, днів")
+    parser.add_argument("--history", type=int, default=100000, help="давніх замовлень готівкою")
+    parser.add_argument("--reference", type=int, default=2000, help="надходжень для еталона")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    config = make_config()
+    window = timedelta(hours=config.payment_window_hours)
+    problems = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "payments.db"
+        database.DATABASE_PATH = path
+        asyncio.run(database.init_db())
+        transfers = populate(path, args.orders, args.history, args.days, rnd)
+        content = make_statement(transfers, args.lines, args.days, rnd)
+
+        started = time.perf_counter()
+        plan = asyncio.run(payments.plan_payments(content, config))
+        plan_seconds = time.perf_counter() - started
+
+        # Окремо етапи — на тих самих даних
+        started = time.perf_counter()
+        statement = payments.parse_statement(content)
+        parse_seconds = time.perf_counter() - started
+        transactions = statement.transactions
+        started = time.perf_counter()
+        orders = asyncio.run(database.get_unpaid_orders(
+            TRANSFER, transactions[0].at - window, transactions[-1].at + payments.MATCH_TOLERANCE + timedelta(seconds=1)
+        ))
+        fetch_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        payments.match_payments(transactions, orders, window)
+        match_seconds = time.perf_counter() - started
+
+        subset = transactions[:args.reference]
+        started = time.perf_counter()
+        expected = reference_match(subset, orders, window, payments.MATCH_TOLERANCE)
+        reference_seconds = time.perf_counter() - started
+        got = sorted((match.transaction.line, match.order.id) for match in payments.match_payments(subset, orders, window).matches)
+        if got != expected:
+            problems.append(f"зіставлення розійшлось з еталоном: {len(got)} пар проти {len(expected)}")
+
+        created = {order.id: database.utc_to_local(order.created_at) for order, _ in orders}
+        for match in plan.matches:
+            transaction, order = match.transaction, match.order
+            if order.total_price * 100 != transaction.amount:
+                problems.append(f"#{order.id}: сума переказу {transaction.amount / 100} ≠ {order.total_price}")
+                break
+            if not created[order.id] - payments.MATCH_TOLERANCE <= transaction.at <= created[order.id] + window:
+                problems.append(f"#{order.id}: переказ поза вікном")
+                break
+        if len({match.order.id for match in plan.matches}) != len(plan.matches):
+            problems.append("замовлення оплачене двічі")
+        if len({match.transaction.line for match in plan.matches}) != len(plan.matches):
+            problems.append("переказ зараховано двічі")
+
+        started = time.perf_counter()
+        paid = asyncio.run(database.mark_orders_paid(
+            [(match.order.id, match.transaction.at, match.transaction.ref) for match in plan.matches]
+        ))
+        apply_seconds = time.perf_counter() - started
+        if paid != len(plan.matches):
+            problems.append(f"позначено {paid} з {len(plan.matches)}")
+        again = asyncio.run(payments.plan_payments(content, config))
+        if again.matches or again.already_used != len(plan.matches):
+            problems.append(f"повторна звірка: ще {len(again.matches)} оплат, зараховано раніше {again.already_used}")
+
+    by_reference = sum(1 for match in plan.matches if match.by_reference)
+    per_transaction = reference_seconds / len(subset)
+    print(f"виписка: {args.lines} рядків ({len(content) / 1e6:.1f} МБ), надходжень {len(transactions)}; "
+          f"неоплачених замовлень: {len(orders)} з {args.orders + args.history}")
+    print(f"план оплат: {plan_seconds:.2f} с (розбір {parse_seconds:.2f} с, вибірка {fetch_seconds:.2f} с, "
+          f"зіставлення {match_seconds * 1000:.0f} мс); запис {len(plan.matches)} оплат {apply_seconds:.2f} с")
+    print(f"перебір: {per_transaction * 1000:.2f} мс на надходження на перших {len(subset)} — на всю виписку "
+          f"~{per_transaction * len(transactions):.0f} с (×{per_transaction * len(transactions) / match_seconds:.0f} "
+          f"від зіставлення)")
+    print(f"зіставлено {len(plan.matches)} (за номером {by_reference}), переказів без замовлення "
+          f"{len(plan.unmatched_transactions)}, замовлень без переказу {len(plan.unmatched_orders)}, "
+          f"вікно не минуло {plan.waiting}")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
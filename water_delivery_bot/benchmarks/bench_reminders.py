@@ -0,0 +1,165 @@
+"""Прогноз повторних замовлень і розсилка нагадувань на великій історії.
+
+БД заповнюється клієнтами з регулярною історією: кожен замовляє q пляшок
+кожні d днів (d від 7 до 30) протягом --days днів, давні замовлення лежать
+в архіві, частина клієнтів має ще й скасовані (прогноз їх не враховує).
+Вимірюється:
+    * перерахунок прогнозів усіх клієнтів і пікова пам'ять Python під час нього;
+    * точність: швидкість має дорівнювати q/d, дата — останнє замовлення + d;
+    * розсилка через SendQueue у фейкового бота із затримкою мережі й
+      відповідями 429 — фактична швидкість проти заданої;
+Розсилка переривається на половині (як при зупинці бота) і запускається
+знову, після чого перевіряється, що кожен клієнт, чия дата настала,
+отримав рівно одне нагадування, а повторна розсилка нічого не надсилає.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_reminders --customers 100000 --days 540
+"""
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import database
+import reminders
+
+# Відповідь 429 на кожне таке повідомлення
+RETRY_EVERY = 500
+
+
+class FakeBot:
+    """Бот із затримкою мережі, що зрідка відповідає 429."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.received: Counter[int] = Counter()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls % RETRY_EVERY == 0:
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", 1)
+        self.received[chat_id] += 1
+
+
+def customer(i: int) -> tuple[int, int, float]:
+    """(пляшок за раз, інтервал у днях, днів від останнього замовлення) клієнта i."""
+    interval = 7 + i % 24
+    return 1 + i % 3, interval, interval * ((i * 7919) % 1000) / 1000
+
+
+def populate(path: Path, customers: int, days: int, now: datetime, archive_before: datetime) -> int:
+    """Клієнти й замовлення; повертає кількість замовлень."""
+    def orders():
+        for i in range(customers):
+            quantity, interval, since_last = customer(i)
+            at = now - timedelta(days=since_last)
+            first = now - timedelta(days=days)
+            while at >= first:
+                yield 1 + i, quantity, "completed", at
+                at -= timedelta(days=interval)
+            if i % 10 == 0:
+                yield 1 + i, 5, "cancelled", now - timedelta(days=since_last / 2)
+
+    total = 0
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        for user_id, quantity, status, at in orders():
+            table = "orders_archive" if at < archive_before else "orders"
+            db.execute(
+                f"""INSERT INTO {table} (user_id, water_type, quantity, total_price, payment_method, status, created_at)
+                    VALUES (?, 'effect', ?, ?, '💵 Готівка', ?, ?)""",
+                (user_id, quantity, quantity * 150, status, at.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            total += 1
+    return total
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=540, help="глибина історії")
+    parser.add_argument("--rate", type=float, default=300, help="повідомлень/с у розсилці")
+    parser.add_argument("--latency", type=float, default=0.02, help="затримка фейкового бота, с")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    # created_at — UTC, як CURRENT_TIMESTAMP
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "reminders.db"
+        await database.init_db()
+        started = time.perf_counter()
+        orders = populate(database.DATABASE_PATH, args.customers, args.days, now, now - timedelta(days=90))
+        print(f"клієнтів: {args.customers}, замовлень: {orders} (заповнення {time.perf_counter() - started:.0f} с)")
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        forecasts = await reminders.compute_forecasts()
+        rebuild = time.perf_counter() - started
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        with sqlite3.connect(database.DATABASE_PATH) as db:
+            rows = db.execute("SELECT user_id, daily_bottles, last_order_at, next_order_at FROM order_forecasts")
+            rate_error = next_error = 0.0
+            for user_id, daily_bottles, last_order_at, next_order_at in rows:
+                quantity, interval, _ = customer(user_id - 1)
+                expected = datetime.fromisoformat(last_order_at) + timedelta(days=interval)
+                rate_error = max(rate_error, abs(daily_bottles - quantity / interval))
+                next_error = max(next_error, abs((datetime.fromisoformat(next_order_at) - expected).total_seconds()))
+
+        due = {
+            100000 + i for i in range(args.customers)
+            if customer(i)[1] - customer(i)[2] < reminders.REMIND_AHEAD_DAYS
+        }
+
+        bot = FakeBot(args.latency)
+        interrupted = asyncio.create_task(reminders.send_reminders(bot, rate=args.rate))
+        while len(bot.received) < len(due) // 2 and not interrupted.done():
+            await asyncio.sleep(0.01)
+        interrupted.cancel()
+        await asyncio.gather(interrupted, return_exceptions=True)
+        before_resume = len(bot.received)
+        report = await reminders.send_reminders(bot, rate=args.rate)
+        again = await reminders.send_reminders(bot, rate=args.rate)
+
+    print(f"прогнози: {forecasts} клієнтів за {rebuild:.1f} с, пікова пам'ять Python {peak_kb:.0f} КБ")
+    print(f"похибка: швидкість {rate_error:.2e} пл./день, дата {next_error:.0f} с")
+    print(f"розсилка: перервано після {before_resume}, решта {report.sent} з {report.due} "
+          f"за {report.seconds:.1f} с ({report.sent / report.seconds:.0f}/с при ліміті {args.rate:.0f}/с), "
+          f"відповідей 429 і скасованих: {bot.calls - sum(bot.received.values())}")
+
+    problems = []
+    if forecasts != args.customers:
+        problems.append(f"прогнозів {forecasts}, очікувалось {args.customers}")
+    if rate_error > 1e-6 or next_error > 1:
+        problems.append("прогноз відрізняється від точного")
+    if set(bot.received) != due:
+        problems.append(f"нагадування отримали {len(bot.received)}, очікувалось {len(due)}")
+    if any(count > 1 for count in bot.received.values()) or again.due:
+        problems.append("повторні нагадування")
+    if report.sent / report.seconds > args.rate * 1.05:
+        problems.append("перевищено ліміт швидкості")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,123 @@
+"""Планувальник рейсів: час і якість маршрутів.
+
+Зупинки розкидані по місту навколо кількох «районів» (нормальний
+розподіл), кількість пляшок у замовленні — 1-6. Вимірюється:
+    * один рейс на --stops зупинок: матриця відстаней, найближчий сусід і
+      2-opt за списками сусідів окремо, довжина до і після покращення;
+    * повний 2-opt (усі пари) на тих самих зупинках для порівняння якості;
+    * план на --orders замовлень з розбиттям на рейси по --capacity пляшок;
+після чого перевіряється, що кожне замовлення потрапило рівно в один рейс,
+місткість не перевищена, а 2-opt не погіршив жодного маршруту.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_routes --stops 300 --orders 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+
+import route_planner
+from database import Order, OrderStatus, User, WaterType
+
+DEPOT = (50.4501, 30.5234)
+
+
+def make_orders(count: int, rnd: random.Random) -> list[tuple[Order, User]]:
+    """Підтверджені замовлення клієнтів з геолокацією навколо 8 районів."""
+    districts = [(DEPOT[0] + rnd.uniform(-0.08, 0.08), DEPOT[1] + rnd.uniform(-0.12, 0.12)) for _ in range(8)]
+    now = datetime.now()
+    orders = []
+    for i in range(1, count + 1):
+        lat, lon = rnd.choice(districts)
+        quantity = rnd.randint(1, 6)
+        user = User(
+            id=i, telegram_id=100000 + i, full_name=f"Клієнт {i}", phone="+380501234567",
+            address=f"вул. Тестова {i}", created_at=now,
+            latitude=lat + rnd.gauss(0, 0.015), longitude=lon + rnd.gauss(0, 0.02),
+        )
+        order = Order(
+            id=i, user_id=i, water_type=WaterType.EFFECT, quantity=quantity, total_price=quantity * 150,
+            payment_method="💵 Готівка", status=OrderStatus.CONFIRMED, created_at=now,
+        )
+        orders.append((order, user))
+    return orders
+
+
+def full_two_opt(tour: list[int], matrix: list[list[float]]) -> list[int]:
+    """2-opt перебором усіх пар ребер — еталон якості."""
+    tour = list(tour)
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 2, n):
+                a, b, c = tour[i], tour[i + 1], tour[j]
+                delta = matrix[a][c] - matrix[a][b]
+                if j + 1 < n:
+                    d = tour[j + 1]
+                    delta += matrix[b][d] - matrix[c][d]
+                if delta < -1e-9:
+                    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                    improved = True
+    return tour
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, default=300, help="зупинок в одному рейсі")
+    parser.add_argument("--orders", type=int, default=2000, help="замовлень у плані")
+    parser.add_argument("--capacity", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    problems = []
+
+    points = [DEPOT] + [user.location for _, user in make_orders(args.stops, rnd)]
+    matrix, matrix_ms = timed(route_planner.distance_matrix, points)
+    greedy, greedy_ms = timed(route_planner.nearest_neighbour, matrix)
+    tour, two_opt_ms = timed(route_planner.two_opt, greedy, matrix)
+    reference, reference_ms = timed(full_two_opt, greedy, matrix)
+    greedy_km = route_planner.path_length(greedy, matrix)
+    tour_km = route_planner.path_length(tour, matrix)
+    reference_km = route_planner.path_length(reference, matrix)
+    if sorted(tour) != list(range(len(points))) or tour[0] != 0:
+        problems.append("2-opt загубив чи переставив склад")
+
+    print(f"рейс на {args.stops} зупинок: матриця {matrix_ms:.0f} мс, найближчий сусід {greedy_ms:.0f} мс, "
+          f"2-opt {two_opt_ms:.0f} мс — разом {matrix_ms + greedy_ms + two_opt_ms:.0f} мс")
+    print(f"довжина: найближчий сусід {greedy_km:.1f} км, після 2-opt {tour_km:.1f} км "
+          f"(−{(1 - tour_km / greedy_km) * 100:.0f}%), повний 2-opt {reference_km:.1f} км за {reference_ms:.0f} мс")
+
+    orders = make_orders(args.orders, rnd)
+    plan, plan_ms = timed(route_planner.plan_routes, orders, args.capacity, DEPOT)
+    stops = [stop.order.id for run in plan.runs for stop in run.stops]
+    longest = max(len(run.stops) for run in plan.runs)
+    print(f"план на {args.orders} замовлень: {len(plan.runs)} рейсів (до {longest} зупинок), "
+          f"{plan.distance_km:.0f} км за {plan_ms:.0f} мс")
+
+    if sorted(stops) != [order.id for order, _ in orders]:
+        problems.append("замовлення загублені чи повторені між рейсами")
+    if any(run.bottles > args.capacity for run in plan.runs):
+        problems.append("перевищено місткість рейсу")
+    for run in plan.runs:
+        run_points = [DEPOT] + [stop.location for stop in run.stops]
+        run_matrix = route_planner.distance_matrix(run_points)
+        if run.distance_km > route_planner.path_length(route_planner.nearest_neighbour(run_matrix), run_matrix) + 1e-6:
+            problems.append("2-opt погіршив маршрут")
+            break
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
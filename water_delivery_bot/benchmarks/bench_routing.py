@@ -0,0 +1,83 @@
+"""Бенчмарк маршрутизації: ланцюжок фільтрів aiogram проти RouteIndex.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_routing
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from handlers.routing import RouteIndex
+
+HANDLER_COUNTS = [10, 100, 1000]
+ITERATIONS = 500
+
+_USER = User(id=1, is_bot=False, first_name="Bench")
+_CHAT = Chat(id=1, type="private")
+
+
+def _text_update(update_id: int, text: str) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=_CHAT, from_user=_USER, text=text,
+    ))
+
+
+def _callback_update(update_id: int, data: str) -> Update:
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=_USER, chat_instance="bench", data=data,
+    ))
+
+
+async def _noop(event):
+    return None
+
+
+def _chain_router(count: int) -> Router:
+    router = Router()
+    for i in range(count):
+        router.message.register(_noop, F.text == f"button {i}")
+        router.callback_query.register(_noop, F.data.startswith(f"cb{i}_"))
+    return router
+
+
+def _index_router(count: int) -> Router:
+    index = RouteIndex()
+    for i in range(count):
+        index.text(f"button {i}")(_noop)
+        index.callback(f"cb{i}_1")(_noop)
+    return index.as_router()
+
+
+async def _measure(router: Router, updates: list[Update]) -> float:
+    bot = Bot(token="42:BENCHMARK")
+    dp = Dispatcher()
+    dp.include_router(router)
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - start
+    await bot.session.close()
+    return elapsed / len(updates) * 1e6
+
+
+async def main():
+    print(f"{'handlers':>8} {'chain, мкс':>12} {'index, мкс':>12} {'speedup':>8}")
+    for count in HANDLER_COUNTS:
+        # Найгірший випадок для ланцюжка — остання зареєстрована кнопка
+        updates = []
+        for i in range(ITERATIONS):
+            if i % 2:
+                updates.append(_text_update(i, f"button {count - 1}"))
+            else:
+                updates.append(_callback_update(i, f"cb{count - 1}_1"))
+        chain = await _measure(_chain_router(count), updates)
+        index = await _measure(_index_router(count), updates)
+        print(f"{count:>8} {chain:>12.1f} {index:>12.1f} {chain / index:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+"""Слоти доставки: ранковий пік бронювань.
+
+БД заповнюється --customers клієнтами й --history давніми замовленнями зі
+слотами. Вимірюється:
+    * показ вільних слотів: таблиця бронювань у пам'яті (slots.available_slots)
+      проти запиту SUM(quantity) за замовленнями на кожен показ;
+    * пік: --customers клієнтів одночасно, розділені між --workers процесами
+      (як при WORKERS > 1), переглядають слоти й бронюють бажаний; якщо
+      місце зайняли, обирають наступний, поки є вільні;
+після чого перевіряється, що жоден слот не перебронено, а лічильники
+delivery_slots збігаються з замовленнями (check_slot_bookings).
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_slots --customers 600 --workers 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import database
+from config import Config
+from database import WaterType
+from slots import DeliverySlot, available_slots, fits, upcoming_slots
+
+RENDERS = 200
+ATTEMPTS = 20
+
+
+def make_config(capacity: int) -> Config:
+    return Config(
+        bot_token="0:bench",
+        admin_ids=(),
+        delivery_slots=((9, 12), (12, 15), (15, 18), (18, 21)),
+        slot_capacity=capacity,
+        slot_days=3,
+    )
+
+
+def populate(path: Path, customers: int, history: int) -> None:
+    """Клієнти і давні виконані замовлення зі слотами одним executemany."""
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        start = date.today() - timedelta(days=400)
+        db.executemany(
+            """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, status,
+                                   delivery_slot, created_at)
+               VALUES (?, 'effect', ?, ?, '💵 Готівка', 'completed', ?, ?)""",
+            (
+                (1 + i % customers, 2, 300,
+                 DeliverySlot(start + timedelta(days=i * 400 // history), 9 + 3 * (i % 4), 12 + 3 * (i % 4)).key,
+                 f"{start + timedelta(days=i * 400 // history)} 08:00:00")
+                for i in range(history)
+            ),
+        )
+
+
+async def available_by_query(config: Config, quantity: int) -> list[tuple[DeliverySlot, int]]:
+    """Те саме, що available_slots, але з підрахунком бронювань запитом на кожен показ."""
+    now = datetime.now()
+    async with database._connect() as db:
+        cursor = await db.execute(
+            """SELECT delivery_slot, SUM(quantity) FROM orders
+               WHERE delivery_slot >= ? AND status != 'cancelled'
+               GROUP BY delivery_slot""",
+            (now.date().isoformat(),)
+        )
+        booked = dict(await cursor.fetchall())
+    return [
+        (slot, max(config.slot_capacity - booked.get(slot.key, 0), 0))
+        for slot in upcoming_slots(config, now)
+        if fits(booked.get(slot.key, 0), quantity, config.slot_capacity)
+    ]
+
+
+async def time_renders(render, config: Config) -> float:
+    """Медіана показу слотів, мс."""
+    samples = []
+    for i in range(RENDERS):
+        start = time.perf_counter()
+        await render(config, 1 + i % 6)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def customer(config: Config, user_id: int, rnd: random.Random) -> tuple[bool, int, float]:
+    """Клієнт у пік: (забронював, спроб, с на оформлення)."""
+    quantity = rnd.randint(1, 6)
+    started = time.perf_counter()
+    for attempt in range(1, ATTEMPTS + 1):
+        slots = await available_slots(config, quantity)
+        if not slots:
+            return False, attempt, time.perf_counter() - started
+        # Ранкові слоти найближчого дня найпопулярніші
+        slot = slots[min(int(rnd.expovariate(0.5)), len(slots) - 1)][0]
+        order = await database.create_order(
+            user_id, WaterType.EFFECT, quantity, quantity * 150, "💵 Готівка",
+            delivery_slot=slot.key, slot_capacity=config.slot_capacity,
+        )
+        if order is not None:
+            return True, attempt, time.perf_counter() - started
+    return False, ATTEMPTS, time.perf_counter() - started
+
+
+def rush_worker(path: str, capacity: int, user_ids: list[int], seed: int) -> list[tuple[bool, int, float]]:
+    """Процес-обробник: свої клієнти одночасно."""
+    database.DATABASE_PATH = Path(path)
+    config = make_config(capacity)
+    rnd = random.Random(seed)
+
+    async def run():
+        return await asyncio.gather(*(customer(config, user_id, rnd) for user_id in user_ids))
+
+    return asyncio.run(run())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=600, help="клієнтів у піку")
+    parser.add_argument("--workers", type=int, default=4, help="процесів-обробників")
+    parser.add_argument("--history", type=int, default=100000, help="давніх замовлень зі слотами")
+    parser.add_argument("--capacity", type=int, default=200, help="пляшок на слот")
+    args = parser.parse_args()
+    problems = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "slots.db"
+        database.DATABASE_PATH = path
+        asyncio.run(database.init_db())
+        populate(path, args.customers, args.history)
+        config = make_config(args.capacity)
+
+        # Запит на кожен показ — з індексом, щоб порівняння було чесним
+        with sqlite3.connect(path) as db:
+            db.execute("CREATE INDEX idx_bench_slot ON orders (delivery_slot, status)")
+        query_ms = asyncio.run(time_renders(available_by_query, config))
+        table_ms = asyncio.run(time_renders(available_slots, config))
+
+        user_ids = list(range(1, args.customers + 1))
+        random.Random(1).shuffle(user_ids)
+        chunks = [(str(path), args.capacity, user_ids[i::args.workers], i) for i in range(args.workers)]
+        mp = multiprocessing.get_context("spawn")
+        with mp.Pool(args.workers) as pool:
+            started = time.perf_counter()
+            results = [row for rows in pool.starmap(rush_worker, chunks) for row in rows]
+            rush_seconds = time.perf_counter() - started
+
+        today = date.today().isoformat()
+        problems += asyncio.run(database.check_slot_bookings(today))
+        with sqlite3.connect(path) as db:
+            rows = db.execute(
+                """SELECT delivery_slot, SUM(quantity), COUNT(*), MAX(quantity) FROM orders
+                   WHERE delivery_slot >= ? AND status != 'cancelled' GROUP BY delivery_slot""",
+                (today,)
+            ).fetchall()
+    for slot, bottles, orders, largest in rows:
+        if bottles > args.capacity and orders > 1:
+            problems.append(f"слот {slot} перебронено: {bottles} пл. при місткості {args.capacity}")
+
+    booked = [row for row in results if row[0]]
+    retried = sum(1 for _, attempts, _ in booked if attempts > 1)
+    latencies = sorted(seconds for _, _, seconds in results)
+    slots_total = len(upcoming_slots(config))
+    print(f"клієнтів: {args.customers}, процесів: {args.workers}, слотів: {slots_total} по {args.capacity} пл., "
+          f"давніх замовлень: {args.history}")
+    print(f"показ слотів: таблиця в пам'яті {table_ms:.3f} мс, запит на кожен показ {query_ms:.2f} мс "
+          f"(×{query_ms / table_ms:.0f})")
+    print(f"пік: {rush_seconds:.2f} с; забронювали {len(booked)}, з повторним вибором {retried}, "
+          f"без слота {len(results) - len(booked)}; оформлення p50 {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} мс")
+    print(f"заповнено пляшок: {sum(row[1] for row in rows)} з {slots_total * args.capacity}")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Час холодного старту бота з бюджетом.
+
+Кожен прогін — окремий процес під ``python -X importtime``: імпорт main,
+потім main.start_bot (перевірка схеми БД, deleteWebhook до
+FakeTelegramServer і побудова диспетчера). Перший прогін іде з новою БД
+(створення схеми), решта — з наявною (схема вже актуальна). Звіт містить
+найдорожчі пакети за власним часом імпорту.
+
+Код виходу 1, якщо медіана старту з наявною БД перевищує бюджет.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 3000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+TOKEN = "42:STARTUP"
+
+
+def parse_importtime(stderr: str, root: str = "main") -> tuple[int, Counter]:
+    """Сукупний час імпорту root (мкс) і власний час за пакетами верхнього рівня."""
+    packages: Counter = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not self_us.isdigit():
+            continue  # заголовок таблиці
+        packages[name.split(".")[0]] += int(self_us)
+        if name == root:
+            return int(cumulative_us), packages
+    return 0, packages
+
+
+async def _child(database_path: str) -> dict:
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import database
+    from config import Config, ConfigStore
+
+    from benchmarks.fake_telegram import FakeTelegramServer
+
+    server = FakeTelegramServer()
+    await server.start()
+    database.DATABASE_PATH = Path(database_path)
+    bot = Bot(token=TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)))
+
+    start = time.perf_counter()
+    await main.start_bot(ConfigStore(Config(bot_token=TOKEN, admin_ids=[1])), bot)
+    ready = time.perf_counter()
+
+    await bot.session.close()
+    await server.stop()
+    return {
+        "import_ms": (imported - started) * 1000,
+        "start_ms": (ready - start) * 1000,
+    }
+
+
+def run_once(database_path: Path) -> dict:
+    """Один старт у свіжому процесі."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.bench_startup", "--child", str(database_path)],
+        capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    _, result["packages"] = parse_importtime(proc.stderr)
+    result["total_ms"] = result["import_ms"] + result["start_ms"]
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=3000.0, help="бюджет: імпорт + start_bot")
+    parser.add_argument("--top", type=int, default=8, help="скільки пакетів показати")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child))))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = Path(tmp) / "startup.db"
+        results = [run_once(database_path) for _ in range(max(2, args.runs))]
+
+    print(f"{'прогін':<8} {'БД':<9} {'імпорт, мс':>11} {'start_bot, мс':>14} {'разом, мс':>10}")
+    for i, result in enumerate(results):
+        kind = "нова" if i == 0 else "наявна"
+        print(f"{i + 1:<8} {kind:<9} {result['import_ms']:>11.0f} {result['start_ms']:>14.1f} {result['total_ms']:>10.0f}")
+
+    warm = results[1:]
+    packages: Counter = Counter()
+    for result in warm:
+        packages.update(result["packages"])
+    total_import = sum(packages.values()) or 1
+    print(f"\nНайдорожчі пакети (власний час імпорту, середнє за {len(warm)} прогонів):")
+    for package, us in packages.most_common(args.top):
+        print(f"  {package:<24} {us / len(warm) / 1000:>8.0f} мс  {us / total_import:>6.1%}")
+
+    median = statistics.median(result["total_ms"] for result in warm)
+    print(f"\nМедіана старту з наявною БД: {median:.0f} мс, бюджет: {args.budget_ms:.0f} мс")
+    if median > args.budget_ms:
+        print("Бюджет перевищено")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
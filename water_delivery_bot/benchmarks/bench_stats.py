@@ -0,0 +1,238 @@
+"""Статистика замовлень: зведення order_stats проти перерахунку з замовлень.
+
+БД заповнюється --history замовленнями за --days днів (різні типи води,
+способи оплати, статуси й оцінки) і зведенням, перерахованим з них. Далі
+--workers конкурентних клієнтів оформлюють --orders замовлень і роблять
+--transitions випадкових дій над новими й давніми замовленнями:
+підтвердження, виїзд, отримання, скасування, повторні натискання, оцінки
+й переоцінки; посередині частина історії переноситься в архів.
+Вимірюється:
+    * зміна статусу зі зміною зведення проти зміни без нього;
+    * /stats за 30 днів зі зведення проти підсумовування замовлень;
+    * повний перерахунок зведення;
+після чого перевіряється, що зведення після всіх дій збігається з
+перерахунком з нуля кошик у кошик.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_stats --history 100000 --orders 2000 --transitions 20000
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import database
+from database import OrderStatus, WaterType
+
+PAYMENT_METHODS = ("💵 Готівкою кур'єру", "💳 Карткою кур'єру", "🏦 Переказ на картку")
+# Суми тривалостей накопичуються в іншому порядку, ніж при перерахунку
+TOLERANCE = 1e-3
+BASELINE_UPDATES = 300
+
+
+def populate(path: Path, history: int, days: int, customers: int, rnd: random.Random) -> None:
+    """Давні замовлення з мітками часу за статусом; частина ще активна."""
+    start = datetime.now().replace(microsecond=0) - timedelta(days=days)
+
+    def orders():
+        for i in range(history):
+            created = start + timedelta(seconds=rnd.randrange(days * 24 * 3600))
+            status = rnd.choices(list(OrderStatus), weights=(5, 5, 5, 70, 15))[0]
+            reached = {
+                OrderStatus.CONFIRMED: 1, OrderStatus.DELIVERING: 2, OrderStatus.COMPLETED: 3,
+            }.get(status, rnd.randrange(3) if status == OrderStatus.CANCELLED else 0)
+            confirmed = created + timedelta(minutes=rnd.uniform(1, 120))
+            delivered = confirmed + timedelta(minutes=rnd.uniform(10, 240))
+            completed = delivered + timedelta(minutes=rnd.uniform(5, 90))
+            quantity = rnd.randint(1, 6)
+            yield (
+                1 + i % customers, rnd.choice(list(WaterType)).value, quantity, quantity * 150,
+                rnd.choice(PAYMENT_METHODS), status.value,
+                created.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                confirmed.isoformat() if reached >= 1 else None,
+                delivered.isoformat() if reached >= 2 else None,
+                completed.isoformat() if reached >= 3 else None,
+                rnd.randint(1, 5) if status == OrderStatus.COMPLETED and rnd.random() < 0.4 else None,
+            )
+
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(customers)),
+        )
+        db.executemany(
+            """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, status,
+                                   created_at, confirmed_at, delivered_at, completed_at, rating)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            orders(),
+        )
+
+
+async def random_actions(order_ids: list[int], actions: int, rnd: random.Random, samples: list[float]) -> None:
+    """Випадкові зміни статусу й оцінки, зокрема повторні й недоречні."""
+    for _ in range(actions):
+        order_id = rnd.choice(order_ids)
+        if rnd.random() < 0.2:
+            await database.set_order_rating(order_id, rnd.randint(1, 5))
+            continue
+        status = rnd.choice((OrderStatus.CONFIRMED, OrderStatus.DELIVERING, OrderStatus.COMPLETED,
+                             OrderStatus.COMPLETED, OrderStatus.CANCELLED))
+        start = time.perf_counter()
+        await database.update_order_status(order_id, status)
+        samples.append(time.perf_counter() - start)
+
+
+async def snapshot() -> dict[tuple, tuple]:
+    """Вміст order_stats: ключ кошика → підсумки (порожні кошики пропускаються)."""
+    async with database._connect() as db:
+        cursor = await db.execute(
+            f"SELECT period, bucket, water_type, payment_method, {', '.join(database.STATS_COLUMNS)} FROM order_stats"
+        )
+        rows = await cursor.fetchall()
+    return {tuple(row[:4]): tuple(row[4:]) for row in rows if any(row[4:])}
+
+
+def same_totals(a: tuple | None, b: tuple | None) -> bool:
+    if a is None or b is None:
+        return a is b
+    return all(math.isclose(x, y, abs_tol=TOLERANCE) for x, y in zip(a, b))
+
+
+STATS_SCAN = f"""
+    SELECT water_type, payment_method, COUNT(*), SUM(status = 'cancelled'), SUM(status = 'completed'),
+           SUM(CASE WHEN status != 'cancelled' THEN quantity ELSE 0 END),
+           SUM(CASE WHEN status != 'cancelled' THEN total_price ELSE 0 END),
+           COUNT(rating), SUM(rating)
+    FROM {database._ALL_ORDERS}
+    WHERE created_at >= ?
+    GROUP BY water_type, payment_method
+"""
+
+
+async def time_stats_queries(runs: int) -> tuple[float, float]:
+    """Медіана /stats за 30 днів: зі зведення і підсумовуванням замовлень, мс."""
+    today = date.today()
+    since = today - timedelta(days=29)
+    rollup, scan = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await database.get_order_stats(since, today)
+        rollup.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        async with database._connect() as db:
+            cursor = await db.execute(STATS_SCAN, (database._utc_text(datetime.combine(since, datetime.min.time())),))
+            await cursor.fetchall()
+        scan.append(time.perf_counter() - start)
+    return statistics.median(rollup) * 1000, statistics.median(scan) * 1000
+
+
+async def run(args, rnd: random.Random) -> list[str]:
+    problems = []
+    customers = max(args.history // 20, 1)
+    await database.init_db()
+    populate(database.DATABASE_PATH, args.history, args.days, customers, rnd)
+    started = time.perf_counter()
+    await database.rebuild_order_stats()
+    rebuild_seconds = time.perf_counter() - started
+
+    # Нові замовлення конкурентно, потім дії над ними і над випадковими давніми
+    per_worker = args.orders // args.workers
+    created: list[int] = []
+
+    async def place(worker: int) -> None:
+        for i in range(per_worker):
+            order = await database.create_order(
+                1 + (worker * per_worker + i) % customers, rnd.choice(list(WaterType)), rnd.randint(1, 6),
+                rnd.randint(1, 6) * 150, rnd.choice(PAYMENT_METHODS),
+            )
+            created.append(order.id)
+
+    await asyncio.gather(*(place(worker) for worker in range(args.workers)))
+    with sqlite3.connect(database.DATABASE_PATH) as db:
+        old_ids = [row[0] for row in db.execute(
+            "SELECT id FROM orders WHERE id <= ? ORDER BY random() LIMIT ?", (args.history, args.orders)
+        )]
+    order_ids = created + old_ids
+
+    samples: list[float] = []
+    per_worker = args.transitions // args.workers // 2
+    await asyncio.gather(*(
+        random_actions(order_ids, per_worker, random.Random(args.seed + worker), samples)
+        for worker in range(args.workers)
+    ))
+    archived = await database.archive_orders_batch(datetime.now() - timedelta(days=args.days // 2), args.history)
+    await asyncio.gather(*(
+        random_actions(order_ids, per_worker, random.Random(args.seed + args.workers + worker), samples)
+        for worker in range(args.workers)
+    ))
+
+    incremental = await snapshot()
+    counted = await database.rebuild_order_stats()
+    rebuilt = await snapshot()
+    differing = [
+        key for key in incremental.keys() | rebuilt.keys()
+        if not same_totals(incremental.get(key), rebuilt.get(key))
+    ]
+    if differing:
+        key = sorted(differing)[0]
+        problems.append(f"{len(differing)} кошиків розходяться з перерахунком, напр. {key}: "
+                        f"{incremental.get(key)} проти {rebuilt.get(key)}")
+    if not archived:
+        problems.append("в архів нічого не перенесено — архівні кошики не перевірено")
+
+    rollup_ms, scan_ms = await time_stats_queries(20)
+
+    # Еталон без зведення: зміна статусу пропускає order_stats
+    apply_order_stats = database._apply_order_stats
+
+    async def skip_order_stats(*_args) -> None:
+        pass
+
+    database._apply_order_stats = skip_order_stats
+    plain: list[float] = []
+    try:
+        await random_actions(created, BASELINE_UPDATES, rnd, plain)
+    finally:
+        database._apply_order_stats = apply_order_stats
+
+    with_ms = statistics.median(samples) * 1000
+    plain_ms = statistics.median(plain) * 1000
+    print(f"замовлень: {counted} (історія {args.history} за {args.days} днів, в архіві {archived}), "
+          f"кошиків: {len(rebuilt)}")
+    print(f"дій: {len(samples)} змін статусу в {args.workers} потоках + оцінки над {len(order_ids)} замовленнями")
+    print(f"зміна статусу: зі зведенням {with_ms:.3f} мс, без {plain_ms:.3f} мс (+{with_ms - plain_ms:.3f} мс)")
+    print(f"/stats за 30 днів: зведення {rollup_ms:.2f} мс, підсумовування замовлень {scan_ms:.1f} мс "
+          f"(×{scan_ms / rollup_ms:.0f})")
+    print(f"перерахунок зведення: {rebuild_seconds:.2f} с")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=100000, help="давніх замовлень")
+    parser.add_argument("--days", type=int, default=120, help="період історії, днів")
+    parser.add_argument("--orders", type=int, default=2000, help="нових замовлень")
+    parser.add_argument("--transitions", type=int, default=20000, help="випадкових дій")
+    parser.add_argument("--workers", type=int, default=8, help="конкурентних клієнтів")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "stats.db"
+        problems = asyncio.run(run(args, rnd))
+
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
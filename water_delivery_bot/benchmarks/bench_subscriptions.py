@@ -0,0 +1,158 @@
+"""Планувальник підписок на великій кількості підписок.
+
+БД заповнюється підписками з запусками, рівномірно розкиданими на 4
+тижні вперед, і частиною пропущених (бот «не працював»). Вимірюється:
+    * поповнення купи на вікно SCHEDULER_HORIZON проти читання всієї таблиці;
+    * розмір купи і пам'ять, яку вона займає;
+    * наздоганяння пропущених запусків через run_subscription (сповіщення
+      йдуть у фейкового бота) — швидкість і паузи циклу подій;
+після чого перевіряється, що кожна пропущена підписка дала рівно одне
+замовлення, перенесена в майбутнє, а повторний запуск не створює дубля.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_subscriptions --subscriptions 100000 --missed 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database
+import subscriptions
+from config import Config, ConfigStore
+
+TOKEN = "42:SUBSCRIPTIONS"
+
+
+class FakeBot:
+    """Бот, що лише рахує надіслані повідомлення."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+def populate(path: Path, total: int, missed: int, now: datetime) -> None:
+    """Клієнти з підписками: missed — прострочені на 1-3 дні, решта на 28 днів уперед."""
+    spread = timedelta(days=28).total_seconds()
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            ((100000 + i, f"Клієнт {i}", "+380501234567", f"вул. Тестова {i}") for i in range(total)),
+        )
+        db.executemany(
+            """INSERT INTO subscriptions (user_id, water_type, quantity, payment_method, interval_days, next_run)
+               VALUES (?, 'effect', 2, '💵 Готівка', 7, ?)""",
+            (
+                (
+                    1 + i,
+                    (now - timedelta(days=1 + i % 3) if i < missed
+                     else now + timedelta(seconds=spread * i / total + 60)).isoformat(sep=" ", timespec="seconds"),
+                )
+                for i in range(total)
+            ),
+        )
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=100000)
+    parser.add_argument("--missed", type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    # Без пауз між запусками: вимірюється сам планувальник
+    subscriptions.RUN_PAUSE = 0
+    store = ConfigStore(Config(bot_token=TOKEN, admin_ids=[1]))
+    bot = FakeBot()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "subscriptions.db"
+        await database.init_db()
+        now = datetime.now().replace(microsecond=0)
+        populate(database.DATABASE_PATH, args.subscriptions, args.missed, now)
+
+        started = time.perf_counter()
+        full = [row async for row in _all_subscriptions()]
+        full_ms = (time.perf_counter() - started) * 1000
+
+        scheduler = subscriptions.SubscriptionScheduler()
+        tracemalloc.start()
+        started = time.perf_counter()
+        await scheduler.refill(datetime.now())
+        refill_ms = (time.perf_counter() - started) * 1000
+        heap_kb = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+        queued = len(scheduler)
+
+        # Наздоганяння разом з пульсом циклу подій
+        lags = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            while not done.is_set():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - tick - 0.01)
+
+        pulse = asyncio.create_task(heartbeat())
+        due = scheduler.pop_due(datetime.now())
+        started = time.perf_counter()
+        for run_at, subscription_id in due:
+            await subscriptions.run_subscription(bot, store, subscription_id, run_at)
+        catchup = time.perf_counter() - started
+        done.set()
+        await pulse
+
+        # Повторний запуск тих самих (id, час) нічого не створює
+        for run_at, subscription_id in due[:100]:
+            await subscriptions.run_subscription(bot, store, subscription_id, run_at)
+
+        with sqlite3.connect(database.DATABASE_PATH) as db:
+            (orders,) = db.execute("SELECT COUNT(*) FROM orders").fetchone()
+            (per_user,) = db.execute(
+                "SELECT COUNT(*) FROM (SELECT user_id FROM orders GROUP BY user_id HAVING COUNT(*) > 1)"
+            ).fetchone()
+            (overdue,) = db.execute(
+                "SELECT COUNT(*) FROM subscriptions WHERE next_run <= ?", (datetime.now().isoformat(sep=" "),)
+            ).fetchone()
+
+    print(f"підписок: {args.subscriptions}, пропущених: {args.missed}")
+    print(f"читання всієї таблиці: {full_ms:.1f} мс ({len(full)} рядків)")
+    print(f"поповнення на {subscriptions.SCHEDULER_HORIZON // 60} хв: {refill_ms:.1f} мс, "
+          f"у купі {queued}, пам'ять {heap_kb:.0f} КБ")
+    print(f"наздоганяння: {len(due)} замовлень за {catchup:.1f} с "
+          f"({len(due) / catchup:.0f}/с), повідомлень {bot.sent}")
+    print(f"найдовша пауза циклу подій: {max(lags) * 1000:.1f} мс")
+
+    problems = []
+    if orders != args.missed:
+        problems.append(f"замовлень {orders}, очікувалось {args.missed}")
+    if per_user:
+        problems.append(f"дублі замовлень у {per_user} клієнтів")
+    if overdue:
+        problems.append(f"{overdue} підписок лишились простроченими")
+    print("перевірка: " + ("; ".join(problems) if problems else "ok"))
+    return 1 if problems else 0
+
+
+async def _all_subscriptions():
+    """Для порівняння: що читало б опитування всієї таблиці."""
+    async with database._connect() as db:
+        async with db.execute("SELECT id, next_run FROM subscriptions") as cursor:
+            cursor.arraysize = database.FETCH_BATCH
+            async for row in cursor:
+                yield row
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
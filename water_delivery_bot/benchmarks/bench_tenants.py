@@ -0,0 +1,99 @@
+"""Пам'ять і час обробки залежно від кількості орендарів в одному процесі.
+
+Для кожної кількості орендарів в окремому процесі створюються файли .env,
+БД, боти зі спільною сесією і один диспетчер; кожен бот обробляє кілька
+оновлень. Для порівняння наводиться оцінка для окремих процесів:
+N × RSS процесу з одним ботом.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_tenants --tenants 1 10 50
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram.types import Update
+
+from main import create_dispatcher
+from tenants import Tenants
+
+from benchmarks.bench_workers import _text
+from benchmarks.replay import StubSession
+
+UPDATES_PER_TENANT = ["/start", "💰 Ціни", "📝 Реєстрація", "Клієнт Навантаження", "+380501234567"]
+
+
+def rss_mb() -> float:
+    """Поточний RSS процесу (Linux), інакше — піковий."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _run_level(count: int, workdir: Path) -> dict:
+    tenants_dir = workdir / f"tenants_{count}"
+    tenants_dir.mkdir(parents=True)
+    for i in range(count):
+        (tenants_dir / f"brand{i}.env").write_text(
+            f"BOT_TOKEN={1000 + i}:TENANT\n"
+            f"ADMIN_IDS=1\n"
+            f"DEFAULT_BOTTLE_PRICE={100 + i}\n"
+            f"ORDERS_CHAT_ID=\n"
+            f"DATABASE_PATH={tenants_dir / f'brand{i}.db'}\n"
+        )
+
+    tenants = Tenants.from_directory(tenants_dir)
+    await tenants.init_databases()
+    bots = tenants.create_bots(session=StubSession())
+    dp = create_dispatcher(tenants)
+
+    start = time.perf_counter()
+    for bot in bots:
+        for text in UPDATES_PER_TENANT:
+            update = Update.model_validate({"update_id": 1, **_text(500, text)}, context={"bot": bot})
+            await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+
+    return {
+        "tenants": count,
+        "rss": rss_mb(),
+        "update_ms": elapsed / (count * len(UPDATES_PER_TENANT)) * 1000,
+    }
+
+
+def run_level(count: int, workdir: Path) -> dict:
+    """Один прогін з заданою кількістю орендарів (у свіжому процесі)."""
+    logging.basicConfig(level=logging.CRITICAL)
+    return asyncio.run(_run_level(count, workdir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    # Роутери — об'єкти модулів, тож кожен рівень потребує свіжого процесу
+    mp = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp, mp.Pool(1, maxtasksperchild=1) as pool:
+        # Процес з одним ботом — база для варіанту «кожен бренд окремо»
+        single = pool.apply(run_level, (1, Path(tmp) / "single"))["rss"]
+
+        print(f"{'орендарів':>9} {'RSS, МБ':>8} {'окремі процеси, МБ':>19} {'оновлення, мс':>14}")
+        for count in args.tenants:
+            result = pool.apply(run_level, (count, Path(tmp)))
+            print(f"{count:>9} {result['rss']:>8.1f} {single * count:>19.1f} {result['update_ms']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
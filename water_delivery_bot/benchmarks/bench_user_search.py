@@ -0,0 +1,73 @@
+"""Повнотекстовий пошук клієнтів (/find): час запиту на великій базі.
+
+База заповнюється синтетичними клієнтами (ім'я, телефон, адреса), після
+чого для набору типових запитів — частина імені, вулиця, початок номера
+в різних записах — вимірюється медіана і максимум часу search_users.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_user_search --users 100000
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import database
+
+FIRST_NAMES = ["Іван", "Олена", "Петро", "Марія", "Андрій", "Оксана", "Мар'яна", "Юрій", "Наталія", "Богдан"]
+LAST_NAMES = ["Петренко", "Коваленко", "Шевченко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник", "Мельник"]
+STREETS = ["Хрещатик", "Сумська", "Шевченка", "Грушевського", "Лесі Українки", "Franka", "Зелена", "Садова"]
+
+QUERIES = ["петр", "коваленко олена", "сумська 12", "мар'яна", "050", "0501", "+380 67 12", "(093) 555", "о", "franka"]
+
+
+def populate(path: Path, users: int) -> None:
+    rnd = random.Random(3)
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO users (telegram_id, full_name, phone, address) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    100000 + i,
+                    f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}{i % 100 or ''}",
+                    f"+380{rnd.choice(['50', '67', '93', '63'])}{rnd.randrange(10**7):07d}",
+                    f"м. Київ, вул. {rnd.choice(STREETS)} {rnd.randrange(1, 200)}, кв. {rnd.randrange(1, 300)}",
+                )
+                for i in range(users)
+            ),
+        )
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "search.db"
+        await database.init_db()
+        started = time.perf_counter()
+        populate(database.DATABASE_PATH, args.users)
+        print(f"клієнтів: {args.users}, запис з індексацією {time.perf_counter() - started:.1f} с\n")
+
+        print(f"{'запит':<20} {'знайдено':>9} {'медіана, мс':>12} {'макс, мс':>9}  перший")
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                found = await database.search_users(query, limit=11)
+                timings.append((time.perf_counter() - started) * 1000)
+            first = found[0].full_name if found else "—"
+            print(f"{query:<20} {len(found):>9} {statistics.median(timings):>12.2f} {max(timings):>9.2f}  {first}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
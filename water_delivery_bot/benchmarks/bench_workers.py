@@ -0,0 +1,130 @@
+"""Пропускна здатність залежно від кількості процесів-обробників.
+
+Приймач і обробники з scaling.py працюють із FakeTelegramServer і
+спільною БД у режимі WAL. Кожен синтетичний клієнт проходить реєстрацію
+(5 оновлень, останнє — запис у БД); усі оновлення подаються одразу, а
+час рахується до останньої відповіді sendMessage.
+
+Запуск з директорії бота:
+    python -m benchmarks.bench_workers --workers 1 2 4 --users 500 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram.client.telegram import TelegramAPIServer
+
+import database
+from config import Config
+from scaling import Ingester
+
+from benchmarks.fake_telegram import FakeTelegramServer
+
+TOKEN = "42:WORKERS"
+STEPS_PER_USER = 5
+
+_message_ids = itertools.count(1)
+
+
+def _text(telegram_id: int, text: str) -> dict:
+    return {"message": {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": telegram_id, "type": "private"},
+        "from": {"id": telegram_id, "is_bot": False, "first_name": f"Load{telegram_id}"},
+        "text": text,
+    }}
+
+
+async def _wait_for_replies(server: FakeTelegramServer, expected: int, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while server.calls["sendMessage"] < expected:
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+async def run_level(workers: int, users: int, latency: float, workdir: Path) -> dict:
+    """Один прогін з заданою кількістю обробників."""
+    db_path = workdir / f"workers_{workers}.db"
+    database.DATABASE_PATH = db_path
+    await database.init_db()
+
+    server = FakeTelegramServer(latency=latency)
+    await server.start()
+    ingester = Ingester(
+        Config(bot_token=TOKEN, admin_ids=[1]),
+        workers,
+        database_path=db_path,
+        api=TelegramAPIServer.from_base(server.base_url),
+        poll_timeout=1,
+    )
+    running = asyncio.create_task(ingester.run())
+
+    try:
+        # Прогрів: процеси стартують та імпортують обробники
+        for i in range(workers * 4):
+            server.push_update(_text(10 + i, "💰 Ціни"))
+        if not await _wait_for_replies(server, workers * 4, timeout=60):
+            raise RuntimeError("Обробники не відповіли під час прогріву")
+
+        sent_before = server.calls["sendMessage"]
+        start = time.perf_counter()
+        for telegram_id in range(1000, 1000 + users):
+            server.push_update(_text(telegram_id, "📝 Реєстрація"))
+            server.push_update(_text(telegram_id, f"Клієнт Навантаження {telegram_id}"))
+            server.push_update(_text(telegram_id, "+380501234567"))
+            server.push_update(_text(telegram_id, f"м. Харків, вул. Тестова {telegram_id}"))
+            server.push_update(_text(telegram_id, "⏭️ Пропустити"))
+        completed = await _wait_for_replies(server, sent_before + users * STEPS_PER_USER, timeout=300)
+        elapsed = time.perf_counter() - start
+    finally:
+        ingester.stop()
+        await running
+        await server.stop()
+
+    with sqlite3.connect(db_path) as db:
+        registered = db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    return {
+        "workers": workers,
+        "elapsed": elapsed,
+        "updates": users * STEPS_PER_USER,
+        "registered": registered,
+        "completed": completed,
+        "restarts": ingester.restarts,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="затримка відповіді Bot API")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{'обробників':>10} {'час, с':>8} {'оновлень/с':>11} {'прискорення':>12} {'зареєстровано':>14}")
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            result = await run_level(workers, args.users, args.latency_ms / 1000, Path(tmp))
+            throughput = result["updates"] / result["elapsed"]
+            base = base or throughput
+            note = "" if result["completed"] else " (не дочекались усіх відповідей)"
+            if result["restarts"]:
+                note += f" (перезапусків: {result['restarts']})"
+            print(f"{workers:>10} {result['elapsed']:>8.2f} {throughput:>11.1f} "
+                  f"{throughput / base:>11.2f}x {result['registered']:>14}{note}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
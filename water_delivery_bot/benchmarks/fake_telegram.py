@@ -0,0 +1,142 @@
+"""Локальна заглушка Telegram Bot API для навантажувального тестування.
+
+Підтримує getUpdates (long polling), sendMessage, editMessageText,
+answerCallbackQuery та службові методи. Затримка відповіді та частка
+відповідей 429 налаштовуються.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+# Методи, для яких імітується обмеження частоти запитів
+RATE_LIMITED_METHODS = {"sendMessage", "editMessageText", "sendDocument"}
+
+
+class FakeTelegramServer:
+    """HTTP-сервер, що імітує Bot API на 127.0.0.1."""
+
+    def __init__(self, latency: float = 0.0, rate_429: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.calls: Counter[str] = Counter()
+        self.throttled: Counter[str] = Counter()
+        # Надіслані повідомлення (chat_id, text) та підтверджений offset getUpdates
+        self.sent: list[tuple[int, str]] = []
+        self.offset = 0
+        self._updates: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self) -> None:
+        """Запуск сервера на вільному порту."""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def push_update(self, update: dict) -> int:
+        """Додати оновлення в чергу getUpdates, повертає update_id."""
+        update_id = next(self._update_ids)
+        self._updates.append({"update_id": update_id, **update})
+        self._new_updates.set()
+        return update_id
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        for key, value in params.items():
+            # aiogram передає вкладені об'єкти як JSON-рядки у form-data
+            if isinstance(value, str) and value[:1] in "{[":
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in RATE_LIMITED_METHODS and self.rate_429 and random.random() < self.rate_429:
+            self.throttled[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if method == "sendMessage":
+            self.sent.append((int(params.get("chat_id") or 0), params.get("text") or ""))
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    @property
+    def pending(self) -> list[dict]:
+        """Оновлення, ще не підтверджені ботом."""
+        return [u for u in self._updates if u["update_id"] >= self.offset]
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+
+        self.offset = max(self.offset, offset)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    def _message(self, chat_id, text: str | None = None, message_id: int | None = None) -> dict:
+        chat_id = int(chat_id) if chat_id is not None else 0
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "text": text or "",
+        }
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 42, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        if method in ("sendMessage", "sendDocument"):
+            return self._message(params.get("chat_id"), params.get("text") or params.get("caption"))
+        if method == "editMessageText":
+            if params.get("inline_message_id"):
+                return True
+            return self._message(params.get("chat_id"), params.get("text"), int(params.get("message_id") or 0) or None)
+        return True
@@ -0,0 +1,278 @@
+"""Навантажувальний тест бота без звернень до справжнього Telegram.
+
+Синтетичні клієнти проходять повний сценарій (реєстрація → замовлення →
+підтвердження адміном → доставка → отримання → оцінка → повторне
+замовлення однією кнопкою) через справжні Dispatcher і роутери з main.py,
+а Bot API імітує FakeTelegramServer.
+
+Запуск з директорії бота:
+    python -m benchmarks.load_test --users 10 100 1000 --latency-ms 20 --rate-429 0.01
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+import database
+from callbacks import (
+    AdminAction,
+    AdminOrderCallback,
+    ClientAction,
+    ClientOrderCallback,
+    PaymentCallback,
+    QuantityCallback,
+    RateCallback,
+    WaterCallback,
+)
+from config import Config
+from database import WaterType
+from main import create_dispatcher
+
+from benchmarks.fake_telegram import FakeTelegramServer
+
+ADMIN_ID = 1
+TOKEN = "42:LOADTEST"
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль методом найближчого рангу."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class UpdateTracker:
+    """Очікування завершення обробки оновлень та збір помилок."""
+
+    def __init__(self):
+        self._waiters: dict[int, asyncio.Future] = {}
+        self.errors: defaultdict[str, int] = defaultdict(int)
+        self.processed = 0
+
+    def expect(self, update_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[update_id] = future
+        return future
+
+    async def middleware(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        except sqlite3.OperationalError as e:
+            self.errors["database locked" if "locked" in str(e) else "sqlite"] += 1
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+        finally:
+            self.processed += 1
+            future = self._waiters.pop(event.update_id, None)
+            if future and not future.done():
+                future.set_result(None)
+
+
+class Customer:
+    """Синтетичний клієнт, що надсилає оновлення і чекає їх обробки."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, telegram_id: int, server: FakeTelegramServer, tracker: UpdateTracker,
+                 latencies: dict[str, list[float]]):
+        self.telegram_id = telegram_id
+        self.server = server
+        self.tracker = tracker
+        self.latencies = latencies
+
+    def _user(self, telegram_id: int) -> dict:
+        return {"id": telegram_id, "is_bot": False, "first_name": f"Load{telegram_id}"}
+
+    def _chat(self, telegram_id: int) -> dict:
+        return {"id": telegram_id, "type": "private"}
+
+    async def _send(self, stage: str, update: dict) -> None:
+        start = time.perf_counter()
+        update_id = self.server.push_update(update)
+        await self.tracker.expect(update_id)
+        self.latencies[stage].append(time.perf_counter() - start)
+
+    async def text(self, stage: str, text: str, sender: int | None = None) -> None:
+        sender = sender or self.telegram_id
+        await self._send(stage, {"message": {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": self._chat(sender),
+            "from": self._user(sender),
+            "text": text,
+        }})
+
+    async def press(self, stage: str, data: str, sender: int | None = None) -> None:
+        sender = sender or self.telegram_id
+        await self._send(stage, {"callback_query": {
+            "id": str(next(self._ids)),
+            "from": self._user(sender),
+            "chat_instance": "load",
+            "data": data,
+            "message": {
+                "message_id": next(self._ids),
+                "date": int(time.time()),
+                "chat": self._chat(sender),
+                "text": "…",
+            },
+        }})
+
+    async def run(self) -> None:
+        """Повний життєвий цикл замовлення."""
+        await self.text("registration", "/start")
+        await self.text("registration", "📝 Реєстрація")
+        await self.text("registration", f"Клієнт Навантаження {self.telegram_id}")
+        await self.text("registration", "+380501234567")
+        await self.text("registration", f"м. Харків, вул. Тестова {self.telegram_id}")
+        await self.text("registration", "⏭️ Пропустити")
+
+        await self.text("order", "🛒 Зробити замовлення")
+        await self.press("order", WaterCallback(water_type=WaterType.EFFECT).pack())
+        await self.press("order", QuantityCallback(value="2").pack())
+        await self.press("order", PaymentCallback(index=0).pack())
+        await self.press("order", "skip_comment")
+        await self.press("order", "confirm_order")
+
+        orders = await database.get_user_orders(self.telegram_id, limit=1)
+        if not orders:
+            return
+        order_id = orders[0].id
+
+        await self.press("admin_confirm", AdminOrderCallback(
+            action=AdminAction.CONFIRM, order_id=order_id).pack(), sender=ADMIN_ID)
+        await self.press("admin_deliver", AdminOrderCallback(
+            action=AdminAction.DELIVER, order_id=order_id).pack(), sender=ADMIN_ID)
+        await self.press("received", ClientOrderCallback(
+            action=ClientAction.RECEIVED, order_id=order_id).pack())
+        await self.press("rating", RateCallback(order_id=order_id, rating=5).pack())
+        await self.press("rating", "skip_feedback")
+
+        await self.text("reorder", "🔁 Повторити замовлення")
+        await self.press("reorder", "confirm_order")
+
+
+async def probe_database(samples: list[float], stop: asyncio.Event) -> None:
+    """Вимірювання затримки простого запиту до БД під навантаженням."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await database.get_user(0)
+        except sqlite3.OperationalError:
+            pass
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run_level(users: int, first_id: int, server: FakeTelegramServer, tracker: UpdateTracker,
+                    workdir: Path) -> dict:
+    """Один прогін з заданою кількістю одночасних клієнтів."""
+    database.DATABASE_PATH = workdir / f"load_{users}.db"
+    await database.init_db()
+    await database.load_active_orders()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    customers = [Customer(first_id + i, server, tracker, latencies) for i in range(users)]
+    probe_samples: list[float] = []
+    stop_probe = asyncio.Event()
+    probe = asyncio.create_task(probe_database(probe_samples, stop_probe))
+
+    errors_before = dict(tracker.errors)
+    processed_before = tracker.processed
+    calls_before = sum(server.calls.values())
+    start = time.perf_counter()
+    await asyncio.gather(*(customer.run() for customer in customers))
+    elapsed = time.perf_counter() - start
+    stop_probe.set()
+    await probe
+    index_problems = await database.check_active_orders()
+    async with database._connect() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM orders")
+        orders = (await cursor.fetchone())[0]
+
+    return {
+        "users": users,
+        "elapsed": elapsed,
+        "updates": tracker.processed - processed_before,
+        "api_calls": sum(server.calls.values()) - calls_before,
+        "latencies": latencies,
+        "db_probe": probe_samples,
+        "index_problems": index_problems,
+        "orders": orders,
+        "errors": {k: v - errors_before.get(k, 0) for k, v in tracker.errors.items()
+                   if v - errors_before.get(k, 0)},
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"\n=== {result['users']} одночасних клієнтів ===")
+    print(f"час: {result['elapsed']:.2f} с, оновлень: {result['updates']}, "
+          f"{result['updates'] / result['elapsed']:.1f} оновлень/с, викликів API: {result['api_calls']}")
+    print(f"{'етап':<14} {'n':>6} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for stage, values in result["latencies"].items():
+        print(f"{stage:<14} {len(values):>6} "
+              f"{percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+              f"{percentile(values, 99) * 1000:>9.1f} {max(values) * 1000:>9.1f}")
+    probe = result["db_probe"]
+    print(f"БД (пробний запит): p50 {percentile(probe, 50) * 1000:.1f} мс, "
+          f"p95 {percentile(probe, 95) * 1000:.1f} мс, max {max(probe, default=0) * 1000:.1f} мс")
+    # Кожен клієнт оформлює замовлення і повторює його
+    expected = result["users"] * 2
+    print(f"замовлень у БД: {result['orders']} з {expected}"
+          + ("" if result["orders"] == expected else " — частина клієнтів не пройшла сценарій"))
+    problems = result["index_problems"]
+    print(f"індекс активних замовлень: {'збігається з БД' if not problems else f'{len(problems)} розбіжностей'}")
+    for problem in problems[:10]:
+        print(f"  {problem}")
+    if result["errors"]:
+        print("помилки:", ", ".join(f"{k}: {v}" for k, v in result["errors"].items()))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="затримка відповіді Bot API")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="частка відповідей 429")
+    args = parser.parse_args()
+
+    # Помилки обробників враховуються у звіті, лог лише заважає
+    logging.basicConfig(level=logging.CRITICAL)
+
+    server = FakeTelegramServer(latency=args.latency_ms / 1000, rate_429=args.rate_429)
+    await server.start()
+
+    config = Config(bot_token=TOKEN, admin_ids=[ADMIN_ID])
+    bot = Bot(token=TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)))
+    dp = create_dispatcher(config)
+    tracker = UpdateTracker()
+    dp.update.outer_middleware(tracker.middleware)
+    polling = asyncio.create_task(dp.start_polling(bot, polling_timeout=1, handle_signals=False))
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            first_id = 1000
+            for users in args.users:
+                print_report(await run_level(users, first_id, server, tracker, Path(tmp)))
+                first_id += users
+        if server.throttled:
+            print("\nвідповідей 429:", dict(server.throttled))
+    finally:
+        await dp.stop_polling()
+        await polling
+        await bot.session.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
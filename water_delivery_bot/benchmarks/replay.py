@@ -0,0 +1,220 @@
+"""Відтворення записаних оновлень для перевірки регресій продуктивності.
+
+Оновлення з файлу запису (RECORD_UPDATES, див. recording.py) подаються в
+диспетчер з main.py з БД у пам'яті та Bot без мережі. Звіт містить час
+кожного обробника і порівняння з базовим прогоном.
+
+Запуск з директорії бота:
+    python -m benchmarks.replay data/updates.jsonl --speed 0 --save-baseline baseline.json
+    python -m benchmarks.replay data/updates.jsonl --speed 10 --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import aiosqlite
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, Update
+
+import database
+from config import Config
+from main import create_dispatcher
+from recording import read_recording
+
+from benchmarks.load_test import percentile
+
+TOKEN = "42:REPLAY"
+MEMORY_DATABASE = "file:replay?mode=memory&cache=shared"
+
+
+class StubSession(BaseSession):
+    """Сесія, що відповідає на виклики Bot API без мережі."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: defaultdict[str, int] = defaultdict(int)
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        self.calls[type(method).__name__] += 1
+        returning = getattr(method, "__returning__", None)
+        if returning is Message or "Message" in str(returning):
+            chat_id = getattr(method, "chat_id", None)
+            chat_id = chat_id if isinstance(chat_id, int) else 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private" if chat_id > 0 else "supergroup"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class HandlerTimer:
+    """Inner-middleware, що вимірює час кожного обробника."""
+
+    def __init__(self):
+        self.timings: defaultdict[str, list[float]] = defaultdict(list)
+        self.errors: defaultdict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def handler_name(data: dict) -> str:
+        route = data.get("route")
+        callback = route.handler.callback if route else data["handler"].callback
+        return f"{callback.__module__}.{callback.__qualname__}"
+
+    async def __call__(self, handler, event, data):
+        name = self.handler_name(data)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[name] += 1
+        finally:
+            self.timings[name].append(time.perf_counter() - start)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+            }
+            for name, values in sorted(self.timings.items())
+        }
+
+
+def _sender(raw: dict) -> int | None:
+    for key in ("message", "edited_message", "callback_query"):
+        if key in raw:
+            return raw[key].get("from", {}).get("id")
+    return None
+
+
+async def replay(updates: list[tuple[float, dict]], bot: Bot, dp, speed: float) -> float:
+    """Подача оновлень з оригінальними інтервалами, поділеними на speed.
+
+    При speed == 0 оновлення обробляються послідовно без пауз — так
+    результати найстабільніші для порівняння з базою. Інакше різні
+    користувачі обробляються конкурентно, як при polling, але оновлення
+    одного користувача — строго по черзі.
+    """
+    start = time.perf_counter()
+    if speed <= 0:
+        for _, raw in updates:
+            await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+        return time.perf_counter() - start
+
+    last_task: dict[int | None, asyncio.Task] = {}
+
+    async def feed(update: Update, previous: asyncio.Task | None):
+        if previous:
+            await asyncio.wait([previous])
+        await dp.feed_update(bot, update)
+
+    first_ts = updates[0][0]
+    for ts, raw in updates:
+        delay = (ts - first_ts) / speed - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sender = _sender(raw)
+        update = Update.model_validate(raw, context={"bot": bot})
+        last_task[sender] = asyncio.create_task(feed(update, last_task.get(sender)))
+    await asyncio.gather(*last_task.values(), return_exceptions=True)
+    return time.perf_counter() - start
+
+
+def print_report(summary: dict, baseline: dict | None, threshold: float, min_count: int) -> list[str]:
+    """Таблиця часу обробників; повертає список регресій."""
+    regressions = []
+    print(f"{'обробник':<55} {'n':>6} {'mean, мс':>9} {'p95, мс':>9} {'база p95':>9} {'зміна':>8}")
+    for name, stats in summary.items():
+        base = (baseline or {}).get(name)
+        change = ""
+        base_p95 = ""
+        if base and base["p95_ms"] > 0:
+            delta = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+            change = f"{delta:+.0%}"
+            base_p95 = f"{base['p95_ms']:.2f}"
+            # На кількох вимірах шум більший за будь-який поріг
+            if delta > threshold and stats["count"] >= min_count:
+                regressions.append(name)
+                change += " ⚠️"
+        print(f"{name:<55} {stats['count']:>6} {stats['mean_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {base_p95:>9} {change:>8}")
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="файл, записаний через RECORD_UPDATES")
+    parser.add_argument("--speed", type=float, default=1.0, help="прискорення; 0 — без пауз")
+    parser.add_argument("--baseline", help="JSON з попереднього прогону для порівняння")
+    parser.add_argument("--save-baseline", help="зберегти результати як базу")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустиме зростання p95")
+    parser.add_argument("--min-count", type=int, default=20, help="мінімум викликів для висновку про регресію")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    admins, updates = read_recording(args.recording)
+    if not updates:
+        print("Файл запису порожній")
+        return 1
+
+    # БД у пам'яті живе, доки відкрите хоча б одне з'єднання
+    database.DATABASE_PATH = MEMORY_DATABASE
+    keeper = await aiosqlite.connect(MEMORY_DATABASE, uri=True)
+    await database.init_db()
+
+    session = StubSession()
+    bot = Bot(token=TOKEN, session=session)
+    dp = create_dispatcher(Config(bot_token=TOKEN, admin_ids=admins))
+    timer = HandlerTimer()
+    dp.message.middleware(timer)
+    dp.callback_query.middleware(timer)
+
+    elapsed = await replay(updates, bot, dp, args.speed)
+    await keeper.close()
+
+    print(f"Відтворено {len(updates)} оновлень за {elapsed:.2f} с "
+          f"({len(updates) / elapsed:.1f} оновлень/с), викликів API: {sum(session.calls.values())}\n")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    summary = timer.summary()
+    regressions = print_report(summary, baseline, args.threshold, args.min_count)
+    if timer.errors:
+        print("\nпомилки:", ", ".join(f"{k}: {v}" for k, v in timer.errors.items()))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print(f"\nРегресії (p95 > +{args.threshold:.0%}): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,163 @@
+"""Зупинка бота під навантаженням: чи не втрачаються замовлення і сповіщення.
+
+Синтетичні клієнти оформлюють замовлення через FakeTelegramServer з
+затримкою відповіді, а процес отримує SIGTERM, щойно --kill-at частка
+клієнтів натисне «Підтвердити», — тобто посеред оформлення замовлень.
+Після зупинки перевіряється, що:
+    * замовлення взагалі створювались (інакше перевіряти нічого);
+    * на кожне замовлення в БД надіслано сповіщення адміну і в чат замовлень;
+    * кожне підтверджене оновлення confirm_order створило замовлення, а
+      непідтверджені лишились у черзі Telegram і прийдуть після перезапуску.
+З малим --timeout обробники скасовуються: підтверджених, але втрачених
+оновлень і тоді бути не повинно.
+
+Запуск з директорії бота:
+    python -m benchmarks.shutdown_test --users 200 --latency-ms 50 --kill-at 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+import database
+from callbacks import PaymentCallback, QuantityCallback, WaterCallback
+from config import Config
+from database import WaterType
+from main import create_dispatcher
+from shutdown import run_polling
+
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.load_test import ADMIN_ID, TOKEN, Customer, UpdateTracker
+
+ORDERS_CHAT_ID = -100500
+# Граничний час, за який клієнти мають дійти до підтвердження, с
+KILL_WAIT = 60
+
+
+async def place_order(customer: Customer) -> None:
+    """Реєстрація і замовлення до підтвердження включно."""
+    await customer.text("registration", "/start")
+    await customer.text("registration", "📝 Реєстрація")
+    await customer.text("registration", f"Клієнт Навантаження {customer.telegram_id}")
+    await customer.text("registration", "+380501234567")
+    await customer.text("registration", f"м. Харків, вул. Тестова {customer.telegram_id}")
+    await customer.text("registration", "⏭️ Пропустити")
+    await customer.text("order", "🛒 Зробити замовлення")
+    await customer.press("order", WaterCallback(water_type=WaterType.EFFECT).pack())
+    await customer.press("order", QuantityCallback(value="2").pack())
+    await customer.press("order", PaymentCallback(index=0).pack())
+    await customer.press("order", "skip_comment")
+    await customer.press("order", "confirm_order")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="затримка відповіді Bot API")
+    parser.add_argument("--kill-at", type=float, default=0.5,
+                        help="частка клієнтів, що натиснули «Підтвердити», після якої надіслати SIGTERM")
+    parser.add_argument("--timeout", type=float, default=25.0, help="граничний час дренування")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    server = FakeTelegramServer(latency=args.latency_ms / 1000)
+    await server.start()
+
+    # update_id кожного confirm_order → клієнт
+    confirms: dict[int, int] = {}
+    push_update = server.push_update
+    kill = asyncio.Event()
+
+    def recording_push(update: dict) -> int:
+        update_id = push_update(update)
+        query = update.get("callback_query")
+        if query and query["data"] == "confirm_order":
+            confirms[update_id] = query["from"]["id"]
+            if len(confirms) >= max(1, args.kill_at * args.users):
+                kill.set()
+        return update_id
+
+    server.push_update = recording_push
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "shutdown.db"
+        await database.init_db()
+
+        config = Config(bot_token=TOKEN, admin_ids=[ADMIN_ID], orders_chat_id=ORDERS_CHAT_ID)
+        bot = Bot(token=TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)))
+        dp = create_dispatcher(config)
+        tracker = UpdateTracker()
+        dp.update.outer_middleware(tracker.middleware)
+
+        polling = asyncio.create_task(run_polling(dp, bot, timeout=args.timeout, polling_timeout=1))
+        latencies: dict[str, list[float]] = defaultdict(list)
+        customers = [
+            asyncio.create_task(place_order(Customer(1000 + i, server, tracker, latencies)))
+            for i in range(args.users)
+        ]
+
+        try:
+            await asyncio.wait_for(kill.wait(), KILL_WAIT)
+        except asyncio.TimeoutError:
+            print(f"за {KILL_WAIT} с «Підтвердити» натиснули {len(confirms)} клієнтів з {args.users}")
+        killed_at = len(confirms)
+        started = time.perf_counter()
+        os.kill(os.getpid(), signal.SIGTERM)
+        await polling
+        stopped_in = time.perf_counter() - started
+
+        for task in customers:
+            task.cancel()
+        await asyncio.gather(*customers, return_exceptions=True)
+        await bot.session.close()
+        await server.stop()
+
+        with sqlite3.connect(database.DATABASE_PATH) as db:
+            orders = dict(db.execute(
+                "SELECT o.id, u.telegram_id FROM orders o JOIN users u ON u.id = o.user_id"
+            ).fetchall())
+            wal = Path(f"{database.DATABASE_PATH}-wal")
+            wal_size = wal.stat().st_size if wal.exists() else 0
+
+    notified = {
+        chat_id: {text for cid, text in server.sent if cid == chat_id}
+        for chat_id in (ADMIN_ID, ORDERS_CHAT_ID)
+    }
+    missing_notifications = [
+        order_id for order_id in orders
+        if not all(any(f"Нове замовлення #{order_id}<" in text for text in texts) for texts in notified.values())
+    ]
+    ordered_by = set(orders.values())
+    lost = [uid for uid, telegram_id in confirms.items() if uid < server.offset and telegram_id not in ordered_by]
+    pending_confirms = [uid for uid in confirms if uid >= server.offset]
+
+    print(f"SIGTERM після {killed_at} «Підтвердити» з {args.users}, зупинка зайняла {stopped_in:.2f} с")
+    print(f"оновлень оброблено: {tracker.processed}, лишилось у черзі Telegram: {len(server.pending)}")
+    print(f"замовлень у БД: {len(orders)}, confirm_order у черзі до перезапуску: {len(pending_confirms)}")
+    print(f"замовлень без сповіщень: {len(missing_notifications)}")
+    print(f"підтверджених, але втрачених confirm_order: {len(lost)}")
+    print(f"розмір WAL після зупинки: {wal_size} байт")
+    if tracker.errors:
+        print("помилки:", ", ".join(f"{k}: {v}" for k, v in tracker.errors.items()))
+
+    if not orders:
+        print("перевірка: жодного замовлення не створено — зупинку не перевірено")
+        return 1
+    return 1 if missing_notifications or lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,129 @@
+"""Облік зворотної тари: звірка балансів з журналом.
+
+Кожна виконана доставка і кожне повернення порожніх дописують запис у
+bottle_ledger, а баланс клієнта в bottle_balances змінюється в тій самій
+транзакції, тож показ балансу — один рядок, без підсумовування історії.
+Звірка перевіряє, що зведення збігається з журналом: обидва читаються
+потоком, упорядкованим за клієнтом, і зливаються за один прохід — у
+пам'яті лише поточний клієнт і перелік розбіжностей.
+
+Запуск з директорії бота:
+    python -m bottles          # звірка; код виходу 1, якщо є розбіжності
+    python -m bottles --fix    # перерахувати зведення з журналу
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import database
+from database import BottleBalance
+
+# Скільки розбіжностей показувати у звіті
+REPORT_LIMIT = 20
+
+
+@dataclass
+class Reconciliation:
+    customers: int = 0
+    entries: int = 0
+    delivered: int = 0
+    returned: int = 0
+    mismatches: list[tuple[BottleBalance, BottleBalance]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def held(self) -> int:
+        return self.delivered - self.returned
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+
+async def _next(stream, default):
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return default
+
+
+async def reconcile() -> Reconciliation:
+    """Звірка bottle_balances з bottle_ledger одним проходом по обох потоках."""
+    report = Reconciliation()
+    started = time.perf_counter()
+    async with database.bottle_snapshot() as (ledger, balances):
+        expected, entries = await _next(ledger, (None, 0))
+        actual = await _next(balances, None)
+
+        while expected is not None or actual is not None:
+            if actual is None or (expected is not None and expected.user_id < actual.user_id):
+                # Записи в журналі є, а зведення немає
+                total, found, count = expected, BottleBalance(expected.user_id), entries
+                expected, entries = await _next(ledger, (None, 0))
+            elif expected is None or actual.user_id < expected.user_id:
+                # Зведення без жодного запису в журналі
+                total, found, count = BottleBalance(actual.user_id), actual, 0
+                actual = await _next(balances, None)
+            else:
+                total, found, count = expected, actual, entries
+                expected, entries = await _next(ledger, (None, 0))
+                actual = await _next(balances, None)
+
+            report.customers += 1
+            report.entries += count
+            report.delivered += total.delivered
+            report.returned += total.returned
+            if (found.delivered, found.returned) != (total.delivered, total.returned):
+                report.mismatches.append((total, found))
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def format_report(report: Reconciliation) -> str:
+    """Звіт звірки для адміна і командного рядка."""
+    lines = [
+        f"Клієнтів з тарою: {report.customers}, записів журналу: {report.entries}",
+        f"Доставлено: {report.delivered}, повернуто: {report.returned}, у клієнтів: {report.held}",
+    ]
+    if report.ok:
+        lines.append(f"Зведення збігається з журналом ({report.seconds:.2f} с)")
+        return "\n".join(lines)
+    lines.append(f"Розбіжностей: {len(report.mismatches)} ({report.seconds:.2f} с)")
+    for expected, found in report.mismatches[:REPORT_LIMIT]:
+        lines.append(
+            f"  клієнт #{expected.user_id}: журнал {expected.delivered}/{expected.returned}, "
+            f"зведення {found.delivered}/{found.returned}"
+        )
+    if len(report.mismatches) > REPORT_LIMIT:
+        lines.append(f"  … і ще {len(report.mismatches) - REPORT_LIMIT}")
+    return "\n".join(lines)
+
+
+async def run(args: argparse.Namespace) -> bool:
+    await database.init_db()
+    report = await reconcile()
+    print(format_report(report))
+    if args.fix and not report.ok:
+        customers = await database.rebuild_bottle_balances()
+        print(f"Зведення перераховано з журналу: {customers} клієнтів")
+        return True
+    return report.ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="перерахувати зведення, якщо є розбіжності")
+    parser.add_argument("--database", type=Path, default=database.DATABASE_PATH)
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    return 0 if asyncio.run(run(args)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Масове встановлення індивідуальних цін та імпорт клієнтів з CSV.
+
+Спочатку будується план (PricePlan) — що саме зміниться, без запису в
+БД, — адмін переглядає його і підтверджує, після чого зміни
+записуються однією транзакцією (database.apply_price_changes).
+
+CSV: перший рядок — заголовки, роздільник «,» або «;». Клієнт
+визначається за telegram_id або телефоном; ціна 0 чи порожня скидає до
+ціни за замовчуванням. Рядок з telegram_id, ім'ям, телефоном та адресою
+незареєстрованого клієнта додає його до бази.
+"""
+
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from database import User
+
+# Назви колонок (у нижньому регістрі) → поле; підходять і файли /export
+COLUMN_ALIASES = {
+    "telegram_id": "telegram_id", "telegram id": "telegram_id", "id": "telegram_id",
+    "phone": "phone", "телефон": "phone",
+    "price": "price", "ціна": "price",
+    "full_name": "full_name", "name": "full_name", "клієнт": "full_name", "ім'я": "full_name",
+    "address": "address", "адреса": "address",
+}
+
+MAX_ERRORS = 50
+
+
+@dataclass
+class PriceChange:
+    telegram_id: int
+    full_name: str
+    old_price: int | None
+    new_price: int | None
+
+
+@dataclass
+class NewCustomer:
+    telegram_id: int
+    full_name: str
+    phone: str
+    address: str
+    price: int | None
+
+
+@dataclass
+class PricePlan:
+    """Результат порівняння бажаних цін з поточними."""
+    changes: list[PriceChange] = field(default_factory=list)
+    new_customers: list[NewCustomer] = field(default_factory=list)
+    unchanged: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def error(self, line: int, text: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"рядок {line}: {text}")
+        elif len(self.errors) == MAX_ERRORS:
+            self.errors.append("…")
+
+    def add(self, user: User, price: int | None) -> None:
+        if user.custom_price == price:
+            self.unchanged += 1
+        else:
+            self.changes.append(PriceChange(user.telegram_id, user.full_name, user.custom_price, price))
+
+
+def phone_key(phone: str) -> str:
+    """Останні 9 цифр: +380501234567, 0501234567 і 50 123 45 67 — один номер."""
+    return re.sub(r"\D", "", phone)[-9:]
+
+
+def parse_price(value: str) -> int | None:
+    value = value.strip()
+    if not value:
+        return None
+    price = int(value)
+    if price < 0:
+        raise ValueError(value)
+    return price or None
+
+
+def _decode(content: bytes) -> str:
+    try:
+        return content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return content.decode("cp1251")  # збереження з Excel у Windows
+
+
+def csv_rows(content: bytes) -> Iterator[list[str]]:
+    """Рядки CSV-файлу: кодування і роздільник визначаються за вмістом."""
+    text = _decode(content)
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(io.StringIO(text), dialect)
+
+
+def plan_from_csv(content: bytes, users: list[User]) -> PricePlan:
+    """План змін цін за вмістом CSV-файлу."""
+    reader = csv_rows(content)
+    header = [COLUMN_ALIASES.get(name.strip().lower()) for name in next(reader, [])]
+    if "price" not in header or not {"telegram_id", "phone"} & set(header):
+        raise ValueError("потрібні колонки price і telegram_id або phone")
+
+    by_telegram_id = {user.telegram_id: user for user in users}
+    by_phone = {key: user for user in users if (key := phone_key(user.phone))}
+    plan = PricePlan()
+    seen: set[int] = set()
+
+    for line, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        row = {column: value.strip() for column, value in zip(header, values) if column}
+        try:
+            price = parse_price(row.get("price", ""))
+        except ValueError:
+            plan.error(line, f"некоректна ціна «{row.get('price')}»")
+            continue
+        try:
+            telegram_id = int(row["telegram_id"]) if row.get("telegram_id") else None
+        except ValueError:
+            plan.error(line, f"некоректний telegram_id «{row['telegram_id']}»")
+            continue
+
+        user = by_telegram_id.get(telegram_id) if telegram_id else None
+        if user is None and phone_key(row.get("phone", "")):
+            user = by_phone.get(phone_key(row["phone"]))
+
+        if user is None:
+            if telegram_id and row.get("full_name") and row.get("phone") and row.get("address"):
+                if telegram_id not in seen:
+                    seen.add(telegram_id)
+                    plan.new_customers.append(NewCustomer(
+                        telegram_id, row["full_name"], row["phone"], row["address"], price,
+                    ))
+            else:
+                plan.error(line, "клієнта не знайдено")
+            continue
+        if user.telegram_id in seen:
+            plan.error(line, f"повторний запис для {user.full_name}")
+            continue
+        seen.add(user.telegram_id)
+        plan.add(user, price)
+    return plan
+
+
+def plan_for_segment(users: list[User], price: int | None) -> PricePlan:
+    """Одна ціна для всіх клієнтів сегмента."""
+    plan = PricePlan()
+    for user in users:
+        plan.add(user, price)
+    return plan
@@ -0,0 +1,120 @@
+"""Фабрики callback_data для інлайн-кнопок."""
+
+from enum import Enum
+
+from aiogram.filters.callback_data import CallbackData
+from pydantic import Field
+
+from database import WaterType
+
+
+class AdminAction(str, Enum):
+    """Дії адміністратора із замовленням."""
+    CONFIRM = "confirm"
+    DELIVER = "deliver"
+    COMPLETE = "complete"
+    CANCEL = "cancel"
+
+
+class CourierAction(str, Enum):
+    """Дії кур'єра зі своїм замовленням."""
+    DELIVER = "deliver"
+    COMPLETE = "complete"
+
+
+class StatsPeriod(str, Enum):
+    """Період статистики для адміна."""
+    TODAY = "today"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class ClientAction(str, Enum):
+    """Дії клієнта із замовленням."""
+    RECEIVED = "received"
+
+
+class SubscriptionAction(str, Enum):
+    """Дії клієнта з підпискою."""
+    SET = "set"
+    CANCEL = "cancel"
+
+
+class WaterCallback(CallbackData, prefix="water"):
+    """Вибір типу води."""
+    water_type: WaterType
+
+
+class QuantityCallback(CallbackData, prefix="qty", sep="_"):
+    """Вибір кількості пляшок (число або custom)."""
+    value: str
+
+
+class PaymentCallback(CallbackData, prefix="pay", sep="_"):
+    """Вибір способу оплати (індекс у config.payment_methods)."""
+    index: int
+
+
+# Формат admin_<дія>_<id> збережено, щоб кнопки у вже надісланих
+# повідомленнях продовжували працювати після оновлення бота.
+class AdminOrderCallback(CallbackData, prefix="admin", sep="_"):
+    """Дія адміністратора із замовленням."""
+    action: AdminAction
+    order_id: int
+
+
+class CourierOrderCallback(CallbackData, prefix="courier", sep="_"):
+    """Дія кур'єра із замовленням."""
+    action: CourierAction
+    order_id: int
+
+
+class SlotCallback(CallbackData, prefix="slot", sep="_"):
+    """Вибір слота доставки: день (РРРР-ММ-ДД) і година початку."""
+    day: str
+    hour: int
+
+
+class EmptiesCallback(CallbackData, prefix="empties", sep="_"):
+    """Скільки порожніх пляшок забрали при доставці замовлення."""
+    order_id: int
+    count: int = Field(ge=0)
+
+
+class ClientOrderCallback(CallbackData, prefix="client", sep="_"):
+    """Дія клієнта із замовленням."""
+    action: ClientAction
+    order_id: int
+
+
+class RateCallback(CallbackData, prefix="rate", sep="_"):
+    """Оцінка замовлення."""
+    order_id: int
+    rating: int = Field(ge=1, le=5)
+
+
+class SubscriptionCallback(CallbackData, prefix="sub"):
+    """Оформлення чи зміна інтервалу (днів) або скасування підписки."""
+    action: SubscriptionAction
+    days: int = 0
+
+
+class UsersPageCallback(CallbackData, prefix="users_page"):
+    """Сторінка списку користувачів."""
+    page: int
+
+
+class SetPriceCallback(CallbackData, prefix="setprice"):
+    """Вибір користувача для встановлення ціни."""
+    telegram_id: int
+
+
+class FindUsersCallback(CallbackData, prefix="find"):
+    """Сторінка результатів пошуку клієнтів (запит — нормалізовані слова)."""
+    page: int
+    query: str
+
+
+class StatsCallback(CallbackData, prefix="stats"):
+    """Період на екрані статистики."""
+    period: StatsPeriod
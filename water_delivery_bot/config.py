@@ -1,46 +1,328 @@
 """Конфігурація бота для доставки води."""
 
+import asyncio
+import logging
 import os
-from dataclasses import dataclass
-from dotenv import load_dotenv
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Callable, Mapping
 
-load_dotenv()
+from dotenv import dotenv_values
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+ENV_FILE = Path(__file__).parent / ".env"
+
+# Оточення процесу до читання .env і змінні, які взято з файлу
+_process_env = dict(os.environ)
+_env_file_values: dict[str, str] = {}
+
+
+def read_env_file(path: Path = ENV_FILE) -> dict[str, str]:
+    """Змінні з .env, яких немає в оточенні процесу: воно має пріоритет
+    (напр. Environment= у systemd) і при старті, і при перезавантаженні."""
+    return {
+        key: value for key, value in dotenv_values(path).items()
+        if value is not None and key not in _process_env
+    }
+
+
+def apply_env_file(values: dict[str, str]) -> None:
+    """Змінні з .env в os.environ.
+    
+    Ключ, якого з минулого читання не стало у файлі, прибирається — інакше
+    видалення рядка з .env не мало б ефекту до перезапуску.
+    """
+    for key in _env_file_values.keys() - values.keys():
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    _env_file_values.clear()
+    _env_file_values.update(values)
+
+
+apply_env_file(read_env_file())
+
+DEFAULT_PAYMENT_METHODS = (
+    "💵 Готівкою кур'єру",
+    "💳 Карткою кур'єру",
+    "🏦 Переказ на картку",
+)
+
+# Спосіб оплати, який звіряється з банківською випискою (/payments)
+DEFAULT_TRANSFER_PAYMENT_METHOD = "🏦 Переказ на картку"
+
+# Чат, куди дублюються нові замовлення
+DEFAULT_ORDERS_CHAT_ID = -1002682380858
+
+# Година розсилки нагадувань про повторне замовлення
+DEFAULT_REMINDER_HOUR = 10
+
+
+@dataclass(frozen=True)
+class Courier:
+    """Кур'єр: скільки пляшок везе одночасно і центр району, (широта, довгота)."""
+    
+    telegram_id: int
+    capacity: int
+    # None — без району, отримує замовлення з усього міста
+    zone: tuple[float, float] | None = None
+
+
+@dataclass(frozen=True)
 class Config:
-    """Налаштування застосунку."""
+    """Налаштування застосунку (незмінний знімок)."""
     
     bot_token: str
-    admin_ids: list[int]
+    admin_ids: tuple[int, ...]
     
     # Ціна за замовчуванням (для нових клієнтів без індивідуальної ціни)
     default_bottle_price: int = 150  # Ціна за пляшку 19л у гривнях
     
     # Способи оплати
-    payment_methods: list[str] = None
+    payment_methods: tuple[str, ...] = DEFAULT_PAYMENT_METHODS
+    
+    # Чат замовлень (None — не дублювати)
+    orders_chat_id: int | None = DEFAULT_ORDERS_CHAT_ID
+    
+    # Файл для запису оновлень (анонімізованих) для відтворення в бенчмарках
+    record_updates_path: str | None = None
+    
+    # Кількість процесів-обробників (1 — звичайний polling в одному процесі)
+    workers: int = 1
+    
+    # Скільки чекати на обробники при зупинці, с (systemd чекає 90 с)
+    shutdown_timeout: float = 25.0
+    
+    # Через скільки днів завершені й скасовані замовлення переносяться в архів (0 — ніколи)
+    archive_after_days: int = 90
+    
+    # Інтервал резервних копій БД, год (0 — лише вручну через /backup)
+    backup_interval_hours: int = 24
+    
+    # Година нагадувань про повторне замовлення за прогнозом (None — не надсилати)
+    reminder_hour: int | None = DEFAULT_REMINDER_HOUR
+    
+    # Склад, звідки виїжджають кур'єри: (широта, довгота); None — рейс від крайньої зупинки
+    depot_location: tuple[float, float] | None = None
+    
+    # Місткість машини на один рейс, пляшок
+    run_capacity: int = 60
+    
+    # Кур'єри, між якими розподіляються підтверджені замовлення (порожньо — лише адміни)
+    couriers: tuple[Courier, ...] = ()
+    
+    # Слоти доставки: (початок, кінець) у годинах; порожньо — без вибору часу
+    delivery_slots: tuple[tuple[int, int], ...] = ()
+    
+    # Скільки пляшок можна забронювати в одному слоті
+    slot_capacity: int = 60
+    
+    # На скільки днів наперед (включно з сьогодні) показуються слоти
+    slot_days: int = 3
+    
+    # Спосіб оплати переказом, що звіряється з випискою, і скільки після
+    # створення замовлення чекати переказ, год
+    transfer_payment_method: str = DEFAULT_TRANSFER_PAYMENT_METHOD
+    payment_window_hours: int = 72
     
     def __post_init__(self):
-        if self.payment_methods is None:
-            self.payment_methods = [
-                "💵 Готівкою кур'єру",
-                "💳 Карткою кур'єру",
-                "🏦 Переказ на картку",
-            ]
+        object.__setattr__(self, "admin_ids", tuple(self.admin_ids))
+        object.__setattr__(self, "couriers", tuple(self.couriers))
+        object.__setattr__(self, "delivery_slots", tuple(self.delivery_slots))
+        object.__setattr__(self, "payment_methods", tuple(self.payment_methods or DEFAULT_PAYMENT_METHODS))
+
+
+def parse_location(value: str) -> tuple[float, float]:
+    """Координати з рядка «широта,довгота»."""
+    try:
+        latitude, longitude = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError(f"Очікуються координати «широта,довгота», отримано: {value!r}") from None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"Координати поза межами: {value!r}")
+    return latitude, longitude
+
+
+def parse_couriers(value: str, default_capacity: int) -> tuple[Courier, ...]:
+    """Кур'єри з рядка «id[:місткість[:широта,довгота]]» через "|"."""
+    couriers = []
+    for item in value.split("|"):
+        if not item.strip():
+            continue
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) > 3:
+            raise ValueError(f"Очікується «id[:місткість[:широта,довгота]]», отримано: {item!r}")
+        try:
+            telegram_id = int(parts[0])
+            capacity = int(parts[1]) if len(parts) > 1 and parts[1] else default_capacity
+        except ValueError:
+            raise ValueError(f"Очікується «id[:місткість[:широта,довгота]]», отримано: {item!r}") from None
+        if capacity < 1:
+            raise ValueError(f"Місткість кур'єра має бути додатною: {item!r}")
+        zone = parse_location(parts[2]) if len(parts) > 2 and parts[2] else None
+        couriers.append(Courier(telegram_id, capacity, zone))
+    if len({courier.telegram_id for courier in couriers}) != len(couriers):
+        raise ValueError("Кур'єр указаний у COURIERS двічі")
+    return tuple(couriers)
+
 
+def parse_slots(value: str) -> tuple[tuple[int, int], ...]:
+    """Слоти доставки з рядка «9-12,12-15,15-18» (години, без перетинів)."""
+    slots = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        try:
+            start, end = (int(part) for part in item.split("-"))
+        except ValueError:
+            raise ValueError(f"Очікується слот «початок-кінець» у годинах, отримано: {item!r}") from None
+        if not 0 <= start < end <= 24:
+            raise ValueError(f"Слот поза межами доби: {item!r}")
+        slots.append((start, end))
+    slots.sort()
+    for (_, end), (start, _) in zip(slots, slots[1:]):
+        if start < end:
+            raise ValueError(f"Слоти доставки перетинаються: {value!r}")
+    return tuple(slots)
 
-def load_config() -> Config:
-    """Завантаження конфігурації зі змінних оточення."""
+
+def load_config(env: Mapping[str, str | None] | None = None) -> Config:
+    """Завантаження конфігурації зі змінних оточення (або з env)."""
+    env = os.environ if env is None else env
     
-    token = os.getenv("BOT_TOKEN")
+    token = env.get("BOT_TOKEN")
     if not token:
         raise ValueError("BOT_TOKEN не задано у змінних оточення")
     
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
+    admin_ids_str = env.get("ADMIN_IDS") or ""
     admin_ids = [int(x.strip()) for x in admin_ids_str.split(",") if x.strip()]
     
+    # Способи оплати через "|", бо в назвах можуть бути коми
+    payment_methods_str = env.get("PAYMENT_METHODS") or ""
+    payment_methods = [x.strip() for x in payment_methods_str.split("|") if x.strip()]
+    
+    # Порожнє значення або 0 вимикає дублювання в чат
+    orders_chat_id = env.get("ORDERS_CHAT_ID")
+    if orders_chat_id is None:
+        orders_chat_id = DEFAULT_ORDERS_CHAT_ID
+    else:
+        orders_chat_id = int(orders_chat_id) if orders_chat_id.strip() not in ("", "0") else None
+    
+    # Порожнє значення вимикає нагадування
+    reminder_hour = env.get("REMINDER_HOUR")
+    if reminder_hour is None:
+        reminder_hour = DEFAULT_REMINDER_HOUR
+    else:
+        reminder_hour = int(reminder_hour) % 24 if reminder_hour.strip() else None
+    
+    depot_location = env.get("DEPOT_LOCATION")
+    depot_location = parse_location(depot_location) if depot_location and depot_location.strip() else None
+    
+    run_capacity = max(1, int(env.get("RUN_CAPACITY") or 60))
+    
+    # Кур'єри через "|", бо координати району пишуться через кому
+    couriers = parse_couriers(env.get("COURIERS") or "", run_capacity)
+    
+    # Без TRANSFER_PAYMENT_METHOD — перший спосіб оплати з «🏦»
+    transfer_payment_method = (env.get("TRANSFER_PAYMENT_METHOD") or "").strip() or next(
+        (method for method in payment_methods if method.startswith("🏦")), DEFAULT_TRANSFER_PAYMENT_METHOD
+    )
+    
+    # За замовчуванням у слот вміщається стільки, скільки кур'єри везуть разом
+    slot_capacity = int(env.get("SLOT_CAPACITY") or sum(courier.capacity for courier in couriers) or run_capacity)
+    
     return Config(
         bot_token=token,
         admin_ids=admin_ids,
-        default_bottle_price=int(os.getenv("DEFAULT_BOTTLE_PRICE", 150)),
+        default_bottle_price=int(env.get("DEFAULT_BOTTLE_PRICE") or 150),
+        payment_methods=payment_methods,
+        orders_chat_id=orders_chat_id,
+        record_updates_path=env.get("RECORD_UPDATES") or None,
+        workers=max(1, int(env.get("WORKERS") or 1)),
+        shutdown_timeout=float(env.get("SHUTDOWN_TIMEOUT") or 25.0),
+        archive_after_days=max(0, int(env.get("ARCHIVE_AFTER_DAYS") or 90)),
+        backup_interval_hours=max(0, int(env.get("BACKUP_INTERVAL_HOURS") or 24)),
+        reminder_hour=reminder_hour,
+        depot_location=depot_location,
+        run_capacity=run_capacity,
+        couriers=couriers,
+        delivery_slots=parse_slots(env.get("DELIVERY_SLOTS") or ""),
+        slot_capacity=max(1, slot_capacity),
+        slot_days=max(1, int(env.get("SLOT_DAYS") or 3)),
+        transfer_payment_method=transfer_payment_method,
+        payment_window_hours=max(1, int(env.get("PAYMENT_WINDOW_HOURS") or 72)),
     )
+
+
+def reload_config() -> Config:
+    """Повторне читання .env і завантаження конфігурації.
+    
+    os.environ змінюється, лише якщо нова конфігурація пройшла перевірку.
+    """
+    values = read_env_file()
+    env = {key: value for key, value in os.environ.items() if key not in _env_file_values}
+    config = load_config({**env, **values})
+    apply_env_file(values)
+    return config
+
+
+class ConfigStore:
+    """Поточний знімок конфігурації з гарячим перезавантаженням.
+    
+    Кожне оновлення отримує знімок, актуальний на момент його надходження;
+    заміна знімка — одне присвоєння, тож обробники, що вже працюють,
+    дограють на старому.
+    """
+
+    def __init__(self, config: Config, loader: Callable[[], Config] | None = None):
+        self._config = config
+        self._loader = loader
+        self.version = 1
+
+    @property
+    def current(self) -> Config:
+        return self._config
+
+    def reload(self) -> list[str]:
+        """Перезавантаження; повертає список змінених полів."""
+        if self._loader is None:
+            raise ValueError("Джерело конфігурації не задано")
+        
+        old = self._config
+        new = self._loader()
+        
+        if new.bot_token != old.bot_token:
+            logger.warning("Зміна BOT_TOKEN потребує перезапуску, токен не змінено")
+            new = replace(new, bot_token=old.bot_token)
+        
+        changed = [f.name for f in fields(Config) if getattr(old, f.name) != getattr(new, f.name)]
+        self._config = new
+        self.version += 1
+        
+        logger.info(f"Конфігурацію перезавантажено (версія {self.version}), змінено: {changed or 'нічого'}")
+        return changed
+
+    def try_reload(self) -> list[str] | None:
+        """Перезавантаження без винятків: при помилці залишається старий знімок."""
+        try:
+            return self.reload()
+        except ValueError as e:
+            logger.error(f"Помилка перезавантаження конфігурації: {e}")
+            return None
+
+    async def watch(self, path: Path = ENV_FILE, interval: float = 5.0) -> None:
+        """Перезавантаження при зміні файлу (перевірка mtime)."""
+        def mtime() -> float | None:
+            try:
+                return path.stat().st_mtime
+            except OSError:
+                return None
+        
+        last = mtime()
+        while True:
+            await asyncio.sleep(interval)
+            current = mtime()
+            if current != last:
+                last = current
+                if current is not None:
+                    self.try_reload()
@@ -0,0 +1,362 @@
+"""Розподіл підтверджених замовлень між кур'єрами.
+
+Кур'єр (COURIERS) має місткість — скільки пляшок везе одночасно — і, за
+бажанням, район: центр зони доставки. Підтверджене замовлення отримує
+найменш завантажений (за часткою місткості) кур'єр району, найближчого
+до клієнта, якщо в нього є місце; інакше — найменш завантажений з усіх,
+у кого воно є. Коли місця немає ні в кого, замовлення чекає в черзі й
+передається першому, хто звільниться. Замовлення, більше за місткість,
+дістається кур'єру з порожньою машиною (він зробить кілька рейсів).
+
+Завантаження тримає CourierPool: купа (heapq) на кожен район і одна
+спільна, ключ — (частка місткості, пляшок, id кур'єра), і ще одна купа
+за вільним місцем, щоб у пік без перебору з'ясувати, що місця немає ні в
+кого. Перехід статусу змінює завантаження одного кур'єра і додає в його
+купи новий запис; старий стає застарілим і відкидається при читанні, як у
+планувальнику підписок. Вибір кур'єра коштує O(log n) замість перерахунку
+завантаження всіх кур'єрів за активними замовленнями, а після звільнення
+місця чергу перевіряє лише той кур'єр, що його звільнив. Пляшки рахуються від
+призначення до виконання чи скасування: відправлене замовлення ще в машині.
+
+Сповіщення про замовлення отримує лише кур'єр, якому його передано, а не
+всі кур'єри й адміни. Пул належить процесу, як і індекс активних
+замовлень: з кількома процесами-обробниками він будується з БД щоразу.
+"""
+
+import heapq
+import logging
+from dataclasses import dataclass, replace
+from html import escape
+from typing import Sequence
+
+from aiogram import Bot
+from aiogram.types import LinkPreviewOptions
+
+import database
+from config import Config, Courier
+from database import Order, OrderStatus, User, WATER_TYPE_NAMES
+from keyboards import courier_order_keyboard
+from route_planner import Stop, distance_km, plan_run
+from slots import slot_label
+
+logger = logging.getLogger(__name__)
+
+Location = tuple[float, float]
+
+# Купа перебудовується, коли застарілих записів стає більше, ніж
+# COMPACT_FACTOR на кур'єра (плюс COMPACT_MIN)
+COMPACT_FACTOR = 4
+COMPACT_MIN = 64
+
+
+@dataclass
+class CourierLoad:
+    """Поточне завантаження кур'єра."""
+    courier: Courier
+    bottles: int = 0
+    orders: int = 0
+    # Лічильник змін: запис у купі з іншою версією застарів
+    version: int = 0
+
+    @property
+    def free(self) -> int:
+        return self.courier.capacity - self.bottles
+
+    def fits(self, bottles: int) -> bool:
+        return self.free >= min(bottles, self.courier.capacity)
+
+    def key(self) -> tuple[float, int, int, int]:
+        return self.bottles / self.courier.capacity, self.bottles, self.courier.telegram_id, self.version
+
+
+class CourierPool:
+    """Завантаження кур'єрів однієї БД і черга замовлень, що чекають на місце."""
+
+    def __init__(self, couriers: Sequence[Courier]):
+        self.couriers = tuple(couriers)
+        self._loads = {courier.telegram_id: CourierLoad(courier) for courier in self.couriers}
+        self._everyone: list[tuple[float, int, int, int]] = []
+        self._zones: dict[Location, list[tuple[float, int, int, int]]] = {
+            courier.zone: [] for courier in self.couriers if courier.zone is not None
+        }
+        # (−вільне місце, id кур'єра, версія)
+        self._roomiest: list[tuple[int, int, int]] = []
+        self._smallest = min((courier.capacity for courier in self.couriers), default=0)
+        self._rebuild()
+        # id замовлення → (кур'єр, пляшок)
+        self._assigned: dict[int, tuple[int, int]] = {}
+        # id замовлення → (пляшок, район клієнта) у порядку підтвердження
+        self._waiting: dict[int, tuple[int, Location | None]] = {}
+
+    def __contains__(self, courier_id: int | None) -> bool:
+        return courier_id in self._loads
+
+    def load(self, courier_id: int) -> CourierLoad | None:
+        return self._loads.get(courier_id)
+
+    def loads(self) -> list[CourierLoad]:
+        return list(self._loads.values())
+
+    def courier_of(self, order_id: int) -> int | None:
+        entry = self._assigned.get(order_id)
+        return entry[0] if entry else None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _rebuild(self) -> None:
+        """Купи лише з актуальних записів."""
+        self._everyone = [load.key() for load in self._loads.values()]
+        heapq.heapify(self._everyone)
+        self._roomiest = [(-load.free, courier_id, load.version) for courier_id, load in self._loads.items()]
+        heapq.heapify(self._roomiest)
+        for zone in self._zones:
+            self._zones[zone] = [load.key() for load in self._loads.values() if load.courier.zone == zone]
+            heapq.heapify(self._zones[zone])
+
+    def _change(self, courier_id: int, bottles: int, orders: int) -> None:
+        load = self._loads[courier_id]
+        load.bottles += bottles
+        load.orders += orders
+        load.version += 1
+        if len(self._everyone) > COMPACT_FACTOR * len(self._loads) + COMPACT_MIN:
+            self._rebuild()
+            return
+        key = load.key()
+        heapq.heappush(self._everyone, key)
+        heapq.heappush(self._roomiest, (-load.free, courier_id, load.version))
+        if load.courier.zone is not None:
+            heapq.heappush(self._zones[load.courier.zone], key)
+
+    def _most_free(self) -> int:
+        """Найбільше вільне місце серед кур'єрів."""
+        while self._roomiest:
+            free, courier_id, version = self._roomiest[0]
+            if version == self._loads[courier_id].version:
+                return -free
+            heapq.heappop(self._roomiest)
+        return 0
+
+    def _least_loaded(self, heap: list, bottles: int) -> int | None:
+        """Найменш завантажений кур'єр купи, якому вистачає місця."""
+        full = []
+        found = None
+        while heap:
+            _, _, courier_id, version = heap[0]
+            load = self._loads[courier_id]
+            if version != load.version:
+                heapq.heappop(heap)
+            elif load.fits(bottles):
+                found = courier_id
+                break
+            else:
+                full.append(heapq.heappop(heap))
+        for entry in full:
+            heapq.heappush(heap, entry)
+        return found
+
+    def zone_of(self, location: Location | None) -> Location | None:
+        """Центр найближчого до клієнта району (None — без геолокації чи районів)."""
+        if location is None or not self._zones:
+            return None
+        return min(self._zones, key=lambda center: distance_km(center, location))
+
+    def choose(self, bottles: int, zone: Location | None = None) -> int | None:
+        """Кур'єр для замовлення: спершу з району zone, потім будь-який."""
+        # Кожному потрібно min(bottles, місткість) ≥ min(bottles, найменша місткість)
+        if min(bottles, self._smallest) > self._most_free():
+            return None
+        if zone is not None:
+            courier_id = self._least_loaded(self._zones[zone], bottles)
+            if courier_id is not None:
+                return courier_id
+        return self._least_loaded(self._everyone, bottles)
+
+    def restore(self, order_id: int, courier_id: int, bottles: int) -> None:
+        """Замовлення, передане кур'єру."""
+        self._waiting.pop(order_id, None)
+        self._assigned[order_id] = (courier_id, bottles)
+        self._change(courier_id, bottles, 1)
+
+    def release(self, order_id: int) -> int | None:
+        """Замовлення виконане чи скасоване; повертає кур'єра, що його мав."""
+        self._waiting.pop(order_id, None)
+        entry = self._assigned.pop(order_id, None)
+        if entry is None:
+            return None
+        courier_id, bottles = entry
+        self._change(courier_id, -bottles, -1)
+        return courier_id
+
+    def _refill(self, courier_id: int) -> list[tuple[int, int]]:
+        """Черга після звільнення місця в courier_id.
+
+        Замовлення в черзі не вміщались ні до кого, а змінилось лише
+        завантаження courier_id, тож перевіряти інших кур'єрів не потрібно.
+        """
+        load = self._loads[courier_id]
+        assignments = []
+        for order_id, (bottles, _) in list(self._waiting.items()):
+            if load.free <= 0:
+                break
+            if load.fits(bottles):
+                self.restore(order_id, courier_id, bottles)
+                assignments.append((order_id, courier_id))
+        return assignments
+
+    def transition(self, order_id: int, bottles: int, location: Location | None,
+                   status: OrderStatus) -> list[tuple[int, int]]:
+        """Зміна статусу замовлення; повертає нові призначення (замовлення, кур'єр)."""
+        if status == OrderStatus.CONFIRMED:
+            if order_id in self._assigned or order_id in self._waiting:
+                return []
+            zone = self.zone_of(location)
+            courier_id = self.choose(bottles, zone)
+            if courier_id is None:
+                self._waiting[order_id] = (bottles, zone)
+                return []
+            self.restore(order_id, courier_id, bottles)
+            return [(order_id, courier_id)]
+
+        if status == OrderStatus.DELIVERING:
+            # Відправлене без кур'єра (адміном) більше не чекає
+            self._waiting.pop(order_id, None)
+            return []
+
+        courier_id = self.release(order_id)
+        return self._refill(courier_id) if courier_id is not None else []
+
+
+# Пули за шляхом БД (у багатоорендному режимі — по одному на орендаря)
+_pools: dict[str, CourierPool] = {}
+
+
+async def courier_pool(config: Config) -> tuple[CourierPool, list[tuple[int, int]]]:
+    """Пул поточної БД і призначення, зроблені під час його побудови.
+
+    Пул будується з активних замовлень при першому зверненні і після зміни
+    COURIERS: підтверджені замовлення без кур'єра (або кур'єра, якого
+    більше немає) розподіляються заново, призначення зберігаються в БД.
+    """
+    key = str(database.current_database())
+    pool = _pools.get(key)
+    if pool is not None and pool.couriers == config.couriers:
+        return pool, []
+
+    pool = CourierPool(config.couriers)
+    unassigned = []
+    for order, user in await database.get_all_pending_orders():
+        if order.status == OrderStatus.PENDING:
+            continue
+        if order.courier_id in pool:
+            pool.restore(order.id, order.courier_id, order.quantity)
+        elif order.status == OrderStatus.CONFIRMED:
+            unassigned.append((order, user))
+    assignments = [
+        assignment for order, user in unassigned
+        for assignment in pool.transition(order.id, order.quantity, user.location, OrderStatus.CONFIRMED)
+    ]
+    if database.active_orders() is not None:
+        _pools[key] = pool
+    for order_id, courier_id in assignments:
+        await database.assign_courier(order_id, courier_id)
+    return pool, assignments
+
+
+def courier_order_text(order: Order, user: User, held: int | None = None) -> str:
+    """Картка замовлення для кур'єра; held — тара у клієнта, яку можна забрати."""
+    text = (
+        f"🚚 <b>Замовлення #{order.id}</b>\n\n"
+        f"👤 {escape(user.full_name)}\n"
+        f"📱 {escape(user.phone)}\n"
+        f"📍 {escape(user.address)}\n"
+    )
+    if user.location is not None:
+        latitude, longitude = user.location
+        text += f"🗺 <a href=\"https://maps.google.com/?q={latitude:.6f},{longitude:.6f}\">На карті</a>\n"
+    text += (
+        f"\n💧 {WATER_TYPE_NAMES[order.water_type]}\n"
+        f"📦 {order.quantity} пл.\n"
+        f"💵 {order.total_price} ₴\n"
+        f"💳 {escape(order.payment_method)}\n"
+    )
+    if order.delivery_slot:
+        text += f"🕐 {slot_label(order.delivery_slot)}\n"
+    if held:
+        text += f"♻️ Тара у клієнта: {held} пл.\n"
+    text += f"💬 {escape(order.comment or 'без коментаря')}"
+    return text
+
+
+def delivery_order(orders: list[tuple[Order, User]], depot: Location | None) -> list[tuple[Order, User]]:
+    """Замовлення кур'єра за слотами доставки (без слота — в кінці), у межах
+    слота — в порядку об'їзду; без геолокації — в кінці слота, за часом створення."""
+    by_slot: dict[str | None, list[tuple[Order, User]]] = {}
+    for order, user in orders:
+        by_slot.setdefault(order.delivery_slot, []).append((order, user))
+    ordered = []
+    for slot in sorted(by_slot, key=lambda slot: (slot is None, slot or "")):
+        group = by_slot[slot]
+        stops = [Stop(order, user, user.location) for order, user in group if user.location is not None]
+        run = plan_run(stops, depot)
+        ordered += [(stop.order, stop.user) for stop in run.stops]
+        ordered += [(order, user) for order, user in group if user.location is None]
+    return ordered
+
+
+async def send_to_courier(bot: Bot, courier_id: int, order: Order, user: User) -> None:
+    balance = await database.get_bottle_balance(user.id)
+    try:
+        await bot.send_message(
+            courier_id,
+            courier_order_text(order, user, balance.held),
+            reply_markup=courier_order_keyboard(order.id, order.status),
+            link_preview_options=LinkPreviewOptions(is_disabled=True),
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.error(f"Помилка відправки замовлення #{order.id} кур'єру {courier_id}: {e}")
+    logger.info(f"Замовлення #{order.id} передано кур'єру {courier_id}")
+
+
+async def current_pool(bot: Bot, config: Config) -> CourierPool:
+    """Пул поточної БД; замовлення, розподілені під час його побудови, надсилаються кур'єрам."""
+    pool, assignments = await courier_pool(config)
+    for order_id, courier_id in assignments:
+        entry = await database.get_order_with_user(order_id)
+        if entry is not None:
+            await send_to_courier(bot, courier_id, *entry)
+    return pool
+
+
+async def dispatch(bot: Bot, config: Config, order: Order, user: User, status: OrderStatus) -> int | None:
+    """Перерозподіл після зміни статусу order на status; повертає кур'єра замовлення.
+
+    Нові призначення зберігаються в БД, і кожне отримує лише його кур'єр;
+    про скасування дізнається лише кур'єр, що віз замовлення.
+    """
+    if not config.couriers:
+        return None
+    pool = await current_pool(bot, config)
+    previous = pool.courier_of(order.id)
+
+    for order_id, courier_id in pool.transition(order.id, order.quantity, user.location, status):
+        await database.assign_courier(order_id, courier_id)
+        if order_id == order.id:
+            entry = replace(order, status=status, courier_id=courier_id), user
+        else:
+            entry = await database.get_order_with_user(order_id)
+        if entry is not None:
+            await send_to_courier(bot, courier_id, *entry)
+
+    if status == OrderStatus.CANCELLED and previous is not None:
+        try:
+            await bot.send_message(
+                previous,
+                f"❌ <b>Замовлення #{order.id} скасовано</b> — везти не потрібно.",
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.error(f"Помилка сповіщення кур'єра {previous}: {e}")
+    return pool.courier_of(order.id)
@@ -1,9 +1,16 @@
 """Модуль роботи з базою даних SQLite."""
 
 import aiosqlite
-from datetime import datetime
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
 from pathlib import Path
-from dataclasses import dataclass
+from typing import AsyncIterator
+from dataclasses import astuple, dataclass, fields, replace
 from enum import Enum
 
 
@@ -22,11 +29,34 @@ class WaterType(Enum):
     EFFECT_COFFEE = "effect_coffee"
 
 
+class BottleEntry(Enum):
+    """Запис журналу тари."""
+    DELIVERY = "delivery"      # привезли повні пляшки (виконане замовлення)
+    PICKUP = "pickup"          # забрали порожні
+    ADJUSTMENT = "adjustment"  # виправлення адміном (початковий залишок тощо)
+
+
+class EventSource(Enum):
+    """Хто змінив статус замовлення."""
+    CLIENT = "client"
+    ADMIN = "admin"
+    SYSTEM = "system"
+    COURIER = "courier"
+    MIGRATION = "migration"
+
+
 WATER_TYPE_NAMES = {
     WaterType.EFFECT: "💧 Вода Ефект 19л",
     WaterType.EFFECT_COFFEE: "☕ Вода Ефект для кави 19л",
 }
 
+# Інтервали підписки, днів: кратні тижню, тож день тижня доставки не зсувається
+SUBSCRIPTION_INTERVAL_NAMES = {
+    7: "щотижня",
+    14: "раз на 2 тижні",
+    28: "раз на 4 тижні",
+}
+
 
 @dataclass
 class User:
@@ -38,6 +68,15 @@ class User:
     address: str
     created_at: datetime
     custom_price: int | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    
+    @property
+    def location(self) -> tuple[float, float] | None:
+        """(широта, довгота), якщо клієнт надіслав геолокацію."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
 
 
 @dataclass
@@ -57,10 +96,158 @@ class Order:
     completed_at: datetime | None = None
     rating: int | None = None
     feedback: str | None = None
+    # Telegram id кур'єра, якому передано замовлення
+    courier_id: int | None = None
+    # Обраний слот доставки, ключ виду «2026-10-20 09:00-12:00»
+    delivery_slot: str | None = None
+    # Час надходження переказу за банківською випискою (payments.py)
+    paid_at: datetime | None = None
+
+
+@dataclass
+class OrderStats:
+    """Зведена статистика замовлень (рядок order_stats або їх сума)."""
+    orders: int = 0
+    cancelled: int = 0
+    completed: int = 0
+    bottles: int = 0
+    revenue: int = 0
+    rated: int = 0
+    rating_sum: int = 0
+    confirmed: int = 0
+    confirm_seconds: float = 0.0
+    delivered: int = 0
+    delivery_seconds: float = 0.0
+    
+    def add(self, other: "OrderStats") -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+    
+    @property
+    def avg_rating(self) -> float | None:
+        return self.rating_sum / self.rated if self.rated else None
+    
+    @property
+    def avg_confirm_seconds(self) -> float | None:
+        return self.confirm_seconds / self.confirmed if self.confirmed else None
+    
+    @property
+    def avg_delivery_seconds(self) -> float | None:
+        return self.delivery_seconds / self.delivered if self.delivered else None
+
+
+STATS_COLUMNS = tuple(field.name for field in fields(OrderStats))
+
+
+@dataclass
+class OrderEvent:
+    """Запис журналу змін статусу замовлення."""
+    id: int
+    order_id: int
+    status: OrderStatus
+    actor_id: int | None
+    source: EventSource
+    created_at: datetime
+
+
+@dataclass
+class Subscription:
+    """Регулярне замовлення клієнта (одне на клієнта); next_run — місцевий час."""
+    id: int
+    user_id: int
+    water_type: WaterType
+    quantity: int
+    payment_method: str
+    interval_days: int
+    next_run: datetime
+    comment: str | None = None
+
+
+@dataclass(frozen=True)
+class OrderTemplate:
+    """Що клієнт замовив востаннє — для «🔁 Повторити замовлення»."""
+    water_type: WaterType
+    quantity: int
+    payment_method: str
+    comment: str | None = None
+    
+    @classmethod
+    def from_order(cls, order: "Order") -> "OrderTemplate":
+        return cls(order.water_type, order.quantity, order.payment_method, order.comment)
+
+
+@dataclass
+class BottleBalance:
+    """Підсумок журналу тари клієнта (рядок bottle_balances)."""
+    user_id: int
+    delivered: int = 0
+    returned: int = 0
+    
+    @property
+    def held(self) -> int:
+        """Скільки пляшок зараз у клієнта."""
+        return self.delivered - self.returned
+
+
+@dataclass
+class OrderForecast:
+    """Прогноз споживання клієнта за історією замовлень; час — місцевий."""
+    user_id: int
+    orders: int
+    daily_bottles: float
+    last_order_at: datetime
+    next_order_at: datetime
 
 
 DATABASE_PATH = Path(__file__).parent / "data" / "water_delivery.db"
 
+# Версія схеми в PRAGMA user_version; збільшувати при кожній зміні
+# таблиць чи міграцій, інакше init_db пропустить їх на наявних БД
+SCHEMA_VERSION = 13
+
+# Як часто таблиця бронювань слотів у пам'яті перечитується з БД, с: з
+# кількома процесами-обробниками так підтягуються бронювання інших процесів
+SLOT_BOOKINGS_TTL = 30.0
+
+# Рядків за одне звернення до потоку aiosqlite при потоковому читанні
+# (за замовчуванням курсор забирає по одному)
+FETCH_BATCH = 1000
+
+# Ідентифікаторів переказів в одному запиті IN (межа параметрів SQLite)
+REFS_BATCH = 500
+
+# Скільки клієнтів тримає кеш шаблонів останніх замовлень кожної БД
+LAST_ORDER_CACHE_SIZE = 10000
+
+# Скільки чекати на блокування запису (с): з кількома процесами-обробниками
+# запис у SQLite стає в чергу, і стандартних 5 с під піковим навантаженням мало
+BUSY_TIMEOUT = 30.0
+
+
+# БД поточного орендаря (бренду) у багатоорендному режимі; задається
+# на час обробки оновлення, інакше використовується DATABASE_PATH
+_tenant_database: ContextVar[str | Path | None] = ContextVar("tenant_database", default=None)
+
+
+def current_database() -> str | Path:
+    """Шлях до БД, з якою працює поточне оновлення."""
+    return _tenant_database.get() or DATABASE_PATH
+
+
+def use_database(path: str | Path | None):
+    """Прив'язка БД до поточного контексту; повертає токен для reset_database."""
+    return _tenant_database.set(path)
+
+
+def reset_database(token) -> None:
+    _tenant_database.reset(token)
+
+
+def _connect() -> aiosqlite.Connection:
+    """Підключення до БД (шлях до файлу або URI виду file:...)."""
+    database = str(current_database())
+    return aiosqlite.connect(database, uri=database.startswith("file:"), timeout=BUSY_TIMEOUT)
+
 
 def _safe_get(row, key, default=None):
     """Безпечне отримання значення з Row."""
@@ -76,6 +263,7 @@ def _parse_order(row) -> Order:
     confirmed_at_str = _safe_get(row, "confirmed_at")
     delivered_at_str = _safe_get(row, "delivered_at")
     completed_at_str = _safe_get(row, "completed_at")
+    paid_at_str = _safe_get(row, "paid_at")
     
     return Order(
         id=row["id"],
@@ -92,6 +280,9 @@ def _parse_order(row) -> Order:
         completed_at=datetime.fromisoformat(completed_at_str) if completed_at_str else None,
         rating=_safe_get(row, "rating"),
         feedback=_safe_get(row, "feedback"),
+        courier_id=_safe_get(row, "courier_id"),
+        delivery_slot=_safe_get(row, "delivery_slot"),
+        paid_at=datetime.fromisoformat(paid_at_str) if paid_at_str else None,
     )
 
 
@@ -105,14 +296,99 @@ def _parse_user(row) -> User:
         address=row["address"],
         created_at=datetime.fromisoformat(row["created_at"]),
         custom_price=_safe_get(row, "custom_price"),
+        latitude=_safe_get(row, "latitude"),
+        longitude=_safe_get(row, "longitude"),
     )
 
 
+def _parse_order_with_user(row) -> tuple[Order, User]:
+    """Парсинг рядка _ORDER_WITH_USER в пару (Order, User)."""
+    user = User(
+        id=row["user_id"],
+        telegram_id=row["u_telegram_id"],
+        full_name=row["u_full_name"],
+        phone=row["u_phone"],
+        address=row["u_address"],
+        created_at=datetime.fromisoformat(row["u_created_at"]),
+        custom_price=row["u_custom_price"],
+        latitude=row["u_latitude"],
+        longitude=row["u_longitude"],
+    )
+    return _parse_order(row), user
+
+
+# Колонки замовлення в явному порядку: у старих БД частину додано через
+# ALTER TABLE, тож порядок колонок orders і orders_archive може різнитися
+_ORDER_COLUMNS = """id, user_id, water_type, quantity, total_price, payment_method, status, comment,
+                    confirmed_at, delivered_at, completed_at, rating, feedback, courier_id, delivery_slot,
+                    paid_at, payment_ref, created_at"""
+
+# Поточні й архівні замовлення разом. SQLite розгортає підзапит, тож
+# вибірка з ORDER BY за індексованою колонкою зливає дві таблиці потоком
+_ALL_ORDERS = f"""(SELECT {_ORDER_COLUMNS} FROM orders
+                   UNION ALL
+                   SELECT {_ORDER_COLUMNS} FROM orders_archive)"""
+
+_SELECT_ORDER_WITH_USER = """SELECT o.*, u.telegram_id as u_telegram_id, u.full_name as u_full_name,
+                             u.phone as u_phone, u.address as u_address,
+                             u.custom_price as u_custom_price, u.created_at as u_created_at,
+                             u.latitude as u_latitude, u.longitude as u_longitude"""
+
+_ORDER_WITH_USER = f"""{_SELECT_ORDER_WITH_USER}
+                      FROM orders o
+                      JOIN users u ON o.user_id = u.id"""
+
+_ARCHIVED_ORDER_WITH_USER = f"""{_SELECT_ORDER_WITH_USER}
+                               FROM orders_archive o
+                               JOIN users u ON o.user_id = u.id"""
+
+
+async def _fetch_order_with_user(db: aiosqlite.Connection, order_id: int) -> tuple[Order, User] | None:
+    db.row_factory = aiosqlite.Row
+    for query in (_ORDER_WITH_USER, _ARCHIVED_ORDER_WITH_USER):
+        cursor = await db.execute(f"{query} WHERE o.id = ?", (order_id,))
+        row = await cursor.fetchone()
+        if row:
+            return _parse_order_with_user(row)
+    return None
+
+
+async def _fetch_active_orders(db: aiosqlite.Connection) -> list[tuple[Order, User]]:
+    db.row_factory = aiosqlite.Row
+    cursor = await db.execute(
+        f"""{_ORDER_WITH_USER}
+            WHERE o.status IN ('pending', 'confirmed', 'delivering')
+            ORDER BY o.created_at ASC, o.id ASC"""
+    )
+    return [_parse_order_with_user(row) for row in await cursor.fetchall()]
+
+
 async def init_db():
     """Ініціалізація бази даних."""
-    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    path = current_database()
+    if isinstance(path, Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        # Схема актуальна — CREATE/ALTER не потрібні (режим WAL теж
+        # зберігається у файлі), запуск не чекає на запис у БД
+        cursor = await db.execute("PRAGMA user_version")
+        (version,) = await cursor.fetchone()
+        if version == SCHEMA_VERSION:
+            return
+        
+        # Нова БД: вільні після архівування сторінки повертаються файловій
+        # системі частинами (compact_database). Для наявної БД режим
+        # змінюється лише повним VACUUM — див. python -m archive --vacuum.
+        # Має йти до WAL, інакше заголовок файлу вже записаний
+        if version == 0:
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
+        # WAL: читачі не блокують запис, тож кілька процесів-обробників
+        # можуть працювати з одним файлом БД. Режим зберігається у файлі.
+        if isinstance(path, Path):
+            await db.execute("PRAGMA journal_mode=WAL")
+        
         await db.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -140,11 +416,181 @@ async def init_db():
                 completed_at TIMESTAMP,
                 rating INTEGER,
                 feedback TEXT,
+                courier_id INTEGER,
+                delivery_slot TEXT,
+                paid_at TIMESTAMP,
+                payment_ref TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
         
+        # Статистика: підсумки за днями й годинами (за часом створення
+        # замовлення) для кожного типу води і способу оплати
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS order_stats (
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                water_type TEXT NOT NULL,
+                payment_method TEXT NOT NULL,
+                orders INTEGER NOT NULL DEFAULT 0,
+                cancelled INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0,
+                bottles INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                rated INTEGER NOT NULL DEFAULT 0,
+                rating_sum INTEGER NOT NULL DEFAULT 0,
+                confirmed INTEGER NOT NULL DEFAULT 0,
+                confirm_seconds REAL NOT NULL DEFAULT 0,
+                delivered INTEGER NOT NULL DEFAULT 0,
+                delivery_seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (period, bucket, water_type, payment_method)
+            ) WITHOUT ROWID
+        """)
+        
+        # Журнал змін статусу: лише дописування, час — місцевий
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS order_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                actor_id INTEGER,
+                source TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (order_id) REFERENCES orders (id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_order_events_order ON order_events (order_id, id)"
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_order_events_time ON order_events (created_at)"
+        )
+        
+        # Вибірки замовлень за періодом (експорт)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)"
+        )
+        
+        # Замовлення клієнта (історія, перевірка нових перед нагадуванням)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, created_at)"
+        )
+        
+        # Архів завершених і скасованих замовлень (archive.py); id ті самі, що в orders
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS orders_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                water_type TEXT DEFAULT 'effect',
+                quantity INTEGER NOT NULL,
+                total_price INTEGER NOT NULL,
+                payment_method TEXT NOT NULL,
+                status TEXT NOT NULL,
+                comment TEXT,
+                confirmed_at TIMESTAMP,
+                delivered_at TIMESTAMP,
+                completed_at TIMESTAMP,
+                rating INTEGER,
+                feedback TEXT,
+                courier_id INTEGER,
+                delivery_slot TEXT,
+                paid_at TIMESTAMP,
+                payment_ref TEXT,
+                created_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_archive_created ON orders_archive (created_at)"
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_archive_user ON orders_archive (user_id, created_at)"
+        )
+        
+        # Підписки: планувальник читає найближчі запуски за індексом next_run
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER UNIQUE NOT NULL,
+                water_type TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                payment_method TEXT NOT NULL,
+                comment TEXT,
+                interval_days INTEGER NOT NULL,
+                next_run TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_subscriptions_next_run ON subscriptions (next_run)"
+        )
+        
+        # Прогнози повторних замовлень (reminders.py); час — UTC, як created_at
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS order_forecasts (
+                user_id INTEGER PRIMARY KEY,
+                orders INTEGER NOT NULL,
+                daily_bottles REAL NOT NULL,
+                last_order_at TIMESTAMP NOT NULL,
+                next_order_at TIMESTAMP NOT NULL,
+                computed_at TIMESTAMP NOT NULL,
+                reminded_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_order_forecasts_next ON order_forecasts (next_order_at)"
+        )
+        
+        # Заброньовані пляшки за слотами доставки: змінюються в тій самій
+        # транзакції, що й замовлення (скасоване місця не займає)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS delivery_slots (
+                slot TEXT PRIMARY KEY,
+                bottles INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        
+        # Журнал тари: лише дописування; по одному запису доставки й повернення
+        # на замовлення, час — місцевий
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS bottle_ledger (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                order_id INTEGER,
+                kind TEXT NOT NULL,
+                delivered INTEGER NOT NULL DEFAULT 0,
+                returned INTEGER NOT NULL DEFAULT 0,
+                actor_id INTEGER,
+                source TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
+        await db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_bottle_ledger_order ON bottle_ledger (order_id, kind) "
+            "WHERE order_id IS NOT NULL"
+        )
+        # Покривний: звірка підсумовує журнал за клієнтами, не читаючи таблицю
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bottle_ledger_user ON bottle_ledger (user_id, delivered, returned)"
+        )
+        
+        # Баланс тари клієнта: змінюється в тій самій транзакції, що й журнал
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS bottle_balances (
+                user_id INTEGER PRIMARY KEY,
+                delivered INTEGER NOT NULL DEFAULT 0,
+                returned INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        
+        # Повнотекстовий пошук клієнтів; індекс оновлюють тригери
+        await db.execute(_CREATE_USERS_FTS)
+        for trigger in _USERS_FTS_TRIGGERS:
+            await db.execute(trigger)
+        
         # Міграції: додаємо нові колонки якщо їх немає
         migrations = [
             "ALTER TABLE users ADD COLUMN custom_price INTEGER",
@@ -154,6 +600,16 @@ async def init_db():
             "ALTER TABLE orders ADD COLUMN completed_at TIMESTAMP",
             "ALTER TABLE orders ADD COLUMN rating INTEGER",
             "ALTER TABLE orders ADD COLUMN feedback TEXT",
+            "ALTER TABLE users ADD COLUMN latitude REAL",
+            "ALTER TABLE users ADD COLUMN longitude REAL",
+            "ALTER TABLE orders ADD COLUMN courier_id INTEGER",
+            "ALTER TABLE orders_archive ADD COLUMN courier_id INTEGER",
+            "ALTER TABLE orders ADD COLUMN delivery_slot TEXT",
+            "ALTER TABLE orders_archive ADD COLUMN delivery_slot TEXT",
+            "ALTER TABLE orders ADD COLUMN paid_at TIMESTAMP",
+            "ALTER TABLE orders ADD COLUMN payment_ref TEXT",
+            "ALTER TABLE orders_archive ADD COLUMN paid_at TIMESTAMP",
+            "ALTER TABLE orders_archive ADD COLUMN payment_ref TEXT",
         ]
         
         for migration in migrations:
@@ -162,12 +618,392 @@ async def init_db():
             except Exception:
                 pass  # Колонка вже існує
         
+        # Черга кур'єра без індексу активних замовлень (кілька процесів)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_courier ON orders (courier_id, status)"
+        )
+        
+        # Звірка переказів: неоплачені замовлення за способом оплати одразу в
+        # порядку (сума, час), а один переказ не може оплатити два замовлення
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_unpaid ON orders (payment_method, total_price, created_at) "
+            "WHERE paid_at IS NULL"
+        )
+        await db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_payment_ref ON orders (payment_ref) "
+            "WHERE payment_ref IS NOT NULL"
+        )
+        
+        # Статистика з'явилась у версії 2 — заповнюємо з наявних замовлень
+        if version < 2:
+            await _rebuild_order_stats(db)
+        
+        # Журнал з'явився у версії 3 — відновлюємо події з міток часу замовлень
+        if version < 3:
+            await _backfill_order_events(db)
+        
+        # Пошук з'явився у версії 5 — індексуємо наявних клієнтів
+        if version < 5:
+            await db.execute(
+                f"INSERT INTO users_fts (rowid, full_name, phone, address) "
+                f"SELECT id, full_name, {_fts_phone('users')}, address FROM users"
+            )
+        
+        await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        await db.commit()
+
+
+async def checkpoint() -> None:
+    """Перенесення WAL у файл БД перед зупинкою (журнал обрізається до нуля)."""
+    async with _connect() as db:
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# Активні (ще не виконані й не скасовані) замовлення
+ACTIVE_STATUSES = (OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.DELIVERING)
+
+
+class ActiveOrderIndex:
+    """Активні замовлення однієї БД у пам'яті: за id і за статусом.
+    
+    Завантажується один раз (load_active_orders), далі його оновлюють
+    функції цього модуля одразу після коміту, тож читання не йдуть у БД.
+    Індекс належить процесу: з кількома процесами-обробниками (WORKERS > 1)
+    він не завантажується, і читання виконуються запитом до БД.
+    """
+    
+    def __init__(self, rows=()):
+        # Порядок вставки відповідає порядку створення замовлень
+        self._orders: dict[int, tuple[Order, User]] = {}
+        self._by_status: dict[OrderStatus, dict[int, None]] = {status: {} for status in ACTIVE_STATUSES}
+        self._by_telegram_id: dict[int, set[int]] = {}
+        for order, user in rows:
+            self.put(order, user)
+    
+    def __len__(self) -> int:
+        return len(self._orders)
+    
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+    
+    def get(self, order_id: int) -> tuple[Order, User] | None:
+        return self._orders.get(order_id)
+    
+    def orders(self, *statuses: OrderStatus) -> list[tuple[Order, User]]:
+        """Замовлення з указаними статусами (усі активні, якщо не вказано) за часом створення."""
+        if not statuses:
+            return list(self._orders.values())
+        ids = sorted(order_id for status in statuses for order_id in self._by_status.get(status, ()))
+        return [self._orders[order_id] for order_id in ids]
+    
+    def counts(self) -> dict[OrderStatus, int]:
+        return {status: len(ids) for status, ids in self._by_status.items()}
+    
+    def put(self, order: Order, user: User) -> None:
+        """Додавання або заміна замовлення; неактивне прибирається з індексу.
+        
+        Замінене замовлення лишається на своєму місці, тож orders() без
+        статусів іде за часом створення і після зміни статусу.
+        """
+        entry = self._orders.get(order.id)
+        if order.status not in self._by_status or (entry and entry[1].telegram_id != user.telegram_id):
+            self.discard(order.id)
+            entry = None
+        if order.status not in self._by_status:
+            return
+        if entry is not None:
+            del self._by_status[entry[0].status][order.id]
+        elif self._orders and order.id < next(reversed(self._orders)):
+            # Старіше за останнє (повернуте в активні) — на своє місце
+            self._orders[order.id] = (order, user)
+            self._orders = dict(sorted(self._orders.items()))
+        self._orders[order.id] = (order, user)
+        self._by_status[order.status][order.id] = None
+        self._by_telegram_id.setdefault(user.telegram_id, set()).add(order.id)
+    
+    def discard(self, order_id: int) -> None:
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return
+        order, user = entry
+        del self._by_status[order.status][order_id]
+        ids = self._by_telegram_id[user.telegram_id]
+        ids.discard(order_id)
+        if not ids:
+            del self._by_telegram_id[user.telegram_id]
+    
+    def update(self, order_id: int, **changes) -> None:
+        """Зміна полів замовлення (статус, час, оцінка, оплата)."""
+        entry = self._orders.get(order_id)
+        if entry is None:
+            return
+        self.put(replace(entry[0], **changes), entry[1])
+    
+    def update_user(self, telegram_id: int, **changes) -> None:
+        """Зміна даних клієнта в усіх його активних замовленнях."""
+        for order_id in self._by_telegram_id.get(telegram_id, ()):
+            order, user = self._orders[order_id]
+            self._orders[order_id] = (order, replace(user, **changes))
+
+
+# Індекси за шляхом БД (у багатоорендному режимі — по одному на орендаря)
+_active_indexes: dict[str, ActiveOrderIndex] = {}
+
+
+def active_orders() -> ActiveOrderIndex | None:
+    """Індекс активних замовлень поточної БД, якщо він завантажений."""
+    return _active_indexes.get(str(current_database()))
+
+
+async def load_active_orders() -> ActiveOrderIndex:
+    """Завантаження індексу активних замовлень поточної БД (при старті)."""
+    async with _connect() as db:
+        index = ActiveOrderIndex(await _fetch_active_orders(db))
+    _active_indexes[str(current_database())] = index
+    return index
+
+
+def drop_active_orders() -> None:
+    """Відключення індексу: читання знову йдуть у БД."""
+    _active_indexes.pop(str(current_database()), None)
+
+
+async def check_active_orders() -> list[str]:
+    """Звірка індексу з БД; повертає розбіжності (порожній список — усе збігається)."""
+    index = active_orders()
+    if index is None:
+        return []
+    async with _connect() as db:
+        expected = {order.id: (order, user) for order, user in await _fetch_active_orders(db)}
+    problems = []
+    for order_id, (order, user) in expected.items():
+        entry = index.get(order_id)
+        if entry is None:
+            problems.append(f"#{order_id} ({order.status.value}) відсутнє в індексі")
+        elif entry[0] != order:
+            problems.append(f"#{order_id}: в індексі {entry[0]}, у БД {order}")
+        elif entry[1] != user:
+            problems.append(f"#{order_id}: клієнт в індексі {entry[1]}, у БД {user}")
+    for order, _ in index.orders():
+        if order.id not in expected:
+            problems.append(f"#{order.id} ({order.status.value}) в індексі, але не активне в БД")
+    return problems
+
+
+# Статистика замовлень: order_stats змінюється в тій самій транзакції, що й
+# замовлення, на різницю його внеску до і після зміни
+
+_UPSERT_ORDER_STATS = f"""
+    INSERT INTO order_stats (period, bucket, water_type, payment_method, {", ".join(STATS_COLUMNS)})
+    VALUES (?, ?, ?, ?, {", ".join("?" for _ in STATS_COLUMNS)})
+    ON CONFLICT (period, bucket, water_type, payment_method) DO UPDATE SET
+    {", ".join(f"{column} = {column} + excluded.{column}" for column in STATS_COLUMNS)}
+"""
+
+_SUM_ORDER_STATS = ", ".join(f"SUM({column})" for column in STATS_COLUMNS)
+
+
+def utc_to_local(value: datetime) -> datetime:
+    """created_at (CURRENT_TIMESTAMP, UTC) у місцевому часі, як решта міток замовлення."""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def _local_time(value: str) -> datetime:
+    return utc_to_local(datetime.fromisoformat(value))
+
+
+def _utc_text(value: datetime) -> str:
+    """Місцевий час у форматі CURRENT_TIMESTAMP для порівняння з created_at."""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _order_contribution(row) -> tuple[list[tuple[str, str, str, str]], OrderStats]:
+    """Ключі order_stats (день і година створення) і внесок замовлення в них."""
+    created_at = _local_time(row["created_at"])
+    status = OrderStatus(row["status"])
+    cancelled = status == OrderStatus.CANCELLED
+    rating = _safe_get(row, "rating")
+    confirmed_at = _safe_get(row, "confirmed_at")
+    delivered_at = _safe_get(row, "delivered_at")
+    completed_at = _safe_get(row, "completed_at")
+    
+    stats = OrderStats(
+        orders=1,
+        cancelled=int(cancelled),
+        completed=int(status == OrderStatus.COMPLETED),
+        bottles=0 if cancelled else row["quantity"],
+        revenue=0 if cancelled else row["total_price"],
+        rated=int(rating is not None),
+        rating_sum=rating or 0,
+    )
+    if confirmed_at:
+        stats.confirmed = 1
+        stats.confirm_seconds = (datetime.fromisoformat(confirmed_at) - created_at).total_seconds()
+    # Доставка — від виїзду кур'єра до отримання клієнтом
+    if delivered_at and completed_at:
+        stats.delivered = 1
+        stats.delivery_seconds = (
+            datetime.fromisoformat(completed_at) - datetime.fromisoformat(delivered_at)
+        ).total_seconds()
+    
+    water_type = row["water_type"] or WaterType.EFFECT.value
+    keys = [
+        ("day", created_at.strftime("%Y-%m-%d"), water_type, row["payment_method"]),
+        ("hour", created_at.strftime("%Y-%m-%d %H"), water_type, row["payment_method"]),
+    ]
+    return keys, stats
+
+
+async def _fetch_order_row(db: aiosqlite.Connection, order_id: int):
+    db.row_factory = aiosqlite.Row
+    cursor = await db.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
+    return await cursor.fetchone()
+
+
+async def _apply_order_stats(db: aiosqlite.Connection, before, after) -> None:
+    """Зміна order_stats на різницю внеску рядка замовлення (before/after — None, якщо рядка немає)."""
+    keys, delta = _order_contribution(after) if after is not None else ([], OrderStats())
+    if before is not None:
+        keys, previous = _order_contribution(before)
+        delta = OrderStats(*(new - old for new, old in zip(astuple(delta), astuple(previous))))
+    if not any(astuple(delta)):
+        return
+    await db.executemany(_UPSERT_ORDER_STATS, [(*key, *astuple(delta)) for key in keys])
+
+
+async def _rebuild_order_stats(db: aiosqlite.Connection) -> int:
+    await db.execute("DELETE FROM order_stats")
+    totals: dict[tuple[str, str, str, str], OrderStats] = {}
+    count = 0
+    db.row_factory = aiosqlite.Row
+    # Рядки читаються курсором по одному, у пам'яті лише підсумки
+    async with db.execute(f"SELECT * FROM {_ALL_ORDERS}") as cursor:
+        cursor.arraysize = FETCH_BATCH
+        async for row in cursor:
+            keys, stats = _order_contribution(row)
+            for key in keys:
+                totals.setdefault(key, OrderStats()).add(stats)
+            count += 1
+    await db.executemany(_UPSERT_ORDER_STATS, [(*key, *astuple(stats)) for key, stats in totals.items()])
+    return count
+
+
+async def rebuild_order_stats() -> int:
+    """Перерахунок статистики з усіх замовлень; повертає кількість замовлень."""
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        count = await _rebuild_order_stats(db)
         await db.commit()
+    return count
+
+
+async def get_order_stats(since: date, until: date) -> list[tuple[str, str, OrderStats]]:
+    """Статистика за дні з since по until включно: (тип води, спосіб оплати, підсумки)."""
+    async with _connect() as db:
+        cursor = await db.execute(
+            f"""SELECT water_type, payment_method, {_SUM_ORDER_STATS}
+                FROM order_stats
+                WHERE period = 'day' AND bucket BETWEEN ? AND ?
+                GROUP BY water_type, payment_method""",
+            (since.isoformat(), until.isoformat())
+        )
+        rows = await cursor.fetchall()
+        return [(row[0], row[1], OrderStats(*row[2:])) for row in rows]
+
+
+async def get_hourly_order_stats(day: date) -> dict[int, OrderStats]:
+    """Статистика за годинами одного дня (усі типи води і способи оплати)."""
+    async with _connect() as db:
+        cursor = await db.execute(
+            f"""SELECT CAST(substr(bucket, 12, 2) AS INTEGER), {_SUM_ORDER_STATS}
+                FROM order_stats
+                WHERE period = 'hour' AND bucket BETWEEN ? AND ?
+                GROUP BY bucket""",
+            (f"{day.isoformat()} 00", f"{day.isoformat()} 23")
+        )
+        rows = await cursor.fetchall()
+        return {row[0]: OrderStats(*row[1:]) for row in rows}
+
+
+# Журнал подій замовлень
+
+async def _add_order_event(db: aiosqlite.Connection, order_id: int, status: OrderStatus,
+                           actor_id: int | None, source: EventSource, at: datetime) -> None:
+    await db.execute(
+        """INSERT INTO order_events (order_id, status, actor_id, source, created_at)
+           VALUES (?, ?, ?, ?, ?)""",
+        (order_id, status.value, actor_id, source.value, at.isoformat(sep=" "))
+    )
+
+
+async def _backfill_order_events(db: aiosqlite.Connection) -> None:
+    """Події для замовлень, створених до появи журналу (без виконавця)."""
+    await db.execute("""
+        INSERT INTO order_events (order_id, status, actor_id, source, created_at)
+        SELECT order_id, status, NULL, 'migration', at FROM (
+            SELECT id AS order_id, 'pending' AS status, datetime(created_at, 'localtime') AS at FROM orders
+            UNION ALL
+            SELECT id, 'confirmed', replace(confirmed_at, 'T', ' ') FROM orders WHERE confirmed_at IS NOT NULL
+            UNION ALL
+            SELECT id, 'delivering', replace(delivered_at, 'T', ' ') FROM orders WHERE delivered_at IS NOT NULL
+            UNION ALL
+            SELECT id, 'completed', replace(completed_at, 'T', ' ') FROM orders
+            WHERE completed_at IS NOT NULL AND status = 'completed'
+        )
+        ORDER BY order_id, at
+    """)
+
+
+def _parse_event(row) -> OrderEvent:
+    return OrderEvent(
+        id=row[0],
+        order_id=row[1],
+        status=OrderStatus(row[2]),
+        actor_id=row[3],
+        source=EventSource(row[4]),
+        created_at=datetime.fromisoformat(row[5]),
+    )
+
+
+async def get_order_events(order_id: int) -> list[OrderEvent]:
+    """Історія змін статусу замовлення."""
+    async with _connect() as db:
+        cursor = await db.execute(
+            """SELECT id, order_id, status, actor_id, source, created_at
+               FROM order_events WHERE order_id = ? ORDER BY id""",
+            (order_id,)
+        )
+        return [_parse_event(row) for row in await cursor.fetchall()]
+
+
+async def iter_order_events(since: datetime, until: datetime) -> AsyncIterator[OrderEvent]:
+    """Події замовлень, створених у [since, until), потоком за (order_id, id).
+    
+    Межі id знаходяться за індексом часу, далі читання йде індексом
+    (order_id, id) без сортування — пам'ять не залежить від обсягу журналу.
+    """
+    async with _connect() as db:
+        cursor = await db.execute(
+            """SELECT MIN(order_id), MAX(order_id) FROM order_events
+               WHERE created_at >= ? AND created_at < ? AND status = 'pending'""",
+            (since.isoformat(sep=" "), until.isoformat(sep=" "))
+        )
+        first, last = await cursor.fetchone()
+        if first is None:
+            return
+        async with db.execute(
+            """SELECT id, order_id, status, actor_id, source, created_at
+               FROM order_events WHERE order_id BETWEEN ? AND ? ORDER BY order_id, id""",
+            (first, last)
+        ) as cursor:
+            cursor.arraysize = FETCH_BATCH
+            async for row in cursor:
+                yield _parse_event(row)
 
 
 async def get_user(telegram_id: int) -> User | None:
     """Отримання користувача по telegram_id."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
         cursor = await db.execute(
             "SELECT * FROM users WHERE telegram_id = ?",
@@ -179,7 +1015,7 @@ async def get_user(telegram_id: int) -> User | None:
 
 async def get_user_by_id(user_id: int) -> User | None:
     """Отримання користувача по id."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
         cursor = await db.execute(
             "SELECT * FROM users WHERE id = ?",
@@ -189,13 +1025,15 @@ async def get_user_by_id(user_id: int) -> User | None:
         return _parse_user(row) if row else None
 
 
-async def create_user(telegram_id: int, full_name: str, phone: str, address: str) -> User:
-    """Створення нового користувача."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+async def create_user(telegram_id: int, full_name: str, phone: str, address: str,
+                      location: tuple[float, float] | None = None) -> User:
+    """Створення нового користувача (location — необов'язкова геолокація)."""
+    latitude, longitude = location or (None, None)
+    async with _connect() as db:
         cursor = await db.execute(
-            """INSERT INTO users (telegram_id, full_name, phone, address)
-               VALUES (?, ?, ?, ?)""",
-            (telegram_id, full_name, phone, address)
+            """INSERT INTO users (telegram_id, full_name, phone, address, latitude, longitude)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (telegram_id, full_name, phone, address, latitude, longitude)
         )
         await db.commit()
         
@@ -206,130 +1044,404 @@ async def create_user(telegram_id: int, full_name: str, phone: str, address: str
             phone=phone,
             address=address,
             created_at=datetime.now(),
-            custom_price=None
+            custom_price=None,
+            latitude=latitude,
+            longitude=longitude,
         )
 
 
 async def update_user(telegram_id: int, full_name: str, phone: str, address: str) -> None:
     """Оновлення даних користувача."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         await db.execute(
             """UPDATE users SET full_name = ?, phone = ?, address = ?
                WHERE telegram_id = ?""",
             (full_name, phone, address, telegram_id)
         )
         await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        index.update_user(telegram_id, full_name=full_name, phone=phone, address=address)
 
 
-async def set_user_price(telegram_id: int, price: int | None) -> None:
-    """Встановлення індивідуальної ціни для користувача."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+async def set_user_location(telegram_id: int, location: tuple[float, float] | None) -> None:
+    """Збереження геолокації клієнта (None — видалити)."""
+    latitude, longitude = location or (None, None)
+    async with _connect() as db:
+        await db.execute(
+            "UPDATE users SET latitude = ?, longitude = ? WHERE telegram_id = ?",
+            (latitude, longitude, telegram_id)
+        )
+        await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        index.update_user(telegram_id, latitude=latitude, longitude=longitude)
+
+
+async def set_user_price(telegram_id: int, price: int | None) -> None:
+    """Встановлення індивідуальної ціни для користувача."""
+    async with _connect() as db:
         await db.execute(
             "UPDATE users SET custom_price = ? WHERE telegram_id = ?",
             (price, telegram_id)
         )
         await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        index.update_user(telegram_id, custom_price=price)
+
+
+async def apply_price_changes(
+    prices: list[tuple[int, int | None]],
+    new_users: list[tuple[int, str, str, str, int | None]] = (),
+) -> tuple[int, int]:
+    """Масова зміна цін і додавання клієнтів однією транзакцією.
+    
+    prices — пари (telegram_id, ціна або None для ціни за замовчуванням),
+    new_users — (telegram_id, full_name, phone, address, ціна).
+    Повертає кількість змінених і доданих клієнтів.
+    """
+    async with _connect() as db:
+        created = 0
+        if new_users:
+            cursor = await db.executemany(
+                """INSERT OR IGNORE INTO users (telegram_id, full_name, phone, address, custom_price)
+                   VALUES (?, ?, ?, ?, ?)""",
+                new_users
+            )
+            created = cursor.rowcount
+        cursor = await db.executemany(
+            "UPDATE users SET custom_price = ? WHERE telegram_id = ?",
+            [(price, telegram_id) for telegram_id, price in prices]
+        )
+        updated = cursor.rowcount
+        await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        for telegram_id, price in prices:
+            index.update_user(telegram_id, custom_price=price)
+    return updated, created
+
+
+async def get_users_segment(
+    address: str | None = None,
+    price: int | None = None,
+    default_price: int = 0,
+    min_orders: int | None = None,
+    ordered_within_days: int | None = None,
+) -> list[User]:
+    """Клієнти за фільтрами: частина адреси, поточна ціна (з урахуванням
+    ціни за замовчуванням), мінімум замовлень, замовляли за останні N днів."""
+    conditions, params = [], []
+    if price is not None:
+        conditions.append("COALESCE(u.custom_price, ?) = ?")
+        params.extend((default_price, price))
+    if min_orders:
+        conditions.append(f"(SELECT COUNT(*) FROM {_ALL_ORDERS} o WHERE o.user_id = u.id) >= ?")
+        params.append(min_orders)
+    if ordered_within_days:
+        conditions.append(
+            f"EXISTS (SELECT 1 FROM {_ALL_ORDERS} o WHERE o.user_id = u.id AND o.created_at >= datetime('now', ?))"
+        )
+        params.append(f"-{ordered_within_days} days")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute(f"SELECT u.* FROM users u {where} ORDER BY u.full_name", params)
+        rows = await cursor.fetchall()
+    
+    users = [_parse_user(row) for row in rows]
+    # lower() у SQLite не працює з кирилицею
+    if address:
+        address = address.casefold()
+        users = [user for user in users if address in user.address.casefold()]
+    return users
+
+
+# ============= ПОШУК КЛІЄНТІВ =============
+
+# Індекс без власної копії даних (content=''): рядки беруться з users за rowid.
+# Префіксні індекси прискорюють пошук за першими 2–3 символами слова.
+_CREATE_USERS_FTS = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        full_name, phone, address,
+        content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+
+def _fts_phone(row: str) -> str:
+    """Телефон для індексу: цифри повністю, з 0 і без нього —
+    «050…», «50…» і «380…» знаходять +380501234567."""
+    digits = f"{row}.phone"
+    for char in "+ -().":
+        digits = f"replace({digits}, '{char}', '')"
+    return f"{digits} || ' ' || substr({digits}, -10) || ' ' || substr({digits}, -9)"
+
+
+def _fts_values(row: str) -> str:
+    return f"{row}.id, {row}.full_name, {_fts_phone(row)}, {row}.address"
+
+
+_USERS_FTS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, full_name, phone, address) VALUES ({_fts_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, phone, address) VALUES ('delete', {_fts_values('old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, phone, address ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, phone, address) VALUES ('delete', {_fts_values('old')});
+        INSERT INTO users_fts (rowid, full_name, phone, address) VALUES ({_fts_values('new')});
+    END""",
+)
+
+# Вага збігу в імені, телефоні та адресі для bm25
+_SEARCH_WEIGHTS = "4.0, 2.0, 1.0"
+MAX_SEARCH_TERMS = 5
+
+# bm25 рахується для кожного збігу (~2 мкс на рядок), тож широкі запити
+# на кшталт «050» чи «о» з десятками тисяч збігів не ранжуються —
+# спершу показуються нові клієнти
+RANKED_MATCHES = 1000
+
+
+def search_terms(query: str) -> list[str]:
+    """Слова запиту; номер телефону з пробілами, дужками чи дефісами — одним словом."""
+    if re.fullmatch(r"[\d\s()+\-]+", query):
+        digits = re.sub(r"\D", "", query)
+        return [digits] if digits else []
+    return re.findall(r"[^\W_]+", query)[:MAX_SEARCH_TERMS]
+
+
+async def search_users(query: str, limit: int = 10, offset: int = 0) -> list[User]:
+    """Клієнти, в імені, телефоні чи адресі яких є слова з початком на
+    кожне слово запиту; найкращі збіги першими."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    match = " ".join(f'"{term}"*' for term in terms)
+    
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute(
+            "SELECT count(*) FROM (SELECT 1 FROM users_fts WHERE users_fts MATCH ? LIMIT ?)",
+            (match, RANKED_MATCHES + 1)
+        )
+        (matches,) = await cursor.fetchone()
+        score = f"bm25(users_fts, {_SEARCH_WEIGHTS})" if matches <= RANKED_MATCHES else "0"
+        
+        cursor = await db.execute(f"""
+            SELECT u.* FROM (
+                SELECT rowid, {score} AS score FROM users_fts
+                WHERE users_fts MATCH ? ORDER BY score, rowid DESC LIMIT ? OFFSET ?
+            ) AS found
+            JOIN users u ON u.id = found.rowid
+            ORDER BY found.score, found.rowid DESC
+        """, (match, limit, offset))
+        rows = await cursor.fetchall()
+        return [_parse_user(row) for row in rows]
 
 
 async def get_all_users() -> list[User]:
     """Отримання всіх користувачів."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
         cursor = await db.execute("SELECT * FROM users ORDER BY full_name")
         rows = await cursor.fetchall()
         return [_parse_user(row) for row in rows]
 
 
+async def _insert_order(
+    db: aiosqlite.Connection,
+    user_id: int,
+    water_type: WaterType,
+    quantity: int,
+    total_price: int,
+    payment_method: str,
+    comment: str | None,
+    actor_id: int | None,
+    source: EventSource,
+    delivery_slot: str | None = None,
+) -> tuple[Order, tuple[Order, User] | None]:
+    """Запис замовлення зі статистикою і подією в поточній транзакції;
+    повертає замовлення і запис для індексу активних (якщо він завантажений)."""
+    cursor = await db.execute(
+        """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, comment, delivery_slot)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (user_id, water_type.value, quantity, total_price, payment_method, comment, delivery_slot)
+    )
+    await _apply_order_stats(db, None, await _fetch_order_row(db, cursor.lastrowid))
+    await _add_order_event(db, cursor.lastrowid, OrderStatus.PENDING, actor_id, source, datetime.now())
+    # Рядок з часом створення від БД читається в тій самій транзакції
+    entry = await _fetch_order_with_user(db, cursor.lastrowid) if active_orders() is not None else None
+    
+    order = Order(
+        id=cursor.lastrowid,
+        user_id=user_id,
+        water_type=water_type,
+        quantity=quantity,
+        total_price=total_price,
+        payment_method=payment_method,
+        status=OrderStatus.PENDING,
+        created_at=datetime.now(),
+        comment=comment,
+        delivery_slot=delivery_slot,
+    )
+    return order, entry
+
+
 async def create_order(
     user_id: int,
     water_type: WaterType,
     quantity: int,
     total_price: int,
     payment_method: str,
-    comment: str | None = None
-) -> Order:
-    """Створення нового замовлення."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            """INSERT INTO orders (user_id, water_type, quantity, total_price, payment_method, comment)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (user_id, water_type.value, quantity, total_price, payment_method, comment)
+    comment: str | None = None,
+    actor_id: int | None = None,
+    delivery_slot: str | None = None,
+    slot_capacity: int = 0,
+) -> Order | None:
+    """Створення нового замовлення (actor_id — Telegram id того, хто оформив).
+    
+    З delivery_slot місце в слоті бронюється в тій самій транзакції; якщо
+    slot_capacity пляшок уже не вистачає, замовлення не створюється і
+    повертається None.
+    """
+    async with _slot_lock() if delivery_slot is not None else nullcontext(), _connect() as db:
+        if delivery_slot is not None:
+            reserved, booked = await _reserve_slot(db, delivery_slot, quantity, slot_capacity)
+            if not reserved:
+                _slot_booked(delivery_slot, booked)
+                return None
+        order, entry = await _insert_order(
+            db, user_id, water_type, quantity, total_price, payment_method, comment, actor_id, EventSource.CLIENT,
+            delivery_slot
         )
         await db.commit()
-        
-        return Order(
-            id=cursor.lastrowid,
-            user_id=user_id,
-            water_type=water_type,
-            quantity=quantity,
-            total_price=total_price,
-            payment_method=payment_method,
-            status=OrderStatus.PENDING,
-            created_at=datetime.now(),
-            comment=comment
-        )
+    
+    if delivery_slot is not None:
+        _slot_booked(delivery_slot, booked)
+    _order_created(order, entry)
+    return order
+
+
+def _order_created(order: Order, entry: tuple[Order, User] | None) -> None:
+    """Оновлення кешів у пам'яті після коміту нового замовлення."""
+    index = active_orders()
+    if entry is not None and index is not None:
+        index.put(*entry)
+    _remember_last_order(order.user_id, OrderTemplate.from_order(order))
 
 
 async def get_order(order_id: int) -> Order | None:
-    """Отримання замовлення по id."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    """Отримання замовлення по id (спершу серед поточних, потім в архіві)."""
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-        row = await cursor.fetchone()
-        return _parse_order(row) if row else None
+        for table in ("orders", "orders_archive"):
+            cursor = await db.execute(f"SELECT * FROM {table} WHERE id = ?", (order_id,))
+            row = await cursor.fetchone()
+            if row:
+                return _parse_order(row)
+        return None
 
 
 async def get_user_orders(telegram_id: int, limit: int = 10) -> list[Order]:
-    """Отримання замовлень користувача."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    """Отримання замовлень користувача; архів читається, лише якщо поточних менше limit."""
+    rows = []
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """SELECT o.* FROM orders o
-               JOIN users u ON o.user_id = u.id
-               WHERE u.telegram_id = ?
-               ORDER BY o.created_at DESC
-               LIMIT ?""",
-            (telegram_id, limit)
-        )
-        rows = await cursor.fetchall()
-        return [_parse_order(row) for row in rows]
+        for table in ("orders", "orders_archive"):
+            cursor = await db.execute(
+                f"""SELECT o.* FROM {table} o
+                    JOIN users u ON o.user_id = u.id
+                    WHERE u.telegram_id = ?
+                    ORDER BY o.created_at DESC
+                    LIMIT ?""",
+                (telegram_id, limit - len(rows))
+            )
+            rows += await cursor.fetchall()
+            if len(rows) >= limit:
+                break
+    
+    # Давнє замовлення, що досі в роботі, може бути старшим за архівні
+    orders = [_parse_order(row) for row in rows]
+    orders.sort(key=lambda order: order.created_at, reverse=True)
+    return orders
 
 
-async def get_all_pending_orders() -> list[tuple[Order, User]]:
-    """Отримання всіх очікуючих замовлень (для адміна)."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+# Шаблони останніх замовлень за шляхом БД: users.id → шаблон (None — замовлень
+# немає), найдавніше використані витісняються. Оновлюються при кожному
+# новому замовленні; з кількома процесами-обробниками оновлення клієнта
+# завжди потрапляють в один процес, тож його кеш не застаріває
+_last_orders: dict[str, OrderedDict[int, OrderTemplate | None]] = {}
+
+
+def _last_order_cache() -> OrderedDict[int, OrderTemplate | None]:
+    return _last_orders.setdefault(str(current_database()), OrderedDict())
+
+
+def _remember_last_order(user_id: int, template: OrderTemplate | None) -> None:
+    cache = _last_order_cache()
+    cache[user_id] = template
+    cache.move_to_end(user_id)
+    if len(cache) > LAST_ORDER_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+async def get_last_order_template(user_id: int) -> OrderTemplate | None:
+    """Шаблон останнього замовлення клієнта (users.id); БД читається лише при промаху кешу."""
+    cache = _last_order_cache()
+    if user_id in cache:
+        cache.move_to_end(user_id)
+        return cache[user_id]
+    
+    template = None
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """SELECT o.*, u.telegram_id as u_telegram_id, u.full_name as u_full_name, 
-                      u.phone as u_phone, u.address as u_address, 
-                      u.custom_price as u_custom_price, u.created_at as u_created_at
-               FROM orders o
-               JOIN users u ON o.user_id = u.id
-               WHERE o.status IN ('pending', 'confirmed', 'delivering')
-               ORDER BY o.created_at ASC"""
-        )
-        rows = await cursor.fetchall()
-        
-        result = []
-        for row in rows:
-            order = _parse_order(row)
-            user = User(
-                id=row["user_id"],
-                telegram_id=row["u_telegram_id"],
-                full_name=row["u_full_name"],
-                phone=row["u_phone"],
-                address=row["u_address"],
-                created_at=datetime.fromisoformat(row["u_created_at"]),
-                custom_price=row["u_custom_price"]
+        for table in ("orders", "orders_archive"):
+            cursor = await db.execute(
+                f"""SELECT * FROM {table} WHERE user_id = ?
+                    ORDER BY created_at DESC, id DESC LIMIT 1""",
+                (user_id,)
             )
-            result.append((order, user))
-        
-        return result
+            row = await cursor.fetchone()
+            if row:
+                template = OrderTemplate.from_order(_parse_order(row))
+                break
+    # Замовлення, створене поки йшло читання, вже в кеші і новіше
+    if user_id not in cache:
+        _remember_last_order(user_id, template)
+    return cache.get(user_id, template)
+
+
+async def get_all_pending_orders() -> list[tuple[Order, User]]:
+    """Отримання всіх очікуючих замовлень (для адміна)."""
+    index = active_orders()
+    if index is not None:
+        return index.orders()
+    async with _connect() as db:
+        return await _fetch_active_orders(db)
 
 
-async def update_order_status(order_id: int, status: OrderStatus) -> None:
-    """Оновлення статусу замовлення."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+async def update_order_status(
+    order_id: int,
+    status: OrderStatus,
+    actor_id: int | None = None,
+    source: EventSource = EventSource.SYSTEM,
+) -> None:
+    """Оновлення статусу замовлення із записом у журнал подій."""
+    async with _connect() as db:
+        # Попередній стан читається під блокуванням запису, щоб різниця
+        # для статистики не розійшлась з паралельною зміною
+        await db.execute("BEGIN IMMEDIATE")
+        previous = await _fetch_order_row(db, order_id)
+        
         # Додаємо час для відповідного статусу
         timestamp_field = None
         if status == OrderStatus.CONFIRMED:
@@ -339,55 +1451,757 @@ async def update_order_status(order_id: int, status: OrderStatus) -> None:
         elif status == OrderStatus.COMPLETED:
             timestamp_field = "completed_at"
         
+        now = datetime.now()
+        changes = {"status": status}
         if timestamp_field:
-            await db.execute(
+            changes[timestamp_field] = now
+            cursor = await db.execute(
                 f"UPDATE orders SET status = ?, {timestamp_field} = ? WHERE id = ?",
-                (status.value, datetime.now().isoformat(), order_id)
+                (status.value, now.isoformat(), order_id)
             )
         else:
-            await db.execute(
+            cursor = await db.execute(
                 "UPDATE orders SET status = ? WHERE id = ?",
                 (status.value, order_id)
             )
+        slot = None
+        if cursor.rowcount:
+            current = await _fetch_order_row(db, order_id)
+            await _apply_order_stats(db, previous, current)
+            slot = await _apply_slot_booking(db, previous, current)
+            await _add_order_event(db, order_id, status, actor_id, source, now)
+            if status == OrderStatus.COMPLETED and previous["status"] != OrderStatus.COMPLETED.value:
+                await _add_bottle_entry(
+                    db, previous["user_id"], order_id, BottleEntry.DELIVERY, previous["quantity"], 0,
+                    actor_id, source, now
+                )
+        
+        index = active_orders()
+        entry = None
+        if index is not None and order_id not in index and status in ACTIVE_STATUSES and cursor.rowcount:
+            # Замовлення повертається в роботу — потрібні всі його поля
+            entry = await _fetch_order_with_user(db, order_id)
+        await db.commit()
+        
+        if slot is not None:
+            _slot_booked(*slot)
+        if entry is not None:
+            index.put(*entry)
+        elif index is not None:
+            index.update(order_id, **changes)
+
+
+async def assign_courier(order_id: int, courier_id: int | None) -> None:
+    """Передача замовлення кур'єру (None — зняти призначення)."""
+    async with _connect() as db:
+        await db.execute("UPDATE orders SET courier_id = ? WHERE id = ?", (courier_id, order_id))
         await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        index.update(order_id, courier_id=courier_id)
+
+
+async def get_courier_orders(courier_id: int) -> list[tuple[Order, User]]:
+    """Підтверджені й відправлені замовлення кур'єра за часом створення."""
+    index = active_orders()
+    if index is not None:
+        return [
+            (order, user) for order, user in index.orders(OrderStatus.CONFIRMED, OrderStatus.DELIVERING)
+            if order.courier_id == courier_id
+        ]
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute(
+            f"""{_ORDER_WITH_USER}
+                WHERE o.courier_id = ? AND o.status IN ('confirmed', 'delivering')
+                ORDER BY o.created_at ASC, o.id ASC""",
+            (courier_id,)
+        )
+        return [_parse_order_with_user(row) for row in await cursor.fetchall()]
 
 
 async def set_order_rating(order_id: int, rating: int, feedback: str | None = None) -> None:
     """Встановлення оцінки замовлення."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute(
+    completed_at = datetime.now()
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        previous = await _fetch_order_row(db, order_id)
+        cursor = await db.execute(
             "UPDATE orders SET rating = ?, feedback = ?, completed_at = ? WHERE id = ?",
-            (rating, feedback, datetime.now().isoformat(), order_id)
+            (rating, feedback, completed_at.isoformat(), order_id)
         )
+        if cursor.rowcount:
+            await _apply_order_stats(db, previous, await _fetch_order_row(db, order_id))
         await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        index.update(order_id, rating=rating, feedback=feedback, completed_at=completed_at)
+
+
+async def iter_orders_with_users(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    statuses: list[OrderStatus] | None = None,
+) -> AsyncIterator[tuple[Order, User]]:
+    """Замовлення з клієнтами (разом з архівом), створені в [since, until) за місцевим
+    часом, потоком за часом створення."""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("o.created_at >= ?")
+        params.append(_utc_text(since))
+    if until is not None:
+        conditions.append("o.created_at < ?")
+        params.append(_utc_text(until))
+    if statuses:
+        conditions.append(f"o.status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(status.value for status in statuses)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            f"""{_SELECT_ORDER_WITH_USER}
+                FROM {_ALL_ORDERS} o
+                JOIN users u ON o.user_id = u.id
+                {where}
+                ORDER BY o.created_at, o.id""",
+            params
+        ) as cursor:
+            cursor.arraysize = FETCH_BATCH
+            async for row in cursor:
+                yield _parse_order_with_user(row)
 
 
 async def get_order_with_user(order_id: int) -> tuple[Order, User] | None:
-    """Отримання замовлення з даними користувача."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    """Отримання замовлення з даними користувача (також з архіву)."""
+    async with _connect() as db:
+        return await _fetch_order_with_user(db, order_id)
+
+
+# ============= СЛОТИ ДОСТАВКИ =============
+
+class SlotBookings:
+    """Заброньовані пляшки за слотами доставки однієї БД у пам'яті.
+    
+    Завантажується при першому зверненні (get_slot_bookings) і далі
+    оновлюється функціями цього модуля після кожного коміту, тож показ
+    вільних слотів не читає БД. Раз на SLOT_BOOKINGS_TTL таблиця
+    перечитується, щоб підтягнути бронювання інших процесів-обробників.
+    Від перебронювання захищає умовний UPDATE у БД, а не ця таблиця.
+    """
+    
+    def __init__(self):
+        self._bottles: dict[str, int] = {}
+        self._loaded_at: float | None = None
+        # Значення, записані поки йде перечитування, новіші за прочитані
+        self._written: dict[str, int] | None = None
+        self._lock = asyncio.Lock()
+    
+    def booked(self, slot: str) -> int:
+        return self._bottles.get(slot, 0)
+    
+    def set(self, slot: str, bottles: int) -> None:
+        self._bottles[slot] = bottles
+        if self._written is not None:
+            self._written[slot] = bottles
+    
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > SLOT_BOOKINGS_TTL
+    
+    async def refresh(self, since: str) -> None:
+        """Перечитування слотів від since; одночасні виклики чекають на одне читання."""
+        async with self._lock:
+            if not self.stale:
+                return
+            self._written = {}
+            try:
+                async with _connect() as db:
+                    cursor = await db.execute("SELECT slot, bottles FROM delivery_slots WHERE slot >= ?", (since,))
+                    rows = await cursor.fetchall()
+                self._bottles = dict(rows) | self._written
+                self._loaded_at = time.monotonic()
+            finally:
+                self._written = None
+
+
+# Таблиці бронювань за шляхом БД (у багатоорендному режимі — по одній на орендаря)
+_slot_bookings: dict[str, SlotBookings] = {}
+
+
+async def get_slot_bookings(since: str) -> SlotBookings:
+    """Бронювання слотів поточної БД, починаючи з since (дата «РРРР-ММ-ДД»)."""
+    table = _slot_bookings.setdefault(str(current_database()), SlotBookings())
+    if table.stale:
+        await table.refresh(since)
+    return table
+
+
+# Обробники одного процесу бронюють слоти по черзі: у пік це швидше, ніж
+# чекати на блокування запису SQLite з паузами обробника зайнятості.
+# Між процесами від перебронювання захищає сам умовний UPDATE
+_slot_locks: dict[str, asyncio.Lock] = {}
+
+
+def _slot_lock() -> asyncio.Lock:
+    return _slot_locks.setdefault(str(current_database()), asyncio.Lock())
+
+
+def _slot_booked(slot: str, bottles: int) -> None:
+    """Нове значення броні слота після коміту (якщо таблиця вже завантажена)."""
+    table = _slot_bookings.get(str(current_database()))
+    if table is not None:
+        table.set(slot, bottles)
+
+
+async def _reserve_slot(db: aiosqlite.Connection, slot: str, bottles: int, capacity: int) -> tuple[bool, int]:
+    """Бронювання bottles пляшок у слоті в поточній транзакції; повертає
+    (чи вдалося, скільки заброньовано тепер). Замовлення, більше за
+    місткість, вміщається лише в порожній слот."""
+    await db.execute("INSERT OR IGNORE INTO delivery_slots (slot) VALUES (?)", (slot,))
+    # Перевірка і зміна — один запит під блокуванням запису, тож два
+    # клієнти, навіть з різних процесів, не займуть останнє місце разом
+    cursor = await db.execute(
+        """UPDATE delivery_slots SET bottles = bottles + ?
+           WHERE slot = ? AND (bottles + ? <= ? OR bottles = 0)""",
+        (bottles, slot, bottles, capacity)
+    )
+    reserved = cursor.rowcount > 0
+    cursor = await db.execute("SELECT bottles FROM delivery_slots WHERE slot = ?", (slot,))
+    (booked,) = await cursor.fetchone()
+    return reserved, booked
+
+
+def _slot_contribution(row) -> tuple[str | None, int]:
+    """Слот замовлення і скільки пляшок воно в ньому займає."""
+    slot = _safe_get(row, "delivery_slot")
+    if slot is None or row["status"] == OrderStatus.CANCELLED.value:
+        return slot, 0
+    return slot, row["quantity"]
+
+
+async def _apply_slot_booking(db: aiosqlite.Connection, before, after) -> tuple[str, int] | None:
+    """Зміна delivery_slots на різницю броні рядка замовлення; повертає
+    (слот, скільки заброньовано тепер) або None, якщо бронь не змінилась."""
+    slot, bottles = _slot_contribution(after)
+    _, previous = _slot_contribution(before)
+    if slot is None or bottles == previous:
+        return None
+    await db.execute(
+        "UPDATE delivery_slots SET bottles = MAX(bottles + ?, 0) WHERE slot = ?",
+        (bottles - previous, slot)
+    )
+    cursor = await db.execute("SELECT bottles FROM delivery_slots WHERE slot = ?", (slot,))
+    row = await cursor.fetchone()
+    return (slot, row[0]) if row else None
+
+
+async def check_slot_bookings(since: str) -> list[str]:
+    """Звірка delivery_slots із замовленнями для слотів від since; повертає
+    розбіжності (давні замовлення могли піти в архів)."""
+    async with _connect() as db:
+        cursor = await db.execute(
+            """SELECT delivery_slot, SUM(quantity) FROM orders
+               WHERE delivery_slot >= ? AND status != 'cancelled'
+               GROUP BY delivery_slot""",
+            (since,)
+        )
+        expected = dict(await cursor.fetchall())
+        cursor = await db.execute("SELECT slot, bottles FROM delivery_slots WHERE slot >= ? AND bottles != 0", (since,))
+        booked = dict(await cursor.fetchall())
+    return [
+        f"слот {slot}: заброньовано {booked.get(slot, 0)}, у замовленнях {expected.get(slot, 0)}"
+        for slot in sorted(expected.keys() | booked.keys())
+        if booked.get(slot, 0) != expected.get(slot, 0)
+    ]
+
+
+# ============= ОПЛАТА ПЕРЕКАЗОМ =============
+
+async def get_unpaid_orders(payment_method: str, since: datetime, until: datetime) -> list[tuple[Order, User]]:
+    """Неоплачені нескасовані замовлення зі способом оплати payment_method,
+    створені в [since, until) за місцевим часом, у порядку (сума, час створення)."""
+    async with _connect() as db:
         db.row_factory = aiosqlite.Row
         cursor = await db.execute(
-            """SELECT o.*, u.telegram_id as u_telegram_id, u.full_name as u_full_name, 
-                      u.phone as u_phone, u.address as u_address, 
-                      u.custom_price as u_custom_price, u.created_at as u_created_at
-               FROM orders o
-               JOIN users u ON o.user_id = u.id
-               WHERE o.id = ?""",
-            (order_id,)
+            f"""{_ORDER_WITH_USER}
+                WHERE o.payment_method = ? AND o.paid_at IS NULL AND o.status != 'cancelled'
+                AND o.created_at >= ? AND o.created_at < ?
+                ORDER BY o.total_price, o.created_at, o.id""",
+            (payment_method, _utc_text(since), _utc_text(until))
         )
+        return [_parse_order_with_user(row) for row in await cursor.fetchall()]
+
+
+async def get_used_payment_refs(refs: list[str]) -> set[str]:
+    """Які з переказів виписки вже зараховані в оплату замовлень."""
+    used = set()
+    async with _connect() as db:
+        for start in range(0, len(refs), REFS_BATCH):
+            batch = refs[start:start + REFS_BATCH]
+            cursor = await db.execute(
+                f"SELECT payment_ref FROM orders WHERE payment_ref IN ({', '.join('?' for _ in batch)})",
+                batch
+            )
+            used.update(row[0] for row in await cursor.fetchall())
+    return used
+
+
+async def mark_orders_paid(payments: list[tuple[int, datetime, str]]) -> int:
+    """Позначення замовлень оплаченими: (id, час переказу, ідентифікатор переказу).
+    
+    Одна транзакція; замовлення, вже оплачене, і переказ, уже зарахований
+    іншому замовленню, пропускаються. Повертає кількість позначених.
+    """
+    paid = []
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        for order_id, paid_at, ref in payments:
+            cursor = await db.execute(
+                "UPDATE OR IGNORE orders SET paid_at = ?, payment_ref = ? WHERE id = ? AND paid_at IS NULL",
+                (paid_at.isoformat(sep=" "), ref, order_id)
+            )
+            if cursor.rowcount:
+                paid.append((order_id, paid_at))
+        await db.commit()
+    
+    index = active_orders()
+    if index is not None:
+        for order_id, paid_at in paid:
+            index.update(order_id, paid_at=paid_at)
+    return len(paid)
+
+
+# ============= ТАРА =============
+
+_UPSERT_BOTTLE_BALANCE = """
+    INSERT INTO bottle_balances (user_id, delivered, returned) VALUES (?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+    delivered = delivered + excluded.delivered, returned = returned + excluded.returned
+"""
+
+
+async def _add_bottle_entry(
+    db: aiosqlite.Connection,
+    user_id: int,
+    order_id: int | None,
+    kind: BottleEntry,
+    delivered: int,
+    returned: int,
+    actor_id: int | None,
+    source: EventSource,
+    at: datetime,
+) -> bool:
+    """Запис у журнал тари і зміна балансу клієнта в поточній транзакції;
+    False — запис цього виду для замовлення вже є."""
+    cursor = await db.execute(
+        """INSERT OR IGNORE INTO bottle_ledger
+           (user_id, order_id, kind, delivered, returned, actor_id, source, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (user_id, order_id, kind.value, delivered, returned, actor_id, source.value, at.isoformat(sep=" "))
+    )
+    if not cursor.rowcount:
+        return False
+    await db.execute(_UPSERT_BOTTLE_BALANCE, (user_id, delivered, returned))
+    return True
+
+
+async def _fetch_bottle_balance(db: aiosqlite.Connection, user_id: int) -> BottleBalance:
+    cursor = await db.execute("SELECT delivered, returned FROM bottle_balances WHERE user_id = ?", (user_id,))
+    row = await cursor.fetchone()
+    return BottleBalance(user_id, *row) if row else BottleBalance(user_id)
+
+
+async def record_bottle_return(
+    order_id: int,
+    returned: int,
+    actor_id: int | None = None,
+    source: EventSource = EventSource.SYSTEM,
+) -> BottleBalance | None:
+    """Порожні пляшки, забрані при доставці виконаного замовлення; повертає новий
+    баланс клієнта або None, якщо повернення вже записане чи замовлення не виконане."""
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute("SELECT user_id FROM orders WHERE id = ? AND status = 'completed'", (order_id,))
         row = await cursor.fetchone()
-        
-        if not row:
+        if row is None:
             return None
-        
-        order = _parse_order(row)
-        user = User(
-            id=row["user_id"],
-            telegram_id=row["u_telegram_id"],
-            full_name=row["u_full_name"],
-            phone=row["u_phone"],
-            address=row["u_address"],
-            created_at=datetime.fromisoformat(row["u_created_at"]),
-            custom_price=row["u_custom_price"]
-        )
-        return order, user
+        if not await _add_bottle_entry(
+            db, row[0], order_id, BottleEntry.PICKUP, 0, returned, actor_id, source, datetime.now()
+        ):
+            return None
+        balance = await _fetch_bottle_balance(db, row[0])
+        await db.commit()
+    return balance
+
+
+async def adjust_bottles(telegram_id: int, delta: int, actor_id: int | None = None) -> BottleBalance | None:
+    """Виправлення балансу тари клієнта на delta пляшок (додатне — у клієнта
+    більше); None — клієнта не знайдено."""
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        await _add_bottle_entry(
+            db, row[0], None, BottleEntry.ADJUSTMENT, max(delta, 0), max(-delta, 0),
+            actor_id, EventSource.ADMIN, datetime.now()
+        )
+        balance = await _fetch_bottle_balance(db, row[0])
+        await db.commit()
+    return balance
+
+
+async def get_bottle_balance(user_id: int) -> BottleBalance:
+    """Баланс тари клієнта (users.id) — один рядок зведення, без підсумовування журналу."""
+    async with _connect() as db:
+        return await _fetch_bottle_balance(db, user_id)
+
+
+async def get_bottle_balances(user_ids: list[int]) -> dict[int, BottleBalance]:
+    """Баланси тари кількох клієнтів (для списків замовлень)."""
+    ids = list(set(user_ids))
+    if not ids:
+        return {}
+    async with _connect() as db:
+        cursor = await db.execute(
+            f"SELECT user_id, delivered, returned FROM bottle_balances WHERE user_id IN ({', '.join('?' for _ in ids)})",
+            ids
+        )
+        balances = {row[0]: BottleBalance(*row) for row in await cursor.fetchall()}
+    return {user_id: balances.get(user_id, BottleBalance(user_id)) for user_id in ids}
+
+
+@asynccontextmanager
+async def bottle_snapshot() -> AsyncIterator[tuple[AsyncIterator[tuple[BottleBalance, int]], AsyncIterator[BottleBalance]]]:
+    """Підсумки журналу тари і зведення балансів з одного знімка БД для звірки.
+    
+    Обидва потоки впорядковані за user_id і читаються в одній читальній
+    транзакції, тож доставки, записані під час звірки, не дають хибних
+    розбіжностей. Журнал групується покривним індексом без сортування і
+    без читання таблиці — у пам'яті лише поточна пачка рядків.
+    """
+    async with _connect() as db:
+        await db.execute("BEGIN")
+        ledger, balances = _stream_ledger_totals(db), _stream_bottle_balances(db)
+        try:
+            yield ledger, balances
+        finally:
+            await ledger.aclose()
+            await balances.aclose()
+            await db.rollback()
+
+
+async def _stream_ledger_totals(db: aiosqlite.Connection) -> AsyncIterator[tuple[BottleBalance, int]]:
+    async with db.execute(
+        """SELECT user_id, SUM(delivered), SUM(returned), COUNT(*) FROM bottle_ledger
+           GROUP BY user_id ORDER BY user_id"""
+    ) as cursor:
+        cursor.arraysize = FETCH_BATCH
+        async for user_id, delivered, returned, entries in cursor:
+            yield BottleBalance(user_id, delivered, returned), entries
+
+
+async def _stream_bottle_balances(db: aiosqlite.Connection) -> AsyncIterator[BottleBalance]:
+    async with db.execute("SELECT user_id, delivered, returned FROM bottle_balances ORDER BY user_id") as cursor:
+        cursor.arraysize = FETCH_BATCH
+        async for row in cursor:
+            yield BottleBalance(*row)
+
+
+async def rebuild_bottle_balances() -> int:
+    """Перерахунок bottle_balances з журналу; повертає кількість клієнтів."""
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        await db.execute("DELETE FROM bottle_balances")
+        cursor = await db.execute(
+            """INSERT INTO bottle_balances (user_id, delivered, returned)
+               SELECT user_id, SUM(delivered), SUM(returned) FROM bottle_ledger GROUP BY user_id"""
+        )
+        await db.commit()
+    return cursor.rowcount
+
+
+# ============= АРХІВ =============
+
+TERMINAL_STATUSES = (OrderStatus.COMPLETED, OrderStatus.CANCELLED)
+
+
+async def archive_orders_batch(before: datetime, limit: int) -> int:
+    """Перенесення до limit завершених і скасованих замовлень, створених до
+    before (місцевий час), в orders_archive однією транзакцією; повертає кількість."""
+    async with _connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute(
+            f"""SELECT id FROM orders
+                WHERE created_at < ? AND status IN ({', '.join('?' for _ in TERMINAL_STATUSES)})
+                ORDER BY created_at
+                LIMIT ?""",
+            (_utc_text(before), *(status.value for status in TERMINAL_STATUSES), limit)
+        )
+        ids = [row[0] for row in await cursor.fetchall()]
+        if ids:
+            marks = ", ".join("?" for _ in ids)
+            await db.execute(
+                f"""INSERT INTO orders_archive ({_ORDER_COLUMNS})
+                    SELECT {_ORDER_COLUMNS} FROM orders WHERE id IN ({marks})""",
+                ids
+            )
+            await db.execute(f"DELETE FROM orders WHERE id IN ({marks})", ids)
+        await db.commit()
+    return len(ids)
+
+
+async def compact_database(pages: int) -> tuple[int, int] | None:
+    """Повернення до pages вільних сторінок файловій системі; повертає
+    (звільнено, лишилось вільних), None — інкрементальний VACUUM для БД не увімкнено."""
+    async with _connect() as db:
+        cursor = await db.execute("PRAGMA auto_vacuum")
+        (mode,) = await cursor.fetchone()
+        if mode != 2:  # INCREMENTAL
+            return None
+        cursor = await db.execute("PRAGMA freelist_count")
+        (before,) = await cursor.fetchone()
+        if before:
+            # executescript виконує PRAGMA до кінця (execute звільняє одну сторінку)
+            await db.executescript(f"PRAGMA incremental_vacuum({max(1, int(pages))})")
+        cursor = await db.execute("PRAGMA freelist_count")
+        (after,) = await cursor.fetchone()
+        return before - after, after
+
+
+async def optimize_database() -> None:
+    """Оновлення статистики планувальника запитів після великих змін."""
+    async with _connect() as db:
+        await db.execute("PRAGMA optimize")
+
+
+async def enable_incremental_vacuum() -> None:
+    """Переведення наявної БД у режим auto_vacuum = INCREMENTAL.
+    
+    Потребує повного VACUUM: файл переписується, запис блокується на весь
+    час, тож запускати на зупиненому боті.
+    """
+    async with _connect() as db:
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("VACUUM")
+
+
+# ============= ПІДПИСКИ =============
+
+def _time_text(value: datetime) -> str:
+    """Місцевий час з точністю до секунди: next_run порівнюється як рядок."""
+    return value.isoformat(sep=" ", timespec="seconds")
+
+
+def _parse_subscription(row) -> Subscription:
+    return Subscription(
+        id=row["id"],
+        user_id=row["user_id"],
+        water_type=WaterType(row["water_type"]),
+        quantity=row["quantity"],
+        payment_method=row["payment_method"],
+        interval_days=row["interval_days"],
+        next_run=datetime.fromisoformat(row["next_run"]),
+        comment=row["comment"],
+    )
+
+
+async def get_subscription(user_id: int) -> Subscription | None:
+    """Підписка клієнта (users.id)."""
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute("SELECT * FROM subscriptions WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        return _parse_subscription(row) if row else None
+
+
+async def save_subscription(
+    user_id: int,
+    water_type: WaterType,
+    quantity: int,
+    payment_method: str,
+    comment: str | None,
+    interval_days: int,
+    next_run: datetime,
+) -> Subscription:
+    """Створення або заміна підписки клієнта."""
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        await db.execute(
+            """INSERT INTO subscriptions (user_id, water_type, quantity, payment_method, comment,
+                                          interval_days, next_run)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (user_id) DO UPDATE SET
+                   water_type = excluded.water_type, quantity = excluded.quantity,
+                   payment_method = excluded.payment_method, comment = excluded.comment,
+                   interval_days = excluded.interval_days, next_run = excluded.next_run""",
+            (user_id, water_type.value, quantity, payment_method, comment, interval_days, _time_text(next_run))
+        )
+        cursor = await db.execute("SELECT * FROM subscriptions WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        await db.commit()
+        return _parse_subscription(row)
+
+
+async def delete_subscription(user_id: int) -> bool:
+    """Скасування підписки клієнта; False — підписки не було."""
+    async with _connect() as db:
+        cursor = await db.execute("DELETE FROM subscriptions WHERE user_id = ?", (user_id,))
+        await db.commit()
+        return cursor.rowcount > 0
+
+
+async def iter_due_subscriptions(until: datetime) -> AsyncIterator[tuple[int, datetime]]:
+    """(id, next_run) підписок із запуском до until, включно з пропущеними, за часом.
+    
+    Читання йде діапазоном індексу next_run: вартість залежить від кількості
+    найближчих запусків, а не від усіх підписок.
+    """
+    async with _connect() as db:
+        async with db.execute(
+            "SELECT id, next_run FROM subscriptions WHERE next_run < ? ORDER BY next_run",
+            (_time_text(until),)
+        ) as cursor:
+            cursor.arraysize = FETCH_BATCH
+            async for row in cursor:
+                yield row[0], datetime.fromisoformat(row[1])
+
+
+async def get_subscription_with_user(subscription_id: int) -> tuple[Subscription, User] | None:
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute("SELECT * FROM subscriptions WHERE id = ?", (subscription_id,))
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        subscription = _parse_subscription(row)
+        cursor = await db.execute("SELECT * FROM users WHERE id = ?", (subscription.user_id,))
+        return subscription, _parse_user(await cursor.fetchone())
+
+
+async def create_subscription_order(subscription: Subscription, total_price: int, next_run: datetime) -> Order | None:
+    """Замовлення за підпискою і перенесення її на next_run однією транзакцією.
+    
+    Спрацьовує, лише якщо підписка досі запланована на subscription.next_run:
+    скасована чи змінена після читання, або вже виконана, вона повертає None,
+    тож повторний запуск не створить дубля.
+    """
+    async with _connect() as db:
+        cursor = await db.execute(
+            "UPDATE subscriptions SET next_run = ? WHERE id = ? AND next_run = ?",
+            (_time_text(next_run), subscription.id, _time_text(subscription.next_run))
+        )
+        if cursor.rowcount == 0:
+            return None
+        order, entry = await _insert_order(
+            db, subscription.user_id, subscription.water_type, subscription.quantity, total_price,
+            subscription.payment_method, subscription.comment, None, EventSource.SYSTEM
+        )
+        await db.commit()
+    
+    _order_created(order, entry)
+    return order
+
+
+# ============= ПРОГНОЗ ПОВТОРНИХ ЗАМОВЛЕНЬ =============
+
+# Прогноз для всіх клієнтів одним запитом. Замовлення вікна групуються за
+# клієнтом, останнє позначає віконна функція: пляшки всіх замовлень, крім
+# останнього, випиті між першим і останнім — звідси швидкість споживання,
+# а останнє замовлення закінчиться через quantity / швидкість
+_FORECAST_SELECT = f"""
+    SELECT user_id, orders,
+           (bottles - last_quantity) / (last_day - first_day) AS daily_bottles,
+           last_order_at,
+           datetime(last_day + last_quantity * (last_day - first_day) / (bottles - last_quantity)) AS next_order_at
+    FROM (SELECT user_id, COUNT(*) AS orders, SUM(quantity) AS bottles,
+                 MIN(day) AS first_day, MAX(day) AS last_day, MAX(created_at) AS last_order_at,
+                 SUM(CASE WHEN is_last THEN quantity END) AS last_quantity
+          FROM (SELECT user_id, quantity, created_at, julianday(created_at) AS day,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) = 1 AS is_last
+                FROM {_ALL_ORDERS}
+                WHERE created_at >= ? AND status != 'cancelled')
+          GROUP BY user_id
+          HAVING COUNT(*) >= ? AND MAX(day) > MIN(day))"""
+
+
+def _parse_forecast(row) -> OrderForecast:
+    return OrderForecast(
+        user_id=row["id"],
+        orders=row["f_orders"],
+        daily_bottles=row["f_daily_bottles"],
+        last_order_at=_local_time(row["f_last_order_at"]),
+        next_order_at=_local_time(row["f_next_order_at"]),
+    )
+
+
+async def rebuild_order_forecasts(since: datetime, min_orders: int) -> int:
+    """Перерахунок прогнозів за замовленнями з since; повертає кількість клієнтів.
+    
+    Розрахунок іде в тимчасову таблицю лише читанням (у режимі WAL обробники
+    тим часом пишуть), запис блокується тільки на її перенесення. Клієнти,
+    що випали з прогнозу, видаляються; позначка нагадування решти лишається.
+    """
+    computed_at = _utc_text(datetime.now())
+    async with _connect() as db:
+        await db.execute(
+            f"CREATE TEMP TABLE new_forecasts AS {_FORECAST_SELECT}",
+            (_utc_text(since), min_orders)
+        )
+        await db.execute(
+            """INSERT INTO order_forecasts (user_id, orders, daily_bottles, last_order_at,
+                                            next_order_at, computed_at)
+               SELECT user_id, orders, daily_bottles, last_order_at, next_order_at, ?
+               FROM new_forecasts WHERE true
+               ON CONFLICT (user_id) DO UPDATE SET
+                   orders = excluded.orders, daily_bottles = excluded.daily_bottles,
+                   last_order_at = excluded.last_order_at, next_order_at = excluded.next_order_at,
+                   computed_at = excluded.computed_at""",
+            (computed_at,)
+        )
+        await db.execute("DELETE FROM order_forecasts WHERE computed_at != ?", (computed_at,))
+        cursor = await db.execute("SELECT COUNT(*) FROM new_forecasts")
+        (count,) = await cursor.fetchone()
+        await db.commit()
+        return count
+
+
+async def get_due_reminders(since: datetime, until: datetime, limit: int) -> list[tuple[OrderForecast, User]]:
+    """Клієнти без нагадування, чиє замовлення за прогнозом припадає на [since, until).
+    
+    Пропускаються клієнти з підпискою і ті, хто замовив після розрахунку
+    прогнозу; читання діапазоном індексу next_order_at.
+    """
+    async with _connect() as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute(
+            """SELECT u.*, f.orders AS f_orders, f.daily_bottles AS f_daily_bottles,
+                      f.last_order_at AS f_last_order_at, f.next_order_at AS f_next_order_at
+               FROM order_forecasts f
+               JOIN users u ON u.id = f.user_id
+               WHERE f.next_order_at >= ? AND f.next_order_at < ?
+                 AND (f.reminded_at IS NULL OR f.reminded_at < f.last_order_at)
+                 AND NOT EXISTS (SELECT 1 FROM subscriptions s WHERE s.user_id = f.user_id)
+                 AND NOT EXISTS (SELECT 1 FROM orders o
+                                 WHERE o.user_id = f.user_id AND o.created_at > f.last_order_at
+                                   AND o.status != 'cancelled')
+               ORDER BY f.next_order_at
+               LIMIT ?""",
+            (_utc_text(since), _utc_text(until), limit)
+        )
+        return [(_parse_forecast(row), _parse_user(row)) for row in await cursor.fetchall()]
+
+
+async def mark_reminded(user_ids: list[int]) -> None:
+    """Позначка нагадування: до наступного замовлення клієнт його більше не отримає."""
+    async with _connect() as db:
+        await db.execute(
+            f"""UPDATE order_forecasts SET reminded_at = CURRENT_TIMESTAMP
+                WHERE user_id IN ({', '.join('?' for _ in user_ids)})""",
+            user_ids
+        )
+        await db.commit()
@@ -0,0 +1,236 @@
+"""Експорт замовлень з даними клієнтів у CSV або XLSX для бухгалтерії.
+
+Рядки читаються з БД курсором пачками і дописуються у файл в окремому
+потоці, тож пам'ять не залежить від кількості замовлень, а цикл подій
+не блокується. XLSX пишеться потоком у zip без сторонніх бібліотек.
+
+Запуск з директорії бота:
+    python -m export --since 2026-09-01 --until 2026-09-30 --format xlsx --status completed
+"""
+
+import argparse
+import asyncio
+import csv
+import re
+import sys
+import zipfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import database
+from database import FETCH_BATCH, Order, OrderStatus, User, WATER_TYPE_NAMES, utc_to_local
+
+FORMATS = ("csv", "xlsx")
+
+COLUMNS = [
+    "Замовлення", "Створено", "Статус", "Вода", "Кількість", "Сума, ₴", "Оплата", "Коментар",
+    "Підтверджено", "Виїзд", "Завершено", "Оцінка", "Відгук",
+    "Telegram ID", "Клієнт", "Телефон", "Адреса",
+]
+
+STATUS_NAMES = {
+    OrderStatus.PENDING: "Очікує",
+    OrderStatus.CONFIRMED: "Підтверджено",
+    OrderStatus.DELIVERING: "У доставці",
+    OrderStatus.COMPLETED: "Виконано",
+    OrderStatus.CANCELLED: "Скасовано",
+}
+
+
+def _time(value: datetime | None) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def order_row(order: Order, user: User) -> list:
+    return [
+        order.id,
+        _time(utc_to_local(order.created_at)),
+        STATUS_NAMES[order.status],
+        WATER_TYPE_NAMES.get(order.water_type, order.water_type.value),
+        order.quantity,
+        order.total_price,
+        order.payment_method,
+        order.comment or "",
+        _time(order.confirmed_at),
+        _time(order.delivered_at),
+        _time(order.completed_at),
+        order.rating if order.rating is not None else "",
+        order.feedback or "",
+        user.telegram_id,
+        user.full_name,
+        user.phone,
+        user.address,
+    ]
+
+
+# Початок клітинки, з якого Excel читає формулу: текст клієнтів
+# (коментар, відгук, ім'я, адреса) виконався б при відкритті CSV
+_FORMULA_START = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    """Текст, що почався б як формула, — з апострофом, тобто як текст."""
+    if isinstance(value, str) and value.startswith(_FORMULA_START):
+        return "'" + value
+    return value
+
+
+class CsvWriter:
+    """CSV для Excel: BOM, щоб кирилиця відкрилась правильно, і «;» як роздільник.
+
+    XLSX від формул захищений сам: текст пишеться як inlineStr.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file, delimiter=";")
+        self._writer.writerow(COLUMNS)
+
+    def write_rows(self, rows: list[list]) -> None:
+        self._writer.writerows([_csv_cell(value) for value in row] for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Символи, заборонені в XML (можуть трапитись у коментарях клієнтів)
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Замовлення" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxWriter:
+    """Мінімальна книга XLSX з одним аркушем, що дописується рядками."""
+
+    def __init__(self, path: Path):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_PARTS.items():
+            self._zip.writestr(name, '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + content)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self.write_rows([COLUMNS])
+
+    def write_rows(self, rows: list[list]) -> None:
+        self._sheet.write("".join(
+            "<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>" for row in rows
+        ).encode())
+
+    def close(self) -> None:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter}
+
+
+async def export_orders(
+    path: Path,
+    fmt: str = "xlsx",
+    since: date | None = None,
+    until: date | None = None,
+    statuses: list[OrderStatus] | None = None,
+) -> int:
+    """Запис замовлень, створених з since по until включно, у файл; повертає кількість рядків."""
+    start = datetime.combine(since, time.min) if since else None
+    end = datetime.combine(until + timedelta(days=1), time.min) if until else None
+
+    writer = await asyncio.to_thread(WRITERS[fmt], path)
+    count = 0
+    try:
+        batch = []
+        async for order, user in database.iter_orders_with_users(start, end, statuses):
+            batch.append(order_row(order, user))
+            if len(batch) >= FETCH_BATCH:
+                await asyncio.to_thread(writer.write_rows, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(writer.write_rows, batch)
+            count += len(batch)
+    finally:
+        await asyncio.to_thread(writer.close)
+    return count
+
+
+def previous_month(today: date | None = None) -> tuple[date, date]:
+    """Перший і останній день попереднього місяця."""
+    first_of_month = (today or date.today()).replace(day=1)
+    until = first_of_month - timedelta(days=1)
+    return until.replace(day=1), until
+
+
+def parse_period(value: str) -> tuple[date, date]:
+    """YYYY-MM (весь місяць) або YYYY-MM-DD (один день)."""
+    if re.fullmatch(r"\d{4}-\d{2}", value):
+        since = date.fromisoformat(f"{value}-01")
+        next_month = (since + timedelta(days=32)).replace(day=1)
+        return since, next_month - timedelta(days=1)
+    day = date.fromisoformat(value)
+    return day, day
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="перший день (за замовчуванням — попередній місяць)")
+    parser.add_argument("--until", type=date.fromisoformat, help="останній день включно")
+    parser.add_argument("--format", choices=FORMATS, default="xlsx")
+    parser.add_argument("--status", action="append", choices=[status.value for status in OrderStatus],
+                        help="лише замовлення з цим статусом (можна кілька разів)")
+    parser.add_argument("--database", type=Path, default=database.DATABASE_PATH)
+    parser.add_argument("-o", "--output", type=Path)
+    args = parser.parse_args()
+
+    since, until = args.since, args.until
+    if since is None and until is None:
+        since, until = previous_month()
+    output = args.output or Path(f"orders_{since or 'start'}_{until or 'now'}.{args.format}")
+    statuses = [OrderStatus(value) for value in args.status] if args.status else None
+
+    database.DATABASE_PATH = args.database
+    count = asyncio.run(export_orders(output, args.format, since, until, statuses))
+    print(f"{output}: {count} замовлень")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,18 +2,24 @@
 
 from aiogram import Router
 
+from .routing import routes
 from .common import router as common_router
 from .registration import router as registration_router
 from .orders import router as orders_router
 from .admin import router as admin_router
+from .courier import router as courier_router
 
 
 def setup_routers() -> Router:
     """Настройка всех роутеров."""
     router = Router()
+    # Кнопки и callback-запросы из индекса проверяются первыми,
+    # команды и свободный ввод в состояниях FSM - в роутерах модулей
+    router.include_router(routes.as_router(name="route_index"))
     router.include_router(common_router)
     router.include_router(registration_router)
     router.include_router(orders_router)
     router.include_router(admin_router)
+    router.include_router(courier_router)
     return router
 
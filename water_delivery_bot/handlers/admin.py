@@ -1,11 +1,17 @@
 """Обробники для адміністраторів."""
 
+import asyncio
 import logging
+import os
 import random
-from datetime import datetime
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+import tempfile
+from datetime import date, datetime, timedelta
+from html import escape
+from pathlib import Path
+from aiogram import Bot, F, Router
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 
 from database import (
@@ -15,12 +21,45 @@ from database import (
     get_all_users,
     get_user,
     set_user_price,
+    get_users_segment,
+    search_users,
+    search_terms,
+    apply_price_changes,
+    get_order_stats,
+    get_hourly_order_stats,
+    rebuild_order_stats,
+    get_bottle_balance,
+    get_bottle_balances,
+    adjust_bottles,
+    mark_orders_paid,
+    utc_to_local,
+    EventSource,
+    OrderStats,
     OrderStatus,
+    User,
+    WaterType,
     WATER_TYPE_NAMES
 )
-from keyboards import admin_order_keyboard, users_list_keyboard, admin_menu_keyboard, order_complete_keyboard
+from keyboards import (
+    admin_order_keyboard, users_list_keyboard, admin_menu_keyboard, order_complete_keyboard, empties_keyboard,
+    stats_keyboard, STATS_PERIOD_NAMES, bulk_price_confirm_keyboard, users_search_keyboard, payments_confirm_keyboard,
+)
 from states import AdminStates
-from config import Config
+from config import Config, ConfigStore
+import profiler
+import export
+import backup
+import bulk_prices
+import bottles
+import payments
+import couriers
+from route_planner import Run, plan_routes
+from slots import slot_label
+from callbacks import (
+    AdminAction, AdminOrderCallback, UsersPageCallback, SetPriceCallback, StatsCallback, StatsPeriod,
+    FindUsersCallback,
+)
+from .routing import routes
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -75,8 +114,12 @@ def is_admin(user_id: int, config: Config) -> bool:
 
 def format_time_diff(created_at: datetime, action_at: datetime) -> str:
     """Форматування різниці в часі."""
-    diff = action_at - created_at
-    total_seconds = int(diff.total_seconds())
+    return format_duration((action_at - created_at).total_seconds())
+
+
+def format_duration(seconds: float) -> str:
+    """Форматування тривалості в секундах."""
+    total_seconds = int(seconds)
     
     if total_seconds < 60:
         return f"{total_seconds} сек"
@@ -106,7 +149,7 @@ async def admin_panel(message: Message, config: Config):
     )
 
 
-@router.callback_query(F.data == "admin_menu_back")
+@routes.callback("admin_menu_back")
 async def back_to_admin_menu(callback: CallbackQuery, state: FSMContext, config: Config):
     """Повернення до головного меню адміна."""
     if not is_admin(callback.from_user.id, config):
@@ -124,7 +167,7 @@ async def back_to_admin_menu(callback: CallbackQuery, state: FSMContext, config:
 
 # ============= ЗАМОВЛЕННЯ =============
 
-@router.callback_query(F.data == "admin_menu_orders")
+@routes.callback("admin_menu_orders")
 async def admin_orders(callback: CallbackQuery, config: Config):
     """Перегляд замовлень."""
     if not is_admin(callback.from_user.id, config):
@@ -154,6 +197,9 @@ async def admin_orders(callback: CallbackQuery, config: Config):
         OrderStatus.DELIVERING: "🚗 У доставці",
     }
     
+    # Тара клієнтів одним запитом на весь список
+    balances = await get_bottle_balances([user.id for _, user in orders])
+    
     for order, user in orders:
         water_name = WATER_TYPE_NAMES.get(order.water_type, "Вода")
         status_text = status_icons.get(order.status, str(order.status.value))
@@ -163,24 +209,395 @@ async def admin_orders(callback: CallbackQuery, config: Config):
         if order.confirmed_at:
             time_diff = format_time_diff(order.created_at, order.confirmed_at)
             time_info = f"\n⏱️ Підтверджено за: {time_diff}"
+        courier_info = f"\n🚚 Кур'єр: <code>{order.courier_id}</code>" if order.courier_id else ""
+        paid_info = ""
+        if order.paid_at:
+            paid_info = f" · ✅ оплачено {order.paid_at.strftime('%d.%m %H:%M')}"
+        elif order.payment_method == config.transfer_payment_method:
+            paid_info = " · ⏳ переказ не надійшов"
+        slot_info = f"🕐 {slot_label(order.delivery_slot)}\n" if order.delivery_slot else ""
         
         await callback.message.answer(
             f"<b>Замовлення #{order.id}</b> {status_text}\n\n"
             f"👤 {user.full_name}\n"
             f"📱 {user.phone}\n"
-            f"📍 {user.address}\n\n"
+            f"📍 {user.address}\n"
+            f"♻️ Тара у клієнта: {balances[user.id].held} пл.\n\n"
             f"💧 {water_name}\n"
             f"📦 {order.quantity} пл.\n"
             f"💵 {order.total_price} ₴\n"
-            f"💳 {order.payment_method}\n"
+            f"💳 {order.payment_method}{paid_info}\n"
+            f"{slot_info}"
             f"💬 {order.comment or 'без коментаря'}\n"
             f"📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}"
-            f"{time_info}",
+            f"{time_info}{courier_info}",
             reply_markup=admin_order_keyboard(order.id, order.status),
             parse_mode="HTML"
         )
 
 
+# ============= МАРШРУТИ =============
+
+# Межа тексту повідомлення з запасом до ліміту Telegram (4096)
+MESSAGE_LIMIT = 4000
+
+
+def join_chunks(lines: list[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Рядки, зібрані в повідомлення не довші за limit."""
+    chunks = [""]
+    for line in lines:
+        if chunks[-1] and len(chunks[-1]) + len(line) + 1 > limit:
+            chunks.append("")
+        chunks[-1] += line + "\n"
+    return chunks
+
+
+def render_run(number: int, run: Run) -> list[str]:
+    """Повідомлення з рейсом: зупинки в порядку об'їзду."""
+    lines = [
+        f"🚚 <b>Рейс {number}</b>: {len(run.stops)} зуп., {run.bottles} пл., ~{run.distance_km:.1f} км\n"
+    ]
+    for position, stop in enumerate(run.stops, 1):
+        lines.append(
+            f"{position}. #{stop.order.id} {escape(stop.user.address)} — "
+            f"{stop.order.quantity} пл., {stop.user.phone}"
+        )
+    return join_chunks(lines)
+
+
+@routes.callback("admin_menu_routes")
+async def admin_routes(callback: CallbackQuery, config: Config):
+    """Рейси кур'єрів для підтверджених замовлень."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    orders = [
+        (order, user) for order, user in await get_all_pending_orders()
+        if order.status == OrderStatus.CONFIRMED
+    ]
+    
+    if not orders:
+        await callback.message.edit_text(
+            "🗺 <b>Маршрути</b>\n\n"
+            "Немає підтверджених замовлень.",
+            reply_markup=admin_menu_keyboard(),
+            parse_mode="HTML"
+        )
+        return
+    
+    # Розрахунок — у потоці, щоб великий план не затримував інші оновлення
+    plan = await asyncio.to_thread(plan_routes, orders, config.run_capacity, config.depot_location)
+    
+    await callback.message.edit_text(
+        f"🗺 <b>Маршрути</b>\n\n"
+        f"✅ Підтверджених замовлень: {len(orders)}\n"
+        f"🚚 Рейсів: {len(plan.runs)} (до {config.run_capacity} пл.), ~{plan.distance_km:.1f} км\n"
+        f"❓ Без геолокації: {len(plan.unlocated)}",
+        reply_markup=admin_menu_keyboard(),
+        parse_mode="HTML"
+    )
+    
+    for number, run in enumerate(plan.runs, 1):
+        for text in render_run(number, run):
+            await callback.message.answer(text, parse_mode="HTML")
+    
+    if plan.unlocated:
+        lines = ["❓ <b>Без геолокації</b> (розподіліть вручну)\n"]
+        lines += [
+            f"#{order.id} {escape(user.address)} — {order.quantity} пл., {user.phone}"
+            for order, user in plan.unlocated
+        ]
+        for text in join_chunks(lines):
+            await callback.message.answer(text, parse_mode="HTML")
+
+
+# ============= КУР'ЄРИ =============
+
+@routes.callback("admin_menu_couriers")
+async def admin_couriers(callback: CallbackQuery, config: Config):
+    """Завантаження кур'єрів і черга замовлень без кур'єра."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    if not config.couriers:
+        await callback.message.edit_text(
+            "🚚 <b>Кур'єри</b>\n\n"
+            "Кур'єрів не задано — замовлення розвозять адміни.\n"
+            "Додайте їх у COURIERS (див. env.example).",
+            reply_markup=admin_menu_keyboard(),
+            parse_mode="HTML"
+        )
+        return
+    
+    pool = await couriers.current_pool(callback.bot, config)
+    
+    text = "🚚 <b>Кур'єри</b>\n\n"
+    for load in sorted(pool.loads(), key=lambda load: load.key()):
+        zone = "усе місто"
+        if load.courier.zone is not None:
+            zone = f"район {load.courier.zone[0]:.4f}, {load.courier.zone[1]:.4f}"
+        text += (
+            f"<code>{load.courier.telegram_id}</code> — {load.bottles}/{load.courier.capacity} пл., "
+            f"замовлень: {load.orders} ({zone})\n"
+        )
+    text += f"\n⏳ Чекають вільного кур'єра: {pool.waiting}"
+    
+    await callback.message.edit_text(text, reply_markup=admin_menu_keyboard(), parse_mode="HTML")
+
+
+# ============= СТАТИСТИКА =============
+
+STATS_PERIOD_DAYS = {
+    StatsPeriod.TODAY: 1,
+    StatsPeriod.WEEK: 7,
+    StatsPeriod.MONTH: 30,
+}
+
+
+async def render_stats(period: StatsPeriod) -> str:
+    """Текст екрана статистики з підсумкових таблиць (без перегляду замовлень)."""
+    until = date.today()
+    since = until - timedelta(days=STATS_PERIOD_DAYS[period] - 1)
+    rows = await get_order_stats(since, until)
+    
+    total = OrderStats()
+    by_water: dict[str, OrderStats] = {}
+    by_payment: dict[str, OrderStats] = {}
+    for water_type, payment_method, stats in rows:
+        total.add(stats)
+        by_water.setdefault(water_type, OrderStats()).add(stats)
+        by_payment.setdefault(payment_method, OrderStats()).add(stats)
+    
+    dates = since.strftime("%d.%m.%Y") if since == until else f"{since:%d.%m} – {until:%d.%m.%Y}"
+    text = f"📊 <b>Статистика: {STATS_PERIOD_NAMES[period].lower()}</b> ({dates})\n\n"
+    if not total.orders:
+        return text + "Замовлень за цей період немає."
+    
+    text += (
+        f"📦 Замовлень: <b>{total.orders}</b> (виконано: {total.completed}, скасовано: {total.cancelled})\n"
+        f"💧 Пляшок: <b>{total.bottles}</b>\n"
+        f"💵 Виручка: <b>{total.revenue} ₴</b>\n"
+    )
+    if total.avg_rating is not None:
+        text += f"⭐ Середня оцінка: <b>{total.avg_rating:.1f}</b> ({total.rated} оцінок)\n"
+    if total.avg_confirm_seconds is not None:
+        text += f"⏱️ Підтвердження в середньому: {format_duration(total.avg_confirm_seconds)}\n"
+    if total.avg_delivery_seconds is not None:
+        text += f"🚗 Доставка в середньому: {format_duration(total.avg_delivery_seconds)}\n"
+    
+    text += "\n<b>За типом води:</b>\n"
+    for water_type, stats in sorted(by_water.items(), key=lambda item: -item[1].orders):
+        name = WATER_TYPE_NAMES.get(WaterType(water_type), water_type)
+        text += f"• {name}: {stats.orders} зам., {stats.bottles} пл., {stats.revenue} ₴\n"
+    
+    text += "\n<b>За способом оплати:</b>\n"
+    for payment_method, stats in sorted(by_payment.items(), key=lambda item: -item[1].orders):
+        text += f"• {payment_method}: {stats.orders} зам., {stats.revenue} ₴\n"
+    
+    if period == StatsPeriod.TODAY:
+        hours = await get_hourly_order_stats(until)
+        if hours:
+            hour, stats = max(hours.items(), key=lambda item: item[1].orders)
+            text += f"\n🕐 Найбільше замовлень: {hour:02d}:00–{hour + 1:02d}:00 ({stats.orders})"
+    
+    return text
+
+
+@router.message(Command("stats"))
+async def admin_stats_command(message: Message, config: Config):
+    """Статистика продажів і доставки (команда)."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    await message.answer(
+        await render_stats(StatsPeriod.TODAY),
+        reply_markup=stats_keyboard(StatsPeriod.TODAY),
+        parse_mode="HTML"
+    )
+
+
+@routes.callback(StatsCallback)
+async def admin_stats(callback: CallbackQuery, callback_data: StatsCallback, config: Config):
+    """Статистика за обраний період."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    try:
+        await callback.message.edit_text(
+            await render_stats(callback_data.period),
+            reply_markup=stats_keyboard(callback_data.period),
+            parse_mode="HTML"
+        )
+    except TelegramBadRequest as e:
+        # Повторне натискання того ж періоду без нових замовлень
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
+
+
+@router.message(Command("rebuild_stats"))
+async def admin_rebuild_stats(message: Message, config: Config):
+    """Перерахунок статистики з усіх замовлень (після ручних змін у БД)."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    started = datetime.now()
+    count = await rebuild_order_stats()
+    logger.info(f"Статистику перераховано адміном {message.from_user.id}: {count} замовлень")
+    await message.answer(
+        f"📊 Статистику перераховано: {count} замовлень за "
+        f"{(datetime.now() - started).total_seconds():.1f} с"
+    )
+
+
+@router.message(Command("bottles"))
+async def admin_bottles(message: Message, command: CommandObject, config: Config):
+    """Звірка балансів тари з журналом; з аргументами — виправлення балансу клієнта."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    if command.args:
+        try:
+            telegram_id, delta = (int(part) for part in command.args.split())
+        except ValueError:
+            await message.answer(
+                "Формат: <code>/bottles telegram_id ±N</code>\n"
+                "Наприклад, <code>/bottles 123456789 2</code> — у клієнта на 2 пляшки більше.",
+                parse_mode="HTML"
+            )
+            return
+        
+        balance = await adjust_bottles(telegram_id, delta, message.from_user.id)
+        if balance is None:
+            await message.answer("❌ Користувача не знайдено")
+            return
+        
+        logger.info(f"Тару клієнта {telegram_id} виправлено адміном {message.from_user.id}: {delta:+d}")
+        await message.answer(f"♻️ Тара клієнта <code>{telegram_id}</code>: {balance.held} пл.", parse_mode="HTML")
+        return
+    
+    report = await bottles.reconcile()
+    if not report.ok:
+        logger.warning(f"Баланси тари розходяться з журналом: {len(report.mismatches)} клієнтів")
+    await message.answer(
+        f"♻️ <b>Тара</b>\n\n<pre>{escape(bottles.format_report(report))}</pre>",
+        parse_mode="HTML"
+    )
+
+
+# ============= ЕКСПОРТ =============
+
+# Обмеження Bot API на розмір документа, що надсилає бот
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+EXPORT_USAGE = (
+    "Формат: <code>/export [період] [по] [csv|xlsx] [статуси]</code>\n"
+    "Період — <code>2026-09</code> (місяць) або <code>2026-09-01</code> (день), "
+    "за замовчуванням попередній місяць.\n"
+    "Статуси: " + ", ".join(f"<code>{status.value}</code>" for status in OrderStatus)
+)
+
+
+def parse_export_args(args: str | None) -> tuple[date, date, str, list[OrderStatus]]:
+    """Аргументи /export: періоди, формат і статуси в довільному порядку."""
+    periods, fmt, statuses = [], "xlsx", []
+    for token in (args or "").split():
+        token = token.lower()
+        if token in export.FORMATS:
+            fmt = token
+        elif token in {status.value for status in OrderStatus}:
+            statuses.append(OrderStatus(token))
+        else:
+            try:
+                periods.append(export.parse_period(token))
+            except ValueError:
+                raise ValueError(f"Не вдалося розпізнати «{token}»") from None
+    if len(periods) > 2:
+        raise ValueError("Забагато дат")
+    since, until = export.previous_month() if not periods else (periods[0][0], periods[-1][1])
+    if since > until:
+        raise ValueError("Початок періоду пізніше за кінець")
+    return since, until, fmt, statuses
+
+
+@router.message(Command("export"))
+async def admin_export(message: Message, command: CommandObject, config: Config):
+    """Вивантаження замовлень з даними клієнтів для бухгалтерії."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    try:
+        since, until, fmt, statuses = parse_export_args(command.args)
+    except ValueError as e:
+        await message.answer(f"❌ {e}\n\n{EXPORT_USAGE}", parse_mode="HTML")
+        return
+    
+    period = f"{since:%d.%m.%Y}" if since == until else f"{since:%d.%m.%Y} – {until:%d.%m.%Y}"
+    await message.answer(f"⏳ Формую експорт за {period}...")
+    
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        count = await export.export_orders(Path(path), fmt, since, until, statuses)
+        size = os.path.getsize(path)
+        if size > EXPORT_MAX_BYTES:
+            await message.answer(
+                f"❌ Файл завеликий для Telegram ({size / 2**20:.0f} МБ). "
+                "Оберіть коротший період або скористайтесь <code>python -m export</code> на сервері.",
+                parse_mode="HTML"
+            )
+            return
+        
+        status_text = f", статуси: {', '.join(status.value for status in statuses)}" if statuses else ""
+        await message.answer_document(
+            FSInputFile(path, filename=f"orders_{since:%Y%m%d}_{until:%Y%m%d}.{fmt}"),
+            caption=f"📤 Замовлення за {period}{status_text}: {count}",
+        )
+        logger.info(f"Експорт {count} замовлень адміном {message.from_user.id}")
+    finally:
+        os.unlink(path)
+
+
+# ============= РЕЗЕРВНІ КОПІЇ =============
+
+def format_size(size: int) -> str:
+    return f"{size / 2**20:.1f} МБ" if size >= 2**20 else f"{size / 1024:.0f} КБ"
+
+
+@router.message(Command("backup"))
+async def admin_backup(message: Message, config: Config):
+    """Резервна копія БД без зупинки бота."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    await message.answer("⏳ Створюю резервну копію...")
+    try:
+        report = await backup.backup_database()
+    except Exception as e:
+        logger.error(f"Помилка резервного копіювання: {e}")
+        await message.answer(f"❌ Не вдалося створити копію: {e}")
+        return
+    
+    logger.info(f"Резервна копія {report.path.name} адміном {message.from_user.id}")
+    restarts_text = f"\n🔁 Починалась спочатку через записи: {report.restarts}" if report.restarts else ""
+    await message.answer(
+        f"✅ <b>Резервну копію створено</b> за {report.seconds:.1f} с\n\n"
+        f"📄 <code>{report.path.name}</code>\n"
+        f"💾 БД: {format_size(report.database_bytes)} → стиснуто {format_size(report.backup_bytes)}\n"
+        f"✔️ PRAGMA quick_check: ok{restarts_text}\n"
+        f"🗂 Зберігається копій: {report.kept}",
+        parse_mode="HTML"
+    )
+
+
 # ============= ЦІНИ КЛІЄНТІВ =============
 
 @router.message(Command("prices"))
@@ -193,7 +610,7 @@ async def admin_prices_command(message: Message, config: Config):
     await show_prices_list(message, config)
 
 
-@router.callback_query(F.data == "admin_menu_prices")
+@routes.callback("admin_menu_prices")
 async def admin_prices(callback: CallbackQuery, config: Config):
     """Управління цінами користувачів."""
     if not is_admin(callback.from_user.id, config):
@@ -218,7 +635,8 @@ async def show_prices_list(message: Message, config: Config, edit: bool = False)
     text = (
         f"💰 <b>Ціни клієнтів ({len(users)})</b>\n\n"
         f"Ціна за замовчуванням: <b>{config.default_bottle_price} ₴</b>\n\n"
-        "Оберіть клієнта для встановлення індивідуальної ціни:"
+        "Оберіть клієнта для встановлення індивідуальної ціни\n"
+        "або знайдіть його: <code>/find ім'я, телефон чи вулиця</code>"
     )
     
     if edit:
@@ -227,9 +645,67 @@ async def show_prices_list(message: Message, config: Config, edit: bool = False)
         await message.answer(text, reply_markup=users_list_keyboard(users), parse_mode="HTML")
 
 
+# ============= ПОШУК КЛІЄНТІВ =============
+
+FIND_PER_PAGE = 10
+# Запит іде в callback_data (до 64 байт разом з префіксом і сторінкою)
+FIND_QUERY_BYTES = 48
+
+FIND_USAGE = (
+    "🔍 <b>Пошук клієнтів</b>\n\n"
+    "<code>/find Петренко</code>, <code>/find 050 123</code>, <code>/find Сумська 12</code>\n\n"
+    "Шукає за початком слів в імені, телефоні та адресі."
+)
+
+
+async def render_user_search(query: str, page: int):
+    """Текст і клавіатура сторінки результатів пошуку."""
+    # Зайвий рядок показує, чи є наступна сторінка
+    users = await search_users(query, FIND_PER_PAGE + 1, page * FIND_PER_PAGE)
+    has_next = len(users) > FIND_PER_PAGE
+    users = users[:FIND_PER_PAGE]
+    
+    text = f"🔍 <b>Пошук: {escape(query)}</b>\n\n"
+    if not users:
+        return text + "Нічого не знайдено.", None
+    
+    for number, user in enumerate(users, start=page * FIND_PER_PAGE + 1):
+        text += f"{number}. <b>{escape(user.full_name)}</b> — {escape(user.phone)}, {escape(user.address)}\n"
+    text += "\nОберіть клієнта для встановлення ціни:"
+    return text, users_search_keyboard(users, query, page, has_next)
+
+
+@router.message(Command("find"))
+async def admin_find(message: Message, command: CommandObject, config: Config):
+    """Пошук клієнтів за ім'ям, телефоном чи адресою."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    query = " ".join(search_terms(command.args or ""))
+    query = query.encode()[:FIND_QUERY_BYTES].decode(errors="ignore").strip()
+    if not query:
+        await message.answer(FIND_USAGE, parse_mode="HTML")
+        return
+    
+    text, keyboard = await render_user_search(query, 0)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@routes.callback(FindUsersCallback)
+async def handle_find_page(callback: CallbackQuery, callback_data: FindUsersCallback, config: Config):
+    """Навігація по сторінках результатів пошуку."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    text, keyboard = await render_user_search(callback_data.query, callback_data.page)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
 # ============= ВСІ КЛІЄНТИ =============
 
-@router.callback_query(F.data == "admin_menu_clients")
+@routes.callback("admin_menu_clients")
 async def admin_clients(callback: CallbackQuery, config: Config):
     """Перегляд всіх клієнтів."""
     if not is_admin(callback.from_user.id, config):
@@ -270,14 +746,14 @@ async def admin_clients(callback: CallbackQuery, config: Config):
 
 # ============= НАВІГАЦІЯ ПО КОРИСТУВАЧАХ =============
 
-@router.callback_query(F.data.startswith("users_page_"))
-async def handle_users_page(callback: CallbackQuery, config: Config):
+@routes.callback(UsersPageCallback)
+async def handle_users_page(callback: CallbackQuery, callback_data: UsersPageCallback, config: Config):
     """Навігація по сторінках користувачів."""
     if not is_admin(callback.from_user.id, config):
         await callback.answer("❌ Немає доступу", show_alert=True)
         return
     
-    page = int(callback.data.split("_")[2])
+    page = callback_data.page
     users = await get_all_users()
     
     await callback.message.edit_reply_markup(
@@ -285,14 +761,14 @@ async def handle_users_page(callback: CallbackQuery, config: Config):
     )
 
 
-@router.callback_query(F.data.startswith("setprice_user_"))
-async def handle_select_user_for_price(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(SetPriceCallback)
+async def handle_select_user_for_price(callback: CallbackQuery, callback_data: SetPriceCallback, state: FSMContext, config: Config):
     """Вибір користувача для встановлення ціни."""
     if not is_admin(callback.from_user.id, config):
         await callback.answer("❌ Немає доступу", show_alert=True)
         return
     
-    telegram_id = int(callback.data.split("_")[2])
+    telegram_id = callback_data.telegram_id
     user = await get_user(telegram_id)
     
     if not user:
@@ -301,13 +777,15 @@ async def handle_select_user_for_price(callback: CallbackQuery, state: FSMContex
     
     current_price = user.custom_price if user.custom_price else config.default_bottle_price
     price_type = "індивідуальна" if user.custom_price else "за замовчуванням"
+    balance = await get_bottle_balance(user.id)
     
     await state.update_data(price_user_telegram_id=telegram_id)
     await state.set_state(AdminStates.waiting_for_price)
     
     await callback.message.edit_text(
         f"👤 <b>{user.full_name}</b>\n"
-        f"📱 {user.phone}\n\n"
+        f"📱 {user.phone}\n"
+        f"♻️ Тара у клієнта: {balance.held} пл.\n\n"
         f"💰 Поточна ціна: <b>{current_price} ₴</b> ({price_type})\n\n"
         "Введіть нову ціну за пляшку (число в гривнях)\n"
         "або напишіть <b>0</b> щоб скинути до ціни за замовчуванням:",
@@ -360,9 +838,393 @@ async def process_new_price(message: Message, state: FSMContext, config: Config)
     await state.clear()
 
 
+# ============= МАСОВІ ЦІНИ =============
+
+# Файл цін читається в пам'ять цілком; тисячі клієнтів — це сотні КБ
+BULK_PRICE_MAX_BYTES = 5 * 1024 * 1024
+BULK_PRICE_PREVIEW = 15
+
+# Ключі фільтрів сегмента → параметр get_users_segment
+SEGMENT_FILTERS = {
+    "адреса": "address", "address": "address",
+    "ціна": "price", "price": "price",
+    "замовлень": "min_orders", "orders": "min_orders",
+    "днів": "ordered_within_days", "days": "ordered_within_days",
+}
+
+BULK_PRICE_USAGE = (
+    "💰 <b>Масова зміна цін</b>\n\n"
+    "<b>Файлом:</b> надішліть CSV з колонками <code>telegram_id</code> або <code>phone</code> "
+    "і <code>price</code> (0 — ціна за замовчуванням). Рядки з <code>full_name</code>, "
+    "<code>phone</code> і <code>address</code> для незареєстрованих клієнтів додадуть їх до бази.\n\n"
+    "<b>Сегментом:</b> <code>/bulkprice 140 адреса=Сумська ціна=150 замовлень=5 днів=30</code> — "
+    "нова ціна для клієнтів, що відповідають усім фільтрам "
+    "(частина адреси, поточна ціна, мінімум замовлень, замовляли за N днів).\n\n"
+    "Перед записом буде показано, що зміниться."
+)
+
+
+def _price_label(price: int | None, config: Config) -> str:
+    return f"{price} ₴" if price is not None else f"стандартна ({config.default_bottle_price} ₴)"
+
+
+def format_price_plan(plan: bulk_prices.PricePlan, config: Config) -> str:
+    """Попередній перегляд змін (dry-run)."""
+    text = (
+        "🔍 <b>Перевірка змін цін</b>\n\n"
+        f"Зміниться: <b>{len(plan.changes)}</b>\n"
+        f"Нових клієнтів: <b>{len(plan.new_customers)}</b>\n"
+        f"Без змін: {plan.unchanged}\n"
+    )
+    if plan.errors:
+        text += f"Пропущено рядків: {len(plan.errors)}\n"
+    
+    if plan.changes:
+        text += "\n"
+        for change in plan.changes[:BULK_PRICE_PREVIEW]:
+            text += (
+                f"• {escape(change.full_name)}: {_price_label(change.old_price, config)} → "
+                f"<b>{_price_label(change.new_price, config)}</b>\n"
+            )
+        if len(plan.changes) > BULK_PRICE_PREVIEW:
+            text += f"…і ще {len(plan.changes) - BULK_PRICE_PREVIEW}\n"
+    if plan.new_customers:
+        text += "\n"
+        for customer in plan.new_customers[:BULK_PRICE_PREVIEW]:
+            text += f"➕ {escape(customer.full_name)}: {_price_label(customer.price, config)}\n"
+        if len(plan.new_customers) > BULK_PRICE_PREVIEW:
+            text += f"…і ще {len(plan.new_customers) - BULK_PRICE_PREVIEW}\n"
+    if plan.errors:
+        text += "\n<b>Пропущено:</b>\n" + "\n".join(escape(error) for error in plan.errors[:10]) + "\n"
+    return text
+
+
+async def offer_price_plan(message: Message, state: FSMContext, plan: bulk_prices.PricePlan, config: Config):
+    """Показ плану і збереження його в FSM до підтвердження."""
+    if not plan.changes and not plan.new_customers:
+        await state.clear()
+        await message.answer(format_price_plan(plan, config) + "\nЗмінювати нічого.", parse_mode="HTML")
+        return
+    
+    await state.set_state(AdminStates.confirming_bulk_prices)
+    await state.update_data(
+        bulk_prices=[[change.telegram_id, change.new_price] for change in plan.changes],
+        bulk_new_users=[
+            [c.telegram_id, c.full_name, c.phone, c.address, c.price] for c in plan.new_customers
+        ],
+    )
+    await message.answer(
+        format_price_plan(plan, config),
+        reply_markup=bulk_price_confirm_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@router.message(Command("bulkprice"))
+async def admin_bulk_price(message: Message, command: CommandObject, state: FSMContext, config: Config):
+    """Масова зміна цін: файлом або для сегмента клієнтів."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    if not command.args:
+        await state.set_state(AdminStates.waiting_for_price_file)
+        await message.answer(BULK_PRICE_USAGE, parse_mode="HTML")
+        return
+    
+    price_text, *filters = command.args.split()
+    segment = {}
+    try:
+        price = bulk_prices.parse_price(price_text)
+        for item in filters:
+            key, _, value = item.partition("=")
+            name = SEGMENT_FILTERS[key.lower()]
+            segment[name] = value if name == "address" else int(value)
+    except (KeyError, ValueError):
+        await message.answer(f"❌ Не вдалося розібрати команду.\n\n{BULK_PRICE_USAGE}", parse_mode="HTML")
+        return
+    
+    users = await get_users_segment(default_price=config.default_bottle_price, **segment)
+    await offer_price_plan(message, state, bulk_prices.plan_for_segment(users, price), config)
+
+
+@router.message(AdminStates.waiting_for_price_file, F.document)
+async def process_price_file(message: Message, bot: Bot, state: FSMContext, config: Config):
+    """CSV з цінами: розбір і попередній перегляд."""
+    if not is_admin(message.from_user.id, config):
+        await state.clear()
+        return
+    
+    if message.document.file_size and message.document.file_size > BULK_PRICE_MAX_BYTES:
+        await message.answer("❌ Файл завеликий (максимум 5 МБ).")
+        return
+    
+    content = (await bot.download(message.document)).getvalue()
+    try:
+        plan = bulk_prices.plan_from_csv(content, await get_all_users())
+    except ValueError as e:
+        await message.answer(f"❌ Файл не підходить: {e}. Надішліть інший файл або /admin для виходу.")
+        return
+    
+    await offer_price_plan(message, state, plan, config)
+
+
+@routes.callback("bulkprice_apply", AdminStates.confirming_bulk_prices)
+async def apply_bulk_prices(callback: CallbackQuery, state: FSMContext, config: Config):
+    """Запис підтверджених змін однією транзакцією."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    data = await state.get_data()
+    await state.clear()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    
+    started = datetime.now()
+    updated, created = await apply_price_changes(
+        [tuple(item) for item in data.get("bulk_prices", [])],
+        [tuple(item) for item in data.get("bulk_new_users", [])],
+    )
+    elapsed = (datetime.now() - started).total_seconds()
+    logger.info(f"Масова зміна цін адміном {callback.from_user.id}: змінено {updated}, додано {created}")
+    
+    await callback.message.answer(
+        f"✅ <b>Ціни оновлено</b> за {elapsed:.2f} с\n\n"
+        f"Змінено: <b>{updated}</b>\n"
+        f"Додано клієнтів: <b>{created}</b>\n\n"
+        "Повернутися до меню: /admin",
+        parse_mode="HTML"
+    )
+
+
+@routes.callback("bulkprice_cancel")
+async def cancel_bulk_prices(callback: CallbackQuery, state: FSMContext, config: Config):
+    """Скасування масової зміни цін."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    await state.clear()
+    await callback.message.edit_text("❌ Масову зміну цін скасовано.")
+
+
+# ============= ЗВІРКА ПЕРЕКАЗІВ =============
+
+# Обмеження Bot API на завантаження файлу ботом; десятки тисяч рядків виписки — кілька МБ
+PAYMENTS_MAX_BYTES = 20 * 1024 * 1024
+PAYMENTS_PREVIEW = 10
+
+
+def payments_usage(config: Config) -> str:
+    return (
+        "🏦 <b>Звірка переказів</b>\n\n"
+        "Надішліть виписку банку CSV (Monobank, ПриватБанк або з колонками <code>date</code>, "
+        "<code>amount</code>, <code>description</code>). Надходження буде зіставлено з неоплаченими "
+        f"замовленнями «{escape(config.transfer_payment_method)}» за сумою і часом — до "
+        f"{config.payment_window_hours} год після замовлення; номер замовлення в призначенні "
+        "(<code>#123</code>) має перевагу.\n\n"
+        "Перед записом буде показано, що зміниться."
+    )
+
+
+def format_payment_plan(plan: payments.PaymentPlan, seconds: float) -> str:
+    """Попередній перегляд звірки (dry-run)."""
+    by_reference = sum(1 for match in plan.matches if match.by_reference)
+    text = (
+        "🔍 <b>Звірка виписки</b>\n\n"
+        f"Зіставлено: <b>{len(plan.matches)}</b> на {plan.matched_amount} ₴ (за номером: {by_reference})\n"
+        f"Переказів без замовлення: <b>{len(plan.unmatched_transactions)}</b>\n"
+        f"Замовлень без переказу: <b>{len(plan.unmatched_orders)}</b>\n"
+    )
+    if plan.waiting:
+        text += f"Ще можуть оплатити (вікно не минуло): {plan.waiting}\n"
+    if plan.already_used:
+        text += f"Уже зараховані раніше: {plan.already_used}\n"
+    if plan.outgoing:
+        text += f"Видатків пропущено: {plan.outgoing}\n"
+    if plan.errors:
+        text += f"Пропущено рядків: {len(plan.errors)}\n"
+    text += f"<i>Звірка за {seconds:.2f} с</i>\n"
+    
+    sections = (
+        ("Зіставлено", plan.matches, lambda match: (
+            f"#{match.order.id} {escape(match.user.full_name)} — {match.order.total_price} ₴, "
+            f"{match.transaction.at:%d.%m %H:%M}"
+        )),
+        ("Переказ без замовлення", plan.unmatched_transactions, lambda transaction: (
+            f"рядок {transaction.line}: {transaction.amount / 100:.2f} ₴, {transaction.at:%d.%m %H:%M} "
+            f"{escape(transaction.description[:40])}"
+        )),
+        ("Замовлення без переказу", plan.unmatched_orders, lambda entry: (
+            f"#{entry[0].id} {escape(entry[1].full_name)}, {escape(entry[1].phone)} — {entry[0].total_price} ₴, "
+            f"{utc_to_local(entry[0].created_at):%d.%m %H:%M}"
+        )),
+    )
+    for title, items, line in sections:
+        if items:
+            text += f"\n<b>{title}:</b>\n" + "".join(f"• {line(item)}\n" for item in items[:PAYMENTS_PREVIEW])
+            if len(items) > PAYMENTS_PREVIEW:
+                text += f"…і ще {len(items) - PAYMENTS_PREVIEW}\n"
+    if plan.errors:
+        text += "\n<b>Пропущено:</b>\n" + "\n".join(escape(error) for error in plan.errors[:10]) + "\n"
+    return text
+
+
+@router.message(Command("payments"))
+async def admin_payments(message: Message, bot: Bot, state: FSMContext, config: Config):
+    """Звірка переказів на картку з випискою банку."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    # Виписка з підписом /payments — одразу до звірки
+    if message.document:
+        await process_statement(message, bot, state, config)
+        return
+    
+    await state.set_state(AdminStates.waiting_for_statement)
+    await message.answer(payments_usage(config), parse_mode="HTML")
+
+
+@router.message(AdminStates.waiting_for_statement, F.document)
+async def process_statement(message: Message, bot: Bot, state: FSMContext, config: Config):
+    """Виписка CSV: звірка і попередній перегляд."""
+    if not is_admin(message.from_user.id, config):
+        await state.clear()
+        return
+    
+    if message.document.file_size and message.document.file_size > PAYMENTS_MAX_BYTES:
+        await message.answer("❌ Файл завеликий (максимум 20 МБ).")
+        return
+    
+    content = (await bot.download(message.document)).getvalue()
+    started = datetime.now()
+    try:
+        plan = await payments.plan_payments(content, config)
+    except ValueError as e:
+        await message.answer(f"❌ Файл не підходить: {e}. Надішліть інший файл або /admin для виходу.")
+        return
+    elapsed = (datetime.now() - started).total_seconds()
+    
+    text = format_payment_plan(plan, elapsed)
+    if plan.matches:
+        await state.set_state(AdminStates.confirming_payments)
+        await state.update_data(payments=[
+            [match.order.id, match.transaction.at.isoformat(), match.transaction.ref] for match in plan.matches
+        ])
+        await message.answer(text, reply_markup=payments_confirm_keyboard(), parse_mode="HTML")
+    else:
+        await state.clear()
+        await message.answer(text + "\nПозначати нічого.", parse_mode="HTML")
+    
+    # Повний перелік, якщо в повідомлення вмістилась лише частина
+    if max(len(plan.matches), len(plan.unmatched_transactions), len(plan.unmatched_orders)) > PAYMENTS_PREVIEW:
+        await message.answer_document(
+            BufferedInputFile(payments.report_csv(plan), filename=f"reconciliation_{datetime.now():%Y%m%d_%H%M}.csv"),
+            caption="📄 Повний звіт звірки"
+        )
+
+
+@routes.callback("payments_apply", AdminStates.confirming_payments)
+async def apply_payments(callback: CallbackQuery, state: FSMContext, config: Config):
+    """Позначення зіставлених замовлень оплаченими однією транзакцією."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    data = await state.get_data()
+    await state.clear()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    
+    planned = [
+        (order_id, datetime.fromisoformat(paid_at), ref) for order_id, paid_at, ref in data.get("payments", [])
+    ]
+    paid = await mark_orders_paid(planned)
+    logger.info(f"Оплати за випискою адміном {callback.from_user.id}: позначено {paid} з {len(planned)}")
+    
+    text = f"✅ <b>Оплачено замовлень: {paid}</b>\n"
+    if paid < len(planned):
+        text += f"Пропущено {len(planned) - paid}: їх уже позначено іншою випискою\n"
+    await callback.message.answer(text + "\nПовернутися до меню: /admin", parse_mode="HTML")
+
+
+@routes.callback("payments_cancel")
+async def cancel_payments(callback: CallbackQuery, state: FSMContext, config: Config):
+    """Скасування звірки виписки."""
+    if not is_admin(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    await state.clear()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.answer("❌ Звірку скасовано, оплати не позначено.")
+
+
+# ============= ПРОФІЛЮВАННЯ =============
+
+PROFILE_MAX_SECONDS = 300
+
+
+@router.message(Command("profile"))
+async def admin_profile(message: Message, command: CommandObject, config: Config):
+    """Семплююче профілювання бота на N секунд (/profile 60)."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    try:
+        seconds = int(command.args or 60)
+        if seconds < 1 or seconds > PROFILE_MAX_SECONDS:
+            raise ValueError()
+    except ValueError:
+        await message.answer(f"❌ Вкажіть тривалість від 1 до {PROFILE_MAX_SECONDS} секунд: /profile 60")
+        return
+    
+    if profiler.is_running():
+        await message.answer("⏳ Профілювання вже триває, дочекайтесь результату.")
+        return
+    
+    await message.answer(f"🔬 Профілювання запущено на <b>{seconds} с</b>...", parse_mode="HTML")
+    logger.info(f"Профілювання на {seconds} с запущено адміном {message.from_user.id}")
+    
+    result = await profiler.profile_event_loop(seconds)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    await message.answer_document(
+        BufferedInputFile(result.collapsed().encode(), filename=f"profile_{stamp}.collapsed"),
+        caption="🔥 Стеки для flamegraph.pl / speedscope.app",
+    )
+    await message.answer_document(
+        BufferedInputFile(result.top().encode(), filename=f"profile_{stamp}_top.txt"),
+        caption=f"📊 Найгарячіші функції ({result.total} семплів)",
+    )
+
+
+# ============= КОНФІГУРАЦІЯ =============
+
+@router.message(Command("reload"))
+async def admin_reload_config(message: Message, config: Config, config_store: ConfigStore):
+    """Перезавантаження конфігурації з .env без перезапуску."""
+    if not is_admin(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    try:
+        changed = config_store.reload()
+    except ValueError as e:
+        await message.answer(f"❌ Помилка конфігурації, залишено попередню:\n<code>{e}</code>", parse_mode="HTML")
+        return
+    
+    await message.answer(
+        f"🔄 <b>Конфігурацію перезавантажено</b> (версія {config_store.version})\n\n"
+        f"Змінено: {', '.join(changed) if changed else 'нічого'}",
+        parse_mode="HTML"
+    )
+
+
 # ============= ЗАКРИТТЯ МЕНЮ =============
 
-@router.callback_query(F.data == "close_admin")
+@routes.callback("close_admin")
 async def close_admin_panel(callback: CallbackQuery, state: FSMContext):
     """Закрити адмін-панель."""
     await state.clear()
@@ -371,34 +1233,30 @@ async def close_admin_panel(callback: CallbackQuery, state: FSMContext):
 
 # ============= ОБРОБКА ДІЙ З ЗАМОВЛЕННЯМИ =============
 
-@router.callback_query(F.data.regexp(r"^admin_(confirm|deliver|complete|cancel)_\d+$"))
-async def handle_admin_action(callback: CallbackQuery, config: Config):
+@routes.callback(AdminOrderCallback)
+async def handle_admin_action(callback: CallbackQuery, callback_data: AdminOrderCallback, config: Config):
     """Обробка дій адміністратора з замовленнями."""
     if not is_admin(callback.from_user.id, config):
         await callback.answer("❌ Немає доступу", show_alert=True)
         return
     
-    parts = callback.data.split("_")
-    action = parts[1]
-    order_id = int(parts[2])
+    action = callback_data.action
+    order_id = callback_data.order_id
     
     status_map = {
-        "confirm": OrderStatus.CONFIRMED,
-        "deliver": OrderStatus.DELIVERING,
-        "complete": OrderStatus.COMPLETED,
-        "cancel": OrderStatus.CANCELLED,
+        AdminAction.CONFIRM: OrderStatus.CONFIRMED,
+        AdminAction.DELIVER: OrderStatus.DELIVERING,
+        AdminAction.COMPLETE: OrderStatus.COMPLETED,
+        AdminAction.CANCEL: OrderStatus.CANCELLED,
     }
     
     status_names = {
-        "confirm": "✅ Підтверджено",
-        "deliver": "🚗 У доставці",
-        "complete": "✔️ Виконано",
-        "cancel": "❌ Скасовано",
+        AdminAction.CONFIRM: "✅ Підтверджено",
+        AdminAction.DELIVER: "🚗 У доставці",
+        AdminAction.COMPLETE: "✔️ Виконано",
+        AdminAction.CANCEL: "❌ Скасовано",
     }
     
-    if action not in status_map:
-        return
-    
     # Отримуємо дані про замовлення та користувача
     order_data = await get_order_with_user(order_id)
     
@@ -408,23 +1266,30 @@ async def handle_admin_action(callback: CallbackQuery, config: Config):
     
     order, user = order_data
     
-    # Оновлюємо статус
-    await update_order_status(order_id, status_map[action])
+    # Оновлюємо статус і передаємо підтверджене замовлення кур'єру
+    await update_order_status(order_id, status_map[action], callback.from_user.id, EventSource.ADMIN)
+    courier_id = await couriers.dispatch(callback.bot, config, order, user, status_map[action])
     
     # Час від створення до підтвердження
     time_info = ""
-    if action == "confirm":
+    if action == AdminAction.CONFIRM:
         time_diff = format_time_diff(order.created_at, datetime.now())
         time_info = f"\n⏱️ Підтверджено за: {time_diff}"
+        if courier_id is not None:
+            time_info += f"\n🚚 Кур'єр: <code>{courier_id}</code>"
+        elif config.couriers:
+            time_info += "\n⏳ Усі кур'єри завантажені — замовлення в черзі"
     
     # Оновлюємо повідомлення адміна
     current_text = callback.message.text or callback.message.caption
     new_text = current_text + f"\n\n<b>Статус: {status_names[action]}</b>{time_info}"
     
-    # Видаляємо кнопки для завершених/скасованих
+    # Видаляємо кнопки для завершених/скасованих; після виконання — облік тари
     new_keyboard = None
-    if action in ["confirm", "deliver"]:
+    if action in (AdminAction.CONFIRM, AdminAction.DELIVER):
         new_keyboard = admin_order_keyboard(order_id, status_map[action])
+    elif action == AdminAction.COMPLETE:
+        new_keyboard = empties_keyboard(order_id, order.quantity)
     
     await callback.message.edit_text(
         new_text,
@@ -435,9 +1300,13 @@ async def handle_admin_action(callback: CallbackQuery, config: Config):
     await callback.answer(f"Замовлення #{order_id}: {status_names[action]}")
     
     # Сповіщення користувача
-    bot = callback.bot
+    await notify_client(callback.bot, user, order_id, status_map[action])
+
+
+async def notify_client(bot: Bot, user: User, order_id: int, status: OrderStatus) -> None:
+    """Сповіщення клієнта про зміну статусу замовлення (адміном чи кур'єром)."""
     try:
-        if action == "confirm":
+        if status == OrderStatus.CONFIRMED:
             # Теплі слова підтвердження
             user_message = random.choice(CONFIRM_MESSAGES).format(order_id=order_id)
             await bot.send_message(
@@ -446,7 +1315,7 @@ async def handle_admin_action(callback: CallbackQuery, config: Config):
                 parse_mode="HTML"
             )
         
-        elif action == "deliver":
+        elif status == OrderStatus.DELIVERING:
             # Веселе повідомлення про доставку + кнопка "Отримано"
             user_message = random.choice(DELIVERY_MESSAGES).format(order_id=order_id)
             await bot.send_message(
@@ -456,7 +1325,7 @@ async def handle_admin_action(callback: CallbackQuery, config: Config):
                 parse_mode="HTML"
             )
         
-        elif action == "complete":
+        elif status == OrderStatus.COMPLETED:
             await bot.send_message(
                 chat_id=user.telegram_id,
                 text=f"✔️ <b>Замовлення #{order_id} виконано!</b>\n\n"
@@ -464,7 +1333,7 @@ async def handle_admin_action(callback: CallbackQuery, config: Config):
                 parse_mode="HTML"
             )
         
-        elif action == "cancel":
+        elif status == OrderStatus.CANCELLED:
             await bot.send_message(
                 chat_id=user.telegram_id,
                 text=f"❌ <b>Замовлення #{order_id} скасовано</b>\n\n"
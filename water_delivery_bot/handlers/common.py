@@ -1,13 +1,17 @@
 """Загальні обробники команд."""
 
-from aiogram import Router, F
+from functools import lru_cache
+
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 from database import get_user, WATER_TYPE_NAMES, WaterType
-from keyboards import main_menu_keyboard
+from keyboards import main_menu_keyboard, courier_menu_keyboard
 from config import Config
+from .courier import is_courier
+from .routing import routes
 
 router = Router()
 
@@ -35,9 +39,14 @@ async def cmd_start(message: Message, state: FSMContext, config: Config):
             "Натисніть кнопку <b>📝 Реєстрація</b> нижче."
         )
     
+    keyboard = main_menu_keyboard(is_registered)
+    if is_courier(message.from_user.id, config):
+        welcome_text += "\n\n🚚 Ви кур'єр: ваші замовлення — кнопка <b>🚚 Мої доставки</b>."
+        keyboard = courier_menu_keyboard()
+    
     await message.answer(
         welcome_text,
-        reply_markup=main_menu_keyboard(is_registered),
+        reply_markup=keyboard,
         parse_mode="HTML"
     )
 
@@ -53,19 +62,22 @@ async def cmd_help(message: Message):
         "/prices - Ціни\n"
         "/contacts - Контакти\n\n"
         "<b>Як зробити замовлення:</b>\n"
-        "1. Зареєструйтесь (ПІБ, телефон, адреса)\n"
+        "1. Зареєструйтесь (ПІБ, телефон, адреса, за бажанням — геолокація)\n"
         "2. Натисніть «🛒 Зробити замовлення»\n"
         "3. Оберіть тип води\n"
         "4. Оберіть кількість пляшок\n"
         "5. Оберіть спосіб оплати\n"
         "6. Підтвердіть замовлення\n\n"
+        "«🔁 Повторити замовлення» — те саме, що минулого разу, "
+        "одразу на підтвердження.\n\n"
+        "Змінилось місце доставки — надішліть нову геолокацію (📎 → Геопозиція).\n\n"
         "Менеджер зв'яжеться з вами для уточнення часу доставки."
     )
     
     await message.answer(help_text, parse_mode="HTML")
 
 
-@router.message(F.text == "💰 Ціни")
+@routes.text("💰 Ціни")
 @router.message(Command("prices"))
 async def cmd_prices(message: Message, config: Config):
     """Показати ціни."""
@@ -73,11 +85,17 @@ async def cmd_prices(message: Message, config: Config):
     
     # Визначаємо ціну для користувача
     if user and user.custom_price is not None:
-        price = user.custom_price
-        price_note = "(ваша індивідуальна ціна)"
+        prices_text = _prices_text(user.custom_price, is_custom=True)
     else:
-        price = config.default_bottle_price
-        price_note = ""
+        prices_text = _prices_text(config.default_bottle_price, is_custom=False)
+    
+    await message.answer(prices_text, parse_mode="HTML")
+
+
+@lru_cache(maxsize=256)
+def _prices_text(price: int, is_custom: bool) -> str:
+    """Текст прайсу для заданої ціни за пляшку."""
+    price_note = "(ваша індивідуальна ціна)" if is_custom else ""
     
     prices_text = (
         "💰 <b>Наші ціни</b>\n\n"
@@ -97,10 +115,10 @@ async def cmd_prices(message: Message, config: Config):
         total = qty * price
         prices_text += f"• {qty} пл. = <b>{total} ₴</b>\n"
     
-    await message.answer(prices_text, parse_mode="HTML")
+    return prices_text
 
 
-@router.message(F.text == "📞 Контакти")
+@routes.text("📞 Контакти")
 @router.message(Command("contacts"))
 async def cmd_contacts(message: Message):
     """Показати контакти."""
@@ -120,7 +138,7 @@ async def cmd_contacts(message: Message):
     await message.answer(contacts_text, parse_mode="HTML")
 
 
-@router.message(F.text == "❌ Скасувати")
+@routes.text("❌ Скасувати")
 async def cancel_action(message: Message, state: FSMContext):
     """Скасування поточної дії."""
     await state.clear()
@@ -0,0 +1,167 @@
+"""Обробники для кур'єрів: черга своїх доставок і зміна їх статусу."""
+
+import logging
+
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery, LinkPreviewOptions
+
+from database import (
+    get_bottle_balances,
+    get_courier_orders,
+    get_order_with_user,
+    record_bottle_return,
+    update_order_status,
+    EventSource,
+    OrderStatus,
+)
+from keyboards import courier_order_keyboard, empties_keyboard
+from config import Config
+import couriers
+from callbacks import CourierAction, CourierOrderCallback, EmptiesCallback
+from .admin import is_admin, notify_client
+from .routing import routes
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+def is_courier(user_id: int, config: Config) -> bool:
+    """Перевірка, чи є користувач кур'єром."""
+    return any(courier.telegram_id == user_id for courier in config.couriers)
+
+
+@routes.text("🚚 Мої доставки")
+async def show_deliveries(message: Message, config: Config):
+    """Замовлення кур'єра в порядку об'їзду."""
+    if not is_courier(message.from_user.id, config):
+        await message.answer("❌ У вас немає доступу до цієї команди.")
+        return
+    
+    orders = await get_courier_orders(message.from_user.id)
+    pool = await couriers.current_pool(message.bot, config)
+    load = pool.load(message.from_user.id)
+    
+    if not orders:
+        await message.answer(
+            "🚚 <b>Мої доставки</b>\n\n"
+            "Доставок немає. Нові замовлення надійдуть у цей чат.",
+            parse_mode="HTML"
+        )
+        return
+    
+    await message.answer(
+        f"🚚 <b>Мої доставки: {len(orders)}</b>\n\n"
+        f"📦 Завантаження: {load.bottles}/{load.courier.capacity} пл.\n"
+        "Порядок — за маршрутом від складу.",
+        parse_mode="HTML"
+    )
+    
+    balances = await get_bottle_balances([user.id for _, user in orders])
+    for order, user in couriers.delivery_order(orders, config.depot_location):
+        await message.answer(
+            couriers.courier_order_text(order, user, balances[user.id].held),
+            reply_markup=courier_order_keyboard(order.id, order.status),
+            link_preview_options=LinkPreviewOptions(is_disabled=True),
+            parse_mode="HTML"
+        )
+
+
+@routes.callback(CourierOrderCallback)
+async def handle_courier_action(callback: CallbackQuery, callback_data: CourierOrderCallback, config: Config):
+    """Кур'єр виїхав із замовленням або доставив його."""
+    if not is_courier(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    action = callback_data.action
+    order_id = callback_data.order_id
+    
+    # Дія можлива лише з попереднього статусу
+    transitions = {
+        CourierAction.DELIVER: (OrderStatus.CONFIRMED, OrderStatus.DELIVERING, "🚗 У доставці"),
+        CourierAction.COMPLETE: (OrderStatus.DELIVERING, OrderStatus.COMPLETED, "✔️ Доставлено"),
+    }
+    expected, status, status_name = transitions[action]
+    
+    order_data = await get_order_with_user(order_id)
+    
+    if not order_data:
+        await callback.answer("❌ Замовлення не знайдено", show_alert=True)
+        return
+    
+    order, user = order_data
+    
+    if order.courier_id != callback.from_user.id:
+        await callback.answer("❌ Замовлення передано іншому кур'єру", show_alert=True)
+        return
+    
+    if action == CourierAction.COMPLETE and order.status == OrderStatus.COMPLETED:
+        # Клієнт уже натиснув «Отримано» — лишається записати тару
+        await callback.message.edit_reply_markup(reply_markup=empties_keyboard(order_id, order.quantity))
+        await callback.answer("♻️ Скільки порожніх пляшок забрали?")
+        return
+    
+    if order.status != expected:
+        await callback.answer("❌ Замовлення вже оброблено", show_alert=True)
+        return
+    
+    await update_order_status(order_id, status, callback.from_user.id, EventSource.COURIER)
+    await couriers.dispatch(callback.bot, config, order, user, status)
+    
+    # Після доставки — питання, скільки порожніх пляшок забрали
+    current_text = callback.message.html_text
+    await callback.message.edit_text(
+        current_text + f"\n\n<b>Статус: {status_name}</b>",
+        reply_markup=(
+            empties_keyboard(order_id, order.quantity) if status == OrderStatus.COMPLETED
+            else courier_order_keyboard(order_id, status)
+        ),
+        link_preview_options=LinkPreviewOptions(is_disabled=True),
+        parse_mode="HTML"
+    )
+    
+    await callback.answer(f"Замовлення #{order_id}: {status_name}")
+    
+    # Сповіщення користувача
+    await notify_client(callback.bot, user, order_id, status)
+
+
+@routes.callback(EmptiesCallback)
+async def handle_empties(callback: CallbackQuery, callback_data: EmptiesCallback, config: Config):
+    """Запис забраних порожніх пляшок (кур'єр замовлення або адмін)."""
+    order_id = callback_data.order_id
+    admin = is_admin(callback.from_user.id, config)
+    
+    if not admin and not is_courier(callback.from_user.id, config):
+        await callback.answer("❌ Немає доступу", show_alert=True)
+        return
+    
+    order_data = await get_order_with_user(order_id)
+    
+    if not order_data:
+        await callback.answer("❌ Замовлення не знайдено", show_alert=True)
+        return
+    
+    order, user = order_data
+    
+    if not admin and order.courier_id != callback.from_user.id:
+        await callback.answer("❌ Замовлення передано іншому кур'єру", show_alert=True)
+        return
+    
+    balance = await record_bottle_return(
+        order_id, callback_data.count, callback.from_user.id,
+        EventSource.ADMIN if admin else EventSource.COURIER
+    )
+    
+    if balance is None:
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer("❌ Тару за це замовлення вже записано", show_alert=True)
+        return
+    
+    await callback.message.edit_text(
+        callback.message.html_text
+        + f"\n\n♻️ Забрано порожніх: {callback_data.count}, тара у клієнта: {balance.held} пл.",
+        link_preview_options=LinkPreviewOptions(is_disabled=True),
+        parse_mode="HTML"
+    )
+    await callback.answer(f"♻️ Записано: {callback_data.count}")
@@ -1,14 +1,16 @@
 """Обробники замовлень."""
 
 import logging
-from aiogram import Router, F
+from datetime import datetime, timedelta
+from aiogram import Bot, Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from database import (
     get_user, create_order, get_user_orders, get_order_with_user,
     set_order_rating, update_order_status,
-    OrderStatus, WaterType, WATER_TYPE_NAMES
+    get_subscription, save_subscription, delete_subscription, get_last_order_template, get_bottle_balance,
+    EventSource, Order, OrderStatus, Subscription, User, WATER_TYPE_NAMES, SUBSCRIPTION_INTERVAL_NAMES
 )
 from keyboards import (
     main_menu_keyboard,
@@ -17,11 +19,27 @@ from keyboards import (
     payment_keyboard,
     confirm_order_keyboard,
     skip_comment_keyboard,
+    slot_keyboard,
     rating_keyboard,
     skip_feedback_keyboard,
+    subscription_keyboard,
 )
 from states import OrderStates, RatingStates
 from config import Config
+from callbacks import (
+    WaterCallback,
+    QuantityCallback,
+    PaymentCallback,
+    SlotCallback,
+    ClientOrderCallback,
+    RateCallback,
+    SubscriptionAction,
+    SubscriptionCallback,
+)
+from subscriptions import next_after
+from slots import DeliverySlot, available_slots, find_slot, slot_label
+import couriers
+from .routing import routes
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -36,7 +54,7 @@ def get_user_price(user, config: Config) -> int:
 
 # ============= СТВОРЕННЯ ЗАМОВЛЕННЯ =============
 
-@router.message(F.text == "🛒 Зробити замовлення")
+@routes.text("🛒 Зробити замовлення")
 async def start_order(message: Message, state: FSMContext, config: Config):
     """Початок оформлення замовлення."""
     user = await get_user(message.from_user.id)
@@ -49,7 +67,8 @@ async def start_order(message: Message, state: FSMContext, config: Config):
         return
     
     price = get_user_price(user, config)
-    await state.update_data(bottle_price=price)
+    # Дані незавершеного оформлення (слот, коментар) не переносяться в нове
+    await state.set_data({"bottle_price": price})
     await state.set_state(OrderStates.waiting_for_water_type)
     
     await message.answer(
@@ -62,11 +81,10 @@ async def start_order(message: Message, state: FSMContext, config: Config):
     )
 
 
-@router.callback_query(F.data.startswith("water_"), OrderStates.waiting_for_water_type)
-async def process_water_type(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(WaterCallback, OrderStates.waiting_for_water_type)
+async def process_water_type(callback: CallbackQuery, callback_data: WaterCallback, state: FSMContext, config: Config):
     """Обробка вибору типу води."""
-    water_type_value = callback.data.split("_", 1)[1]
-    water_type = WaterType(water_type_value)
+    water_type = callback_data.water_type
     
     await state.update_data(water_type=water_type)
     await state.set_state(OrderStates.waiting_for_quantity)
@@ -84,7 +102,7 @@ async def process_water_type(callback: CallbackQuery, state: FSMContext, config:
     )
 
 
-@router.callback_query(F.data == "back_to_water")
+@routes.callback("back_to_water")
 async def back_to_water_type(callback: CallbackQuery, state: FSMContext, config: Config):
     """Повернутися до вибору типу води."""
     await state.set_state(OrderStates.waiting_for_water_type)
@@ -102,10 +120,10 @@ async def back_to_water_type(callback: CallbackQuery, state: FSMContext, config:
     )
 
 
-@router.callback_query(F.data.startswith("qty_"), OrderStates.waiting_for_quantity)
-async def process_quantity(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(QuantityCallback, OrderStates.waiting_for_quantity)
+async def process_quantity(callback: CallbackQuery, callback_data: QuantityCallback, state: FSMContext, config: Config):
     """Обробка вибору кількості."""
-    qty_str = callback.data.split("_")[1]
+    qty_str = callback_data.value
     
     if qty_str == "custom":
         await state.set_state(OrderStates.waiting_for_custom_quantity)
@@ -164,7 +182,7 @@ async def process_custom_quantity(message: Message, state: FSMContext, config: C
     )
 
 
-@router.callback_query(F.data == "back_to_qty")
+@routes.callback("back_to_qty")
 async def back_to_quantity(callback: CallbackQuery, state: FSMContext, config: Config):
     """Повернутися до вибору кількості."""
     await state.set_state(OrderStates.waiting_for_quantity)
@@ -183,13 +201,26 @@ async def back_to_quantity(callback: CallbackQuery, state: FSMContext, config: C
     )
 
 
-@router.callback_query(F.data.startswith("pay_"), OrderStates.waiting_for_payment)
-async def process_payment(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(PaymentCallback, OrderStates.waiting_for_payment)
+async def process_payment(callback: CallbackQuery, callback_data: PaymentCallback, state: FSMContext, config: Config):
     """Обробка вибору способу оплати."""
-    pay_idx = int(callback.data.split("_")[1])
+    pay_idx = callback_data.index
+    
+    # Список способів оплати міг змінитися після перезавантаження конфігурації
+    if pay_idx >= len(config.payment_methods):
+        await callback.message.edit_reply_markup(reply_markup=payment_keyboard(config))
+        await callback.answer("Способи оплати оновилися, оберіть ще раз", show_alert=True)
+        return
+    
     payment_method = config.payment_methods[pay_idx]
     
     await state.update_data(payment_method=payment_method)
+    
+    if config.delivery_slots:
+        await ask_slot(callback.message, state, config, edit=True,
+                       notice=f"💳 Спосіб оплати: <b>{payment_method}</b>\n\n")
+        return
+    
     await state.set_state(OrderStates.waiting_for_comment)
     
     await callback.message.edit_text(
@@ -201,7 +232,57 @@ async def process_payment(callback: CallbackQuery, state: FSMContext, config: Co
     )
 
 
-@router.callback_query(F.data == "skip_comment", OrderStates.waiting_for_comment)
+async def ask_slot(message: Message, state: FSMContext, config: Config, edit: bool = False, notice: str = ""):
+    """Вибір слота доставки серед тих, куди вміщається замовлення."""
+    data = await state.get_data()
+    slots = await available_slots(config, data["quantity"])
+    await state.set_state(OrderStates.waiting_for_slot)
+    
+    if slots:
+        text = f"{notice}🕐 Оберіть час доставки:"
+    else:
+        text = (
+            f"{notice}😔 На найближчі дні вільного часу доставки немає.\n"
+            "Спробуйте пізніше або зв'яжіться з нами (📞 Контакти)."
+        )
+    
+    if edit:
+        await message.edit_text(text, reply_markup=slot_keyboard(slots), parse_mode="HTML")
+    else:
+        await message.answer(text, reply_markup=slot_keyboard(slots), parse_mode="HTML")
+
+
+@routes.callback(SlotCallback, OrderStates.waiting_for_slot)
+async def process_slot(callback: CallbackQuery, callback_data: SlotCallback, state: FSMContext, config: Config):
+    """Обробка вибору слота доставки."""
+    data = await state.get_data()
+    slot = await find_slot(config, callback_data.day, callback_data.hour, data["quantity"])
+    
+    # Слот міг заповнитися, початися або зникнути після перезавантаження конфігурації
+    if slot is None:
+        await callback.answer("Цей час уже недоступний, оберіть інший", show_alert=True)
+        await ask_slot(callback.message, state, config, edit=True)
+        return
+    
+    await state.update_data(delivery_slot=slot.key)
+    
+    # Повторення замовлення або повторний вибір слота — коментар уже є
+    if "comment" in data:
+        await show_confirmation(callback.message, state, config, telegram_id=callback.from_user.id, edit=True)
+        return
+    
+    await state.set_state(OrderStates.waiting_for_comment)
+    
+    await callback.message.edit_text(
+        f"🕐 Доставка: <b>{slot.label}</b>\n\n"
+        "Додайте коментар до замовлення (під'їзд, домофон тощо)\n"
+        "або натисніть «Пропустити»:",
+        reply_markup=skip_comment_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@routes.callback("skip_comment", OrderStates.waiting_for_comment)
 async def skip_comment(callback: CallbackQuery, state: FSMContext, config: Config):
     """Пропустити коментар."""
     await state.update_data(comment=None)
@@ -216,10 +297,12 @@ async def process_comment(message: Message, state: FSMContext, config: Config):
     await show_confirmation(message, state, config, telegram_id=message.from_user.id, edit=False)
 
 
-async def show_confirmation(message: Message, state: FSMContext, config: Config, telegram_id: int, edit: bool = False):
-    """Показати підтвердження замовлення."""
+async def show_confirmation(message: Message, state: FSMContext, config: Config, telegram_id: int, edit: bool = False,
+                            user: User | None = None):
+    """Показати підтвердження замовлення (user — якщо вже прочитаний обробником)."""
     data = await state.get_data()
-    user = await get_user(telegram_id)
+    if user is None:
+        user = await get_user(telegram_id)
     
     quantity = data["quantity"]
     price = data["bottle_price"]
@@ -227,6 +310,7 @@ async def show_confirmation(message: Message, state: FSMContext, config: Config,
     total = quantity * price
     
     comment_text = f"\n💬 Коментар: {data.get('comment')}" if data.get("comment") else ""
+    slot_text = f"🕐 Час доставки: {slot_label(data['delivery_slot'])}\n" if data.get("delivery_slot") else ""
     
     await state.update_data(total_price=total)
     await state.set_state(OrderStates.waiting_for_confirmation)
@@ -239,6 +323,7 @@ async def show_confirmation(message: Message, state: FSMContext, config: Config,
         f"💧 {WATER_TYPE_NAMES[water_type]}\n"
         f"📦 Кількість: {quantity} пл. × {price} ₴ = {total} ₴\n"
         f"🚚 Доставка: безкоштовно\n"
+        f"{slot_text}"
         f"💳 Оплата: {data['payment_method']}\n"
         f"{comment_text}\n"
         f"━━━━━━━━━━━━━━━\n"
@@ -260,32 +345,110 @@ async def show_confirmation(message: Message, state: FSMContext, config: Config,
         )
 
 
-@router.callback_query(F.data == "confirm_order", OrderStates.waiting_for_confirmation)
+@routes.text("🔁 Повторити замовлення")
+async def repeat_order(message: Message, state: FSMContext, config: Config):
+    """Останнє замовлення одразу на підтвердження за поточною ціною клієнта."""
+    await repeat_last_order(message, state, config, telegram_id=message.from_user.id)
+
+
+@routes.callback("repeat_order")
+async def repeat_order_from_reminder(callback: CallbackQuery, state: FSMContext, config: Config):
+    """Кнопка в нагадуванні про повторне замовлення."""
+    await callback.answer()
+    await repeat_last_order(callback.message, state, config, telegram_id=callback.from_user.id)
+
+
+async def repeat_last_order(message: Message, state: FSMContext, config: Config, telegram_id: int):
+    """Заповнення замовлення з останнього і показ підтвердження (або вибору оплати)."""
+    user = await get_user(telegram_id)
+    
+    if not user:
+        await message.answer(
+            "❌ Для оформлення замовлення необхідно зареєструватися.",
+            reply_markup=main_menu_keyboard(is_registered=False)
+        )
+        return
+    
+    template = await get_last_order_template(user.id)
+    if template is None:
+        await message.answer(
+            "📋 У вас поки немає замовлень для повторення.\n\n"
+            "Натисніть «🛒 Зробити замовлення» щоб оформити перше замовлення!"
+        )
+        return
+    
+    price = get_user_price(user, config)
+    await state.set_data({
+        "bottle_price": price,
+        "water_type": template.water_type,
+        "quantity": template.quantity,
+        "payment_method": template.payment_method,
+        "comment": template.comment,
+    })
+    
+    # Спосіб оплати прибрали з конфігурації — лише його і треба обрати
+    if template.payment_method not in config.payment_methods:
+        await state.set_state(OrderStates.waiting_for_payment)
+        await message.answer(
+            f"🔁 <b>Повторення замовлення</b>\n\n"
+            f"📦 Тип: <b>{WATER_TYPE_NAMES[template.water_type]}</b>\n"
+            f"📦 Кількість: <b>{template.quantity} пл.</b>\n"
+            f"💰 {template.quantity} × {price} ₴ = <b>{template.quantity * price} ₴</b>\n\n"
+            f"Спосіб оплати «{template.payment_method}» більше недоступний, оберіть інший:",
+            reply_markup=payment_keyboard(config),
+            parse_mode="HTML"
+        )
+        return
+    
+    if config.delivery_slots:
+        await ask_slot(message, state, config, notice="🔁 <b>Повторення замовлення</b>\n\n")
+        return
+    
+    await show_confirmation(message, state, config, telegram_id=telegram_id, user=user)
+
+
+@routes.callback("confirm_order", OrderStates.waiting_for_confirmation)
 async def confirm_order(callback: CallbackQuery, state: FSMContext, config: Config):
     """Підтвердження замовлення."""
     data = await state.get_data()
     user = await get_user(callback.from_user.id)
+    slot = data.get("delivery_slot")
+    
+    order = None
+    if slot is None or DeliverySlot.parse(slot).bookable(datetime.now()):
+        order = await create_order(
+            user_id=user.id,
+            water_type=data["water_type"],
+            quantity=data["quantity"],
+            total_price=data["total_price"],
+            payment_method=data["payment_method"],
+            comment=data.get("comment"),
+            actor_id=callback.from_user.id,
+            delivery_slot=slot,
+            slot_capacity=config.slot_capacity,
+        )
     
-    order = await create_order(
-        user_id=user.id,
-        water_type=data["water_type"],
-        quantity=data["quantity"],
-        total_price=data["total_price"],
-        payment_method=data["payment_method"],
-        comment=data.get("comment")
-    )
+    # Поки клієнт підтверджував, слот заповнився або підійшов його час
+    if order is None:
+        await callback.answer("😔 Цей час уже зайнятий, оберіть інший", show_alert=True)
+        await ask_slot(callback.message, state, config, edit=True)
+        return
     
     await state.clear()
     
     water_type_name = WATER_TYPE_NAMES[data["water_type"]]
     
+    if slot:
+        timing = f"🕐 Доставка: <b>{slot_label(slot)}</b>\n\nМенеджер зв'яжеться з вами для підтвердження.\n\n"
+    else:
+        timing = "Менеджер зв'яжеться з вами для підтвердження та уточнення часу доставки.\n\n"
+    
     await callback.message.edit_text(
         f"✅ <b>Замовлення #{order.id} оформлено!</b>\n\n"
         f"💧 {water_type_name}\n"
         f"📦 {data['quantity']} пл. на суму {data['total_price']} ₴\n"
         f"💳 {data['payment_method']}\n\n"
-        "Менеджер зв'яжеться з вами для підтвердження "
-        "та уточнення часу доставки.\n\n"
+        f"{timing}"
         "Дякуємо за замовлення! 💙",
         parse_mode="HTML"
     )
@@ -295,20 +458,27 @@ async def confirm_order(callback: CallbackQuery, state: FSMContext, config: Conf
         reply_markup=main_menu_keyboard(is_registered=True)
     )
     
-    # Сповіщення адмінів
-    bot = callback.bot
+    await notify_new_order(callback.bot, config, order, user)
+
+
+async def notify_new_order(bot: Bot, config: Config, order: Order, user: User, subscription: bool = False):
+    """Сповіщення адмінів і чату замовлень про нове замовлення."""
     from keyboards import admin_order_keyboard
     
+    slot_info = f"🕐 {slot_label(order.delivery_slot)}\n" if order.delivery_slot else ""
+    balance = await get_bottle_balance(user.id)
     order_notification = (
-        f"🆕 <b>Нове замовлення #{order.id}</b>\n\n"
+        f"🆕 <b>Нове замовлення #{order.id}</b>{' (📅 за підпискою)' if subscription else ''}\n\n"
         f"👤 {user.full_name}\n"
         f"📱 {user.phone}\n"
-        f"📍 {user.address}\n\n"
-        f"💧 {water_type_name}\n"
-        f"📦 {data['quantity']} пл.\n"
-        f"💵 {data['total_price']} ₴\n"
-        f"💳 {data['payment_method']}\n"
-        f"💬 {data.get('comment') or 'без коментаря'}"
+        f"📍 {user.address}\n"
+        f"♻️ Тара у клієнта: {balance.held} пл.\n\n"
+        f"💧 {WATER_TYPE_NAMES[order.water_type]}\n"
+        f"📦 {order.quantity} пл.\n"
+        f"💵 {order.total_price} ₴\n"
+        f"💳 {order.payment_method}\n"
+        f"{slot_info}"
+        f"💬 {order.comment or 'без коментаря'}"
     )
     
     for admin_id in config.admin_ids:
@@ -323,20 +493,21 @@ async def confirm_order(callback: CallbackQuery, state: FSMContext, config: Conf
             pass
     
     # Сповіщення в чат замовлень
-    ORDERS_CHAT_ID = -1002682380858
+    if config.orders_chat_id is None:
+        return
     try:
         await bot.send_message(
-            chat_id=ORDERS_CHAT_ID,
+            chat_id=config.orders_chat_id,
             text=order_notification,
             reply_markup=admin_order_keyboard(order.id),
             parse_mode="HTML"
         )
-        logger.info(f"Замовлення #{order.id} надіслано в чат {ORDERS_CHAT_ID}")
+        logger.info(f"Замовлення #{order.id} надіслано в чат {config.orders_chat_id}")
     except Exception as e:
-        logger.error(f"Помилка відправки в чат {ORDERS_CHAT_ID}: {e}")
+        logger.error(f"Помилка відправки в чат {config.orders_chat_id}: {e}")
 
 
-@router.callback_query(F.data == "cancel_order")
+@routes.callback("cancel_order")
 async def cancel_order(callback: CallbackQuery, state: FSMContext):
     """Скасування замовлення."""
     await state.clear()
@@ -348,9 +519,120 @@ async def cancel_order(callback: CallbackQuery, state: FSMContext):
     )
 
 
+# ============= ПІДПИСКА =============
+
+def subscription_text(subscription: Subscription, price: int) -> str:
+    """Опис підписки з поточною ціною клієнта."""
+    total = subscription.quantity * price
+    comment_text = f"💬 {subscription.comment}\n" if subscription.comment else ""
+    return (
+        "📅 <b>Ваша підписка</b>\n\n"
+        f"💧 {WATER_TYPE_NAMES[subscription.water_type]}\n"
+        f"📦 {subscription.quantity} пл. × {price} ₴ = {total} ₴\n"
+        f"💳 {subscription.payment_method}\n"
+        f"{comment_text}"
+        f"🔁 {SUBSCRIPTION_INTERVAL_NAMES.get(subscription.interval_days, f'кожні {subscription.interval_days} дн.')}\n"
+        f"📆 Наступне замовлення: <b>{subscription.next_run:%d.%m.%Y %H:%M}</b>\n\n"
+        "Замовлення оформлюється автоматично за вашою ціною на день доставки, "
+        "менеджер підтвердить його як звичайно."
+    )
+
+
+@routes.text("📅 Підписка")
+async def show_subscription(message: Message, config: Config):
+    """Підписка клієнта або пропозиція оформити її з останнього замовлення."""
+    user = await get_user(message.from_user.id)
+    
+    if not user:
+        await message.answer(
+            "❌ Для підписки необхідно зареєструватися.",
+            reply_markup=main_menu_keyboard(is_registered=False)
+        )
+        return
+    
+    subscription = await get_subscription(user.id)
+    if subscription:
+        await message.answer(
+            subscription_text(subscription, get_user_price(user, config)),
+            reply_markup=subscription_keyboard(subscription.interval_days),
+            parse_mode="HTML"
+        )
+        return
+    
+    last = await get_last_order_template(user.id)
+    if last is None:
+        await message.answer(
+            "📅 Підписка автоматично повторює ваше замовлення з обраною періодичністю.\n\n"
+            "Спершу оформіть замовлення — «🛒 Зробити замовлення»."
+        )
+        return
+    
+    await message.answer(
+        "📅 <b>Підписка</b>\n\n"
+        "Ваше останнє замовлення оформлюватиметься автоматично:\n\n"
+        f"💧 {WATER_TYPE_NAMES[last.water_type]}\n"
+        f"📦 {last.quantity} пл. × {get_user_price(user, config)} ₴\n"
+        f"💳 {last.payment_method}\n\n"
+        "Як часто доставляти?",
+        reply_markup=subscription_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@routes.callback(SubscriptionCallback)
+async def process_subscription(callback: CallbackQuery, callback_data: SubscriptionCallback, config: Config):
+    """Оформлення, зміна інтервалу чи скасування підписки."""
+    user = await get_user(callback.from_user.id)
+    if not user:
+        await callback.answer("❌ Спершу зареєструйтесь", show_alert=True)
+        return
+    
+    if callback_data.action == SubscriptionAction.CANCEL:
+        await delete_subscription(user.id)
+        await callback.message.edit_text(
+            "❌ Підписку скасовано.\n\n"
+            "Оформити знову — кнопка «📅 Підписка»."
+        )
+        return
+    
+    days = callback_data.days
+    if days not in SUBSCRIPTION_INTERVAL_NAMES:
+        await callback.answer("❌ Невідомий інтервал", show_alert=True)
+        return
+    
+    now = datetime.now().replace(microsecond=0)
+    subscription = await get_subscription(user.id)
+    if subscription:
+        # Відлік від попереднього запуску (або оформлення) підписки
+        start = subscription.next_run - timedelta(days=subscription.interval_days)
+        template = subscription
+    else:
+        template = await get_last_order_template(user.id)
+        if template is None:
+            await callback.answer("❌ Спершу оформіть замовлення", show_alert=True)
+            return
+        start = now
+    
+    subscription = await save_subscription(
+        user.id,
+        template.water_type,
+        template.quantity,
+        template.payment_method,
+        template.comment,
+        days,
+        next_after(start, days, now),
+    )
+    await callback.message.edit_text(
+        subscription_text(subscription, get_user_price(user, config)),
+        reply_markup=subscription_keyboard(days),
+        parse_mode="HTML"
+    )
+    await callback.answer("✅ Підписку збережено")
+
+
 # ============= МОЇ ЗАМОВЛЕННЯ =============
 
-@router.message(F.text == "📋 Мої замовлення")
+@routes.text("📋 Мої замовлення")
 async def show_my_orders(message: Message):
     """Показати замовлення користувача."""
     user = await get_user(message.from_user.id)
@@ -393,10 +675,12 @@ async def show_my_orders(message: Message):
         icon = status_icons.get(order.status, "❓")
         status_name = status_names.get(order.status, "Невідомо")
         water_name = WATER_TYPE_NAMES.get(order.water_type, "Вода")
+        slot_info = f"🕐 Доставка: {slot_label(order.delivery_slot)}\n" if order.delivery_slot else ""
         
         orders_text += (
             f"<b>Замовлення #{order.id}</b> {icon}\n"
             f"📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+            f"{slot_info}"
             f"💧 {water_name}\n"
             f"📦 {order.quantity} пл. • {order.total_price} ₴\n"
             f"📊 Статус: {status_name}\n"
@@ -408,10 +692,10 @@ async def show_my_orders(message: Message):
 
 # ============= ОЦІНКА ЗАМОВЛЕННЯ =============
 
-@router.callback_query(F.data.startswith("client_received_"))
-async def client_received_order(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(ClientOrderCallback)
+async def client_received_order(callback: CallbackQuery, callback_data: ClientOrderCallback, state: FSMContext, config: Config):
     """Клієнт підтвердив отримання замовлення."""
-    order_id = int(callback.data.split("_")[2])
+    order_id = callback_data.order_id
     
     # Перевіряємо, що замовлення існує і належить цьому користувачу
     order_data = await get_order_with_user(order_id)
@@ -430,8 +714,9 @@ async def client_received_order(callback: CallbackQuery, state: FSMContext, conf
         await callback.answer("❌ Замовлення вже оброблено", show_alert=True)
         return
     
-    # Оновлюємо статус на COMPLETED
-    await update_order_status(order_id, OrderStatus.COMPLETED)
+    # Оновлюємо статус на COMPLETED, кур'єр звільняє місце
+    await update_order_status(order_id, OrderStatus.COMPLETED, callback.from_user.id, EventSource.CLIENT)
+    await couriers.dispatch(callback.bot, config, order, user, OrderStatus.COMPLETED)
     
     # Зберігаємо order_id для оцінки
     await state.update_data(rating_order_id=order_id)
@@ -448,12 +733,11 @@ async def client_received_order(callback: CallbackQuery, state: FSMContext, conf
     )
 
 
-@router.callback_query(F.data.regexp(r"^rate_\d+_[1-5]$"))
-async def process_rating(callback: CallbackQuery, state: FSMContext, config: Config):
+@routes.callback(RateCallback)
+async def process_rating(callback: CallbackQuery, callback_data: RateCallback, state: FSMContext, config: Config):
     """Обробка оцінки від клієнта."""
-    parts = callback.data.split("_")
-    order_id = int(parts[1])
-    rating = int(parts[2])
+    order_id = callback_data.order_id
+    rating = callback_data.rating
     
     await state.update_data(rating_order_id=order_id, rating=rating)
     
@@ -478,7 +762,7 @@ async def process_rating(callback: CallbackQuery, state: FSMContext, config: Con
         )
 
 
-@router.callback_query(F.data == "skip_feedback", RatingStates.waiting_for_feedback)
+@routes.callback("skip_feedback", RatingStates.waiting_for_feedback)
 async def skip_feedback(callback: CallbackQuery, state: FSMContext, config: Config):
     """Пропустити відгук."""
     data = await state.get_data()
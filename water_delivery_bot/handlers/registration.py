@@ -2,12 +2,14 @@
 
 import re
 from aiogram import Router, F
+from aiogram.filters import StateFilter
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from database import get_user, create_user, update_user
-from keyboards import main_menu_keyboard, phone_keyboard, cancel_keyboard
+from database import get_user, create_user, update_user, set_user_location, get_bottle_balance
+from keyboards import main_menu_keyboard, phone_keyboard, cancel_keyboard, location_keyboard
 from states import RegistrationStates, EditProfileStates
+from .routing import routes
 
 router = Router()
 
@@ -28,7 +30,7 @@ def validate_phone(phone: str) -> bool:
 
 # ============= РЕЄСТРАЦІЯ =============
 
-@router.message(F.text == "📝 Реєстрація")
+@routes.text("📝 Реєстрація")
 async def start_registration(message: Message, state: FSMContext):
     """Початок реєстрації."""
     user = await get_user(message.from_user.id)
@@ -114,7 +116,7 @@ async def process_phone_text(message: Message, state: FSMContext):
 
 @router.message(RegistrationStates.waiting_for_address)
 async def process_address(message: Message, state: FSMContext):
-    """Обробка адреси та завершення реєстрації."""
+    """Обробка адреси і запит геолокації."""
     address = message.text.strip()
     
     if len(address) < 10:
@@ -125,22 +127,59 @@ async def process_address(message: Message, state: FSMContext):
         await message.answer("❌ Адреса занадто довга. Спробуйте скоротити:")
         return
     
+    await state.update_data(address=address)
+    await state.set_state(RegistrationStates.waiting_for_location)
+    
+    await message.answer(
+        f"✅ Адреса: <b>{address}</b>\n\n"
+        "Надішліть <b>геолокацію</b> місця доставки — так кур'єр знайде вас швидше.\n"
+        "Можна пропустити і надіслати пізніше (📎 → Геопозиція).",
+        reply_markup=location_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@router.message(RegistrationStates.waiting_for_location, F.location)
+async def process_location(message: Message, state: FSMContext):
+    """Обробка геолокації та завершення реєстрації."""
+    await finish_registration(message, state, (message.location.latitude, message.location.longitude))
+
+
+@routes.text("⏭️ Пропустити", RegistrationStates.waiting_for_location)
+async def skip_location(message: Message, state: FSMContext):
+    """Завершення реєстрації без геолокації."""
+    await finish_registration(message, state, None)
+
+
+@router.message(RegistrationStates.waiting_for_location)
+async def process_location_invalid(message: Message):
+    """Інше повідомлення замість геолокації."""
+    await message.answer(
+        "📍 Натисніть «📍 Надіслати геолокацію» або «⏭️ Пропустити».",
+        reply_markup=location_keyboard()
+    )
+
+
+async def finish_registration(message: Message, state: FSMContext, location: tuple[float, float] | None):
+    """Створення користувача з даних діалогу."""
     data = await state.get_data()
     
     await create_user(
         telegram_id=message.from_user.id,
         full_name=data["full_name"],
         phone=data["phone"],
-        address=address
+        address=data["address"],
+        location=location
     )
     
     await state.clear()
     
+    location_text = "\n🗺 Геолокацію збережено" if location else ""
     await message.answer(
         "🎉 <b>Реєстрацію завершено!</b>\n\n"
         f"👤 ПІБ: {data['full_name']}\n"
         f"📱 Телефон: {data['phone']}\n"
-        f"📍 Адреса: {address}\n\n"
+        f"📍 Адреса: {data['address']}{location_text}\n\n"
         "Тепер ви можете робити замовлення!",
         reply_markup=main_menu_keyboard(is_registered=True),
         parse_mode="HTML"
@@ -149,7 +188,7 @@ async def process_address(message: Message, state: FSMContext):
 
 # ============= ПРОФІЛЬ =============
 
-@router.message(F.text == "👤 Мій профіль")
+@routes.text("👤 Мій профіль")
 async def show_profile(message: Message):
     """Показати профіль користувача."""
     user = await get_user(message.from_user.id)
@@ -161,20 +200,40 @@ async def show_profile(message: Message):
         )
         return
     
+    balance = await get_bottle_balance(user.id)
+    
     profile_text = (
         "👤 <b>Ваш профіль</b>\n\n"
         f"📋 ПІБ: {user.full_name}\n"
         f"📱 Телефон: {user.phone}\n"
         f"📍 Адреса: {user.address}\n"
+        f"🗺 Геолокація: {'збережено' if user.location else 'не вказано (надішліть 📎 → Геопозиція)'}\n"
+        f"♻️ Тара у вас: {balance.held} пл.\n"
         f"📅 Дата реєстрації: {user.created_at.strftime('%d.%m.%Y')}"
     )
     
     await message.answer(profile_text, parse_mode="HTML")
 
 
+@router.message(StateFilter(None), F.location)
+async def update_location(message: Message):
+    """Геолокація поза діалогами — оновлення місця доставки клієнта."""
+    user = await get_user(message.from_user.id)
+    
+    if not user:
+        await message.answer(
+            "Спочатку пройдіть реєстрацію.",
+            reply_markup=main_menu_keyboard(is_registered=False)
+        )
+        return
+    
+    await set_user_location(message.from_user.id, (message.location.latitude, message.location.longitude))
+    await message.answer("🗺 Геолокацію місця доставки збережено!")
+
+
 # ============= РЕДАГУВАННЯ ПРОФІЛЮ =============
 
-@router.message(F.text == "✏️ Змінити дані")
+@routes.text("✏️ Змінити дані")
 async def start_edit_profile(message: Message, state: FSMContext):
     """Початок редагування профілю."""
     user = await get_user(message.from_user.id)
@@ -0,0 +1,135 @@
+"""Індекс маршрутизації для кнопок та callback-запитів.
+
+Замість ланцюжка фільтрів ``F.text == ...`` / ``F.data.startswith(...)``,
+які aiogram перевіряє по черзі для кожного оновлення, обробники
+реєструються у словниках: точний текст кнопки, точне значення
+callback_data або префікс фабрики ``CallbackData``. Пошук обробника
+не залежить від кількості зареєстрованих маршрутів.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery, Message
+
+
+@dataclass(frozen=True)
+class Route:
+    """Зареєстрований маршрут."""
+    handler: CallableObject
+    states: frozenset[str | None] | None = None
+    factory: type[CallbackData] | None = None
+
+    def accepts(self, raw_state: str | None) -> bool:
+        """Чи підходить маршрут для поточного стану FSM."""
+        return self.states is None or raw_state in self.states
+
+
+class RouteIndex:
+    """Словник маршрутів: текст / callback_data / префікс → обробник."""
+
+    def __init__(self):
+        self._texts: dict[str, list[Route]] = {}
+        self._callbacks: dict[str, list[Route]] = {}
+        self._prefixes: dict[tuple[str, str], list[Route]] = {}
+        self._separators: list[str] = []
+
+    @staticmethod
+    def _states(states: tuple[State | str | None, ...]) -> frozenset[str | None] | None:
+        if not states:
+            return None
+        return frozenset(s.state if isinstance(s, State) else s for s in states)
+
+    def text(self, text: str, *states: State | None) -> Callable:
+        """Реєстрація обробника для точного тексту кнопки."""
+        def decorator(handler: Callable) -> Callable:
+            route = Route(CallableObject(handler), self._states(states))
+            self._texts.setdefault(text, []).append(route)
+            return handler
+        return decorator
+
+    def callback(self, key: str | type[CallbackData], *states: State | None) -> Callable:
+        """Реєстрація обробника для callback_data (рядок або фабрика)."""
+        def decorator(handler: Callable) -> Callable:
+            if isinstance(key, str):
+                route = Route(CallableObject(handler), self._states(states))
+                self._callbacks.setdefault(key, []).append(route)
+            else:
+                route = Route(CallableObject(handler), self._states(states), key)
+                sep = key.__separator__
+                if sep not in self._separators:
+                    self._separators.append(sep)
+                self._prefixes.setdefault((sep, key.__prefix__), []).append(route)
+            return handler
+        return decorator
+
+    def __len__(self) -> int:
+        return sum(
+            len(routes)
+            for table in (self._texts, self._callbacks, self._prefixes)
+            for routes in table.values()
+        )
+
+    def is_button(self, text: str | None) -> bool:
+        """Чи є текст зареєстрованою кнопкою."""
+        return text in self._texts
+
+    def match_text(self, text: str | None, raw_state: str | None = None) -> Route | None:
+        """Пошук маршруту для тексту повідомлення."""
+        for route in self._texts.get(text, ()):
+            if route.accepts(raw_state):
+                return route
+        return None
+
+    def match_callback(
+        self, data: str | None, raw_state: str | None = None
+    ) -> tuple[Route, CallbackData | None] | None:
+        """Пошук маршруту для callback_data з розбором у фабрику."""
+        if data is None:
+            return None
+        for route in self._callbacks.get(data, ()):
+            if route.accepts(raw_state):
+                return route, None
+        # Різних роздільників лише кілька, тож кількість пошуків стала
+        for sep in self._separators:
+            prefix = data.split(sep, 1)[0]
+            for route in self._prefixes.get((sep, prefix), ()):
+                if not route.accepts(raw_state):
+                    continue
+                try:
+                    return route, route.factory.unpack(data)
+                except (TypeError, ValueError):
+                    continue
+        return None
+
+    async def _message_filter(self, message: Message, raw_state: str | None = None) -> bool | dict[str, Any]:
+        route = self.match_text(message.text, raw_state)
+        return {"route": route} if route else False
+
+    async def _callback_filter(self, callback: CallbackQuery, raw_state: str | None = None) -> bool | dict[str, Any]:
+        found = self.match_callback(callback.data, raw_state)
+        if not found:
+            return False
+        route, callback_data = found
+        if callback_data is None:
+            return {"route": route}
+        return {"route": route, "callback_data": callback_data}
+
+    @staticmethod
+    async def _dispatch(event: Message | CallbackQuery, route: Route, **data: Any) -> Any:
+        return await route.handler.call(event, **data)
+
+    def as_router(self, name: str | None = None) -> Router:
+        """Роутер з одним обробником на тип події, що диспетчеризує через індекс."""
+        router = Router(name=name)
+        router.message.register(self._dispatch, self._message_filter)
+        router.callback_query.register(self._dispatch, self._callback_filter)
+        return router
+
+
+# Спільний індекс для всіх модулів обробників
+routes = RouteIndex()
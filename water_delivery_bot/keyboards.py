@@ -1,5 +1,7 @@
 """Клавіатури бота."""
 
+from functools import lru_cache
+
 from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -9,7 +11,29 @@ from aiogram.types import (
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 
 from config import Config
-from database import WaterType, WATER_TYPE_NAMES, User, OrderStatus
+from database import WaterType, WATER_TYPE_NAMES, SUBSCRIPTION_INTERVAL_NAMES, User, OrderStatus
+from slots import DeliverySlot
+from callbacks import (
+    AdminAction,
+    AdminOrderCallback,
+    ClientAction,
+    ClientOrderCallback,
+    CourierAction,
+    CourierOrderCallback,
+    EmptiesCallback,
+    FindUsersCallback,
+    PaymentCallback,
+    QuantityCallback,
+    RateCallback,
+    SetPriceCallback,
+    SlotCallback,
+    StatsCallback,
+    StatsPeriod,
+    SubscriptionAction,
+    SubscriptionCallback,
+    UsersPageCallback,
+    WaterCallback,
+)
 
 
 def main_menu_keyboard(is_registered: bool = False) -> ReplyKeyboardMarkup:
@@ -21,6 +45,10 @@ def main_menu_keyboard(is_registered: bool = False) -> ReplyKeyboardMarkup:
             KeyboardButton(text="🛒 Зробити замовлення"),
             KeyboardButton(text="📋 Мої замовлення"),
         )
+        builder.row(
+            KeyboardButton(text="🔁 Повторити замовлення"),
+            KeyboardButton(text="📅 Підписка"),
+        )
         builder.row(
             KeyboardButton(text="👤 Мій профіль"),
             KeyboardButton(text="✏️ Змінити дані"),
@@ -36,6 +64,19 @@ def main_menu_keyboard(is_registered: bool = False) -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
+def courier_menu_keyboard() -> ReplyKeyboardMarkup:
+    """Меню кур'єра."""
+    builder = ReplyKeyboardBuilder()
+    
+    builder.row(KeyboardButton(text="🚚 Мої доставки"))
+    builder.row(
+        KeyboardButton(text="💰 Ціни"),
+        KeyboardButton(text="📞 Контакти"),
+    )
+    
+    return builder.as_markup(resize_keyboard=True)
+
+
 def phone_keyboard() -> ReplyKeyboardMarkup:
     """Клавіатура для запиту телефону."""
     builder = ReplyKeyboardBuilder()
@@ -44,6 +85,15 @@ def phone_keyboard() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
+def location_keyboard() -> ReplyKeyboardMarkup:
+    """Клавіатура для запиту геолокації (необов'язкової)."""
+    builder = ReplyKeyboardBuilder()
+    builder.row(KeyboardButton(text="📍 Надіслати геолокацію", request_location=True))
+    builder.row(KeyboardButton(text="⏭️ Пропустити"))
+    builder.row(KeyboardButton(text="❌ Скасувати"))
+    return builder.as_markup(resize_keyboard=True)
+
+
 def cancel_keyboard() -> ReplyKeyboardMarkup:
     """Клавіатура з кнопкою скасування."""
     builder = ReplyKeyboardBuilder()
@@ -58,7 +108,7 @@ def water_type_keyboard() -> InlineKeyboardMarkup:
     for water_type in WaterType:
         builder.row(InlineKeyboardButton(
             text=WATER_TYPE_NAMES[water_type],
-            callback_data=f"water_{water_type.value}"
+            callback_data=WaterCallback(water_type=water_type).pack()
         ))
     
     builder.row(
@@ -73,10 +123,10 @@ def quantity_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     for i in range(1, 6):
-        builder.add(InlineKeyboardButton(text=str(i), callback_data=f"qty_{i}"))
+        builder.add(InlineKeyboardButton(text=str(i), callback_data=QuantityCallback(value=str(i)).pack()))
     
     builder.row(
-        InlineKeyboardButton(text="6+", callback_data="qty_custom"),
+        InlineKeyboardButton(text="6+", callback_data=QuantityCallback(value="custom").pack()),
     )
     builder.row(
         InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_water"),
@@ -88,10 +138,15 @@ def quantity_keyboard() -> InlineKeyboardMarkup:
 
 def payment_keyboard(config: Config) -> InlineKeyboardMarkup:
     """Клавіатура вибору способу оплати."""
+    return _payment_keyboard(config.payment_methods)
+
+
+@lru_cache(maxsize=8)
+def _payment_keyboard(payment_methods: tuple[str, ...]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    for i, method in enumerate(config.payment_methods):
-        builder.row(InlineKeyboardButton(text=method, callback_data=f"pay_{i}"))
+    for i, method in enumerate(payment_methods):
+        builder.row(InlineKeyboardButton(text=method, callback_data=PaymentCallback(index=i).pack()))
     
     builder.row(
         InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_qty"),
@@ -118,29 +173,77 @@ def admin_order_keyboard(order_id: int, status: OrderStatus = OrderStatus.PENDIN
     if status == OrderStatus.PENDING:
         # Нове замовлення - можна підтвердити або скасувати
         builder.row(
-            InlineKeyboardButton(text="✅ Підтвердити", callback_data=f"admin_confirm_{order_id}"),
+            InlineKeyboardButton(text="✅ Підтвердити", callback_data=AdminOrderCallback(action=AdminAction.CONFIRM, order_id=order_id).pack()),
         )
         builder.row(
-            InlineKeyboardButton(text="❌ Скасувати", callback_data=f"admin_cancel_{order_id}"),
+            InlineKeyboardButton(text="❌ Скасувати", callback_data=AdminOrderCallback(action=AdminAction.CANCEL, order_id=order_id).pack()),
         )
     elif status == OrderStatus.CONFIRMED:
         # Підтверджено - можна відправити в доставку або скасувати
         builder.row(
-            InlineKeyboardButton(text="🚗 Відправити в доставку", callback_data=f"admin_deliver_{order_id}"),
+            InlineKeyboardButton(text="🚗 Відправити в доставку", callback_data=AdminOrderCallback(action=AdminAction.DELIVER, order_id=order_id).pack()),
         )
         builder.row(
-            InlineKeyboardButton(text="❌ Скасувати", callback_data=f"admin_cancel_{order_id}"),
+            InlineKeyboardButton(text="❌ Скасувати", callback_data=AdminOrderCallback(action=AdminAction.CANCEL, order_id=order_id).pack()),
         )
     elif status == OrderStatus.DELIVERING:
         # В доставці - можна примусово завершити
         builder.row(
-            InlineKeyboardButton(text="✔️ Завершити (примусово)", callback_data=f"admin_complete_{order_id}"),
+            InlineKeyboardButton(text="✔️ Завершити (примусово)", callback_data=AdminOrderCallback(action=AdminAction.COMPLETE, order_id=order_id).pack()),
         )
     # Для COMPLETED і CANCELLED кнопок немає
     
     return builder.as_markup()
 
 
+def courier_order_keyboard(order_id: int, status: OrderStatus = OrderStatus.CONFIRMED) -> InlineKeyboardMarkup | None:
+    """Кнопка наступного кроку доставки для кур'єра (None — кроків немає)."""
+    builder = InlineKeyboardBuilder()
+    
+    if status == OrderStatus.CONFIRMED:
+        builder.row(
+            InlineKeyboardButton(text="🚗 Виїжджаю", callback_data=CourierOrderCallback(action=CourierAction.DELIVER, order_id=order_id).pack()),
+        )
+    elif status == OrderStatus.DELIVERING:
+        builder.row(
+            InlineKeyboardButton(text="✔️ Доставлено", callback_data=CourierOrderCallback(action=CourierAction.COMPLETE, order_id=order_id).pack()),
+        )
+    else:
+        return None
+    
+    return builder.as_markup()
+
+
+def empties_keyboard(order_id: int, quantity: int) -> InlineKeyboardMarkup:
+    """Кількість забраних порожніх пляшок після доставки (0 — не забрали)."""
+    builder = InlineKeyboardBuilder()
+    counts = sorted({*range(min(quantity, 6) + 1), quantity})
+    
+    builder.row(*(
+        InlineKeyboardButton(text=f"♻️ {count}", callback_data=EmptiesCallback(order_id=order_id, count=count).pack())
+        for count in counts
+    ), width=4)
+    
+    return builder.as_markup()
+
+
+def slot_keyboard(slots: list[tuple[DeliverySlot, int]]) -> InlineKeyboardMarkup:
+    """Клавіатура вибору слота доставки (слот і вільне місце в ньому)."""
+    builder = InlineKeyboardBuilder()
+    
+    for slot, free in slots:
+        builder.row(InlineKeyboardButton(
+            text=f"🕐 {slot.label} · вільно {free} пл.",
+            callback_data=SlotCallback(day=slot.day.isoformat(), hour=slot.start).pack()
+        ))
+    
+    builder.row(
+        InlineKeyboardButton(text="❌ Скасувати", callback_data="cancel_order"),
+    )
+    
+    return builder.as_markup()
+
+
 def skip_comment_keyboard() -> InlineKeyboardMarkup:
     """Клавіатура для пропуску коментаря."""
     builder = InlineKeyboardBuilder()
@@ -165,12 +268,70 @@ def admin_menu_keyboard() -> InlineKeyboardMarkup:
     builder.row(
         InlineKeyboardButton(text="👥 Всі клієнти", callback_data="admin_menu_clients"),
     )
+    builder.row(
+        InlineKeyboardButton(text="📊 Статистика", callback_data=StatsCallback(period=StatsPeriod.TODAY).pack()),
+    )
+    builder.row(
+        InlineKeyboardButton(text="🗺 Маршрути", callback_data="admin_menu_routes"),
+        InlineKeyboardButton(text="🚚 Кур'єри", callback_data="admin_menu_couriers"),
+    )
     builder.row(
         InlineKeyboardButton(text="❌ Закрити", callback_data="close_admin"),
     )
     return builder.as_markup()
 
 
+def bulk_price_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Підтвердження масової зміни цін."""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Застосувати", callback_data="bulkprice_apply"),
+        InlineKeyboardButton(text="❌ Скасувати", callback_data="bulkprice_cancel"),
+    )
+    return builder.as_markup()
+
+
+def payments_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Підтвердження оплат за випискою."""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Позначити оплаченими", callback_data="payments_apply"),
+        InlineKeyboardButton(text="❌ Скасувати", callback_data="payments_cancel"),
+    )
+    return builder.as_markup()
+
+
+STATS_PERIOD_NAMES = {
+    StatsPeriod.TODAY: "Сьогодні",
+    StatsPeriod.WEEK: "7 днів",
+    StatsPeriod.MONTH: "30 днів",
+}
+
+
+@lru_cache(maxsize=len(StatsPeriod))
+def stats_keyboard(period: StatsPeriod) -> InlineKeyboardMarkup:
+    """Перемикання періоду статистики."""
+    builder = InlineKeyboardBuilder()
+    builder.row(*(
+        InlineKeyboardButton(
+            text=f"• {name} •" if option == period else name,
+            callback_data=StatsCallback(period=option).pack(),
+        )
+        for option, name in STATS_PERIOD_NAMES.items()
+    ))
+    builder.row(InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_menu_back"))
+    return builder.as_markup()
+
+
+def user_price_button(user: User) -> InlineKeyboardButton:
+    """Кнопка клієнта, що відкриває встановлення ціни."""
+    price_text = f" ({user.custom_price} ₴)" if user.custom_price else ""
+    return InlineKeyboardButton(
+        text=f"👤 {user.full_name}{price_text}",
+        callback_data=SetPriceCallback(telegram_id=user.telegram_id).pack()
+    )
+
+
 def users_list_keyboard(users: list[User], page: int = 0, per_page: int = 10) -> InlineKeyboardMarkup:
     """Клавіатура зі списком користувачів для адміна."""
     builder = InlineKeyboardBuilder()
@@ -180,18 +341,39 @@ def users_list_keyboard(users: list[User], page: int = 0, per_page: int = 10) ->
     page_users = users[start:end]
     
     for user in page_users:
-        price_text = f" ({user.custom_price} ₴)" if user.custom_price else ""
-        builder.row(InlineKeyboardButton(
-            text=f"👤 {user.full_name}{price_text}",
-            callback_data=f"setprice_user_{user.telegram_id}"
-        ))
+        builder.row(user_price_button(user))
     
     # Навігація
     nav_buttons = []
     if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"users_page_{page - 1}"))
+        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=UsersPageCallback(page=page - 1).pack()))
     if end < len(users):
-        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"users_page_{page + 1}"))
+        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=UsersPageCallback(page=page + 1).pack()))
+    
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    
+    builder.row(InlineKeyboardButton(text="❌ Закрити", callback_data="close_admin"))
+    
+    return builder.as_markup()
+
+
+def users_search_keyboard(users: list[User], query: str, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    """Результати пошуку клієнтів (сторінка вже вибрана запитом до БД)."""
+    builder = InlineKeyboardBuilder()
+    
+    for user in users:
+        builder.row(user_price_button(user))
+    
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️", callback_data=FindUsersCallback(page=page - 1, query=query).pack()
+        ))
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️", callback_data=FindUsersCallback(page=page + 1, query=query).pack()
+        ))
     
     if nav_buttons:
         builder.row(*nav_buttons)
@@ -205,7 +387,7 @@ def order_complete_keyboard(order_id: int) -> InlineKeyboardMarkup:
     """Клавіатура для клієнта - підтвердження отримання замовлення."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Замовлення отримано!", callback_data=f"client_received_{order_id}"),
+        InlineKeyboardButton(text="✅ Замовлення отримано!", callback_data=ClientOrderCallback(action=ClientAction.RECEIVED, order_id=order_id).pack()),
     )
     return builder.as_markup()
 
@@ -214,13 +396,13 @@ def rating_keyboard(order_id: int) -> InlineKeyboardMarkup:
     """Клавіатура для оцінки замовлення."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="⭐", callback_data=f"rate_{order_id}_1"),
-        InlineKeyboardButton(text="⭐⭐", callback_data=f"rate_{order_id}_2"),
-        InlineKeyboardButton(text="⭐⭐⭐", callback_data=f"rate_{order_id}_3"),
+        InlineKeyboardButton(text="⭐", callback_data=RateCallback(order_id=order_id, rating=1).pack()),
+        InlineKeyboardButton(text="⭐⭐", callback_data=RateCallback(order_id=order_id, rating=2).pack()),
+        InlineKeyboardButton(text="⭐⭐⭐", callback_data=RateCallback(order_id=order_id, rating=3).pack()),
     )
     builder.row(
-        InlineKeyboardButton(text="⭐⭐⭐⭐", callback_data=f"rate_{order_id}_4"),
-        InlineKeyboardButton(text="⭐⭐⭐⭐⭐", callback_data=f"rate_{order_id}_5"),
+        InlineKeyboardButton(text="⭐⭐⭐⭐", callback_data=RateCallback(order_id=order_id, rating=4).pack()),
+        InlineKeyboardButton(text="⭐⭐⭐⭐⭐", callback_data=RateCallback(order_id=order_id, rating=5).pack()),
     )
     return builder.as_markup()
 
@@ -232,3 +414,31 @@ def skip_feedback_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="⏭️ Пропустити", callback_data="skip_feedback"),
     )
     return builder.as_markup()
+
+
+def subscription_keyboard(current_days: int | None = None) -> InlineKeyboardMarkup:
+    """Інтервали підписки (поточний позначено) і скасування, якщо вона є."""
+    builder = InlineKeyboardBuilder()
+    
+    for days, name in SUBSCRIPTION_INTERVAL_NAMES.items():
+        builder.row(InlineKeyboardButton(
+            text=f"✅ {name}" if days == current_days else f"🔁 {name.capitalize()}",
+            callback_data=SubscriptionCallback(action=SubscriptionAction.SET, days=days).pack()
+        ))
+    
+    if current_days is not None:
+        builder.row(InlineKeyboardButton(
+            text="❌ Скасувати підписку",
+            callback_data=SubscriptionCallback(action=SubscriptionAction.CANCEL).pack()
+        ))
+    
+    return builder.as_markup()
+
+
+def reorder_reminder_keyboard() -> InlineKeyboardMarkup:
+    """Кнопка повторення останнього замовлення в нагадуванні."""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔁 Повторити замовлення", callback_data="repeat_order"),
+    )
+    return builder.as_markup()
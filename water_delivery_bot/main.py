@@ -2,25 +2,65 @@
 
 import asyncio
 import logging
+import os
+import signal
 import sys
+from typing import TYPE_CHECKING
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import load_config, Config
-from database import init_db
-from handlers import setup_routers
+from config import load_config, reload_config, Config, ConfigStore
+from database import init_db, load_active_orders
+
+# Обработчики, многоарендный режим, масштабирование и т.п. импортируются
+# там, где нужны: так `import main` (воркеры, бенчмарки) и запуск в
+# обычном режиме не платят за модули, которые не используются
+if TYPE_CHECKING:
+    from tenants import Tenants
 
 # Глобальные переменные для доступа из других модулей
 bot: Bot = None
-config: Config = None
+config_store: ConfigStore = None
+
+
+def create_dispatcher(config: "Config | ConfigStore | Tenants") -> Dispatcher:
+    """Создание диспетчера с middleware и роутерами."""
+    from handlers import setup_routers
+    from tenants import Tenants
+    
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    
+    if isinstance(config, Tenants):
+        # Несколько ботов: config и БД выбираются по id бота.
+        # Ключи FSM уже содержат bot_id, поэтому хранилище общее
+        dp.update.outer_middleware(config.middleware)
+    else:
+        store = config if isinstance(config, ConfigStore) else ConfigStore(config)
+        
+        # Middleware для передачи config в обработчики: каждое обновление
+        # получает снимок, актуальный на момент поступления, и дорабатывает
+        # на нём даже если конфигурация перезагружена в процессе
+        @dp.update.outer_middleware()
+        async def config_middleware(handler, event, data):
+            data["config"] = store.current
+            data["config_store"] = store
+            return await handler(event, data)
+    
+    # Регистрация роутеров
+    router = setup_routers()
+    dp.include_router(router)
+    
+    return dp
 
 
 async def main():
     """Точка входа."""
-    global bot, config
+    global bot, config_store
     
     # Настройка логирования
     logging.basicConfig(
@@ -33,46 +73,167 @@ async def main():
     )
     logger = logging.getLogger(__name__)
     
+    # Несколько брендов в одном процессе
+    tenants_dir = os.getenv("TENANTS_DIR")
+    if tenants_dir:
+        await run_tenants(tenants_dir)
+        return
+    
     # Загрузка конфигурации
     try:
         config = load_config()
     except ValueError as e:
         logger.error(f"Ошибка конфигурации: {e}")
         sys.exit(1)
+    config_store = ConfigStore(config, loader=reload_config)
     
-    # Инициализация БД
-    await init_db()
-    logger.info("База данных инициализирована")
-    
-    # Создание бота и диспетчера
+    # Создание бота и диспетчера, инициализация БД
     bot = Bot(
         token=config.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    dp = await start_bot(config_store, bot)
+    logger.info("База данных инициализирована")
     
-    # Middleware для передачи config в обработчики
-    @dp.update.outer_middleware()
-    async def config_middleware(handler, event, data):
-        data["config"] = config
-        return await handler(event, data)
+    # Запись обновлений для воспроизведения в бенчмарках
+    recorder = None
+    if config.record_updates_path and config.workers == 1:
+        from recording import UpdateRecorder
+        recorder = UpdateRecorder(
+            config.record_updates_path,
+            config.admin_ids,
+            salt=config.bot_token.encode(),
+        )
+        dp.update.outer_middleware(recorder)
+        logger.info(f"Запись обновлений в {config.record_updates_path}")
     
-    # Регистрация роутеров
-    router = setup_routers()
-    dp.include_router(router)
+    # Горячая перезагрузка конфигурации: SIGHUP, изменение .env или /reload
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, config_store.try_reload)
+    watcher = asyncio.create_task(config_store.watch())
+    
+    # Раз в сутки старые завершённые заказы переносятся в архив,
+    # резервные копии БД — по расписанию из BACKUP_INTERVAL_HOURS
+    from archive import archive_periodically
+    from backup import backup_periodically
+    archiver = asyncio.create_task(archive_periodically(config_store))
+    backups = asyncio.create_task(backup_periodically(config_store))
+    
+    # Заказы по подпискам создаёт один планировщик в этом процессе
+    from subscriptions import run_subscriptions
+    scheduler = asyncio.create_task(run_subscriptions(config_store, bot))
+    
+    # Ночью — прогноз повторных заказов, в REMINDER_HOUR — напоминания
+    from reminders import remind_periodically
+    reminders = asyncio.create_task(remind_periodically(config_store, bot))
     
     # Запуск
     logger.info("Бот запускается...")
     
+    # Начатые рассылки дорабатывают при остановке до закрытия сессии
+    from sending import outbound
+    senders = [scheduler, reminders]
+    
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if config.workers > 1:
+            # Несколько процессов-обработчиков, обновления шардируются по пользователю
+            from scaling import Ingester
+            await Ingester(config, config.workers, on_reload=config_store.try_reload).run()
+        else:
+            # По SIGTERM: прекратить приём, дождаться обработчиков и
+            # рассылок, подтвердить обработанные обновления и сбросить WAL
+            from shutdown import run_polling
+            await run_polling(dp, bot, timeout=config.shutdown_timeout, senders=senders)
     finally:
+        watcher.cancel()
+        archiver.cancel()
+        backups.cancel()
+        # После run_polling рассылки уже остановлены — тогда сразу
+        await outbound.stop(senders, config.shutdown_timeout)
+        if recorder:
+            recorder.close()
         await bot.session.close()
 
 
+async def start_bot(config: "ConfigStore | Tenants", *bots: Bot) -> Dispatcher:
+    """Подготовка к polling: независимые шаги выполняются одновременно.
+    
+    Проверка схемы БД (поток aiosqlite) и deleteWebhook (сеть) идут в
+    фоне, пока в основном потоке строится диспетчер.
+    """
+    from tenants import Tenants
+    
+    db_ready = asyncio.create_task(
+        config.init_databases() if isinstance(config, Tenants) else prepare_database(config.current)
+    )
+    # Обновления, пришедшие во время перезапуска, не отбрасываются:
+    # при остановке подтверждаются только обработанные
+    webhooks_deleted = asyncio.gather(
+        *(bot.delete_webhook(drop_pending_updates=False) for bot in bots)
+    )
+    dp = create_dispatcher(config)
+    await asyncio.gather(db_ready, webhooks_deleted)
+    return dp
+
+
+async def prepare_database(config: Config):
+    """Проверка схемы и загрузка индекса активных заказов.
+    
+    С несколькими процессами-обработчиками индекс в памяти одного процесса
+    не видел бы изменений остальных, поэтому заказы читаются из БД.
+    """
+    await init_db()
+    if config.workers == 1:
+        await load_active_orders()
+
+
+async def run_tenants(tenants_dir: str):
+    """Запуск всех ботов из TENANTS_DIR на общем диспетчере."""
+    from shutdown import run_polling
+    from tenants import Tenants
+    
+    logger = logging.getLogger(__name__)
+    
+    try:
+        tenants = Tenants.from_directory(tenants_dir)
+    except ValueError as e:
+        logger.error(f"Ошибка конфигурации: {e}")
+        sys.exit(1)
+    
+    # Одна HTTP-сессия на все боты
+    session = AiohttpSession()
+    bots = tenants.create_bots(
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    dp = await start_bot(tenants, *bots)
+    logger.info(f"Базы данных инициализированы, арендаторов: {len(tenants)}")
+    
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, tenants.try_reload)
+    watcher = asyncio.create_task(tenants.watch())
+    archiver = asyncio.create_task(tenants.archive_periodically())
+    backups = asyncio.create_task(tenants.backup_periodically())
+    scheduler = asyncio.create_task(tenants.run_subscriptions(bots))
+    reminders = asyncio.create_task(tenants.remind_periodically(bots))
+    
+    logger.info("Боты запускаются: " + ", ".join(tenant.name for tenant in tenants))
+    
+    try:
+        timeout = max(tenant.store.current.shutdown_timeout for tenant in tenants)
+        await run_polling(
+            dp, *bots, timeout=timeout, checkpoint=tenants.checkpoint, senders=[scheduler, reminders]
+        )
+    finally:
+        watcher.cancel()
+        archiver.cancel()
+        backups.cancel()
+        scheduler.cancel()
+        reminders.cancel()
+        await session.close()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
 
@@ -0,0 +1,329 @@
+"""Звірка переказів на картку з банківською випискою.
+
+Адмін надсилає виписку CSV (/payments); надходження зіставляються з
+неоплаченими замовленнями зі способом оплати «переказ» за сумою і часом:
+переказ має надійти не раніше ніж за MATCH_TOLERANCE до створення
+замовлення і не пізніше ніж за PAYMENT_WINDOW_HOURS після.
+
+Спершу — перекази з номером замовлення в призначенні («#123»), далі —
+злиття двох упорядкованих за (сума, час) списків: виписки і неоплачених
+замовлень (БД віддає їх у цьому порядку індексом). У межах однієї суми
+кожне надходження оплачує найстаріше замовлення, вікно якого ще не минуло;
+вікна однакової довжини, тож так зіставляється найбільше пар, а весь
+прохід — O(n log n) на сортування виписки замість перебору пар.
+
+Як і з цінами (bulk_prices), спершу будується план без запису в БД,
+адмін переглядає його і підтверджує. Зараховані перекази запам'ятовуються
+(orders.payment_ref), тож повторне завантаження виписки, що перетинається
+з попередньою, не оплатить ними інші замовлення.
+
+CSV: перший рядок — заголовки (підходять виписки Monobank і ПриватБанку);
+потрібні дата (з часом або окрема колонка часу) і сума — загальна, де
+надходження додатні, або окрема колонка надходжень.
+"""
+
+import csv
+import hashlib
+import io
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+import database
+from bulk_prices import csv_rows
+from config import Config
+from database import Order, User
+
+# Назви колонок (у нижньому регістрі) → поле
+COLUMN_ALIASES = {
+    "date": "date", "datetime": "date", "дата": "date", "дата операції": "date",
+    "дата і час операції": "date", "дата i час операції": "date", "дата та час": "date",
+    "time": "time", "час": "time", "час операції": "time",
+    "amount": "amount", "сума": "amount", "сума операції": "amount",
+    "сума в валюті картки": "amount", "сума в валюті картки (uah)": "amount", "сума (uah)": "amount",
+    "credit": "credit", "кредит": "credit", "надходження": "credit", "зарахування": "credit",
+    "id": "reference", "reference": "reference", "номер": "reference", "номер операції": "reference",
+    "id операції": "reference", "референс": "reference",
+    "description": "description", "опис": "description", "опис операції": "description",
+    "призначення": "description", "призначення платежу": "description", "деталі операції": "description",
+}
+
+DATE_FORMATS = (
+    "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S", "%d.%m.%Y", "%Y-%m-%d", "%d.%m.%y %H:%M", "%d.%m.%y",
+)
+
+# Переказ може бути позначений трохи раніше за створення замовлення
+# (годинник банку, виписка з точністю до хвилини)
+MATCH_TOLERANCE = timedelta(minutes=10)
+
+# Номер замовлення в призначенні платежу: «#123», «№123», «замовлення 123»
+ORDER_REFERENCE = re.compile(r"(?:#|№|замовлення\s*)\s*(\d+)", re.IGNORECASE)
+
+MAX_ERRORS = 50
+
+# Пробіли, знак і валюта в сумі
+_AMOUNT_NOISE = re.compile(r"[\s +]|UAH|грн|₴", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Transaction:
+    """Надходження з виписки; сума в копійках, час місцевий."""
+    line: int
+    at: datetime
+    amount: int
+    reference: str
+    description: str
+    # Порядковий номер серед однакових рядків виписки (час, сума, призначення)
+    occurrence: int = 0
+
+    @property
+    def ref(self) -> str:
+        """Ідентифікатор переказу: номер операції банку або відбиток рядка."""
+        if self.reference:
+            return self.reference
+        key = f"{self.at.isoformat()}|{self.amount}|{self.description}|{self.occurrence}"
+        return f"sha1:{hashlib.sha1(key.encode()).hexdigest()[:20]}"
+
+
+@dataclass
+class Match:
+    transaction: Transaction
+    order: Order
+    user: User
+    by_reference: bool = False
+
+
+@dataclass
+class Statement:
+    """Надходження виписки за часом і пропущені рядки."""
+    transactions: list[Transaction] = field(default_factory=list)
+    outgoing: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def error(self, line: int, text: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"рядок {line}: {text}")
+        elif len(self.errors) == MAX_ERRORS:
+            self.errors.append("…")
+
+
+@dataclass
+class PaymentPlan:
+    """Результат звірки виписки з неоплаченими замовленнями."""
+    matches: list[Match] = field(default_factory=list)
+    unmatched_transactions: list[Transaction] = field(default_factory=list)
+    unmatched_orders: list[tuple[Order, User]] = field(default_factory=list)
+    # Замовлення, вікно оплати яких ще не закінчилось на кінець виписки
+    waiting: int = 0
+    # Надходження, вже зараховані раніше (повторна виписка)
+    already_used: int = 0
+    outgoing: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def matched_amount(self) -> int:
+        """Сума зіставлених переказів, ₴."""
+        return sum(match.order.total_price for match in self.matches)
+
+
+def parse_amount(value: str) -> int:
+    """Сума в копійках: «1 350,00», «1350.00», «+1,350.50»."""
+    value = _AMOUNT_NOISE.sub("", value)
+    if "," in value and "." in value:
+        value = value.replace(",", "")
+    try:
+        return int((Decimal(value.replace(",", ".")) * 100).to_integral_value())
+    except InvalidOperation:
+        raise ValueError(value) from None
+
+
+class _TimeParser:
+    """Дата й час рядка виписки; формат першого вдалого рядка пробується першим."""
+
+    def __init__(self):
+        self._formats = list(DATE_FORMATS)
+
+    def __call__(self, date_value: str, time_value: str = "") -> datetime:
+        value = f"{date_value} {time_value}".strip()
+        for fmt in self._formats:
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if fmt != self._formats[0]:
+                self._formats.remove(fmt)
+                self._formats.insert(0, fmt)
+            # Лише дата — переказ міг надійти будь-коли протягом дня
+            return parsed if "%H" in fmt else datetime.combine(parsed.date(), time.max.replace(microsecond=0))
+        raise ValueError(value)
+
+
+def parse_statement(content: bytes) -> Statement:
+    """Надходження з CSV-виписки; видатки пропускаються."""
+    reader = csv_rows(content)
+    header = [COLUMN_ALIASES.get(name.strip().lower()) for name in next(reader, [])]
+    if "date" not in header or not {"amount", "credit"} & set(header):
+        raise ValueError("потрібні колонки з датою і сумою (або надходженням)")
+
+    amount_column = "credit" if "credit" in header else "amount"
+    parse_time = _TimeParser()
+    statement = Statement()
+    seen: dict[tuple, int] = {}
+    for line, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        row = {column: value.strip() for column, value in zip(header, values) if column}
+        if not row.get(amount_column):
+            statement.outgoing += 1
+            continue
+        try:
+            amount = parse_amount(row[amount_column])
+        except ValueError:
+            statement.error(line, f"некоректна сума «{row[amount_column]}»")
+            continue
+        if amount <= 0:
+            statement.outgoing += 1
+            continue
+        try:
+            at = parse_time(row.get("date", ""), row.get("time", ""))
+        except ValueError:
+            statement.error(line, f"некоректна дата «{row.get('date', '')}»")
+            continue
+        key = (at, amount, row.get("reference", ""), row.get("description", ""))
+        seen[key] = seen.get(key, -1) + 1
+        statement.transactions.append(Transaction(line, *key, occurrence=seen[key]))
+    statement.transactions.sort(key=lambda transaction: transaction.at)
+    return statement
+
+
+def match_payments(
+    transactions: list[Transaction],
+    orders: list[tuple[Order, User]],
+    window: timedelta,
+    tolerance: timedelta = MATCH_TOLERANCE,
+) -> PaymentPlan:
+    """Зіставлення надходжень (за часом) з неоплаченими замовленнями
+    (за сумою і часом створення, як повертає database.get_unpaid_orders)."""
+    plan = PaymentPlan()
+    created = {order.id: database.utc_to_local(order.created_at) for order, _ in orders}
+
+    # Номер замовлення в призначенні — якщо сума збігається і час у вікні
+    by_id = {order.id: (order, user) for order, user in orders}
+    rest = []
+    for transaction in transactions:
+        found = ORDER_REFERENCE.search(transaction.description)
+        entry = by_id.get(int(found.group(1))) if found else None
+        if (
+            entry is not None
+            and entry[0].total_price * 100 == transaction.amount
+            and created[entry[0].id] - tolerance <= transaction.at <= created[entry[0].id] + window
+        ):
+            plan.matches.append(Match(transaction, *entry, by_reference=True))
+            del by_id[entry[0].id]
+        else:
+            rest.append(transaction)
+    orders = [entry for entry in orders if entry[0].id in by_id]
+
+    # Злиття за сумою; сортування стабільне, тож у межах суми — за часом
+    rest.sort(key=lambda transaction: transaction.amount)
+    i = j = 0
+    while i < len(rest) or j < len(orders):
+        amount = min(
+            rest[i].amount if i < len(rest) else float("inf"),
+            orders[j][0].total_price * 100 if j < len(orders) else float("inf"),
+        )
+        group_end = i
+        while group_end < len(rest) and rest[group_end].amount == amount:
+            group_end += 1
+        orders_end = j
+        while orders_end < len(orders) and orders[orders_end][0].total_price * 100 == amount:
+            orders_end += 1
+        _match_group(plan, rest[i:group_end], orders[j:orders_end], created, window, tolerance)
+        i, j = group_end, orders_end
+    return plan
+
+
+def _match_group(
+    plan: PaymentPlan,
+    transactions: list[Transaction],
+    orders: list[tuple[Order, User]],
+    created: dict[int, datetime],
+    window: timedelta,
+    tolerance: timedelta,
+) -> None:
+    """Надходження і замовлення однієї суми, обидва за часом: кожне
+    надходження оплачує найстаріше замовлення, вікно якого ще відкрите."""
+    open_orders: deque[tuple[Order, User]] = deque()
+    k = 0
+    for transaction in transactions:
+        while k < len(orders) and created[orders[k][0].id] - tolerance <= transaction.at:
+            open_orders.append(orders[k])
+            k += 1
+        while open_orders and created[open_orders[0][0].id] + window < transaction.at:
+            plan.unmatched_orders.append(open_orders.popleft())
+        if open_orders:
+            plan.matches.append(Match(transaction, *open_orders.popleft()))
+        else:
+            plan.unmatched_transactions.append(transaction)
+    plan.unmatched_orders += open_orders
+    plan.unmatched_orders += orders[k:]
+
+
+async def plan_payments(content: bytes, config: Config) -> PaymentPlan:
+    """План оплат за вмістом CSV-виписки (без запису в БД)."""
+    statement = parse_statement(content)
+    used = await database.get_used_payment_refs([transaction.ref for transaction in statement.transactions])
+    transactions = [transaction for transaction in statement.transactions if transaction.ref not in used]
+
+    window = timedelta(hours=config.payment_window_hours)
+    orders = []
+    if transactions:
+        orders = await database.get_unpaid_orders(
+            config.transfer_payment_method,
+            transactions[0].at - window,
+            transactions[-1].at + MATCH_TOLERANCE + timedelta(seconds=1),
+        )
+    plan = match_payments(transactions, orders, window)
+    if transactions:
+        # Замовлення, вікно яких виходить за кінець виписки, ще можуть оплатити
+        closed = [
+            entry for entry in plan.unmatched_orders
+            if database.utc_to_local(entry[0].created_at) + window < transactions[-1].at
+        ]
+        plan.waiting = len(plan.unmatched_orders) - len(closed)
+        plan.unmatched_orders = closed
+    plan.already_used = len(statement.transactions) - len(transactions)
+    plan.outgoing = statement.outgoing
+    plan.errors = statement.errors
+    plan.unmatched_orders.sort(key=lambda entry: entry[0].id)
+    plan.unmatched_transactions.sort(key=lambda transaction: transaction.line)
+    return plan
+
+
+def report_csv(plan: PaymentPlan) -> bytes:
+    """Повний звіт звірки: зіставлені пари й незіставлене з обох боків."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(["результат", "рядок виписки", "час переказу", "сума, ₴", "призначення",
+                     "замовлення", "створено", "клієнт", "телефон"])
+    for match in plan.matches:
+        transaction, order, user = match.transaction, match.order, match.user
+        writer.writerow([
+            "за номером" if match.by_reference else "зіставлено", transaction.line,
+            f"{transaction.at:%Y-%m-%d %H:%M:%S}", f"{transaction.amount / 100:.2f}", transaction.description,
+            order.id, f"{database.utc_to_local(order.created_at):%Y-%m-%d %H:%M}", user.full_name, user.phone,
+        ])
+    for transaction in plan.unmatched_transactions:
+        writer.writerow([
+            "переказ без замовлення", transaction.line, f"{transaction.at:%Y-%m-%d %H:%M:%S}",
+            f"{transaction.amount / 100:.2f}", transaction.description, "", "", "", "",
+        ])
+    for order, user in plan.unmatched_orders:
+        writer.writerow([
+            "замовлення без переказу", "", "", f"{order.total_price:.2f}", "",
+            order.id, f"{database.utc_to_local(order.created_at):%Y-%m-%d %H:%M}", user.full_name, user.phone,
+        ])
+    return buffer.getvalue().encode("utf-8-sig")
@@ -0,0 +1,127 @@
+"""Семплюючий профайлер циклу подій.
+
+Окремий потік з заданим інтервалом знімає стек потоку, в якому працює
+asyncio-цикл, і рахує однакові стеки. Обробники при цьому не
+інструментуються, тому накладні витрати малі і профілювати можна
+прямо під робочим навантаженням.
+
+Результат — файл у форматі collapsed stacks (``a;b;c 42``), який
+приймають flamegraph.pl, speedscope та inferno, і таблиця
+найгарячіших функцій.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+DEFAULT_INTERVAL = 0.005
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+@dataclass
+class ProfileResult:
+    """Зібрані семпли."""
+    samples: Counter = field(default_factory=Counter)
+    duration: float = 0.0
+    interval: float = DEFAULT_INTERVAL
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+        """Стеки у форматі collapsed (корінь;...;лист кількість)."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in self.samples.most_common()
+        )
+
+    def hot_functions(self) -> tuple[Counter, Counter]:
+        """Власний (лист стеку) та сукупний час функцій у семплах."""
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                cumulative[name] += count
+        return own, cumulative
+
+    def top(self, limit: int = 25) -> str:
+        """Таблиця найгарячіших функцій за власним часом."""
+        total = self.total or 1
+        own, cumulative = self.hot_functions()
+        lines = [
+            f"Тривалість: {self.duration:.1f} с, семплів: {self.total}, "
+            f"інтервал: {self.interval * 1000:.0f} мс",
+            "",
+            f"{'own %':>7} {'cum %':>7}  функція",
+        ]
+        for name, count in own.most_common(limit):
+            lines.append(f"{count / total:>7.1%} {cumulative[name] / total:>7.1%}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Профайлер одного потоку (за замовчуванням — поточного)."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_id: int | None = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self._result = ProfileResult(interval=interval)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        stack.reverse()
+        self._result.samples[tuple(stack)] += 1
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            self._sample()
+        self._result.duration = time.perf_counter() - started
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> ProfileResult:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self._result
+
+
+_lock = asyncio.Lock()
+
+
+def is_running() -> bool:
+    """Чи триває зараз профілювання."""
+    return _lock.locked()
+
+
+async def profile_event_loop(seconds: float, interval: float = DEFAULT_INTERVAL) -> ProfileResult:
+    """Профілювання потоку циклу подій протягом заданого часу."""
+    async with _lock:
+        profiler = SamplingProfiler(interval=interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            result = profiler.stop()
+        return result
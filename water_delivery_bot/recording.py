@@ -0,0 +1,170 @@
+"""Запис анонімізованих оновлень для відтворення в бенчмарках.
+
+Формат файлу — JSON Lines, лише дозапис:
+    {"admins": [...]}           заголовок сесії запису
+    {"t": 1700000000.123, "u": {...}}   оновлення з часом отримання
+
+Ідентифікатори користувачів і чатів замінюються стабільними псевдонімами
+(HMAC від солі), імена видаляються, а довільний текст маскується зі
+збереженням довжини та класів символів, щоб валідація в обробниках
+спрацьовувала так само, як на оригінальних даних. Координати геолокацій
+огрублюються до району, адреси місць маскуються. У командах лишається
+лише назва (аргументи маскуються), callback_data розбирається за
+фабриками з callbacks.py: ідентифікатори в ній замінюються тими самими
+псевдонімами, що й у from.id, а довільний текст маскується.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Update
+
+import callbacks  # noqa: F401 — реєструє фабрики callback_data
+from handlers.routing import routes
+
+logger = logging.getLogger(__name__)
+
+_ID_KEYS = {"id", "user_id", "chat_id", "sender_chat_id"}
+_ID_OWNERS = {"from", "chat", "user", "sender_chat", "contact", "forward_from", "forward_from_chat"}
+_NAME_KEYS = {"first_name", "last_name", "username", "title"}
+_TEXT_KEYS = {"text", "caption"}
+_COORDINATE_KEYS = {"latitude", "longitude"}
+# Два знаки — ~1 км: маршрути при відтворенні схожі, будинок не впізнати
+COORDINATE_DIGITS = 2
+# Поля місця (venue), що вказують на конкретну адресу
+_PLACE_KEYS = {"foursquare_id", "foursquare_type", "google_place_id", "google_place_type"}
+# Поля фабрик callback_data з ідентифікаторами Telegram і довільним текстом
+_CALLBACK_ID_FIELDS = {"telegram_id", "user_id", "chat_id"}
+_CALLBACK_TEXT_FIELDS = {"query"}
+
+
+def mask_text(text: str) -> str:
+    """Маскування тексту: літери → x, цифри → 0, решта без змін."""
+    return "".join("0" if ch.isdigit() else "x" if ch.isalpha() else ch for ch in text)
+
+
+class Anonymizer:
+    """Стабільна анонімізація оновлень."""
+
+    def __init__(self, salt: bytes):
+        self._salt = salt
+
+    def pseudonym(self, value: int) -> int:
+        digest = hmac.new(self._salt, str(abs(value)).encode(), hashlib.sha256).digest()
+        pseudo = int.from_bytes(digest[:5], "big") or 1
+        return -pseudo if value < 0 else pseudo
+
+    def _text(self, text: str) -> str:
+        if routes.is_button(text):
+            return text
+        if text.startswith("/"):
+            command, sep, args = text.partition(" ")
+            return command + sep + mask_text(args)
+        return mask_text(text)
+
+    def _callback_data(self, data: str) -> str:
+        """callback_data з псевдонімами замість id і маскованим текстом."""
+        for factory in CallbackData.__subclasses__():
+            if not data.startswith(factory.__prefix__ + factory.__separator__):
+                continue
+            try:
+                fields = factory.unpack(data).model_dump()
+            except (TypeError, ValueError):
+                continue
+            for name, value in fields.items():
+                if name in _CALLBACK_ID_FIELDS and isinstance(value, int):
+                    fields[name] = self.pseudonym(value)
+                elif name in _CALLBACK_TEXT_FIELDS and isinstance(value, str):
+                    fields[name] = mask_text(value)
+            return factory(**fields).pack()
+        # Невідомий формат: відтворення його все одно не обробить
+        return mask_text(data)
+
+    def _walk(self, value: Any, owner: str | None = None) -> Any:
+        if isinstance(value, list):
+            return [self._walk(item, owner) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for key, item in value.items():
+            if isinstance(item, int) and (key in _ID_KEYS and (owner in _ID_OWNERS or key != "id")):
+                result[key] = self.pseudonym(item)
+            elif key in _NAME_KEYS and isinstance(item, str):
+                result[key] = "user" if key == "first_name" else None
+            elif key in _TEXT_KEYS and isinstance(item, str):
+                result[key] = self._text(item)
+            elif owner == "callback_query" and key == "data" and isinstance(item, str):
+                result[key] = self._callback_data(item)
+            elif key == "phone_number" and isinstance(item, str):
+                result[key] = mask_text(item)
+            elif key in _COORDINATE_KEYS and isinstance(item, (int, float)):
+                result[key] = round(item, COORDINATE_DIGITS)
+            elif owner == "venue" and key == "address" and isinstance(item, str):
+                result[key] = mask_text(item)
+            elif owner == "venue" and key in _PLACE_KEYS:
+                result[key] = None
+            elif key in ("entities", "caption_entities"):
+                result[key] = item
+            else:
+                result[key] = self._walk(item, key)
+        return {k: v for k, v in result.items() if v is not None}
+
+    def update(self, update: Update) -> dict:
+        """Анонімізований словник оновлення."""
+        return self._walk(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+
+
+class UpdateRecorder:
+    """Outer-middleware, що дописує кожне оновлення у файл."""
+
+    def __init__(self, path: str | Path, admin_ids: list[int], salt: bytes | None = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.anonymizer = Anonymizer(salt or os.urandom(16))
+        self._file = self.path.open("a", encoding="utf-8", buffering=1)
+        self._write({"admins": [self.anonymizer.pseudonym(admin_id) for admin_id in admin_ids]})
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    async def __call__(self, handler, event: Update, data: dict):
+        try:
+            self._write({"t": round(time.time(), 3), "u": self.anonymizer.update(event)})
+        except Exception as e:
+            logger.error(f"Помилка запису оновлення {event.update_id}: {e}")
+        return await handler(event, data)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_recording(path: str | Path) -> tuple[list[int], list[tuple[float, dict]]]:
+    """Читання файлу запису: адміністратори та оновлення з часом."""
+    admins: set[int] = set()
+    updates: list[tuple[float, dict]] = []
+    for record in _records(path):
+        if "admins" in record:
+            admins.update(record["admins"])
+        else:
+            updates.append((record["t"], record["u"]))
+    return sorted(admins), updates
+
+
+def _records(path: str | Path) -> Iterator[dict]:
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Недописаний останній рядок після аварійної зупинки
+                continue
@@ -0,0 +1,189 @@
+"""Нагадування про повторне замовлення за прогнозом споживання.
+
+Раз на добу вночі (FORECAST_HOUR) прогноз перераховується для всіх
+клієнтів одним SQL-запитом у SQLite (database.rebuild_order_forecasts):
+за замовленнями останніх FORECAST_WINDOW_DAYS днів — швидкість
+споживання, пляшок на день, і дата, коли закінчиться останнє
+замовлення. Python рядків замовлень не бачить, тож ні час, ні пам'ять
+процесу не залежать від розміру історії.
+
+О годині REMINDER_HOUR клієнти, чия дата настає протягом доби (або
+минула не більш як REMIND_LATE_DAYS днів тому), отримують нагадування
+з кнопкою «🔁 Повторити замовлення». Клієнти читаються сторінками за
+індексом дати і йдуть у SendQueue з обмеженням швидкості; позначка
+ставиться, коли сторінку надіслано, а якщо розсилку перервано — лише
+тим, кому вже надіслано, тож перезапуск бота не надішле нагадування
+двічі і нікого не пропустить. Наступне нагадування клієнт отримає лише
+після нового замовлення. Клієнти з підпискою нагадувань не отримують.
+
+Запуск з директорії бота (лише перерахунок, без розсилки):
+    python -m reminders
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+from aiogram import Bot
+
+import database
+from config import ConfigStore
+from keyboards import reorder_reminder_keyboard
+from sending import SEND_RATE, SendQueue, outbound
+
+logger = logging.getLogger(__name__)
+
+# Історія для прогнозу, днів, і скільки замовлень у ній потрібно
+FORECAST_WINDOW_DAYS = 180
+FORECAST_MIN_ORDERS = 3
+# Година нічного перерахунку
+FORECAST_HOUR = 3
+
+# Нагадувати за добу до прогнозованої дати; хто не замовив і через два
+# тижні після неї, ймовірно, більше не клієнт
+REMIND_AHEAD_DAYS = 1
+REMIND_LATE_DAYS = 14
+# Клієнтів за одне читання з БД
+REMIND_PAGE = 500
+
+
+@dataclass
+class ReminderReport:
+    due: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
+async def compute_forecasts(now: datetime | None = None) -> int:
+    """Перерахунок прогнозів усіх клієнтів; повертає кількість прогнозів."""
+    now = now or datetime.now()
+    return await database.rebuild_order_forecasts(now - timedelta(days=FORECAST_WINDOW_DAYS), FORECAST_MIN_ORDERS)
+
+
+def reminder_text(forecast: database.OrderForecast) -> str:
+    return (
+        "💧 <b>Час замовити воду?</b>\n\n"
+        f"За нашими підрахунками, вода із замовлення від {forecast.last_order_at:%d.%m} "
+        f"закінчується приблизно {forecast.next_order_at:%d.%m}.\n\n"
+        "Повторити останнє замовлення — одна кнопка:"
+    )
+
+
+async def send_reminders(bot: Bot, now: datetime | None = None, rate: float = SEND_RATE) -> ReminderReport:
+    """Нагадування всім клієнтам, чия прогнозована дата настала (rate — повідомлень/с)."""
+    report = ReminderReport()
+    started = time.perf_counter()
+    now = now or datetime.now()
+    since = now - timedelta(days=REMIND_LATE_DAYS)
+    until = now + timedelta(days=REMIND_AHEAD_DAYS)
+
+    # Клієнти, з чиїми нагадуваннями закінчено, ще без позначки
+    done: list[int] = []
+    try:
+        # При зупинці бота вже поставлене дограє, нові сторінки не читаються
+        async with outbound.sending(), SendQueue(bot, rate) as queue:
+            while not outbound.stopping and (page := await database.get_due_reminders(since, until, REMIND_PAGE)):
+                report.due += len(page)
+                for forecast, user in page:
+                    if outbound.stopping:
+                        break
+                    await queue.put(
+                        user.telegram_id,
+                        reminder_text(forecast),
+                        on_done=partial(done.append, user.id),
+                        reply_markup=reorder_reminder_keyboard(),
+                        parse_mode="HTML",
+                    )
+                # Позначка після відправлення: наступне читання повертає ще не сповіщених
+                await queue.join()
+                await database.mark_reminded(done)
+                done.clear()
+    finally:
+        # Розсилку перервано (зупинка бота): позначаються ті, кому вже надіслано
+        if done:
+            await database.mark_reminded(done)
+
+    report.sent, report.blocked, report.failed = queue.sent, queue.blocked, queue.failed
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def next_time_at(hour: int, now: datetime) -> datetime:
+    """Найближча (не раніша за now) година hour:00."""
+    run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    return run if run >= now else run + timedelta(days=1)
+
+
+async def _sleep_until(moment: datetime) -> None:
+    await asyncio.sleep(max(0.0, (moment - datetime.now()).total_seconds()))
+
+
+async def remind_once(store: ConfigStore, bot: Bot, computed: datetime) -> None:
+    """Перерахунок прогнозів і розсилка о найближчій reminder_hour після computed."""
+    try:
+        started = time.perf_counter()
+        count = await compute_forecasts()
+        logger.info(f"Прогнози замовлень: {count} клієнтів за {time.perf_counter() - started:.1f} с")
+    except Exception as e:
+        logger.error(f"Помилка розрахунку прогнозів замовлень: {e}")
+        return
+
+    # Конфігурацію могли перезавантажити, поки рахувались прогнози
+    reminder_hour = store.current.reminder_hour
+    if reminder_hour is None:
+        return
+    await _sleep_until(next_time_at(reminder_hour, computed))
+    if store.current.reminder_hour is None:
+        return
+    try:
+        report = await send_reminders(bot)
+        if report.due:
+            logger.info(
+                f"Нагадування про замовлення: {report.sent} з {report.due} "
+                f"(заблокували бота: {report.blocked}, помилок: {report.failed}) за {report.seconds:.1f} с"
+            )
+    except Exception as e:
+        logger.error(f"Помилка розсилки нагадувань: {e}")
+
+
+async def remind_periodically(store: ConfigStore, bot: Bot, database_path: Path | None = None) -> None:
+    """Щоночі о FORECAST_HOUR — прогнози, о reminder_hour — розсилка (None — вимкнено)."""
+    if database_path is not None:
+        # Задача має власну копію контексту
+        database.use_database(database_path)
+
+    computed = next_time_at(FORECAST_HOUR, datetime.now())
+    while True:
+        await _sleep_until(computed)
+        if store.current.reminder_hour is not None:
+            await remind_once(store, bot, computed)
+        computed += timedelta(days=1)
+
+
+async def run(args: argparse.Namespace) -> None:
+    await database.init_db()
+    started = time.perf_counter()
+    count = await compute_forecasts()
+    print(f"Прогнозів: {count} за {time.perf_counter() - started:.1f} с")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", type=Path, default=database.DATABASE_PATH)
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""Горизонтальне масштабування: один процес-приймач і N процесів-обробників.
+
+Приймач (ingester) отримує оновлення через getUpdates і, не розбираючи
+їх, розкладає по чергах multiprocessing за id користувача. Тому всі
+оновлення одного користувача потрапляють в один процес: його стан FSM
+(MemoryStorage) і порядок повідомлень залишаються локальними. Обробники
+працюють зі спільною БД SQLite у режимі WAL і самі відповідають у
+Telegram. Приймач стежить за обробниками і перезапускає тих, що впали.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import Callable
+
+import aiohttp
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+import database
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# spawn: обробники не успадковують цикл подій і сесії приймача
+_mp = multiprocessing.get_context("spawn")
+
+
+def shard_key(update: dict) -> int:
+    """Ключ шардування: id автора оновлення (або чату)."""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+class Ingester:
+    """Процес-приймач оновлень із супервізором обробників.
+
+    on_reload викликається за SIGHUP разом із передачею сигналу обробникам —
+    перезавантаження конфігурації головного процесу (його фонових задач).
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        workers: int,
+        database_path: str | Path | None = None,
+        api: TelegramAPIServer = PRODUCTION,
+        poll_timeout: int = 30,
+        on_reload: Callable[[], object] | None = None,
+    ):
+        self.config = config
+        self.workers = workers
+        self.database_path = database_path
+        self.api = api
+        self.poll_timeout = poll_timeout
+        self.on_reload = on_reload
+        self.restarts = 0
+        self._offset = 0
+        self._queues: list[Queue] = [_mp.Queue() for _ in range(workers)]
+        self._processes: list[BaseProcess | None] = [None] * workers
+        self._stopping = asyncio.Event()
+
+    def _spawn(self, index: int) -> None:
+        process = _mp.Process(
+            target=worker_main,
+            args=(index, self._queues[index], self.config, self.database_path, self.api,
+                  logging.getLogger().level),
+            name=f"water-bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info(f"Обробник #{index} запущено (pid {process.pid})")
+
+    def _replace_queue(self, index: int) -> None:
+        # Процес міг загинути всередині queue.get() із захопленим блокуванням
+        # черги, тоді новий обробник на ній зависне. Оновлення, що лишились
+        # у старій черзі, втрачаються разом з процесом.
+        old = self._queues[index]
+        self._queues[index] = _mp.Queue()
+        old.cancel_join_thread()
+        old.close()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _reload(self) -> None:
+        if self.on_reload is not None:
+            self.on_reload()
+        self._forward_signal(signal.SIGHUP)
+
+    def _forward_signal(self, signum: int) -> None:
+        for process in self._processes:
+            if process and process.is_alive():
+                os.kill(process.pid, signum)
+
+    async def _supervise(self) -> None:
+        while not self._stopping.is_set():
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self._stopping.is_set():
+                    logger.warning(f"Обробник #{index} завершився з кодом {process.exitcode}, перезапуск")
+                    self.restarts += 1
+                    self._replace_queue(index)
+                    self._spawn(index)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self) -> None:
+        url = self.api.api_url(token=self.config.bot_token, method="getUpdates")
+        timeout = aiohttp.ClientTimeout(total=self.poll_timeout + 10)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            while not self._stopping.is_set():
+                try:
+                    async with http.get(url, params={"offset": self._offset, "timeout": self.poll_timeout}) as resp:
+                        payload = await resp.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.error(f"Помилка getUpdates: {e}")
+                    await asyncio.sleep(1)
+                    continue
+
+                if not payload.get("ok"):
+                    retry_after = payload.get("parameters", {}).get("retry_after", 1)
+                    logger.error(f"getUpdates: {payload.get('description')}")
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                for update in payload["result"]:
+                    self._offset = update["update_id"] + 1
+                    self._queues[shard_key(update) % self.workers].put(update)
+
+    async def run(self) -> None:
+        """Запуск обробників, приймання оновлень до stop() або SIGINT/SIGTERM."""
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if hasattr(signal, "SIGHUP"):
+            # Обробник замінює зареєстрований раніше (main.py), тож приймач
+            # перезавантажує і свою конфігурацію, і передає сигнал обробникам
+            loop.add_signal_handler(signal.SIGHUP, self._reload)
+
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Приймач оновлень запущено, обробників: {self.workers}")
+
+        poller = asyncio.create_task(self._poll())
+        supervisor = asyncio.create_task(self._supervise())
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            poller.cancel()
+            await asyncio.gather(poller, supervisor, return_exceptions=True)
+            # Обробники дограють свої черги до кінця і завершуються
+            for queue in self._queues:
+                queue.put(None)
+            drained = True
+            for process in self._processes:
+                if process:
+                    await loop.run_in_executor(None, process.join, self.config.shutdown_timeout + 5)
+                    drained = drained and process.exitcode == 0
+            if drained:
+                await self._confirm_updates()
+            else:
+                logger.warning("Не всі обробники завершились штатно, оновлення не підтверджено")
+            token = database.use_database(self.database_path)
+            try:
+                await database.checkpoint()
+            finally:
+                database.reset_database(token)
+            logger.info("Приймач оновлень зупинено")
+
+    async def _confirm_updates(self) -> None:
+        if not self._offset:
+            return
+        url = self.api.api_url(token=self.config.bot_token, method="getUpdates")
+        try:
+            async with aiohttp.ClientSession() as http:
+                async with http.get(url, params={"offset": self._offset, "limit": 1, "timeout": 0}):
+                    pass
+        except aiohttp.ClientError as e:
+            logger.error(f"Не вдалося підтвердити оновлення: {e}")
+
+
+def worker_main(index: int, queue: Queue, config: Config, database_path: str | Path | None,
+                api: TelegramAPIServer, log_level: int = logging.INFO) -> None:
+    """Точка входу процесу-обробника."""
+    # Зупинкою керує приймач: він надсилає None у чергу
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(
+        level=log_level,
+        format=f"%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(_worker(queue, config, database_path, api))
+
+
+async def _worker(queue: Queue, config: Config, database_path: str | Path | None, api: TelegramAPIServer) -> None:
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.enums import ParseMode
+
+    from config import ConfigStore, reload_config
+    from main import create_dispatcher
+
+    if database_path:
+        database.DATABASE_PATH = database_path
+
+    session = AiohttpSession(api=api)
+    bot = Bot(
+        token=config.bot_token,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    config_store = ConfigStore(config, loader=reload_config)
+    dp = create_dispatcher(config_store)
+
+    loop = asyncio.get_running_loop()
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, config_store.try_reload)
+    watcher = asyncio.create_task(config_store.watch())
+
+    # Оновлення одного користувача обробляються строго по черзі,
+    # різних користувачів — конкурентно
+    last_task: dict[int, asyncio.Task] = {}
+
+    async def feed(update: dict, previous: asyncio.Task | None) -> None:
+        if previous:
+            await asyncio.wait([previous])
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error(f"Помилка обробки оновлення {update.get('update_id')}: {e}")
+
+    def forget(key: int, task: asyncio.Task) -> None:
+        if last_task.get(key) is task:
+            del last_task[key]
+
+    while True:
+        update = await loop.run_in_executor(None, queue.get)
+        if update is None:
+            break
+        key = shard_key(update)
+        task = asyncio.create_task(feed(update, last_task.get(key)))
+        last_task[key] = task
+        task.add_done_callback(lambda t, k=key: forget(k, t))
+
+    await asyncio.gather(*last_task.values(), return_exceptions=True)
+    watcher.cancel()
+    await bot.session.close()
@@ -0,0 +1,169 @@
+"""Черга масової розсилки з обмеженням швидкості.
+
+Telegram дозволяє боту близько 30 повідомлень на секунду різним чатам;
+понад ліміт відповідає 429 (TelegramRetryAfter). SendQueue розподіляє
+відправлення на рівні проміжки 1/rate між кількома обробниками, тож
+повільні відповіді мережі не зменшують швидкість, а ліміт не
+перевищується. Після 429 пауза діє на всю чергу, повідомлення
+надсилається повторно.
+
+Черга обмежена: put чекає, поки звільниться місце, тож той, хто
+наповнює чергу (напр. читає клієнтів з БД сторінками), іде з тією ж
+швидкістю, що й відправлення, і пам'ять не залежить від кількості
+адресатів.
+
+outbound — фонові розсилки процесу (підписки, нагадування): при зупинці
+бота почате дограє, перш ніж закриються HTTP-сесії.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Повідомлень на секунду — із запасом до ліміту Telegram
+SEND_RATE = 25
+# Місць у черзі і одночасних запитів (8 тримають 25/с навіть при відповіді API за 0,3 с)
+SEND_QUEUE_SIZE = 1000
+SEND_WORKERS = 8
+# Спроб одного повідомлення після 429
+SEND_RETRIES = 3
+
+
+class SendQueue:
+    """Розсилка через обмежену чергу; async with чекає на відправлення всього поставленого."""
+
+    def __init__(self, bot: Bot, rate: float = SEND_RATE, maxsize: int = SEND_QUEUE_SIZE,
+                 workers: int = SEND_WORKERS):
+        self.bot = bot
+        self._interval = 1 / rate
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._workers_count = workers
+        self._workers: list[asyncio.Task] = []
+        self._next_slot = 0.0
+        self.sent = 0
+        self.blocked = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def __aenter__(self) -> "SendQueue":
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._workers_count)]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                await self._queue.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def put(self, chat_id: int, text: str, on_done: Callable[[], None] | None = None, **kwargs) -> None:
+        """Постановка повідомлення (аргументи send_message); чекає на місце в черзі.
+
+        on_done викликається, коли з повідомленням закінчено (надіслано, бот
+        заблоковано чи спроби вичерпано), але не при скасуванні розсилки.
+        """
+        await self._queue.put((chat_id, text, on_done, kwargs))
+
+    async def join(self) -> None:
+        """Очікування відправлення всього поставленого."""
+        await self._queue.join()
+
+    async def _slot(self) -> None:
+        """Очікування свого проміжку: обробники ділять одну шкалу часу."""
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        await asyncio.sleep(slot - now)
+
+    async def _work(self) -> None:
+        while True:
+            chat_id, text, on_done, kwargs = await self._queue.get()
+            try:
+                await self._send(chat_id, text, kwargs)
+                if on_done is not None:
+                    on_done()
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, chat_id: int, text: str, kwargs: dict) -> None:
+        for _ in range(SEND_RETRIES):
+            await self._slot()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                self.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                # Ліміт перевищено: пауза для всієї черги
+                self.retried += 1
+                resume = asyncio.get_running_loop().time() + e.retry_after
+                self._next_slot = max(self._next_slot, resume)
+            except TelegramForbiddenError:
+                # Клієнт заблокував бота
+                self.blocked += 1
+                return
+            except Exception as e:
+                logger.warning(f"Не вдалося надіслати повідомлення {chat_id}: {e}")
+                self.failed += 1
+                return
+        self.failed += 1
+
+
+class Outbound:
+    """Фонові розсилки процесу для координованої зупинки.
+
+    Ділянка `async with outbound.sending()` (замовлення за підпискою разом
+    зі сповіщеннями, розсилка нагадувань) не переривається посередині:
+    stop() чекає її завершення і лише потім скасовує задачі. Після початку
+    зупинки нові ділянки не починаються, а довгі розсилки перевіряють
+    stopping і перестають ставити нові повідомлення.
+    """
+
+    def __init__(self):
+        self.stopping = False
+        self._active = 0
+        # Створюється в stop(): модуль імпортується поза циклом подій
+        self._idle: asyncio.Event | None = None
+
+    @asynccontextmanager
+    async def sending(self) -> AsyncIterator[None]:
+        if self.stopping:
+            # Зупинка вже почалась — чекаємо на скасування задачі
+            await asyncio.Event().wait()
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if not self._active and self._idle is not None:
+                self._idle.set()
+
+    async def stop(self, tasks: Iterable[asyncio.Task], timeout: float) -> bool:
+        """Дочекатися почате (не довше timeout) і скасувати tasks; False, якщо час вийшов."""
+        self.stopping = True
+        self._idle = asyncio.Event()
+        finished = True
+        if self._active:
+            logger.info(f"Очікування розсилок: {self._active} (до {timeout:.0f} с)")
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+                logger.info(f"Розсилки завершено за {time.monotonic() - started:.1f} с")
+            except asyncio.TimeoutError:
+                finished = False
+        tasks = list(tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return finished
+
+
+outbound = Outbound()
@@ -0,0 +1,274 @@
+"""Координована зупинка бота без втрати оновлень.
+
+Порядок при SIGTERM/SIGINT:
+    1. polling зупиняється — нові оновлення не приймаються;
+    2. обробники, що вже працюють, і початі фонові розсилки (підписки,
+       нагадування — sending.outbound) дограють (з тим самим граничним
+       часом), тож замовлення не обривається між create_order і
+       сповіщеннями, а поставлені в чергу повідомлення надсилаються;
+    3. Telegram отримує підтвердження (offset) лише для оброблених
+       оновлень — скасовані через граничний час буде доставлено повторно
+       після перезапуску (стан FSM у пам'яті втрачено, тож повторно
+       спрацюють лише дії, що від нього не залежать);
+    4. WAL переноситься у файл БД;
+    5. лише після цього викликаючий код закриває HTTP-сесії.
+
+Polling aiogram підтверджує всю отриману пачку наступним getUpdates, ще
+до того, як обробники завершаться, тому тут власний цикл: offset стоїть
+на найстарішому оновленні в обробці. Telegram при цьому віддає ще
+не підтверджені оновлення, що вже в обробці, — вони пропускаються.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.dispatcher import DEFAULT_BACKOFF_CONFIG
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff
+
+import database
+from sending import outbound
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 25.0
+
+# Максимум getUpdates: стільки оновлень може бути отримано понад найстаріше в обробці
+UPDATES_LIMIT = 100
+# Як часто перепитувати Telegram, поки всі отримані оновлення ще в обробці
+RECHECK_INTERVAL = 0.2
+# Оновлення, що обробляється довше, не тримає offset, коли через нього
+# стоїть приймання (/profile, /export)
+STALL_TIMEOUT = 5.0
+
+
+class InFlightTracker:
+    """Оновлення в обробці та межа підтвердження для кожного бота."""
+
+    def __init__(self):
+        self._last_update_id: dict[int, int] = {}
+        # update_id в обробці і скасованих, що тримають offset
+        self._pending: dict[int, set[int]] = {}
+        # Оновлення в обробці, на яких offset більше не тримається
+        self._released: dict[int, set[int]] = {}
+        self._tasks: dict[asyncio.Task, tuple[int, int]] = {}
+        self._started: dict[tuple[int, int], float] = {}
+        self.finished = 0
+        self._progress = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def is_new(self, bot_id: int, update_id: int) -> bool:
+        """Оновлення ще не отримували (повторно його надсилає незрушений offset)."""
+        return update_id > self._last_update_id.get(bot_id, -1)
+
+    def start(self, bot_id: int, update_id: int, handle: Awaitable[Any]) -> None:
+        """Обробка оновлення окремою задачею."""
+        self._last_update_id[bot_id] = max(update_id, self._last_update_id.get(bot_id, -1))
+        self._pending.setdefault(bot_id, set()).add(update_id)
+        self._started[bot_id, update_id] = time.monotonic()
+        task = asyncio.create_task(handle)
+        self._tasks[task] = (bot_id, update_id)
+        self._idle.clear()
+        task.add_done_callback(self._finish)
+
+    def _finish(self, task: asyncio.Task) -> None:
+        bot_id, update_id = self._tasks.pop(task)
+        del self._started[bot_id, update_id]
+        released = self._released.get(bot_id, set())
+        # Скасоване оновлення лишається і тримає offset, якщо його ще не підтверджено
+        if not task.cancelled() or update_id in released:
+            self._pending[bot_id].discard(update_id)
+        released.discard(update_id)
+        self.finished += 1
+        self._progress.set()
+        if not self._tasks:
+            self._idle.set()
+
+    def release_stalled(self, bot_id: int, older_than: float) -> int:
+        """Перестати тримати offset на оновленнях, що в обробці довше older_than с.
+
+        Поки найстаріше оновлення в обробці, Telegram віддає лише UPDATES_LIMIT
+        наступних; якщо всі вони вже отримані, приймання чекає. Короткі
+        обробники скоро звільнять offset, а довгий (/profile) зупинив би
+        приймання — його оновлення підтверджується до завершення, як у
+        звичайному polling.
+        """
+        now = time.monotonic()
+        released = self._released.setdefault(bot_id, set())
+        stalled = {
+            update_id for update_id in self._pending.get(bot_id, set()) - released
+            if (bot_id, update_id) in self._started and now - self._started[bot_id, update_id] >= older_than
+        }
+        released.update(stalled)
+        return len(stalled)
+
+    async def wait_progress(self, finished: int, timeout: float) -> None:
+        """Очікування, поки після finished завершених обробників завершиться ще один
+        (не довше timeout)."""
+        if self.finished != finished:
+            return
+        self._progress.clear()
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._progress.wait(), timeout)
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Очікування завершення обробників; False, якщо час вийшов."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def cancel(self) -> int:
+        """Скасування обробників, що не встигли; повертає їх кількість."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+
+    def confirm_offset(self, bot_id: int) -> int | None:
+        """Offset для getUpdates: усе до нього оброблено.
+
+        Якщо якесь оновлення в обробці чи скасоване, межа ставиться перед
+        ним — краще повторно обробити кілька оновлень, ніж втратити замовлення.
+        """
+        held = self._pending.get(bot_id, set()) - self._released.get(bot_id, set())
+        if held:
+            return min(held)
+        last = self._last_update_id.get(bot_id)
+        return None if last is None else last + 1
+
+
+async def confirm_updates(bot: Bot, offset: int | None) -> None:
+    """Підтвердження оброблених оновлень, щоб Telegram не надіслав їх повторно."""
+    if offset is None:
+        return
+    try:
+        await bot.get_updates(offset=offset, limit=1, timeout=0)
+    except Exception as e:
+        logger.error(f"Не вдалося підтвердити оновлення бота {bot.id}: {e}")
+
+
+async def process_update(dp: Dispatcher, bot: Bot, update: Update, **kwargs: Any) -> None:
+    """Обробка одного оновлення, як у polling aiogram; помилки лише логуються."""
+    try:
+        response = await dp.feed_update(bot, update, **kwargs)
+        if isinstance(response, TelegramMethod):
+            await dp.silent_call_request(bot, response)
+    except Exception as e:
+        logger.exception(f"Помилка обробки оновлення {update.update_id}: {e}")
+
+
+async def poll_updates(dp: Dispatcher, bot: Bot, tracker: InFlightTracker, polling_timeout: int,
+                       allowed_updates: list[str] | None, **kwargs: Any) -> None:
+    """getUpdates з offset, що не заходить за оновлення в обробці."""
+    backoff = Backoff(config=DEFAULT_BACKOFF_CONFIG)
+    request_timeout = int(bot.session.timeout + polling_timeout) if bot.session.timeout else None
+    while True:
+        offset = tracker.confirm_offset(bot.id)
+        finished = tracker.finished
+        try:
+            updates = await bot(
+                GetUpdates(offset=offset, limit=UPDATES_LIMIT, timeout=polling_timeout,
+                           allowed_updates=allowed_updates),
+                request_timeout=request_timeout,
+            )
+        except Exception as e:
+            logger.error(f"Помилка getUpdates бота {bot.id}: {e}")
+            await backoff.asleep()
+            continue
+        backoff.reset()
+
+        new = [update for update in updates if tracker.is_new(bot.id, update.update_id)]
+        for update in new:
+            tracker.start(bot.id, update.update_id, process_update(dp, bot, update, **kwargs))
+        if updates and not new:
+            # Усі отримані ще в обробці: long polling відповідає одразу, тож
+            # чекаємо на обробники; повна пачка — приймання стоїть через них
+            if len(updates) >= UPDATES_LIMIT:
+                released = tracker.release_stalled(bot.id, STALL_TIMEOUT)
+                if released:
+                    logger.warning(f"Обробники довше {STALL_TIMEOUT:.0f} с, "
+                                   f"оновлення підтверджено до завершення: {released}")
+            await tracker.wait_progress(finished, RECHECK_INTERVAL)
+
+
+async def run_polling(
+    dp: Dispatcher,
+    *bots: Bot,
+    timeout: float = DEFAULT_TIMEOUT,
+    checkpoint: Callable[[], Awaitable[None]] = database.checkpoint,
+    polling_timeout: int = 10,
+    senders: Iterable[asyncio.Task] = (),
+    **kwargs,
+) -> None:
+    """Polling до SIGTERM/SIGINT з дренуванням обробників перед поверненням.
+
+    senders — фонові задачі з розсилками: дренуються разом з обробниками і
+    скасовуються. Сесії ботів не закриваються — це робить викликаючий код
+    після повернення.
+    """
+    tracker = InFlightTracker()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop.set)
+
+    workflow_data = {"dispatcher": dp, "bots": bots, **dp.workflow_data, **kwargs}
+    allowed_updates = dp.resolve_used_update_types()
+    await dp.emit_startup(bot=bots[-1], **workflow_data)
+    logger.info("Start polling")
+    pollers = [
+        asyncio.create_task(poll_updates(dp, bot, tracker, polling_timeout, allowed_updates, **workflow_data))
+        for bot in bots
+    ]
+    stopping = asyncio.create_task(stop.wait())
+    try:
+        done, _ = await asyncio.wait([*pollers, stopping], return_when=asyncio.FIRST_COMPLETED)
+        # Поллер завершується лише з помилкою — її варто побачити
+        for task in done - {stopping}:
+            task.result()
+    finally:
+        for task in (*pollers, stopping):
+            task.cancel()
+        await asyncio.gather(*pollers, stopping, return_exceptions=True)
+        logger.info("Polling stopped")
+        try:
+            await drain(tracker, bots, timeout, checkpoint, senders)
+        finally:
+            await dp.emit_shutdown(bot=bots[-1], **workflow_data)
+
+
+async def drain(tracker: InFlightTracker, bots: Iterable[Bot], timeout: float,
+                checkpoint: Callable[[], Awaitable[None]], senders: Iterable[asyncio.Task] = ()) -> None:
+    if tracker.active:
+        logger.info(f"Очікування обробників: {tracker.active} (до {timeout:.0f} с)")
+    handlers_done, senders_done = await asyncio.gather(
+        tracker.wait_idle(timeout), outbound.stop(senders, timeout)
+    )
+    if not handlers_done:
+        cancelled = await tracker.cancel()
+        logger.warning(f"Обробники не завершились вчасно, скасовано: {cancelled}")
+    if not senders_done:
+        logger.warning("Розсилки не завершились вчасно і перервані")
+
+    await asyncio.gather(*(confirm_updates(bot, tracker.confirm_offset(bot.id)) for bot in bots))
+
+    try:
+        await checkpoint()
+    except Exception as e:
+        logger.error(f"Помилка checkpoint WAL: {e}")
+    logger.info("Обробку завершено, бот зупиняється")
@@ -0,0 +1,105 @@
+"""Слоти доставки: розклад на найближчі дні і вільне місце в них.
+
+Слоти задаються годинами (DELIVERY_SLOTS) з однаковою місткістю в пляшках
+(SLOT_CAPACITY) і повторюються щодня на SLOT_DAYS днів уперед. Заброньоване
+читається з таблиці в пам'яті (database.get_slot_bookings), тож клавіатура
+слотів у ранковий пік не робить запиту до БД на кожен показ. Саме
+бронювання — умовний UPDATE у транзакції створення замовлення
+(database.create_order): показане вільне місце може встигнути зайняти інший
+клієнт, але перебронювати слот не вийде.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import cached_property, lru_cache
+
+from config import Config
+from database import get_slot_bookings
+
+WEEKDAYS = ("пн", "вт", "ср", "чт", "пт", "сб", "нд")
+
+# Слот можна обрати не пізніше ніж за стільки до його початку (цілі години:
+# тоді розклад змінюється лише на початку години і кешується на годину)
+BOOKING_CUTOFF = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class DeliverySlot:
+    """Слот доставки: день і години [start, end)."""
+
+    day: date
+    start: int
+    end: int
+
+    @cached_property
+    def key(self) -> str:
+        """Ключ у БД (orders.delivery_slot, delivery_slots.slot); сортується за часом."""
+        return f"{self.day.isoformat()} {self.start:02d}:00-{self.end:02d}:00"
+
+    @property
+    def label(self) -> str:
+        return f"{WEEKDAYS[self.day.weekday()]} {self.day:%d.%m}, {self.start:02d}:00–{self.end:02d}:00"
+
+    @property
+    def begins_at(self) -> datetime:
+        return datetime.combine(self.day, datetime.min.time()) + timedelta(hours=self.start)
+
+    @classmethod
+    def parse(cls, key: str) -> "DeliverySlot | None":
+        try:
+            day, hours = key.split(" ")
+            start, end = (int(part.split(":")[0]) for part in hours.split("-"))
+            return cls(date.fromisoformat(day), start, end)
+        except ValueError:
+            return None
+
+    def bookable(self, now: datetime) -> bool:
+        return now < self.begins_at - BOOKING_CUTOFF
+
+
+def slot_label(key: str) -> str:
+    """Слот збереженого замовлення для показу."""
+    slot = DeliverySlot.parse(key)
+    return slot.label if slot is not None else key
+
+
+def upcoming_slots(config: Config, now: datetime | None = None) -> tuple[DeliverySlot, ...]:
+    """Слоти, які ще можна обрати, за часом."""
+    hour = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    return _schedule(config.delivery_slots, config.slot_days, hour)
+
+
+@lru_cache(maxsize=16)
+def _schedule(delivery_slots: tuple[tuple[int, int], ...], days: int, hour: datetime) -> tuple[DeliverySlot, ...]:
+    slots = (
+        DeliverySlot(hour.date() + timedelta(days=offset), start, end)
+        for offset in range(days)
+        for start, end in delivery_slots
+    )
+    return tuple(slot for slot in slots if slot.bookable(hour))
+
+
+def fits(booked: int, quantity: int, capacity: int) -> bool:
+    """Чи вміститься замовлення; більше за місткість — лише в порожній слот
+    (та сама умова, що в database._reserve_slot)."""
+    return booked + quantity <= capacity or booked == 0
+
+
+async def available_slots(config: Config, quantity: int, now: datetime | None = None) -> list[tuple[DeliverySlot, int]]:
+    """Слоти, куди вміщається замовлення на quantity пляшок, і вільне місце в них."""
+    now = now or datetime.now()
+    bookings = await get_slot_bookings(now.date().isoformat())
+    available = []
+    for slot in upcoming_slots(config, now):
+        booked = bookings.booked(slot.key)
+        if fits(booked, quantity, config.slot_capacity):
+            available.append((slot, max(config.slot_capacity - booked, 0)))
+    return available
+
+
+async def find_slot(config: Config, day: str, start: int, quantity: int) -> DeliverySlot | None:
+    """Обраний клієнтом слот, якщо він досі в розкладі, не почався і має місце."""
+    for slot, _ in await available_slots(config, quantity):
+        if slot.day.isoformat() == day and slot.start == start:
+            return slot
+    return None
@@ -8,6 +8,7 @@ class RegistrationStates(StatesGroup):
     waiting_for_name = State()
     waiting_for_phone = State()
     waiting_for_address = State()
+    waiting_for_location = State()
 
 
 class EditProfileStates(StatesGroup):
@@ -23,6 +24,7 @@ class OrderStates(StatesGroup):
     waiting_for_quantity = State()
     waiting_for_custom_quantity = State()
     waiting_for_payment = State()
+    waiting_for_slot = State()
     waiting_for_comment = State()
     waiting_for_confirmation = State()
 
@@ -36,3 +38,7 @@ class RatingStates(StatesGroup):
 class AdminStates(StatesGroup):
     """Стани адмін-панелі."""
     waiting_for_price = State()
+    waiting_for_price_file = State()
+    confirming_bulk_prices = State()
+    waiting_for_statement = State()
+    confirming_payments = State()
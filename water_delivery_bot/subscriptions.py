@@ -0,0 +1,153 @@
+"""Планувальник підписок: регулярні замовлення без участі клієнта.
+
+Один планувальник на БД тримає в купі (heapq) лише запуски найближчого
+вікна SCHEDULER_HORIZON: купа поповнюється запитом за індексом
+next_run, тож ні пам'ять, ні робота не залежать від загальної кількості
+підписок, а опитування всієї таблиці немає. Між запусками планувальник
+спить до найближчого з них або до кінця вікна.
+
+Замовлення створюється тим самим шляхом, що й з меню (запис, статистика,
+журнал подій, індекс активних), а адміни отримують звичайне сповіщення.
+Підписка переноситься на наступний запуск у тій самій транзакції, тому
+перезапуск бота посеред запуску не дає дубля. Запуски, пропущені поки
+бот не працював, наздоганяються одним замовленням при старті.
+
+Скасована чи змінена підписка лишає в купі застарілий запис — він
+відкидається під час запуску (перевірка next_run у БД), тож клієнтські
+обробники з планувальником не взаємодіють і можуть працювати в інших
+процесах. Вікно має бути коротшим за найменший інтервал підписки.
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from aiogram import Bot
+
+import database
+from config import ConfigStore
+from sending import outbound
+
+logger = logging.getLogger(__name__)
+
+# Вікно запусків у пам'яті, с
+SCHEDULER_HORIZON = 15 * 60
+# Пауза між замовленнями, с: сповіщення клієнту й адмінам не впираються
+# в ліміт Telegram, коли наздоганяється багато пропущених запусків
+RUN_PAUSE = 0.1
+
+
+def next_after(start: datetime, interval_days: int, now: datetime) -> datetime:
+    """Перший запуск start + k·interval_days (k ≥ 1), пізніший за now."""
+    interval = timedelta(days=interval_days)
+    missed = max(0, (now - start) // interval)
+    return start + interval * (missed + 1)
+
+
+class SubscriptionScheduler:
+    """Купа (час запуску, id підписки) найближчих запусків однієї БД."""
+
+    def __init__(self, horizon: float = SCHEDULER_HORIZON):
+        self.horizon = timedelta(seconds=horizon)
+        self._heap: list[tuple[datetime, int]] = []
+        # Актуальний час запуску кожної підписки в купі; решта записів застарілі
+        self._queued: dict[int, datetime] = {}
+        self._loaded_until: datetime | None = None
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def push(self, subscription_id: int, run_at: datetime) -> None:
+        if self._queued.get(subscription_id) == run_at:
+            return
+        self._queued[subscription_id] = run_at
+        heapq.heappush(self._heap, (run_at, subscription_id))
+
+    async def refill(self, now: datetime) -> None:
+        """Запуски до now + horizon (і всі пропущені) з БД у купу."""
+        until = now + self.horizon
+        async for subscription_id, run_at in database.iter_due_subscriptions(until):
+            self.push(subscription_id, run_at)
+        self._loaded_until = until
+
+    def pop_due(self, now: datetime) -> list[tuple[datetime, int]]:
+        """Запуски, час яких настав, без застарілих записів."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, subscription_id = heapq.heappop(self._heap)
+            if self._queued.get(subscription_id) == run_at:
+                del self._queued[subscription_id]
+                due.append((run_at, subscription_id))
+        return due
+
+    def next_wakeup(self) -> datetime:
+        """Найближчий запуск або кінець завантаженого вікна."""
+        if self._heap and self._heap[0][0] < self._loaded_until:
+            return self._heap[0][0]
+        return self._loaded_until
+
+    async def run(self, fire) -> None:
+        """Нескінченний цикл: fire(subscription_id, run_at) для кожного запуску."""
+        while True:
+            now = datetime.now()
+            if self._loaded_until is None or now >= self._loaded_until:
+                await self.refill(now)
+            for run_at, subscription_id in self.pop_due(now):
+                try:
+                    await fire(subscription_id, run_at)
+                except Exception as e:
+                    # Підписка лишилась на старому next_run — її поверне наступне поповнення
+                    logger.error(f"Помилка запуску підписки {subscription_id}: {e}")
+                await asyncio.sleep(RUN_PAUSE)
+            delay = (self.next_wakeup() - datetime.now()).total_seconds()
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def run_subscription(bot: Bot, store: ConfigStore, subscription_id: int, run_at: datetime) -> None:
+    """Замовлення за підпискою за поточною ціною клієнта і сповіщення."""
+    from handlers.orders import get_user_price, notify_new_order
+
+    entry = await database.get_subscription_with_user(subscription_id)
+    if entry is None or entry[0].next_run != run_at:
+        return  # скасована або перенесена
+    subscription, user = entry
+    config = store.current
+    next_run = next_after(run_at, subscription.interval_days, datetime.now())
+
+    order = await database.create_subscription_order(
+        subscription, subscription.quantity * get_user_price(user, config), next_run
+    )
+    if order is None:
+        return
+    logger.info(f"Замовлення #{order.id} за підпискою {subscription.id}, наступне {next_run:%d.%m.%Y %H:%M}")
+
+    try:
+        await bot.send_message(
+            user.telegram_id,
+            f"📅 <b>Замовлення #{order.id} за підпискою оформлено!</b>\n\n"
+            f"💧 {database.WATER_TYPE_NAMES[order.water_type]}\n"
+            f"📦 {order.quantity} пл. на суму {order.total_price} ₴\n"
+            f"💳 {order.payment_method}\n\n"
+            f"Наступне замовлення: {next_run:%d.%m.%Y}.\n"
+            "Змінити чи скасувати — кнопка «📅 Підписка».",
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.warning(f"Не вдалося сповістити клієнта {user.telegram_id}: {e}")
+    await notify_new_order(bot, config, order, user, subscription=True)
+
+
+async def run_subscriptions(store: ConfigStore, bot: Bot, database_path: Path | None = None) -> None:
+    """Планувальник підписок поточної БД (орендаря)."""
+    if database_path is not None:
+        # Задача має власну копію контексту
+        database.use_database(database_path)
+
+    async def fire(subscription_id: int, run_at: datetime) -> None:
+        # Зупинка бота не обриває запуск між замовленням і сповіщеннями
+        async with outbound.sending():
+            await run_subscription(bot, store, subscription_id, run_at)
+
+    await SubscriptionScheduler().run(fire)
@@ -0,0 +1,158 @@
+"""Багатоорендний режим: кілька ботів (брендів-франшиз) в одному процесі.
+
+Кожен орендар описується окремим файлом ``<назва>.env`` у директорії
+TENANTS_DIR з тими ж змінними, що й основний .env (BOT_TOKEN, ADMIN_IDS,
+ціни, способи оплати, ORDERS_CHAT_ID), і отримує власну БД
+``data/<назва>.db`` (або DATABASE_PATH з файлу). Диспетчер, роутери,
+кеші та HTTP-сесія спільні; outer-middleware за id бота підставляє
+конфігурацію і БД орендаря на час обробки оновлення.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from aiogram import Bot
+from dotenv import dotenv_values
+
+import archive
+import backup
+import database
+import reminders
+import subscriptions
+from config import Config, ConfigStore, load_config
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@dataclass
+class Tenant:
+    """Бот одного бренду."""
+    name: str
+    env_file: Path
+    store: ConfigStore
+    database_path: Path
+
+    @property
+    def bot_id(self) -> int:
+        return int(self.store.current.bot_token.split(":", 1)[0])
+
+
+def _load_tenant_config(env_file: Path) -> Config:
+    return load_config(dotenv_values(env_file))
+
+
+def load_tenant(env_file: Path) -> Tenant:
+    """Орендар з файлу <назва>.env."""
+    env = dotenv_values(env_file)
+    database_path = env.get("DATABASE_PATH")
+    return Tenant(
+        name=env_file.stem,
+        env_file=env_file,
+        store=ConfigStore(load_config(env), loader=lambda: _load_tenant_config(env_file)),
+        database_path=Path(database_path) if database_path else DATA_DIR / f"{env_file.stem}.db",
+    )
+
+
+class Tenants:
+    """Реєстр орендарів з доступом за id бота."""
+
+    def __init__(self, tenants: list[Tenant]):
+        self._by_bot_id: dict[int, Tenant] = {}
+        for tenant in tenants:
+            if tenant.bot_id in self._by_bot_id:
+                raise ValueError(f"Токен орендаря {tenant.name} вже використовує "
+                                 f"{self._by_bot_id[tenant.bot_id].name}")
+            self._by_bot_id[tenant.bot_id] = tenant
+
+    @classmethod
+    def from_directory(cls, path: str | Path) -> "Tenants":
+        """Завантаження всіх *.env з директорії."""
+        env_files = sorted(Path(path).glob("*.env"))
+        if not env_files:
+            raise ValueError(f"У {path} немає файлів орендарів (*.env)")
+        tenants = []
+        for env_file in env_files:
+            try:
+                tenants.append(load_tenant(env_file))
+            except ValueError as e:
+                raise ValueError(f"{env_file.name}: {e}") from e
+        return cls(tenants)
+
+    def __iter__(self):
+        return iter(self._by_bot_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_bot_id)
+
+    def get(self, bot_id: int) -> Tenant | None:
+        return self._by_bot_id.get(bot_id)
+
+    async def init_databases(self) -> None:
+        async def init(tenant: Tenant) -> None:
+            # Кожна задача має власну копію контексту
+            database.use_database(tenant.database_path)
+            await database.init_db()
+            await database.load_active_orders()
+        
+        await asyncio.gather(*(init(tenant) for tenant in self))
+
+    async def checkpoint(self) -> None:
+        for tenant in self:
+            token = database.use_database(tenant.database_path)
+            try:
+                await database.checkpoint()
+            finally:
+                database.reset_database(token)
+
+    def try_reload(self) -> None:
+        for tenant in self:
+            tenant.store.try_reload()
+
+    async def watch(self, interval: float = 5.0) -> None:
+        """Перезавантаження конфігурації орендаря при зміні його файлу."""
+        await asyncio.gather(*(tenant.store.watch(tenant.env_file, interval) for tenant in self))
+
+    async def archive_periodically(self) -> None:
+        """Архівування давніх замовлень у БД кожного орендаря за його налаштуванням."""
+        await asyncio.gather(*(archive.archive_periodically(tenant.store, tenant.database_path) for tenant in self))
+
+    async def backup_periodically(self) -> None:
+        """Резервні копії БД кожного орендаря за його налаштуванням."""
+        await asyncio.gather(*(backup.backup_periodically(tenant.store, tenant.database_path) for tenant in self))
+
+    async def run_subscriptions(self, bots: list[Bot]) -> None:
+        """Планувальники підписок орендарів; bots — у порядку create_bots."""
+        await asyncio.gather(*(
+            subscriptions.run_subscriptions(tenant.store, bot, tenant.database_path)
+            for tenant, bot in zip(self, bots)
+        ))
+
+    async def remind_periodically(self, bots: list[Bot]) -> None:
+        """Прогнози і нагадування про повторне замовлення орендарів; bots — у порядку create_bots."""
+        await asyncio.gather(*(
+            reminders.remind_periodically(tenant.store, bot, tenant.database_path)
+            for tenant, bot in zip(self, bots)
+        ))
+
+    def create_bots(self, **kwargs) -> list[Bot]:
+        """Боти всіх орендарів (kwargs — спільні параметри, напр. session)."""
+        return [Bot(token=tenant.store.current.bot_token, **kwargs) for tenant in self]
+
+    async def middleware(self, handler, event, data):
+        """Outer-middleware: конфігурація і БД орендаря, якому належить бот."""
+        tenant = self.get(data["bot"].id)
+        if tenant is None:
+            logger.warning(f"Оновлення для невідомого бота {data['bot'].id}")
+            return None
+        data["tenant"] = tenant
+        data["config"] = tenant.store.current
+        data["config_store"] = tenant.store
+        token = database.use_database(tenant.database_path)
+        try:
+            return await handler(event, data)
+        finally:
+            database.reset_database(token)